@@ -44,7 +44,7 @@ else:
     
     # Importa gerenciadores
     try:
-        from db_manager import get_db_manager
+        from db_manager import get_db_manager, parse_registros_query
         DB_MANAGER = get_db_manager()
         logger.info("✅ DatabaseManager carregado com sucesso")
     except Exception as e:
@@ -133,20 +133,40 @@ else:
     def get_client(cpf):
         """Retorna um cliente específico"""
         if DB_MANAGER:
-            clients = DB_MANAGER.get_all_clientes()
-            client = next((c for c in clients if c['cpf'] == cpf), None)
+            client = DB_MANAGER.get_cliente_by_id_or_cpf(cpf)
             if client:
                 return jsonify(client)
         return jsonify({"error": "Client not found"}), 404
     
     @app.route('/api/registros', methods=['GET'])
     def get_registros():
-        """Retorna todos os registros"""
+        """Retorna todos os registros, ou uma página se houver parâmetros de filtro"""
         if DB_MANAGER:
-            registros = DB_MANAGER.get_all_registros()
-            return jsonify(registros)
+            try:
+                # Mesmos parâmetros e limite padrão do server.py
+                filters = parse_registros_query(request.query_string.decode('utf-8'))
+                if filters is None:
+                    return jsonify(DB_MANAGER.get_all_registros())
+                return jsonify(DB_MANAGER.get_registros_page(**filters))
+            except ValueError as e:
+                return jsonify({"error": f"Parâmetros inválidos: {e}"}), 400
+            except Exception as e:
+                logger.error(f"Erro ao listar registros: {e}", exc_info=True)
+                return jsonify({"error": "Erro ao buscar registros"}), 500
         return jsonify([])
     
+    @app.route('/api/sync/changes', methods=['GET'])
+    def get_sync_changes():
+        """Retorna as alterações desde a versão informada (sync incremental)"""
+        if DB_MANAGER:
+            try:
+                since = int(request.args.get('since') or 0)
+                limit = int(request.args.get('limit') or 1000)
+            except ValueError:
+                return jsonify({"error": "Parâmetros 'since' e 'limit' devem ser inteiros"}), 400
+            return jsonify(DB_MANAGER.get_changes_since(since, limit))
+        return jsonify({"error": "Database not available"}), 503
+    
     @app.route('/api/registro', methods=['POST'])
     def save_registro():
         """Salva um registro"""
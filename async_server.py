@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Backend asyncio opcional para o CombinedHTTPHandler (SERVER_MODE=asyncio)
+
+O laço de eventos lê as requisições e mantém as conexões abertas; o
+processamento de cada requisição (arquivos estáticos, API, SQLite) roda
+em um executor pequeno, reaproveitando o handler existente. A resposta
+vai para o socket em pedaços pelo laço (LoopWriter), então as rotas em
+streaming continuam com memória limitada. Assinantes SSE ficam
+inteiramente no laço de eventos, então centenas de conexões /api/events
+não ocupam threads.
+"""
+import asyncio
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Optional, Set
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+ASYNC_EXECUTOR_WORKERS = int(os.getenv('ASYNC_EXECUTOR_WORKERS', 4))
+ASYNC_MAX_HEADER_BYTES = 64 * 1024
+ASYNC_MAX_BODY_BYTES = int(os.getenv('ASYNC_MAX_BODY_BYTES', 100 * 1024 * 1024))
+ASYNC_REQUEST_TIMEOUT = float(os.getenv('SERVER_SOCKET_TIMEOUT', 30))
+ASYNC_KEEPALIVE_TIMEOUT = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', 5))
+ASYNC_WRITE_BUFFER = 64 * 1024
+SSE_KEEPALIVE_INTERVAL = 25
+SSE_CLIENT_QUEUE_SIZE = 100
+
+
+class LoopWriter(io.RawIOBase):
+    """
+    wfile do handler no executor: junta escritas pequenas e entrega cada
+    pedaço ao laço de eventos (writer.write + drain), bloqueando a thread
+    até o cliente consumir. Só um pedaço por vez fica em memória.
+    """
+
+    def __init__(self, writer: asyncio.StreamWriter, loop: asyncio.AbstractEventLoop,
+                 buffer_size: int = ASYNC_WRITE_BUFFER):
+        super().__init__()
+        self._writer = writer
+        self._loop = loop
+        self._buffer = bytearray()
+        self.buffer_size = buffer_size
+        self.sent = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if not self._buffer:
+            return
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        future = asyncio.run_coroutine_threadsafe(self._send(data), self._loop)
+        try:
+            future.result(ASYNC_REQUEST_TIMEOUT)
+        except FutureTimeoutError:
+            future.cancel()
+            raise ConnectionAbortedError("Cliente não consumiu a resposta a tempo")
+        self.sent += len(data)
+
+    async def _send(self, data: bytes):
+        self._writer.write(data)
+        await self._writer.drain()
+
+
+def make_loop_handler(handler_class):
+    """
+    Deriva do handler HTTP uma versão que processa uma única requisição já
+    lida (bytes) e escreve a resposta num LoopWriter.
+    """
+
+    class LoopRequestHandler(handler_class):
+        def __init__(self, raw_request: bytes, client_address, server, wfile: LoopWriter):
+            self._raw_request = raw_request
+            self._loop_wfile = wfile
+            super().__init__(None, client_address, server)
+
+        def setup(self):
+            self.connection = None
+            self.rfile = io.BytesIO(self._raw_request)
+            self.wfile = self._loop_wfile
+
+        def handle(self):
+            self.close_connection = True
+            self.handle_one_request()
+
+        def finish(self):
+            pass
+
+    LoopRequestHandler.__name__ = f"Loop{handler_class.__name__}"
+    return LoopRequestHandler
+
+
+class AsyncSSEHub:
+    """Distribui os eventos do SSEBroadcaster para as filas asyncio dos assinantes"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_clients: int):
+        self.loop = loop
+        self.max_clients = max_clients
+        self._queues: Set[asyncio.Queue] = set()
+        self._dropped: Set[asyncio.Queue] = set()
+
+    def client_count(self) -> int:
+        return len(self._queues)
+
+    def has_capacity(self) -> bool:
+        return len(self._queues) < self.max_clients
+
+    def subscribe(self) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=SSE_CLIENT_QUEUE_SIZE)
+        self._queues.add(q)
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue):
+        self._queues.discard(q)
+        self._dropped.discard(q)
+
+    def is_dropped(self, q: asyncio.Queue) -> bool:
+        return q in self._dropped
+
+    def broadcast(self, data: bytes):
+        """Pode ser chamado de qualquer thread"""
+        self.loop.call_soon_threadsafe(self._fanout, data)
+
+    def _fanout(self, data: bytes):
+        for q in list(self._queues):
+            try:
+                q.put_nowait(data)
+            except asyncio.QueueFull:
+                # Assinante lento: a conexão é encerrada por _serve_sse
+                self._queues.discard(q)
+                self._dropped.add(q)
+
+
+class AsyncHTTPServer:
+    """Servidor HTTP asyncio que delega cada requisição ao handler em um executor"""
+
+    def __init__(self, handler_class, address, broadcaster=None,
+                 sse_path: str = '/api/events',
+                 sse_init: Optional[Callable[[Optional[str]], bytes]] = None,
+                 executor_workers: int = ASYNC_EXECUTOR_WORKERS,
+                 max_sse_clients: int = 200):
+        self.handler_class = make_loop_handler(handler_class)
+        self.address = address
+        self.broadcaster = broadcaster
+        self.sse_path = sse_path
+        self.sse_init = sse_init
+        self.max_sse_clients = max_sse_clients
+        self.executor_workers = max(1, executor_workers)
+        self.executor = ThreadPoolExecutor(max_workers=self.executor_workers,
+                                           thread_name_prefix='async-http')
+        self.sse_hub: Optional[AsyncSSEHub] = None
+        self._stats: Dict[str, int] = {'connections': 0, 'requests': 0, 'errors': 0}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def get_stats(self) -> Dict[str, int]:
+        stats = dict(self._stats)
+        stats['executor_workers'] = self.executor_workers
+        stats['sse_clients'] = self.sse_hub.client_count() if self.sse_hub else 0
+        return stats
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.sse_hub = AsyncSSEHub(loop, self.max_sse_clients)
+        if self.broadcaster is not None:
+            self.broadcaster.attach_hub(self.sse_hub)
+        host, port = self.address
+        self._server = await asyncio.start_server(
+            self._handle_connection, host, port,
+            limit=ASYNC_MAX_HEADER_BYTES, reuse_address=True
+        )
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    # ------------------------------------------------------------------
+
+    async def _read_request(self, reader: asyncio.StreamReader, timeout: float) -> Optional[bytes]:
+        """Lê uma requisição completa (headers + corpo). None se a conexão terminou."""
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            return None
+        except asyncio.LimitOverrunError:
+            raise ValueError("Headers muito grandes")
+
+        length = 0
+        for line in head.split(b"\r\n")[1:]:
+            name, _, value = line.partition(b":")
+            name = name.strip().lower()
+            if name == b"content-length":
+                length = int(value.strip() or 0)
+            elif name == b"transfer-encoding" and value.strip().lower() != b"identity":
+                raise ValueError("Transfer-Encoding não suportado")
+        if length > ASYNC_MAX_BODY_BYTES:
+            raise ValueError("Corpo da requisição muito grande")
+        body = b""
+        if length:
+            body = await asyncio.wait_for(reader.readexactly(length), ASYNC_REQUEST_TIMEOUT)
+        return head + body
+
+    @staticmethod
+    def _request_path(raw_request: bytes) -> str:
+        parts = raw_request.split(b"\r\n", 1)[0].split()
+        if len(parts) < 2:
+            return ''
+        return parts[1].decode('latin-1').split('?', 1)[0]
+
+    @staticmethod
+    def _last_event_id(raw_request: bytes) -> Optional[str]:
+        """Last-Event-ID do cabeçalho ou, numa conexão nova, do parâmetro ?lastEventId="""
+        head = raw_request.split(b"\r\n\r\n", 1)[0].decode('latin-1').split("\r\n")
+        for line in head[1:]:
+            name, _, value = line.partition(':')
+            if name.strip().lower() == 'last-event-id' and value.strip():
+                return value.strip()
+        parts = head[0].split()
+        if len(parts) > 1 and '?' in parts[1]:
+            values = parse_qs(parts[1].split('?', 1)[1]).get('lastEventId')
+            if values:
+                return values[0]
+        return None
+
+    def _run_handler(self, raw_request: bytes, client_address, wfile: LoopWriter) -> bool:
+        handler = self.handler_class(raw_request, client_address, self, wfile)
+        wfile.flush()
+        return handler.close_connection
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._stats['connections'] += 1
+        client_address = writer.get_extra_info('peername') or ('', 0)
+        loop = asyncio.get_running_loop()
+        timeout = ASYNC_REQUEST_TIMEOUT
+        try:
+            while True:
+                try:
+                    raw_request = await self._read_request(reader, timeout)
+                except ValueError as e:
+                    await self._send_simple(writer, 400, str(e))
+                    break
+                if raw_request is None:
+                    break
+                self._stats['requests'] += 1
+
+                if self._request_path(raw_request) == self.sse_path and raw_request.startswith(b"GET "):
+                    await self._serve_sse(reader, writer, self._last_event_id(raw_request))
+                    break
+
+                wfile = LoopWriter(writer, loop)
+                try:
+                    close = await loop.run_in_executor(
+                        self.executor, self._run_handler, raw_request, client_address, wfile
+                    )
+                except ConnectionError:
+                    break
+                except Exception as e:
+                    self._stats['errors'] += 1
+                    logger.error(f"Erro ao processar requisição: {e}", exc_info=True)
+                    # Com parte da resposta já enviada, só resta fechar a conexão
+                    if not wfile.sent:
+                        await self._send_simple(writer, 500, "Internal server error")
+                    break
+                if close:
+                    break
+                # Próximas requisições da conexão persistente
+                timeout = ASYNC_KEEPALIVE_TIMEOUT
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def _send_simple(self, writer: asyncio.StreamWriter, status: int, message: str):
+        reasons = {400: 'Bad Request', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+        body = ('{"error": "%s"}' % message).encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {status} {reasons.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Access-Control-Allow-Origin: *\r\n"
+            f"Connection: close\r\n\r\n".encode('latin-1') + body
+        )
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def _serve_sse(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                         last_event_id: Optional[str] = None):
+        hub = self.sse_hub
+        if not hub.has_capacity():
+            await self._send_simple(writer, 503, "Limite de conexões SSE atingido")
+            return
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: keep-alive\r\n"
+            b"Access-Control-Allow-Origin: *\r\n"
+            b"X-Accel-Buffering: no\r\n\r\n"
+        )
+        q = hub.subscribe()
+        # Assinantes não enviam dados: leitura concluída = desconectou
+        disconnected = asyncio.ensure_future(reader.read())
+        try:
+            if self.sse_init is not None:
+                loop = asyncio.get_running_loop()
+                writer.write(await loop.run_in_executor(self.executor, self.sse_init, last_event_id))
+            await writer.drain()
+            while not disconnected.done():
+                getter = asyncio.ensure_future(q.get())
+                done, _ = await asyncio.wait(
+                    {getter, disconnected}, timeout=SSE_KEEPALIVE_INTERVAL,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if getter in done:
+                    writer.write(getter.result())
+                else:
+                    getter.cancel()
+                    if disconnected in done:
+                        break
+                    writer.write(b": keepalive\n\n")
+                if hub.is_dropped(q):
+                    break
+                await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            hub.unsubscribe(q)
+            disconnected.cancel()
+
+
+def run_async_server(handler_class, address, broadcaster=None, sse_init=None,
+                     executor_workers: int = ASYNC_EXECUTOR_WORKERS,
+                     max_sse_clients: int = 200):
+    """Inicia o backend asyncio e bloqueia até Ctrl+C"""
+    server = AsyncHTTPServer(
+        handler_class, address, broadcaster=broadcaster, sse_init=sse_init,
+        executor_workers=executor_workers, max_sse_clients=max_sse_clients
+    )
+    try:
+        asyncio.run(server.serve_forever())
+    finally:
+        server.executor.shutdown(wait=False)
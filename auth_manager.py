@@ -11,6 +11,8 @@ import logging
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
 
+from json_store import write_json_atomic, write_text_atomic
+
 # Configuração de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -157,17 +159,14 @@ class OfflineAuthManager:
     def _save_users(self, users: Dict[str, Any]):
         """Salva usuários no arquivo"""
         try:
-            content = json.dumps(users, ensure_ascii=False, indent=2)
+            content = json.dumps(users, ensure_ascii=False, separators=(',', ':'))
             # Criptografa se disponível e adiciona marcador
             if self.cipher:
                 encrypted = self._encrypt_data(content)
                 content = f'ENCRYPTED:{encrypted}'
             
-            with open(self.users_file, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
-            # Protege o arquivo
-            os.chmod(self.users_file, 0o600)
+            # Troca atômica, já com o arquivo protegido
+            write_text_atomic(self.users_file, content, mode=0o600)
         except Exception as e:
             logger.error(f"Erro ao salvar usuários: {e}")
     
@@ -259,9 +258,7 @@ class OfflineAuthManager:
     def _save_tokens(self, tokens: Dict[str, Any]):
         """Salva tokens no arquivo"""
         try:
-            with open(self.tokens_file, 'w', encoding='utf-8') as f:
-                json.dump(tokens, f, ensure_ascii=False, indent=2)
-            os.chmod(self.tokens_file, 0o600)
+            write_json_atomic(self.tokens_file, tokens, mode=0o600)
         except Exception as e:
             logger.error(f"Erro ao salvar tokens: {e}")
     
@@ -1,14 +1,18 @@
 import threading
-import time
 import uuid
-import json
 import os
 from datetime import datetime
 from typing import Dict, Any, Optional, Callable
 import logging
 
+from db_manager import normalize_cpf
+from json_store import get_json_store
+
 logger = logging.getLogger(__name__)
 
+# Quantidade de itens gravados por transação nas importações em lote
+IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', 2000))
+
 class JobStatus:
     PENDING = 'pending'
     RUNNING = 'running'
@@ -36,7 +40,9 @@ class BackgroundJobManager:
             'clients': 0,
             'registros': 0,
             'usuarios': 0,
-            'categorias': 0
+            'categorias': 0,
+            'config': 0,
+            'solicitacoes': 0
         }
         self._jobs_lock = threading.Lock()
         self._changes_lock = threading.Lock()
@@ -127,10 +133,13 @@ class BackgroundJobManager:
             for job_id in to_remove:
                 del self.jobs[job_id]
     
-    def notify_change(self, change_type: str):
+    def notify_change(self, change_type: str) -> Optional[int]:
+        """Incrementa o contador do recurso e retorna o valor novo (None se desconhecido)"""
         with self._changes_lock:
             if change_type in self.changes:
                 self.changes[change_type] += 1
+                return self.changes[change_type]
+            return None
     
     def get_changes(self) -> Dict[str, int]:
         with self._changes_lock:
@@ -148,11 +157,62 @@ def get_job_manager() -> BackgroundJobManager:
 
 
 class ImportWorker:
-    def __init__(self, db_manager, storage_dir: str):
+    def __init__(self, db_manager, storage_dir: str, chunk_size: Optional[int] = None):
         self.db_manager = db_manager
         self.storage_dir = storage_dir
+        self.chunk_size = max(1, chunk_size or IMPORT_CHUNK_SIZE)
         self.job_manager = get_job_manager()
     
+    def _import_in_chunks(self, job_id: str, items: list, kind: str, storage_mode: str,
+                          label: str, offset: int = 0) -> int:
+        """
+        Grava `items` em blocos de `chunk_size`, uma transação por bloco, e
+        reporta o progresso por bloco. Se um bloco falhar, ele é regravado
+        item a item para isolar os registros inválidos.
+        Retorna a quantidade de itens gravados.
+        """
+        use_sqlite = storage_mode == 'sqlite' and self.db_manager
+        if use_sqlite:
+            save_all = self.db_manager.save_all_clientes if kind == 'clients' else self.db_manager.save_all_registros
+            save_one = self.db_manager.save_cliente if kind == 'clients' else self.db_manager.save_registro
+
+            def save_batch(chunk):
+                return len(chunk) if save_all(chunk) else None
+        else:
+            save_batch = self._save_clients_json if kind == 'clients' else self._save_registros_json
+
+            def save_one(item):
+                return save_batch([item]) == 1
+        
+        imported = 0
+        total = len(items)
+        for start in range(0, total, self.chunk_size):
+            chunk = items[start:start + self.chunk_size]
+            
+            # Cópias rasas: o lote pode alterar os dicts antes de um rollback
+            try:
+                saved = save_batch([dict(item) for item in chunk])
+            except Exception as e:
+                logger.warning(f"Falha no bloco da importação ({kind}), gravando item a item: {e}")
+                saved = None
+            if saved is not None:
+                imported += saved
+            else:
+                for item in chunk:
+                    try:
+                        if save_one(item):
+                            imported += 1
+                    except Exception as e:
+                        logger.warning(f"Item ignorado na importação ({kind}): {e}")
+            
+            done = start + len(chunk)
+            self.job_manager.update_progress(
+                job_id, offset + done,
+                f'Salvando {label} {done} de {total}...'
+            )
+        
+        return imported
+    
     def import_clients_async(self, clients: list, storage_mode: str = 'sqlite') -> str:
         total = len(clients)
         job_id = self.job_manager.create_job('import_clients', total, {
@@ -172,21 +232,12 @@ class ImportWorker:
         try:
             self.job_manager.start_job(job_id, 'Importando clientes...')
             
-            for i, client in enumerate(clients):
-                if storage_mode == 'sqlite' and self.db_manager:
-                    self.db_manager.save_cliente(client)
-                else:
-                    self._save_client_json(client)
-                
-                self.job_manager.update_progress(
-                    job_id, i + 1, 
-                    f'Salvando cliente {i + 1} de {len(clients)}...'
-                )
-                time.sleep(0.01)
+            imported = self._import_in_chunks(job_id, clients, 'clients', storage_mode, 'clientes')
             
             self.job_manager.complete_job(job_id, {
-                'imported': len(clients)
-            }, f'{len(clients)} cliente(s) importado(s) com sucesso!')
+                'imported': imported,
+                'failed': len(clients) - imported
+            }, f'{imported} cliente(s) importado(s) com sucesso!')
             
             self.job_manager.notify_change('clients')
             
@@ -213,21 +264,12 @@ class ImportWorker:
         try:
             self.job_manager.start_job(job_id, 'Importando registros...')
             
-            for i, registro in enumerate(registros):
-                if storage_mode == 'sqlite' and self.db_manager:
-                    self.db_manager.save_registro(registro)
-                else:
-                    self._save_registro_json(registro)
-                
-                self.job_manager.update_progress(
-                    job_id, i + 1,
-                    f'Salvando registro {i + 1} de {len(registros)}...'
-                )
-                time.sleep(0.01)
+            imported = self._import_in_chunks(job_id, registros, 'registros', storage_mode, 'registros')
             
             self.job_manager.complete_job(job_id, {
-                'imported': len(registros)
-            }, f'{len(registros)} registro(s) importado(s) com sucesso!')
+                'imported': imported,
+                'failed': len(registros) - imported
+            }, f'{imported} registro(s) importado(s) com sucesso!')
             
             self.job_manager.notify_change('registros')
             
@@ -269,53 +311,37 @@ class ImportWorker:
             usuarios = data.get('usuarios', [])
             categorias = data.get('categorias', {})
             
+            # Categorias primeiro (são referenciadas por clientes)
             current = 0
-            total = len(clients) + len(registros) + len(usuarios) + (1 if categorias else 0)
-            
-            for i, client in enumerate(clients):
+            if categorias:
                 if storage_mode == 'sqlite' and self.db_manager:
-                    self.db_manager.save_cliente(client)
-                else:
-                    self._save_client_json(client)
+                    self.db_manager.save_categorias(categorias)
                 current += 1
-                self.job_manager.update_progress(
-                    job_id, current,
-                    f'Salvando cliente {i + 1} de {len(clients)}...'
-                )
-                time.sleep(0.005)
+                self.job_manager.update_progress(job_id, current, 'Salvando categorias...')
             
-            for i, registro in enumerate(registros):
-                if storage_mode == 'sqlite' and self.db_manager:
-                    self.db_manager.save_registro(registro)
-                else:
-                    self._save_registro_json(registro)
-                current += 1
-                self.job_manager.update_progress(
-                    job_id, current,
-                    f'Salvando registro {i + 1} de {len(registros)}...'
-                )
-                time.sleep(0.005)
+            clients_imported = self._import_in_chunks(
+                job_id, clients, 'clients', storage_mode, 'clientes', offset=current
+            )
+            current += len(clients)
             
-            for i, usuario in enumerate(usuarios):
-                current += 1
+            registros_imported = self._import_in_chunks(
+                job_id, registros, 'registros', storage_mode, 'registros', offset=current
+            )
+            current += len(registros)
+            
+            if usuarios:
+                current += len(usuarios)
                 self.job_manager.update_progress(
                     job_id, current,
-                    f'Salvando usuário {i + 1} de {len(usuarios)}...'
+                    f'Salvando {len(usuarios)} usuário(s)...'
                 )
-                time.sleep(0.01)
-            
-            if categorias:
-                if storage_mode == 'sqlite' and self.db_manager:
-                    self.db_manager.save_categorias(categorias)
-                current += 1
-                self.job_manager.update_progress(job_id, current, 'Salvando categorias...')
             
             self.job_manager.complete_job(job_id, {
-                'clients_imported': len(clients),
-                'registros_imported': len(registros),
+                'clients_imported': clients_imported,
+                'registros_imported': registros_imported,
                 'usuarios_imported': len(usuarios),
                 'categorias_imported': len(categorias) if categorias else 0
-            }, f'Backup importado: {len(clients)} clientes, {len(registros)} registros, {len(usuarios)} usuários!')
+            }, f'Backup importado: {clients_imported} clientes, {registros_imported} registros, {len(usuarios)} usuários!')
             
             self.job_manager.notify_change('clients')
             self.job_manager.notify_change('registros')
@@ -327,36 +353,19 @@ class ImportWorker:
             logger.error(f"Erro na importação do backup: {e}")
             self.job_manager.fail_job(job_id, str(e))
     
-    def _save_client_json(self, client: Dict):
-        clients_dir = os.path.join(self.storage_dir, 'clientes')
-        os.makedirs(clients_dir, exist_ok=True)
-        
-        cpf = client.get('cpf', '').replace('.', '').replace('-', '')
-        if cpf:
-            filepath = os.path.join(clients_dir, f'{cpf}.json')
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(client, f, ensure_ascii=False, indent=2)
+    def _save_clients_json(self, clients: list) -> int:
+        """Grava os clientes no armazenamento JSON (um sync por bloco); ignora os sem CPF"""
+        items = [(normalize_cpf(client.get('cpf')), client) for client in clients]
+        return get_json_store(self.storage_dir).clientes.put_many(
+            (cpf, client) for cpf, client in items if cpf
+        )
     
-    def _save_registro_json(self, registro: Dict):
-        registros_dir = os.path.join(self.storage_dir, 'registros')
-        os.makedirs(registros_dir, exist_ok=True)
-        
-        data = registro.get('data', 'sem_data')
-        filepath = os.path.join(registros_dir, f'{data}.json')
-        
-        existing = []
-        if os.path.exists(filepath):
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    existing = json.load(f)
-            except:
-                existing = []
-        
-        existing = [r for r in existing if r.get('id') != registro.get('id')]
-        existing.append(registro)
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(existing, f, ensure_ascii=False, indent=2)
+    def _save_registros_json(self, registros: list) -> int:
+        """Grava os registros no armazenamento JSON (um sync por bloco); ignora os sem id"""
+        # Mesmo layout lido pelo servidor (registros/AAAA/MM/DD/<id>.json no motor files)
+        return get_json_store(self.storage_dir).registros.put_many(
+            (registro['id'], registro) for registro in registros if registro.get('id')
+        )
 
 
 def get_import_worker(db_manager, storage_dir: str) -> ImportWorker:
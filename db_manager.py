@@ -7,10 +7,25 @@ import sqlite3
 import json
 import os
 import logging
+import base64
+import itertools
+import queue
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+import uuid
 import zipfile
-from datetime import datetime
+import zlib
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from urllib.parse import parse_qs
+
+from json_store import get_json_store
 
 # Configuração de logging
 logging.basicConfig(
@@ -24,28 +39,418 @@ DB_DIR = "dados/database"
 DB_FILE = os.path.join(DB_DIR, "bicicletario.db")
 BACKUP_DIR = os.path.join(DB_DIR, "backups")
 
+# Pool de conexões (configurável por variáveis de ambiente)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 8))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+DB_POOL_HEALTHCHECK_IDLE = float(os.getenv('DB_POOL_HEALTHCHECK_IDLE', 30))
 
-class DatabaseManager:
-    """Gerenciador de banco de dados SQLite com suporte offline"""
+# Cache de clientes em memória (0 desativa)
+CLIENT_CACHE_MAX_ENTRIES = int(os.getenv('CLIENT_CACHE_MAX_ENTRIES', 50000))
+
+# Paginação de registros
+REGISTROS_PAGE_DEFAULT = 100
+REGISTROS_PAGE_MAX = 1000
+# Parâmetros de GET /api/registros que ativam a resposta paginada
+REGISTROS_QUERY_PARAMS = {'limit', 'cursor', 'from', 'to', 'clientId', 'inside'}
+
+
+def encode_registros_cursor(data_hora_entrada: str, registro_id: str) -> str:
+    """Codifica a posição (entrada, id) do último registro de uma página"""
+    raw = json.dumps([data_hora_entrada, registro_id], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_registros_cursor(cursor: str) -> Optional[tuple]:
+    """Decodifica um cursor gerado por encode_registros_cursor (None se inválido)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        entrada, registro_id = json.loads(base64.urlsafe_b64decode(padded).decode('utf-8'))
+        return str(entrada), str(registro_id)
+    except Exception:
+        return None
+
+
+def registros_range_end(ate: str) -> str:
+    """Converte o fim do intervalo em limite exclusivo (datas puras incluem o dia inteiro)"""
+    if len(ate) == 10:
+        try:
+            return (date.fromisoformat(ate) + timedelta(days=1)).isoformat()
+        except ValueError:
+            pass
+    return ate
+
+
+def parse_registros_query(query: str) -> Optional[Dict[str, Any]]:
+    """
+    Converte a query string de GET /api/registros nos filtros de paginação.
+    Retorna None quando nenhum parâmetro foi informado (lista completa, formato legado).
+    Lança ValueError para valores inválidos.
+    """
+    params = parse_qs(query)
+    if not REGISTROS_QUERY_PARAMS & params.keys():
+        return None
+
+    def first(name):
+        values = params.get(name)
+        return values[0].strip() if values and values[0].strip() else None
+
+    limit = first('limit')
+    try:
+        limit = int(limit) if limit else REGISTROS_PAGE_DEFAULT
+    except ValueError:
+        raise ValueError("'limit' deve ser um número inteiro") from None
+    return {
+        'limit': limit,
+        'cursor': first('cursor'),
+        'desde': first('from'),
+        'ate': first('to'),
+        'cliente_id': first('clientId'),
+        'em_aberto': (first('inside') or '').lower() in ('1', 'true', 'yes', 'sim')
+    }
+
+
+def paginate_registros(registros: List[Dict[str, Any]], limit: int = REGISTROS_PAGE_DEFAULT,
+                       cursor: Optional[str] = None, desde: Optional[str] = None,
+                       ate: Optional[str] = None, cliente_id: Optional[str] = None,
+                       em_aberto: bool = False) -> Dict[str, Any]:
+    """Aplica os mesmos filtros/cursor de get_registros_page a uma lista em memória (modo JSON)"""
+    limit = max(1, min(int(limit), REGISTROS_PAGE_MAX))
+    position = None
+    if cursor:
+        position = decode_registros_cursor(cursor)
+        if position is None:
+            raise ValueError("Cursor inválido")
+    fim = registros_range_end(ate) if ate else None
     
-    def __init__(self, db_path: str = DB_FILE):
-        """Inicializa o gerenciador de banco de dados"""
-        self.db_path = db_path
-        self._ensure_directories()
-        self._init_database()
+    def key(r):
+        return (r.get('dataHoraEntrada') or '', str(r.get('id', '')))
     
-    def _ensure_directories(self):
-        """Cria os diretórios necessários"""
-        try:
-            os.makedirs(DB_DIR, exist_ok=True)
-            os.makedirs(BACKUP_DIR, exist_ok=True)
-            logger.info(f"Diretórios criados/verificados: {DB_DIR}")
-        except Exception as e:
-            logger.error(f"Erro ao criar diretórios: {e}")
+    selecionados = []
+    for r in registros:
+        entrada, rid = key(r)
+        if em_aberto and r.get('dataHoraSaida'):
+            continue
+        if cliente_id and (r.get('clienteId') or r.get('clientId')) != cliente_id:
+            continue
+        if desde and entrada < desde:
+            continue
+        if fim and entrada >= fim:
+            continue
+        if position and (entrada, rid) >= position:
+            continue
+        selecionados.append(r)
     
-    def _get_connection(self) -> sqlite3.Connection:
-        """Retorna uma conexão com o banco de dados"""
-        conn = sqlite3.connect(self.db_path)
+    selecionados.sort(key=key, reverse=True)
+    page = selecionados[:limit]
+    has_more = len(selecionados) > limit
+    next_cursor = encode_registros_cursor(*key(page[-1])) if has_more else None
+    return {'registros': page, 'next_cursor': next_cursor, 'has_more': has_more, 'limit': limit}
+
+
+def normalize_cpf(cpf: Any) -> str:
+    """CPF canônico: apenas os dígitos (chave do índice único e nome dos arquivos JSON)"""
+    return re.sub(r'\D', '', str(cpf or ''))
+
+
+# Busca de clientes (/api/clients/search)
+CLIENT_SEARCH_LIMIT_DEFAULT = 20
+CLIENT_SEARCH_LIMIT_MAX = 100
+CLIENT_SEARCH_MAX_TERMS = 8
+CLIENT_SEARCH_BULK_MIN = 500
+
+# Fila de solicitações do app móvel (/api/solicitacoes)
+SOLICITACAO_PENDENTE = 'pendente'
+SOLICITACAO_EM_ATENDIMENTO = 'em_atendimento'
+SOLICITACAO_APROVADA = 'aprovada'
+SOLICITACAO_REJEITADA = 'rejeitada'
+SOLICITACOES_ABERTAS = (SOLICITACAO_PENDENTE, SOLICITACAO_EM_ATENDIMENTO)
+# Segundos até uma solicitação reservada e não concluída voltar a ficar disponível
+SOLICITACAO_CLAIM_TIMEOUT = int(os.getenv('SOLICITACAO_CLAIM_TIMEOUT', 300))
+SOLICITACOES_RETENCAO_DIAS = 30
+
+# Dias que os tombstones de /api/sync/changes são mantidos; quem sincronizou
+# pela última vez antes disso recebe reset (sincronização completa)
+SYNC_EXCLUSOES_RETENCAO_DIAS = int(os.getenv('SYNC_EXCLUSOES_RETENCAO_DIAS', 90))
+
+_SEARCH_WORD = re.compile(r'[^\W_]+')
+
+
+def normalize_search_text(text: Any) -> str:
+    """Minúsculas e sem acentos (mesma normalização do tokenizer unicode61 remove_diacritics)"""
+    decomposed = unicodedata.normalize('NFKD', str(text or '').casefold())
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def client_search_terms(query: str) -> List[str]:
+    """Quebra o texto digitado em termos de busca (letras e dígitos)"""
+    return _SEARCH_WORD.findall(normalize_search_text(query))[:CLIENT_SEARCH_MAX_TERMS]
+
+
+def client_matches_search(cliente: Dict[str, Any], terms: List[str]) -> bool:
+    """
+    Mesma regra do índice FTS5 para listas em memória (modo JSON ou SQLite sem
+    FTS5): todo termo precisa ser prefixo de alguma palavra do nome, CPF,
+    telefone ou marca/modelo/cor das bicicletas.
+    """
+    campos = [cliente.get('nome'), cliente.get('cpf'), cliente.get('telefone')]
+    campos += [normalize_cpf(cliente.get(k)) for k in ('cpf', 'telefone')]
+    for bike in cliente.get('bicicletas') or []:
+        if isinstance(bike, dict):
+            campos += [bike.get('marca'), bike.get('modelo'), bike.get('cor')]
+    words = _SEARCH_WORD.findall(normalize_search_text(' '.join(str(c) for c in campos if c)))
+    return all(any(word.startswith(term) for word in words) for term in terms)
+
+
+# Profiler de SQL (opt-in): tempo e linhas por instrução, plano das consultas lentas
+SQL_PROFILE = os.getenv('SQL_PROFILE', '0') == '1'
+SQL_SLOW_QUERY_MS = float(os.getenv('SQL_SLOW_QUERY_MS', 100))
+SQL_PROFILE_BUFFER = int(os.getenv('SQL_PROFILE_BUFFER', 200))
+
+_SQL_WHITESPACE = re.compile(r'\s+')
+_SQL_PLACEHOLDER_LIST = re.compile(r'\?(?:\s*,\s*\?)+')
+_SQL_EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+class QueryProfiler:
+    """
+    Agrega tempo e linhas por instrução SQL (normalizada) e guarda, em um
+    buffer circular, as execuções acima de `slow_ms` com o EXPLAIN QUERY PLAN.
+    Os valores dos parâmetros não são guardados (podem conter CPFs).
+    """
+
+    def __init__(self, enabled: bool = SQL_PROFILE, slow_ms: float = SQL_SLOW_QUERY_MS,
+                 buffer_size: int = SQL_PROFILE_BUFFER):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._statements: Dict[str, Dict[str, Any]] = {}
+        self._slow: "deque[Dict[str, Any]]" = deque(maxlen=max(1, buffer_size))
+
+    @staticmethod
+    def normalize(sql: str) -> str:
+        """Remove espaços extras e agrupa listas de placeholders (IN (?, ?, ...))"""
+        sql = _SQL_WHITESPACE.sub(' ', sql).strip()
+        return _SQL_PLACEHOLDER_LIST.sub('?, ...', sql)
+
+    def record(self, conn: sqlite3.Connection, sql: str, params: Any, elapsed: float,
+               rows: int, explain: bool = True):
+        key = self.normalize(sql)
+        elapsed_ms = elapsed * 1000
+        slow = elapsed_ms >= self.slow_ms
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                stats = self._statements[key] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'slow': 0}
+            stats['count'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['rows'] += rows
+            if slow:
+                stats['slow'] += 1
+        if not slow:
+            return
+
+        plan = self._explain(conn, sql, params) if explain else None
+        with self._lock:
+            self._slow.append({
+                'sql': key,
+                'elapsed_ms': round(elapsed_ms, 3),
+                'rows': rows,
+                'plan': plan,
+                'timestamp': datetime.now().isoformat(),
+                'thread': threading.current_thread().name,
+            })
+        logger.warning(f"Consulta lenta ({elapsed_ms:.1f} ms, {rows} linhas): {key}")
+
+    @staticmethod
+    def _explain(conn: sqlite3.Connection, sql: str, params: Any) -> Optional[List[str]]:
+        words = sql.lstrip().split(None, 1)
+        if not words or words[0].upper() not in _SQL_EXPLAINABLE:
+            return None
+        try:
+            # Conexão base: o EXPLAIN não entra nas estatísticas
+            rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, params).fetchall()
+        except sqlite3.Error as e:
+            return [f"EXPLAIN indisponível: {e}"]
+        depth = {0: -1}
+        plan = []
+        for node_id, parent, _, detail in rows:
+            depth[node_id] = depth.get(parent, -1) + 1
+            plan.append('  ' * depth[node_id] + detail)
+        return plan
+
+    def get_report(self, limit: int = 50) -> Dict[str, Any]:
+        """Instruções com maior tempo acumulado e as execuções lentas mais recentes"""
+        with self._lock:
+            statements = [dict(stats, sql=sql) for sql, stats in self._statements.items()]
+            slow = list(self._slow)
+        statements.sort(key=lambda s: s['total_ms'], reverse=True)
+        for stats in statements:
+            stats['avg_ms'] = round(stats['total_ms'] / stats['count'], 3)
+            stats['total_ms'] = round(stats['total_ms'], 3)
+            stats['max_ms'] = round(stats['max_ms'], 3)
+        return {
+            'enabled': self.enabled,
+            'slow_threshold_ms': self.slow_ms,
+            'statements': statements[:limit],
+            'slow_queries': slow[::-1][:limit],
+        }
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._slow.clear()
+
+
+QUERY_PROFILER = QueryProfiler()
+
+
+class ProfilingCursor(sqlite3.Cursor):
+    """
+    Cursor que mede cada instrução, da execução até a leitura da última
+    linha. A medição é fechada na próxima execução, ao esgotar as linhas,
+    no close() ou quando a conexão volta ao pool.
+    """
+
+    _pending = None
+
+    def _finish(self):
+        pending = self._pending
+        if pending is None:
+            return
+        self._pending = None
+        self.connection._pending_cursors.discard(self)
+        QUERY_PROFILER.record(self.connection, *pending)
+
+    def _fetched(self, elapsed: float, rows: int, done: bool):
+        pending = self._pending
+        if pending is None:
+            return
+        pending[2] += elapsed
+        pending[3] += rows
+        if done:
+            self._finish()
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        started = time.perf_counter()
+        super().execute(sql, parameters)
+        elapsed = time.perf_counter() - started
+        if self.description is None:
+            # Sem linhas a ler (INSERT/UPDATE/DELETE/DDL)
+            QUERY_PROFILER.record(self.connection, sql, parameters, elapsed, max(self.rowcount, 0))
+        else:
+            self._pending = [sql, parameters, elapsed, 0]
+            self.connection._pending_cursors.add(self)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        started = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        QUERY_PROFILER.record(self.connection, sql, None, time.perf_counter() - started,
+                              max(self.rowcount, 0), explain=False)
+        return self
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(time.perf_counter() - started, 0 if row is None else 1, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(time.perf_counter() - started, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(time.perf_counter() - started, len(rows), True)
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(time.perf_counter() - started, 0, True)
+            raise
+        self._fetched(time.perf_counter() - started, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+
+class ProfilingConnection(sqlite3.Connection):
+    """Conexão cujos cursores (inclusive os de execute()) são ProfilingCursor"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pending_cursors = set()
+
+    def cursor(self, factory=ProfilingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def flush_profile(self):
+        """
+        Fecha as medições de cursores não lidos até o fim e solta as
+        referências, para que cursores temporários liberem suas instruções.
+        """
+        for cursor in list(self._pending_cursors):
+            cursor._finish()
+        self._pending_cursors.clear()
+
+    def commit(self):
+        self.flush_profile()
+        super().commit()
+
+    def rollback(self):
+        self.flush_profile()
+        super().rollback()
+
+
+class SQLiteConnectionPool:
+    """
+    Pool limitado de conexões SQLite reutilizáveis.
+    Os PRAGMAs são aplicados uma única vez por conexão e conexões ociosas
+    passam por um health check antes de serem reutilizadas.
+    """
+
+    def __init__(self, db_path: str, size: int = DB_POOL_SIZE,
+                 timeout: float = DB_POOL_TIMEOUT,
+                 healthcheck_idle: float = DB_POOL_HEALTHCHECK_IDLE):
+        self.db_path = db_path
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        self._idle: "queue.LifoQueue" = queue.LifoQueue(maxsize=self.size)
+        # Conexões emprestadas; as marcadas em `_retired` são fechadas na devolução
+        self._in_use = set()
+        self._retired = set()
+        self._slots = threading.BoundedSemaphore(self.size)
+        # Fechado durante exclusive(): novos acquire() esperam a restauração acabar
+        self._gate = threading.Event()
+        self._gate.set()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+        self._stats = {'created': 0, 'reused': 0, 'discarded': 0, 'waits': 0}
+
+    def _create_connection(self) -> sqlite3.Connection:
+        """Abre uma nova conexão e aplica os PRAGMAs (apenas uma vez)"""
+        factory = ProfilingConnection if QUERY_PROFILER.enabled else sqlite3.Connection
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, factory=factory)
         conn.row_factory = sqlite3.Row  # Permite acesso por nome de coluna
         
         # Otimizações HÍBRIDAS: Rápido, mas respeitando PCs com POUCA RAM (2GB-4GB)
@@ -60,7 +465,417 @@ class DatabaseManager:
         conn.execute("PRAGMA busy_timeout=5000;")         # Espera até 5s em caso de lock
         conn.execute("PRAGMA foreign_keys=ON;")          # Ativa integridade referencial
         
+        with self._lock:
+            self._created += 1
+            self._stats['created'] += 1
         return conn
+
+    def _is_healthy(self, conn: sqlite3.Connection) -> bool:
+        """Verifica se uma conexão ociosa ainda responde"""
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn: sqlite3.Connection):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._created -= 1
+            self._stats['discarded'] += 1
+
+    def acquire(self) -> sqlite3.Connection:
+        """Obtém uma conexão do pool, aguardando até `timeout` se esgotado"""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Pool de conexões fechado")
+        if not self._gate.wait(self.timeout):
+            raise TimeoutError(f"Pool de conexões bloqueado há mais de {self.timeout}s")
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['waits'] += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                raise TimeoutError(f"Nenhuma conexão SQLite livre após {self.timeout}s")
+        try:
+            while True:
+                try:
+                    conn, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    conn = self._create_connection()
+                    with self._lock:
+                        self._in_use.add(conn)
+                    return conn
+                if time.monotonic() - last_used > self.healthcheck_idle and not self._is_healthy(conn):
+                    self._discard(conn)
+                    continue
+                with self._lock:
+                    self._stats['reused'] += 1
+                    self._in_use.add(conn)
+                return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn: sqlite3.Connection, broken: bool = False):
+        """Devolve uma conexão ao pool (ou a descarta se estiver quebrada)"""
+        with self._lock:
+            self._in_use.discard(conn)
+            retired = conn in self._retired
+            self._retired.discard(conn)
+        try:
+            if isinstance(conn, ProfilingConnection) and not broken:
+                conn.flush_profile()
+            if broken or retired or self._closed:
+                self._discard(conn)
+                return
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put_nowait((conn, time.monotonic()))
+        except (sqlite3.Error, queue.Full):
+            self._discard(conn)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def exclusive(self, timeout: Optional[float] = None) -> Iterator[None]:
+        """
+        Bloqueia novos acquire() e espera as conexões emprestadas voltarem
+        (ocupa todos os slots). Dentro do bloco nenhuma conexão do pool está
+        em uso. Levanta TimeoutError se o pool não esvaziar a tempo.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        self._gate.clear()
+        taken = 0
+        try:
+            while taken < self.size:
+                if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                    raise TimeoutError(f"Conexões SQLite ainda em uso após {timeout}s")
+                taken += 1
+            yield
+        finally:
+            for _ in range(taken):
+                self._slots.release()
+            self._gate.set()
+
+    def close_all(self):
+        """
+        Fecha as conexões ociosas e marca as emprestadas para serem fechadas
+        na devolução
+        """
+        with self._lock:
+            self._retired.update(self._in_use)
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def close(self):
+        """Fecha o pool definitivamente"""
+        self._closed = True
+        self.close_all()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas de uso do pool"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['open'] = self._created
+        stats['idle'] = self._idle.qsize()
+        stats['size'] = self.size
+        return stats
+
+
+def _copy_cliente(cliente: Dict[str, Any]) -> Dict[str, Any]:
+    """Cópia independente de um cliente (o chamador pode alterar o dict e as bicicletas)"""
+    copia = dict(cliente)
+    copia['bicicletas'] = [dict(bike) for bike in cliente.get('bicicletas', [])]
+    return copia
+
+
+class ClienteCache:
+    """
+    Cache em memória dos clientes (com bicicletas), indexado por ID e CPF
+    normalizado (só dígitos).
+
+    Guarda no máximo `max_entries` clientes (LRU). Quando a tabela inteira
+    cabe no cache, a listagem completa também é servida da memória.
+    Escritas incrementam a geração; leituras feitas no banco só são
+    guardadas se a geração não mudou durante a consulta. Um cliente ausente
+    do cache é sempre procurado no banco: outro processo (app.py) pode tê-lo
+    criado.
+
+    O cache guarda também a versão dos clientes no banco
+    (get_clientes_version) com que foi montado; validate() o descarta quando
+    a versão muda por uma escrita que não passou por ele. As escritas deste
+    processo avançam a versão com advance().
+    """
+
+    def __init__(self, max_entries: int = CLIENT_CACHE_MAX_ENTRIES):
+        self.max_entries = max(0, max_entries)
+        self._lock = threading.RLock()
+        self._by_id: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._id_by_cpf: Dict[str, str] = {}
+        self._complete = False
+        # (geração, cliente_id) do invalidate() que suspendeu o cache completo
+        self._complete_pending: Optional[Tuple[int, str]] = None
+        self._sorted: Optional[List[Dict[str, Any]]] = None
+        self._generation = 0
+        # Versão do banco refletida no conteúdo (None: desconhecida)
+        self._data_version: Optional[int] = None
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0,
+                       'stale_drops': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @property
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def has_entries(self) -> bool:
+        with self._lock:
+            return bool(self._by_id)
+
+    def validate(self, version: Optional[int]):
+        """Descarta o conteúdo se o banco não está mais na versão com que foi montado"""
+        with self._lock:
+            if version is not None and version == self._data_version:
+                return
+            if self._by_id:
+                self._stats['stale_drops'] += 1
+                self.clear()
+            self._data_version = version
+
+    def advance(self, before: Optional[int], after: Optional[int]):
+        """
+        Escrita deste processo levou o banco de `before` para `after`. Se o
+        cache estava em `before` (ou vazio), passa a `after`; senão houve
+        outra escrita no meio e ele é descartado.
+        """
+        with self._lock:
+            if not self._by_id or (before is not None and before == self._data_version):
+                self._data_version = after
+            else:
+                self.clear()
+
+    def _resolve(self, key: str, cpf_only: bool = False) -> Optional[str]:
+        if not cpf_only and key in self._by_id:
+            return key
+        return self._id_by_cpf.get(normalize_cpf(key))
+
+    def lookup(self, key: str, cpf_only: bool = False) -> tuple:
+        """
+        Busca por ID ou CPF (só por CPF com `cpf_only`). Retorna
+        (encontrado_no_cache, cliente); fora do cache, (False, None) e o
+        chamador consulta o banco.
+        """
+        with self._lock:
+            cliente_id = self._resolve(key, cpf_only)
+            if cliente_id is not None:
+                self._by_id.move_to_end(cliente_id)
+                self._stats['hits'] += 1
+                return True, _copy_cliente(self._by_id[cliente_id])
+            self._stats['misses'] += 1
+            return False, None
+
+    def get_all(self) -> Optional[List[Dict[str, Any]]]:
+        """Lista completa ordenada por nome (None se o cache não está completo)"""
+        with self._lock:
+            if not self._complete:
+                self._stats['misses'] += 1
+                return None
+            self._stats['hits'] += 1
+            if self._sorted is None:
+                self._sorted = sorted(self._by_id.values(), key=lambda c: c['nome'])
+            return [_copy_cliente(cliente) for cliente in self._sorted]
+
+    def fill(self, clientes: List[Dict[str, Any]], generation: int, version: Optional[int]):
+        """
+        Carrega a tabela inteira lida do banco, se ainda estiver atual e couber.
+        `version` é lida antes das linhas: no máximo o conteúdo é mais novo que ela.
+        """
+        with self._lock:
+            if (generation != self._generation or version is None
+                    or len(clientes) > self.max_entries):
+                return
+            self._data_version = version
+            self._by_id = OrderedDict((c['id'], _copy_cliente(c)) for c in clientes)
+            self._id_by_cpf = {normalize_cpf(c['cpf']): c['id'] for c in clientes}
+            self._complete = True
+            self._complete_pending = None
+            self._sorted = None
+
+    def put(self, cliente: Dict[str, Any], generation: Optional[int] = None):
+        """Insere/atualiza um cliente; com `generation`, ignora leituras desatualizadas"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            if generation is None:
+                self._generation += 1
+            elif self._complete_pending == (generation, cliente['id']):
+                # Nenhuma outra escrita desde o invalidate(): o cache volta a ser completo
+                self._complete = True
+                self._complete_pending = None
+            self._discard(cliente['id'])
+            self._by_id[cliente['id']] = _copy_cliente(cliente)
+            self._id_by_cpf[normalize_cpf(cliente['cpf'])] = cliente['id']
+            self._sorted = None
+            while len(self._by_id) > self.max_entries:
+                evicted_id, evicted = self._by_id.popitem(last=False)
+                self._id_by_cpf.pop(normalize_cpf(evicted['cpf']), None)
+                self._stats['evictions'] += 1
+                self._complete = False
+
+    def _discard(self, cliente_id: str):
+        old = self._by_id.pop(cliente_id, None)
+        if old is not None and self._id_by_cpf.get(normalize_cpf(old['cpf'])) == cliente_id:
+            del self._id_by_cpf[normalize_cpf(old['cpf'])]
+
+    def invalidate(self, cliente_id: str) -> int:
+        """
+        Tira do cache um cliente que acabou de ser gravado e devolve a nova
+        geração: a releitura só volta ao cache se nenhuma outra escrita
+        acontecer antes (put com essa geração).
+        """
+        with self._lock:
+            self._generation += 1
+            self._stats['invalidations'] += 1
+            self._discard(cliente_id)
+            self._complete_pending = (self._generation, cliente_id) if self._complete else None
+            self._complete = False
+            self._sorted = None
+            return self._generation
+
+    def remove(self, key: str):
+        """Remove um cliente excluído (por ID ou CPF); o cache continua completo"""
+        with self._lock:
+            self._generation += 1
+            self._stats['invalidations'] += 1
+            # O DELETE casa `id = ? OR cpf_normalizado = ?`: remove as duas possibilidades
+            for cliente_id in (key, self._id_by_cpf.get(normalize_cpf(key))):
+                if cliente_id is not None:
+                    self._discard(cliente_id)
+            self._sorted = None
+
+    def clear(self):
+        """Descarta tudo (escritas em lote, restauração, limpeza)"""
+        with self._lock:
+            self._generation += 1
+            self._stats['invalidations'] += 1
+            self._by_id.clear()
+            self._id_by_cpf.clear()
+            self._complete = False
+            self._complete_pending = None
+            self._sorted = None
+            self._data_version = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._by_id)
+            stats['complete'] = self._complete
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['max_entries'] = self.max_entries
+        return stats
+
+
+class DatabaseManager:
+    """Gerenciador de banco de dados SQLite com suporte offline"""
+    
+    def __init__(self, db_path: str = DB_FILE, pool_size: Optional[int] = None):
+        """Inicializa o gerenciador de banco de dados"""
+        self.db_path = db_path
+        self._ensure_directories()
+        self._pool = SQLiteConnectionPool(db_path, size=pool_size or DB_POOL_SIZE)
+        self._local = threading.local()
+        self._cliente_cache = ClienteCache()
+        self._search_fts = False
+        self._init_database()
+    
+    def _ensure_directories(self):
+        """Cria os diretórios necessários"""
+        try:
+            os.makedirs(DB_DIR, exist_ok=True)
+            os.makedirs(BACKUP_DIR, exist_ok=True)
+            logger.info(f"Diretórios criados/verificados: {DB_DIR}")
+        except Exception as e:
+            logger.error(f"Erro ao criar diretórios: {e}")
+    
+    @contextmanager
+    def _get_connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Empresta uma conexão do pool durante o bloco `with`.
+        Faz commit ao sair normalmente e rollback em caso de exceção.
+        Chamadas aninhadas na mesma thread reutilizam a mesma conexão.
+        """
+        local = self._local
+        if getattr(local, 'conn', None) is not None:
+            local.depth += 1
+            try:
+                yield local.conn
+            finally:
+                local.depth -= 1
+            return
+        
+        conn = self._pool.acquire()
+        local.conn = conn
+        local.depth = 1
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except sqlite3.DatabaseError as e:
+            broken = not isinstance(e, (sqlite3.IntegrityError, sqlite3.OperationalError))
+            self._safe_rollback(conn)
+            raise
+        except BaseException:
+            self._safe_rollback(conn)
+            raise
+        finally:
+            local.conn = None
+            local.depth = 0
+            self._pool.release(conn, broken=broken)
+    
+    def _commit(self, conn: sqlite3.Connection):
+        """Commit apenas no nível mais externo: aninhada, a transação é do chamador"""
+        if getattr(self._local, 'depth', 0) <= 1:
+            conn.commit()
+    
+    @staticmethod
+    def _safe_rollback(conn: sqlite3.Connection):
+        try:
+            conn.rollback()
+        except sqlite3.Error:
+            pass
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas do pool de conexões"""
+        return self._pool.get_stats()
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas do cache de clientes"""
+        return self._cliente_cache.get_stats()
+    
+    def get_query_profile(self, limit: int = 50) -> Dict[str, Any]:
+        """Retorna o relatório do profiler de SQL (SQL_PROFILE=1)"""
+        return QUERY_PROFILER.get_report(limit)
+    
+    def reset_query_profile(self):
+        """Zera as estatísticas e o buffer de consultas lentas"""
+        QUERY_PROFILER.reset()
+    
+    def close(self):
+        """Fecha todas as conexões do pool"""
+        self._pool.close()
     
     def _init_database(self):
         """Inicializa o banco de dados com as tabelas necessárias"""
@@ -181,6 +996,8 @@ class DatabaseManager:
                 # Índices para melhor performance
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_clientes_cpf ON clientes(cpf)")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_clientes_nome ON clientes(nome COLLATE NOCASE)")
+                # Paginação por chave de iter_all_clientes (ORDER BY nome, id)
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_clientes_nome_id ON clientes(nome, id)")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_bicicletas_cliente ON bicicletas(cliente_id)")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_bicicletas_modelo ON bicicletas(modelo COLLATE NOCASE)")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_registros_cliente ON registros(cliente_id)")
@@ -188,90 +1005,595 @@ class DatabaseManager:
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_auditoria_usuario ON auditoria(usuario)")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_auditoria_timestamp ON auditoria(timestamp)")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_registros_bicicleta ON registros(bicicleta_id)")
+                # Índices compostos para a paginação por cursor de /api/registros
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_registros_entrada_id ON registros(data_hora_entrada, id)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_registros_saida_entrada ON registros(data_hora_saida, data_hora_entrada, id)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_registros_cliente_entrada ON registros(cliente_id, data_hora_entrada, id)")
                 
-                conn.commit()
+                self._init_cpf_normalizado(cursor)
+                self._init_sync_versioning(cursor)
+                self._init_client_search(cursor)
+                self._init_solicitacoes(cursor)
+                
+                self._commit(conn)
                 logger.info("Banco de dados inicializado com sucesso")
         except Exception as e:
             logger.error(f"Erro ao inicializar banco de dados: {e}", exc_info=True)
     
+    def _init_cpf_normalizado(self, cursor: sqlite3.Cursor):
+        """
+        Coluna `cpf_normalizado` (só dígitos, NULL se não houver) com índice
+        único: toda busca por CPF é uma consulta ao índice, qualquer que seja
+        a formatação digitada. Bancos antigos recebem a coluna preenchida.
+        """
+        colunas = {row[1] for row in cursor.execute("PRAGMA table_info(clientes)")}
+        if 'cpf_normalizado' not in colunas:
+            cursor.execute("ALTER TABLE clientes ADD COLUMN cpf_normalizado TEXT")
+        pendentes = cursor.execute(
+            "SELECT id, cpf FROM clientes WHERE cpf_normalizado IS NULL"
+        ).fetchall()
+        atualizacoes = [(normalize_cpf(row['cpf']), row['id']) for row in pendentes if normalize_cpf(row['cpf'])]
+        if atualizacoes:
+            cursor.executemany("UPDATE clientes SET cpf_normalizado = ? WHERE id = ?", atualizacoes)
+        try:
+            cursor.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_clientes_cpf_normalizado ON clientes(cpf_normalizado)"
+            )
+        except sqlite3.IntegrityError:
+            # Mesmo CPF gravado com formatações diferentes em clientes distintos
+            logger.warning("CPFs duplicados após normalização; índice de CPF criado sem unicidade")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_clientes_cpf_normalizado ON clientes(cpf_normalizado)")
+    
+    # ==================== VERSIONAMENTO (SYNC INCREMENTAL) ====================
+    
+    SYNC_TABLES = ('clientes', 'bicicletas', 'registros')
+    SYNC_PAGE_MAX = 5000
+    
+    def _init_sync_versioning(self, cursor: sqlite3.Cursor):
+        """
+        Cria o contador global de versão, a coluna `versao` e os triggers que a
+        mantêm em clientes, bicicletas e registros, além da tabela de exclusões
+        (tombstones). Todo caminho de escrita passa pelos triggers, inclusive
+        executemany e exclusões em cascata.
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS versao_dados (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                valor INTEGER NOT NULL
+            )
+        """)
+        cursor.execute("INSERT OR IGNORE INTO versao_dados (id, valor) VALUES (1, 1)")
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS exclusoes (
+                tabela TEXT NOT NULL,
+                registro_id TEXT NOT NULL,
+                versao INTEGER NOT NULL,
+                excluido_em TEXT NOT NULL,
+                PRIMARY KEY (tabela, registro_id)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_exclusoes_versao ON exclusoes(versao)")
+        
+        bump = "UPDATE versao_dados SET valor = valor + 1 WHERE id = 1;"
+        current = "(SELECT valor FROM versao_dados WHERE id = 1)"
+        for tabela in self.SYNC_TABLES:
+            colunas = {row[1] for row in cursor.execute(f"PRAGMA table_info({tabela})")}
+            if 'versao' not in colunas:
+                cursor.execute(f"ALTER TABLE {tabela} ADD COLUMN versao INTEGER")
+                # Linhas existentes recebem versões distintas para a paginação por versão
+                cursor.execute(f"""
+                    UPDATE {tabela} SET versao = {current} + rowid WHERE versao IS NULL
+                """)
+                cursor.execute(f"""
+                    UPDATE versao_dados SET valor = MAX(valor, (SELECT IFNULL(MAX(versao), 0) FROM {tabela}))
+                    WHERE id = 1
+                """)
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{tabela}_versao ON {tabela}(versao)")
+            
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{tabela}_versao_insert AFTER INSERT ON {tabela}
+                BEGIN
+                    {bump}
+                    UPDATE {tabela} SET versao = {current} WHERE rowid = NEW.rowid;
+                    DELETE FROM exclusoes WHERE tabela = '{tabela}' AND registro_id = NEW.id;
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{tabela}_versao_update AFTER UPDATE ON {tabela}
+                WHEN NEW.versao IS OLD.versao
+                BEGIN
+                    {bump}
+                    UPDATE {tabela} SET versao = {current} WHERE rowid = NEW.rowid;
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{tabela}_versao_delete AFTER DELETE ON {tabela}
+                BEGIN
+                    {bump}
+                    INSERT OR REPLACE INTO exclusoes (tabela, registro_id, versao, excluido_em)
+                    VALUES ('{tabela}', OLD.id, {current}, datetime('now'));
+                END
+            """)
+    
+    def get_data_version(self) -> int:
+        """Retorna a versão global atual dos dados sincronizáveis"""
+        try:
+            with self._get_connection() as conn:
+                row = conn.execute("SELECT valor FROM versao_dados WHERE id = 1").fetchone()
+                return row['valor'] if row else 0
+        except Exception as e:
+            logger.error(f"Erro ao obter versão dos dados: {e}", exc_info=True)
+            return 0
+    
+    _CLIENTES_VERSION_SQL = """
+        SELECT MAX(
+            (SELECT IFNULL(MAX(versao), 0) FROM clientes),
+            (SELECT IFNULL(MAX(versao), 0) FROM bicicletas),
+            (SELECT IFNULL(MAX(versao), 0) FROM exclusoes WHERE tabela IN ('clientes', 'bicicletas')),
+            (SELECT IFNULL(MAX(CAST(valor AS INTEGER)), 0) FROM configuracoes
+             WHERE chave IN ('sync_reset_versao', 'sync_exclusoes_expurgadas_versao'))
+        )
+    """
+
+    def get_clientes_version(self) -> Optional[int]:
+        """
+        Maior versão que afetou clientes ou bicicletas (gravações, exclusões,
+        limpezas e expurgos), de qualquer processo que use o banco. Só cresce.
+        None se a consulta falhar.
+        """
+        try:
+            with self._get_connection() as conn:
+                return conn.execute(self._CLIENTES_VERSION_SQL).fetchone()[0]
+        except Exception as e:
+            logger.error(f"Erro ao obter versão dos clientes: {e}", exc_info=True)
+            return None
+    
+    def get_categorias_version(self) -> Optional[str]:
+        """Marca do estado das categorias (muda a cada inclusão, alteração ou exclusão)"""
+        try:
+            with self._get_connection() as conn:
+                row = conn.execute("""
+                    SELECT COUNT(*), IFNULL(MAX(id), 0), IFNULL(MAX(atualizada_em), ''),
+                           (SELECT IFNULL(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'categorias')
+                    FROM categorias
+                """).fetchone()
+                return f"{zlib.crc32(repr(tuple(row)).encode('utf-8')):08x}"
+        except Exception as e:
+            logger.error(f"Erro ao obter versão das categorias: {e}", exc_info=True)
+            return None
+    
+    def _mark_sync_reset(self, conn: sqlite3.Connection, tabelas: tuple):
+        """
+        Após uma limpeza total, descarta os tombstones gerados e registra a versão
+        a partir da qual clientes precisam de uma sincronização completa.
+        """
+        marks = ",".join("?" for _ in tabelas)
+        conn.execute(f"DELETE FROM exclusoes WHERE tabela IN ({marks})", tabelas)
+        conn.execute("UPDATE versao_dados SET valor = valor + 1 WHERE id = 1")
+        conn.execute("""
+            INSERT OR REPLACE INTO configuracoes (chave, valor, atualizado_em)
+            SELECT 'sync_reset_versao', valor, ? FROM versao_dados WHERE id = 1
+        """, (datetime.now().isoformat(),))
+    
+    def purge_exclusoes(self, days: int = SYNC_EXCLUSOES_RETENCAO_DIAS) -> int:
+        """
+        Apaga os tombstones com mais de `days` dias e guarda a maior versão
+        expurgada: clientes com `since` anterior a ela recebem reset.
+        """
+        try:
+            with self._get_connection() as conn:
+                limite = f"-{int(days)} days"
+                row = conn.execute(
+                    "SELECT MAX(versao) AS versao FROM exclusoes WHERE excluido_em < datetime('now', ?)",
+                    (limite,)
+                ).fetchone()
+                if row['versao'] is None:
+                    return 0
+                cursor = conn.execute(
+                    "DELETE FROM exclusoes WHERE excluido_em < datetime('now', ?)", (limite,)
+                )
+                conn.execute("""
+                    INSERT INTO configuracoes (chave, valor, atualizado_em)
+                    VALUES ('sync_exclusoes_expurgadas_versao', ?, ?)
+                    ON CONFLICT(chave) DO UPDATE SET
+                        valor = MAX(CAST(valor AS INTEGER), CAST(excluded.valor AS INTEGER)),
+                        atualizado_em = excluded.atualizado_em
+                """, (row['versao'], datetime.now().isoformat()))
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Erro ao expurgar exclusões de sincronização: {e}", exc_info=True)
+            return 0
+    
+    def get_changes_since(self, since: int, limit: int = 1000) -> Dict[str, Any]:
+        """
+        Retorna as linhas de clientes, bicicletas e registros alteradas após a
+        versão `since`, mais os IDs excluídos (tombstones).
+        Se houver mais que `limit` alterações em alguma tabela, a resposta é
+        cortada em uma versão consistente e `has_more` indica nova chamada.
+        Quando `reset` é True o cliente deve descartar o estado local: após uma
+        limpeza total ou se `since` é anterior aos tombstones já expurgados.
+        """
+        limit = max(1, min(int(limit), self.SYNC_PAGE_MAX))
+        since = max(0, int(since))
+        
+        with self._get_connection() as conn:
+            # Uma única transação de leitura: todas as tabelas vêm do mesmo snapshot
+            own_transaction = not conn.in_transaction
+            if own_transaction:
+                conn.execute("BEGIN")
+            try:
+                version = conn.execute("SELECT valor FROM versao_dados WHERE id = 1").fetchone()['valor']
+                marks = {
+                    row['chave']: int(row['valor']) for row in conn.execute(
+                        "SELECT chave, valor FROM configuracoes WHERE chave IN (?, ?)",
+                        ('sync_reset_versao', 'sync_exclusoes_expurgadas_versao')
+                    )
+                }
+                reset = since == 0 or any(since < versao for versao in marks.values())
+                if reset:
+                    since = 0
+                
+                rows = {}
+                for tabela in self.SYNC_TABLES:
+                    rows[tabela] = conn.execute(
+                        f"SELECT * FROM {tabela} WHERE versao > ? ORDER BY versao LIMIT ?",
+                        (since, limit + 1)
+                    ).fetchall()
+                deleted_rows = [] if reset else conn.execute(
+                    "SELECT tabela, registro_id, versao FROM exclusoes WHERE versao > ? ORDER BY versao LIMIT ?",
+                    (since, limit + 1)
+                ).fetchall()
+            finally:
+                if own_transaction:
+                    conn.rollback()
+        
+        # Corta todas as listas na menor versão entre as que excederam o limite
+        truncated = [r[limit - 1]['versao'] for r in list(rows.values()) + [deleted_rows] if len(r) > limit]
+        has_more = bool(truncated)
+        version = min([version] + truncated)
+        
+        def upto(items):
+            return [item for item in items if item['versao'] <= version]
+        
+        clientes = []
+        for row in upto(rows['clientes']):
+            cliente = dict(row)
+            cliente['ativo'] = bool(cliente['ativo'])
+            clientes.append(cliente)
+        
+        bicicletas = []
+        for row in upto(rows['bicicletas']):
+            bicicleta = dict(row)
+            bicicleta['clienteId'] = bicicleta.pop('cliente_id')
+            bicicleta['ativa'] = bool(bicicleta['ativa'])
+            bicicletas.append(bicicleta)
+        
+        deleted = {tabela: [] for tabela in self.SYNC_TABLES}
+        for row in upto(deleted_rows):
+            deleted.setdefault(row['tabela'], []).append(row['registro_id'])
+        
+        return {
+            'version': version,
+            'since': since,
+            'reset': reset,
+            'has_more': has_more,
+            'clientes': clientes,
+            'bicicletas': bicicletas,
+            'registros': [self._row_to_registro(row) for row in upto(rows['registros'])],
+            'deleted': deleted
+        }
+    
+    # ==================== ÍNDICE DE BUSCA (FTS5) ====================
+    
+    _SEARCH_SUSPENDED_KEY = 'busca_clientes_suspensa'
+    
+    @staticmethod
+    def _digits_sql(expr: str) -> str:
+        """Expressão SQL que remove a pontuação usual de telefones"""
+        for ch in ('.', '-', '/', '(', ')', ' ', '+'):
+            expr = f"replace({expr}, '{ch}', '')"
+        return expr
+    
+    def _search_document_sql(self, alias: str) -> str:
+        """Colunas (rowid, nome, cpf, telefone, bicicletas) do documento de busca de um cliente"""
+        telefone = f"IFNULL({alias}.telefone, '')"
+        bicicletas = f"""(
+            SELECT group_concat(IFNULL(b.marca, '') || ' ' || IFNULL(b.modelo, '') || ' ' || IFNULL(b.cor, ''), ' ')
+            FROM bicicletas b WHERE b.cliente_id = {alias}.id
+        )"""
+        return (
+            f"{alias}.rowid, {alias}.nome, "
+            f"IFNULL({alias}.cpf, '') || ' ' || IFNULL({alias}.cpf_normalizado, ''), "
+            f"{telefone} || ' ' || {self._digits_sql(telefone)}, "
+            f"IFNULL({bicicletas}, '')"
+        )
+    
+    def _init_client_search(self, cursor: sqlite3.Cursor):
+        """
+        Cria o índice FTS5 `clientes_busca` (nome, CPF, telefone e marca/modelo/cor
+        das bicicletas, sem acentos e com índice de prefixos) e os triggers que o
+        mantêm. Cada cliente é uma linha com o mesmo rowid da tabela clientes.
+        Gravações em lote suspendem os triggers dentro da própria transação
+        (_suspend_client_search) e atualizam o índice de uma vez no final.
+        Sem FTS5 no SQLite, search_clientes filtra a lista em memória.
+        """
+        try:
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS clientes_busca USING fts5(
+                    nome, cpf, telefone, bicicletas,
+                    tokenize = 'unicode61 remove_diacritics 2',
+                    prefix = '2 3'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 indisponível, busca de clientes sem índice: {e}")
+            self._search_fts = False
+            return
+        
+        active = f"WHEN NOT EXISTS (SELECT 1 FROM configuracoes WHERE chave = '{self._SEARCH_SUSPENDED_KEY}')"
+        
+        def refresh(cliente_id: str) -> str:
+            return f"""
+                DELETE FROM clientes_busca WHERE rowid = (SELECT rowid FROM clientes WHERE id = {cliente_id});
+                INSERT INTO clientes_busca (rowid, nome, cpf, telefone, bicicletas)
+                SELECT {self._search_document_sql('c')} FROM clientes c WHERE c.id = {cliente_id};
+            """
+        
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_clientes_busca_insert AFTER INSERT ON clientes {active}
+            BEGIN
+                {refresh('NEW.id')}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_clientes_busca_update
+            AFTER UPDATE OF id, nome, cpf, telefone ON clientes {active}
+            BEGIN
+                DELETE FROM clientes_busca WHERE rowid = OLD.rowid;
+                {refresh('NEW.id')}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_clientes_busca_delete AFTER DELETE ON clientes {active}
+            BEGIN
+                DELETE FROM clientes_busca WHERE rowid = OLD.rowid;
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_bicicletas_busca_insert AFTER INSERT ON bicicletas {active}
+            BEGIN
+                {refresh('NEW.cliente_id')}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_bicicletas_busca_update
+            AFTER UPDATE OF cliente_id, marca, modelo, cor ON bicicletas {active}
+            BEGIN
+                {refresh('OLD.cliente_id')}
+                {refresh('NEW.cliente_id')}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_bicicletas_busca_delete AFTER DELETE ON bicicletas {active}
+            BEGIN
+                {refresh('OLD.cliente_id')}
+            END
+        """)
+        
+        # Bancos anteriores ao índice (ou restaurados de backup) são indexados por completo
+        indexed = cursor.execute("SELECT COUNT(*) FROM clientes_busca").fetchone()[0]
+        total = cursor.execute("SELECT COUNT(*) FROM clientes").fetchone()[0]
+        if indexed != total:
+            self._rebuild_client_search(cursor)
+        self._search_fts = True
+    
+    def _rebuild_client_search(self, cursor: sqlite3.Cursor):
+        cursor.execute("DELETE FROM clientes_busca")
+        cursor.execute(f"""
+            INSERT INTO clientes_busca (rowid, nome, cpf, telefone, bicicletas)
+            SELECT {self._search_document_sql('c')} FROM clientes c
+        """)
+        logger.debug("Índice de busca de clientes reconstruído")
+    
+    def _suspend_client_search(self, conn: sqlite3.Connection):
+        """Desliga os triggers do índice até _resume_client_search (só nesta transação)"""
+        conn.execute(
+            "INSERT OR REPLACE INTO configuracoes (chave, valor, atualizado_em) VALUES (?, '1', ?)",
+            (self._SEARCH_SUSPENDED_KEY, datetime.now().isoformat())
+        )
+    
+    def _resume_client_search(self, conn: sqlite3.Connection, cliente_ids: Optional[List[str]] = None):
+        """
+        Religa os triggers e reindexa os clientes informados (ou todos, se
+        None ou se o lote cobrir boa parte da tabela).
+        """
+        conn.execute("DELETE FROM configuracoes WHERE chave = ?", (self._SEARCH_SUSPENDED_KEY,))
+        cursor = conn.cursor()
+        if cliente_ids is not None:
+            total = cursor.execute("SELECT COUNT(*) FROM clientes").fetchone()[0]
+            if len(cliente_ids) * 2 < total:
+                params = [(cid,) for cid in dict.fromkeys(cliente_ids)]
+                cursor.executemany(
+                    "DELETE FROM clientes_busca WHERE rowid = (SELECT rowid FROM clientes WHERE id = ?)", params
+                )
+                cursor.executemany(f"""
+                    INSERT INTO clientes_busca (rowid, nome, cpf, telefone, bicicletas)
+                    SELECT {self._search_document_sql('c')} FROM clientes c WHERE c.id = ?
+                """, params)
+                return
+        self._rebuild_client_search(cursor)
+    
+    def rebuild_client_search(self) -> bool:
+        """Reconstrói o índice de busca de clientes a partir das tabelas"""
+        if not self._search_fts:
+            return False
+        try:
+            with self._get_connection() as conn:
+                self._rebuild_client_search(conn.cursor())
+                self._commit(conn)
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao reconstruir índice de busca: {e}", exc_info=True)
+            return False
+    
+    def search_clientes(self, query: str, limit: int = CLIENT_SEARCH_LIMIT_DEFAULT) -> List[Dict[str, Any]]:
+        """
+        Busca clientes por prefixo (sem acentos) no nome, CPF (com ou sem
+        pontuação), telefone e marca/modelo/cor das bicicletas. Todos os termos
+        precisam casar; resultados ordenados por relevância (bm25) e nome.
+        """
+        terms = client_search_terms(query)
+        if not terms:
+            return []
+        limit = max(1, min(int(limit), CLIENT_SEARCH_LIMIT_MAX))
+        if not self._search_fts:
+            matches = (c for c in self.iter_all_clientes() if client_matches_search(c, terms))
+            return [c for c, _ in zip(matches, range(limit))]
+        
+        match = ' '.join(f'"{term}"*' for term in terms)
+        try:
+            with self._get_connection() as conn:
+                rows = conn.execute("""
+                    SELECT c.* FROM clientes_busca
+                    JOIN clientes c ON c.rowid = clientes_busca.rowid
+                    WHERE clientes_busca MATCH ?
+                    ORDER BY bm25(clientes_busca, 10.0, 5.0, 5.0, 1.0), c.nome
+                    LIMIT ?
+                """, (match, limit)).fetchall()
+                clientes = []
+                for row in rows:
+                    cliente = dict(row)
+                    cliente['ativo'] = bool(cliente['ativo'])
+                    cliente['bicicletas'] = []
+                    clientes.append(cliente)
+                if clientes:
+                    by_id = {c['id']: c for c in clientes}
+                    marks = ",".join("?" for _ in by_id)
+                    for row in conn.execute(
+                        f"SELECT * FROM bicicletas WHERE cliente_id IN ({marks}) ORDER BY descricao", list(by_id)
+                    ):
+                        bike = dict(row)
+                        cid = bike.pop('cliente_id')
+                        bike['clienteId'] = cid
+                        bike['ativa'] = bool(bike['ativa'])
+                        by_id[cid]['bicicletas'].append(bike)
+                return clientes
+        except Exception as e:
+            logger.error(f"Erro na busca de clientes: {e}", exc_info=True)
+            return []
+    
     # ==================== CLIENTES ====================
     
+    _UPSERT_CLIENTE_SQL = """
+        INSERT INTO clientes (
+            id, cpf, cpf_normalizado, nome, telefone, categoria, comentarios,
+            ativo, data_cadastro, criado_em, atualizado_em
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            cpf=excluded.cpf,
+            cpf_normalizado=excluded.cpf_normalizado,
+            nome=excluded.nome,
+            telefone=excluded.telefone,
+            categoria=excluded.categoria,
+            comentarios=excluded.comentarios,
+            ativo=excluded.ativo,
+            atualizado_em=excluded.atualizado_em
+    """
+    
+    _UPSERT_BICICLETA_SQL = """
+        INSERT INTO bicicletas (
+            id, cliente_id, descricao, marca, modelo,
+            cor, aro, ativa, criada_em, atualizada_em
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            cliente_id=excluded.cliente_id,
+            descricao=excluded.descricao,
+            marca=excluded.marca,
+            modelo=excluded.modelo,
+            cor=excluded.cor,
+            aro=excluded.aro,
+            ativa=excluded.ativa,
+            atualizada_em=excluded.atualizada_em
+    """
+    
+    @staticmethod
+    def _normalize_comentarios(comentarios: Any) -> str:
+        """Garante que comentarios seja string"""
+        if isinstance(comentarios, list):
+            return json.dumps(comentarios)
+        if not isinstance(comentarios, str):
+            return str(comentarios) if comentarios else ''
+        return comentarios
+    
+    def _cliente_row(self, cliente: Dict[str, Any], now: str) -> tuple:
+        """Monta a tupla de parâmetros do upsert de cliente"""
+        return (
+            cliente['id'], cliente['cpf'], normalize_cpf(cliente['cpf']) or None, cliente['nome'],
+            cliente.get('telefone', ''), cliente.get('categoria', ''),
+            self._normalize_comentarios(cliente.get('comentarios', '')),
+            1 if cliente.get('ativo', True) else 0,
+            cliente.get('dataCadastro', now), now, now
+        )
+    
+    @staticmethod
+    def _bicicleta_rows(bicicletas: List[Any], cliente_id: str, now: str) -> List[tuple]:
+        """Monta as tuplas de parâmetros do upsert de bicicletas de um cliente"""
+        return [
+            (
+                bike['id'], cliente_id,
+                f"{bike.get('marca', '')} {bike.get('modelo', '')}".strip(),
+                bike.get('marca', ''), bike.get('modelo', ''),
+                bike.get('cor', ''), bike.get('aro', ''),
+                1 if bike.get('ativa', True) else 0, now, now
+            )
+            for bike in bicicletas
+            if isinstance(bike, dict) and bike.get('id')
+        ]
+    
+    @staticmethod
+    def _existing_cliente_id(cursor: sqlite3.Cursor, cpf: str, cliente_id: Optional[str] = None) -> Optional[str]:
+        """ID já gravado para o cliente: pelo ID ou pelo CPF (normalizado ou como digitado)"""
+        row = cursor.execute(
+            "SELECT id FROM clientes WHERE id = ? OR cpf_normalizado = ? OR cpf = ?",
+            (cliente_id, normalize_cpf(cpf) or None, cpf)
+        ).fetchone()
+        return row['id'] if row else None
+    
     def save_cliente(self, cliente: Dict[str, Any]) -> bool:
-        """Salva ou atualiza um cliente"""
+        """Salva ou atualiza um cliente e suas bicicletas em uma única transação"""
         try:
             with self._get_connection() as conn:
+                before = self._begin_cliente_write(conn)
                 cursor = conn.cursor()
                 now = datetime.now().isoformat()
                 
                 # Extrai bicicletas do cliente para salvar separadamente
                 bicicletas = cliente.pop('bicicletas', []) if isinstance(cliente.get('bicicletas'), list) else []
                 
-                # Garante que comentarios seja string
-                comentarios = cliente.get('comentarios', '')
-                if isinstance(comentarios, list):
-                    comentarios = json.dumps(comentarios)
-                elif not isinstance(comentarios, str):
-                    comentarios = str(comentarios) if comentarios else ''
+                # Reaproveita o ID existente (procurando por ID ou CPF)
+                existing = self._existing_cliente_id(cursor, cliente['cpf'], cliente.get('id') or cliente['cpf'])
+                if existing:
+                    cliente['id'] = existing
+                elif not cliente.get('id'):
+                    cliente['id'] = cliente['cpf']
                 
-                if 'id' not in cliente or not cliente['id']:
-                    cursor.execute("SELECT id FROM clientes WHERE cpf = ?", (cliente['cpf'],))
-                    existing = cursor.fetchone()
-                    if existing:
-                        cliente['id'] = existing['id']
-                    else:
-                        cliente['id'] = cliente['cpf']
-
-                cursor.execute("SELECT id FROM clientes WHERE id = ? OR cpf = ?", (cliente['id'], cliente['cpf']))
-                exists = cursor.fetchone()
-                
-                if exists:
-                    cliente['id'] = exists['id']
-                    cursor.execute("""
-                        UPDATE clientes SET
-                            cpf = ?, nome = ?, telefone = ?, categoria = ?,
-                            comentarios = ?, ativo = ?, atualizado_em = ?
-                        WHERE id = ?
-                    """, (
-                        cliente['cpf'], cliente['nome'], cliente.get('telefone', ''),
-                        cliente.get('categoria', ''), comentarios,
-                        1 if cliente.get('ativo', True) else 0, now, cliente['id']
-                    ))
-                else:
-                    # Insere novo cliente
-                    cursor.execute("""
-                        INSERT INTO clientes (
-                            id, cpf, nome, telefone, categoria, comentarios,
-                            ativo, data_cadastro, criado_em, atualizado_em
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        cliente['id'], cliente['cpf'], cliente['nome'],
-                        cliente.get('telefone', ''), cliente.get('categoria', ''),
-                        comentarios, 1 if cliente.get('ativo', True) else 0,
-                        cliente.get('dataCadastro', now), now, now
-                    ))
-                
-                conn.commit()
-                logger.debug(f"Cliente salvo: {cliente['id']}")
+                cursor.execute(self._UPSERT_CLIENTE_SQL, self._cliente_row(cliente, now))
                 
-                # Salva as bicicletas separadamente
-                for bike in bicicletas:
-                    if isinstance(bike, dict) and bike.get('id'):
-                        bike_data = {
-                            'id': bike['id'],
-                            'clienteId': cliente['id'],
-                            'descricao': f"{bike.get('marca', '')} {bike.get('modelo', '')}".strip(),
-                            'marca': bike.get('marca', ''),
-                            'modelo': bike.get('modelo', ''),
-                            'cor': bike.get('cor', ''),
-                            'aro': bike.get('aro', ''),
-                            'ativa': bike.get('ativa', True)
-                        }
-                        self.save_bicicleta(bike_data)
+                bike_rows = self._bicicleta_rows(bicicletas, cliente['id'], now)
+                if bike_rows:
+                    cursor.executemany(self._UPSERT_BICICLETA_SQL, bike_rows)
                 
-                return True
+                versions = self._cliente_write_versions(conn, before)
+                self._commit(conn)
+            self._refresh_cached_cliente(cliente['id'], versions)
+            logger.debug(f"Cliente salvo: {cliente['id']} ({len(bike_rows)} bicicleta(s))")
+            return True
         except Exception as e:
+            self._cliente_cache.clear()
             logger.error(f"Erro ao salvar cliente: {e}", exc_info=True)
             return False
+    
     def save_all_clientes(self, clientes: List[Dict[str, Any]]) -> bool:
         """Salva uma lista de clientes em uma única transação"""
         try:
@@ -279,123 +1601,156 @@ class DatabaseManager:
                 cursor = conn.cursor()
                 now = datetime.now().isoformat()
                 
+                bulk_search = self._search_fts and len(clientes) >= CLIENT_SEARCH_BULK_MIN
+                if bulk_search:
+                    self._suspend_client_search(conn)
+                
+                bike_rows = []
                 for cliente in clientes:
-                    # Lógica idêntica ao save_cliente, mas sem o commit individual
-                    
                     # Extrai bicicletas
                     bicicletas = cliente.pop('bicicletas', []) if isinstance(cliente.get('bicicletas'), list) else []
                     
-                    # Normaliza comentarios
-                    comentarios = cliente.get('comentarios', '')
-                    if isinstance(comentarios, list):
-                        comentarios = json.dumps(comentarios)
-                    elif not isinstance(comentarios, str):
-                        comentarios = str(comentarios) if comentarios else ''
-
-                    existing_row = cursor.execute("SELECT id FROM clientes WHERE cpf = ?", (cliente['cpf'],)).fetchone()
-                    if existing_row:
-                        cliente['id'] = existing_row['id']
+                    existing = self._existing_cliente_id(cursor, cliente['cpf'])
+                    if existing:
+                        cliente['id'] = existing
                     elif 'id' not in cliente or not cliente['id']:
                         cliente['id'] = cliente['cpf']
-
-                    cursor.execute("""
-                        INSERT INTO clientes (
-                            id, cpf, nome, telefone, categoria, comentarios,
-                            ativo, data_cadastro, criado_em, atualizado_em
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        ON CONFLICT(id) DO UPDATE SET
-                            cpf=excluded.cpf,
-                            nome=excluded.nome,
-                            telefone=excluded.telefone,
-                            categoria=excluded.categoria,
-                            comentarios=excluded.comentarios,
-                            ativo=excluded.ativo,
-                            atualizado_em=excluded.atualizado_em
-                    """, (
-                        cliente['id'], cliente['cpf'], cliente['nome'],
-                        cliente.get('telefone', ''), cliente.get('categoria', ''),
-                        comentarios, 1 if cliente.get('ativo', True) else 0,
-                        cliente.get('dataCadastro', now), now, now
-                    ))
-
-                    # Processa bicicletas (deleta existentes e recria - mais simples para sync total)
-                    # Ou faz upsert também? Vamos manter consistência com save_cliente individual,
-                    # mas otimizado: primeiro tenta update, se não, insert.
-                    # Mas como é "save all", assumimos que o estado do frontend é a verdade.
-                    # Para simplificar e garantir consistência no batch, vamos atualizar ou inserir.
                     
-                    for bike in bicicletas:
-                        if isinstance(bike, dict) and bike.get('id'):
-                            cursor.execute("""
-                                INSERT INTO bicicletas (
-                                    id, cliente_id, descricao, marca, modelo,
-                                    cor, aro, ativa, criada_em, atualizada_em
-                                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                                ON CONFLICT(id) DO UPDATE SET
-                                    cliente_id=excluded.cliente_id,
-                                    descricao=excluded.descricao,
-                                    marca=excluded.marca,
-                                    modelo=excluded.modelo,
-                                    cor=excluded.cor,
-                                    aro=excluded.aro,
-                                    ativa=excluded.ativa,
-                                    atualizada_em=excluded.atualizada_em
-                            """, (
-                                bike['id'], cliente['id'], 
-                                f"{bike.get('marca', '')} {bike.get('modelo', '')}".strip(),
-                                bike.get('marca', ''), bike.get('modelo', ''),
-                                bike.get('cor', ''), bike.get('aro', ''),
-                                1 if bike.get('ativa', True) else 0, now, now
-                            ))
+                    cursor.execute(self._UPSERT_CLIENTE_SQL, self._cliente_row(cliente, now))
+                    
+                    # O estado do frontend é a verdade: bicicletas são atualizadas ou inseridas
+                    bike_rows.extend(self._bicicleta_rows(bicicletas, cliente['id'], now))
                 
-                conn.commit()
-                logger.info(f"Salvos {len(clientes)} clientes em lote")
-                return True
+                if bike_rows:
+                    cursor.executemany(self._UPSERT_BICICLETA_SQL, bike_rows)
+                
+                if bulk_search:
+                    self._resume_client_search(conn, [cliente['id'] for cliente in clientes])
+                
+                self._commit(conn)
+            self._cliente_cache.clear()
+            logger.info(f"Salvos {len(clientes)} clientes em lote")
+            return True
         except Exception as e:
+            self._cliente_cache.clear()
             logger.error(f"Erro ao salvar clientes em lote: {e}", exc_info=True)
             return False
 
+    def _load_cliente(self, where: str, params: tuple) -> Optional[Dict[str, Any]]:
+        """Lê um cliente (com bicicletas) direto do banco"""
+        with self._get_connection() as conn:
+            row = conn.execute(f"SELECT * FROM clientes WHERE {where}", params).fetchone()
+            if not row:
+                return None
+            cliente = dict(row)
+            cliente['ativo'] = bool(cliente['ativo'])
+            cliente['bicicletas'] = self.get_bicicletas_cliente(cliente['id'])
+            return cliente
+    
+    def _begin_cliente_write(self, conn: sqlite3.Connection) -> Optional[int]:
+        """
+        Abre a transação de escrita (BEGIN IMMEDIATE) e retorna a versão dos
+        clientes antes dela: nenhum outro processo grava até o commit, então
+        (antes, depois) descreve só esta escrita. None dentro de uma transação
+        do chamador.
+        """
+        if getattr(self._local, 'depth', 0) > 1 or conn.in_transaction:
+            return None
+        conn.execute("BEGIN IMMEDIATE")
+        return conn.execute(self._CLIENTES_VERSION_SQL).fetchone()[0]
+
+    def _cliente_write_versions(self, conn: sqlite3.Connection, before: Optional[int]) -> tuple:
+        """(antes, depois) da escrita, lidos na mesma transação"""
+        if before is None:
+            return None, None
+        return before, conn.execute(self._CLIENTES_VERSION_SQL).fetchone()[0]
+
+    def _validate_cliente_cache(self):
+        """Descarta o cache de clientes se outro processo alterou clientes/bicicletas"""
+        if self._cliente_cache.has_entries():
+            self._cliente_cache.validate(self.get_clientes_version())
+
+    def _refresh_cached_cliente(self, cliente_id: str, versions: tuple = (None, None)):
+        """Atualiza no cache um cliente recém-gravado (write-through)"""
+        if getattr(self._local, 'conn', None) is not None:
+            # Dentro de uma transação externa ainda não confirmada
+            self._cliente_cache.clear()
+            return
+        # Geração capturada logo após o commit: se outra gravação do mesmo
+        # cliente terminar antes desta releitura, o put abaixo é ignorado
+        generation = self._cliente_cache.invalidate(cliente_id)
+        # Outra escrita entre a montagem do cache e esta: advance() o descarta
+        # e muda a geração, então o put também é ignorado
+        self._cliente_cache.advance(*versions)
+        try:
+            cliente = self._load_cliente("id = ?", (cliente_id,))
+        except Exception:
+            cliente = None
+        if cliente is not None:
+            self._cliente_cache.put(cliente, generation)
+    
     def get_cliente_by_id(self, cliente_id: str) -> Optional[Dict[str, Any]]:
         """Retorna um cliente pelo ID"""
+        self._validate_cliente_cache()
+        cached, cliente = self._cliente_cache.lookup(cliente_id)
+        if cached and cliente['id'] == cliente_id:
+            return cliente
         try:
-            with self._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM clientes WHERE id = ?", (cliente_id,))
-                row = cursor.fetchone()
-                
-                if row:
-                    cliente = dict(row)
-                    cliente['ativo'] = bool(cliente['ativo'])
-                    cliente['bicicletas'] = self.get_bicicletas_cliente(cliente_id)
-                    return cliente
-                return None
+            generation = self._cliente_cache.generation
+            cliente = self._load_cliente("id = ?", (cliente_id,))
+            if cliente:
+                self._cliente_cache.put(cliente, generation)
+            return cliente
         except Exception as e:
             logger.error(f"Erro ao buscar cliente: {e}", exc_info=True)
             return None
 
     def get_cliente_by_id_or_cpf(self, param: str) -> Optional[Dict[str, Any]]:
-        """Retorna um cliente pelo ID ou CPF com query direta"""
+        """Retorna um cliente pelo ID ou CPF (O(1) quando está no cache)"""
+        self._validate_cliente_cache()
+        cached, cliente = self._cliente_cache.lookup(param)
+        if cached:
+            return cliente
         try:
-            with self._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM clientes WHERE id = ? OR cpf = ?", (param, param))
-                row = cursor.fetchone()
-                
-                if row:
-                    cliente = dict(row)
-                    cliente['ativo'] = bool(cliente['ativo'])
-                    cliente['bicicletas'] = self.get_bicicletas_cliente(cliente['id'])
-                    return cliente
-                return None
+            generation = self._cliente_cache.generation
+            cliente = self._load_cliente("id = ? OR cpf_normalizado = ?", (param, normalize_cpf(param) or None))
+            if cliente:
+                self._cliente_cache.put(cliente, generation)
+            return cliente
         except Exception as e:
             logger.error(f"Erro ao buscar cliente por ID/CPF: {e}", exc_info=True)
             return None
 
+    def get_cliente_by_cpf(self, cpf: str) -> Optional[Dict[str, Any]]:
+        """Retorna um cliente pelo CPF, com ou sem pontuação (índice cpf_normalizado)"""
+        cpf_key = normalize_cpf(cpf)
+        if not cpf_key:
+            return None
+        self._validate_cliente_cache()
+        cached, cliente = self._cliente_cache.lookup(cpf_key, cpf_only=True)
+        if cached:
+            return cliente
+        try:
+            generation = self._cliente_cache.generation
+            cliente = self._load_cliente("cpf_normalizado = ?", (cpf_key,))
+            if cliente:
+                self._cliente_cache.put(cliente, generation)
+            return cliente
+        except Exception as e:
+            logger.error(f"Erro ao buscar cliente por CPF: {e}", exc_info=True)
+            return None
+
     def get_all_clientes(self) -> List[Dict[str, Any]]:
         """Retorna todos os clientes com bicicletas em 2 queries (ao invés de N+1)"""
+        self._validate_cliente_cache()
+        cached = self._cliente_cache.get_all()
+        if cached is not None:
+            return cached
         try:
+            generation = self._cliente_cache.generation
             with self._get_connection() as conn:
                 cursor = conn.cursor()
+                version = conn.execute(self._CLIENTES_VERSION_SQL).fetchone()[0]
                 cursor.execute("SELECT * FROM clientes ORDER BY nome")
                 client_rows = cursor.fetchall()
                 
@@ -419,21 +1774,90 @@ class DatabaseManager:
                     cliente['bicicletas'] = bikes_by_client.get(cliente['id'], [])
                     clientes.append(cliente)
                 
-                return clientes
+            self._cliente_cache.fill(clientes, generation, version)
+            return clientes
         except Exception as e:
             logger.error(f"Erro ao buscar clientes: {e}", exc_info=True)
             return []
     
+    def iter_all_clientes(self, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        Gera todos os clientes (com bicicletas) em lotes, sem montar a lista inteira.
+        Mesmo formato e ordem de get_all_clientes. Cada lote é lido por chave
+        (nome, id) com uma conexão própria, devolvida ao pool antes dos yields:
+        um cliente lento na rede não prende conexões.
+        """
+        self._validate_cliente_cache()
+        cached = self._cliente_cache.get_all()
+        if cached is not None:
+            yield from cached
+            return
+        
+        # Aproveita a leitura para aquecer o cache, se a tabela couber nele
+        generation = self._cliente_cache.generation
+        version = self.get_clientes_version() if self._cliente_cache.enabled else None
+        collected: Optional[List[Dict[str, Any]]] = [] if self._cliente_cache.enabled else None
+        position = None
+        while True:
+            with self._get_connection() as conn:
+                if position is None:
+                    client_rows = conn.execute(
+                        "SELECT * FROM clientes ORDER BY nome, id LIMIT ?", (batch_size,)
+                    ).fetchall()
+                else:
+                    client_rows = conn.execute(
+                        "SELECT * FROM clientes WHERE (nome, id) > (?, ?) ORDER BY nome, id LIMIT ?",
+                        (*position, batch_size)
+                    ).fetchall()
+                if not client_rows:
+                    break
+                
+                ids = [row['id'] for row in client_rows]
+                marks = ",".join("?" for _ in ids)
+                bikes_by_client: Dict[str, List[Dict[str, Any]]] = {}
+                for row in conn.execute(
+                    f"SELECT * FROM bicicletas WHERE cliente_id IN ({marks}) ORDER BY descricao", ids
+                ):
+                    bike = dict(row)
+                    cid = bike.pop('cliente_id')
+                    bike['clienteId'] = cid
+                    bike['ativa'] = bool(bike['ativa'])
+                    bikes_by_client.setdefault(cid, []).append(bike)
+            
+            position = (client_rows[-1]['nome'], client_rows[-1]['id'])
+            for row in client_rows:
+                cliente = dict(row)
+                cliente['ativo'] = bool(cliente['ativo'])
+                cliente['bicicletas'] = bikes_by_client.get(cliente['id'], [])
+                if collected is not None:
+                    collected.append(_copy_cliente(cliente))
+                    if len(collected) > self._cliente_cache.max_entries:
+                        collected = None
+                yield cliente
+            if len(client_rows) < batch_size:
+                break
+        
+        if collected is not None:
+            self._cliente_cache.fill(collected, generation, version)
+    
     def delete_cliente(self, cliente_id: str) -> bool:
         """Deleta um cliente"""
         try:
             with self._get_connection() as conn:
+                before = self._begin_cliente_write(conn)
                 cursor = conn.cursor()
-                cursor.execute("DELETE FROM clientes WHERE id = ? OR cpf = ?", (cliente_id, cliente_id))
-                conn.commit()
-                logger.info(f"Cliente deletado: {cliente_id}")
-                return True
+                cursor.execute(
+                    "DELETE FROM clientes WHERE id = ? OR cpf_normalizado = ?",
+                    (cliente_id, normalize_cpf(cliente_id) or None)
+                )
+                versions = self._cliente_write_versions(conn, before)
+                self._commit(conn)
+            self._cliente_cache.remove(cliente_id)
+            self._cliente_cache.advance(*versions)
+            logger.info(f"Cliente deletado: {cliente_id}")
+            return True
         except Exception as e:
+            self._cliente_cache.clear()
             logger.error(f"Erro ao deletar cliente: {e}", exc_info=True)
             return False
     
@@ -443,39 +1867,18 @@ class DatabaseManager:
         """Salva ou atualiza uma bicicleta"""
         try:
             with self._get_connection() as conn:
-                cursor = conn.cursor()
+                before = self._begin_cliente_write(conn)
                 now = datetime.now().isoformat()
-                
-                cursor.execute("SELECT id FROM bicicletas WHERE id = ?", (bicicleta['id'],))
-                exists = cursor.fetchone()
-                
-                if exists:
-                    cursor.execute("""
-                        UPDATE bicicletas SET
-                            cliente_id = ?, descricao = ?, marca = ?, modelo = ?,
-                            cor = ?, aro = ?, ativa = ?, atualizada_em = ?
-                        WHERE id = ?
-                    """, (
-                        bicicleta['clienteId'], bicicleta['descricao'],
-                        bicicleta.get('marca', ''), bicicleta.get('modelo', ''),
-                        bicicleta.get('cor', ''), bicicleta.get('aro', ''),
-                        1 if bicicleta.get('ativa', True) else 0, now, bicicleta['id']
-                    ))
-                else:
-                    cursor.execute("""
-                        INSERT INTO bicicletas (
-                            id, cliente_id, descricao, marca, modelo,
-                            cor, aro, ativa, criada_em, atualizada_em
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        bicicleta['id'], bicicleta['clienteId'], bicicleta['descricao'],
-                        bicicleta.get('marca', ''), bicicleta.get('modelo', ''),
-                        bicicleta.get('cor', ''), bicicleta.get('aro', ''),
-                        1 if bicicleta.get('ativa', True) else 0, now, now
-                    ))
-                
-                conn.commit()
-                return True
+                conn.execute(self._UPSERT_BICICLETA_SQL, (
+                    bicicleta['id'], bicicleta['clienteId'], bicicleta['descricao'],
+                    bicicleta.get('marca', ''), bicicleta.get('modelo', ''),
+                    bicicleta.get('cor', ''), bicicleta.get('aro', ''),
+                    1 if bicicleta.get('ativa', True) else 0, now, now
+                ))
+                versions = self._cliente_write_versions(conn, before)
+                self._commit(conn)
+            self._refresh_cached_cliente(bicicleta['clienteId'], versions)
+            return True
         except Exception as e:
             logger.error(f"Erro ao salvar bicicleta: {e}", exc_info=True)
             return False
@@ -525,59 +1928,86 @@ class DatabaseManager:
     
     # ==================== REGISTROS ====================
     
+    _UPSERT_REGISTRO_SQL = """
+        INSERT INTO registros (
+            id, cliente_id, bicicleta_id, data_hora_entrada,
+            data_hora_saida, pernoite, acesso_removido,
+            registro_original_id, criado_por, criado_em, atualizado_em
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            cliente_id=excluded.cliente_id,
+            bicicleta_id=excluded.bicicleta_id,
+            data_hora_entrada=excluded.data_hora_entrada,
+            data_hora_saida=excluded.data_hora_saida,
+            pernoite=excluded.pernoite,
+            acesso_removido=excluded.acesso_removido,
+            registro_original_id=excluded.registro_original_id,
+            criado_por=excluded.criado_por,
+            atualizado_em=excluded.atualizado_em
+    """
+    
+    @staticmethod
+    def _registro_row(registro: Dict[str, Any], now: str) -> tuple:
+        """Monta a tupla de parâmetros do upsert de registro"""
+        # Normaliza campos: frontend usa clientId/bikeId, banco usa clienteId/bicicletaId
+        if 'clientId' in registro and 'clienteId' not in registro:
+            registro['clienteId'] = registro['clientId']
+        if 'bikeId' in registro and 'bicicletaId' not in registro:
+            registro['bicicletaId'] = registro['bikeId']
+        
+        return (
+            registro['id'], registro['clienteId'], registro['bicicletaId'],
+            registro['dataHoraEntrada'], registro.get('dataHoraSaida'),
+            1 if registro.get('pernoite', False) else 0,
+            1 if registro.get('acessoRemovido', False) else 0,
+            registro.get('registroOriginalId'), registro.get('criadoPor'),
+            now, now
+        )
+    
     def save_registro(self, registro: Dict[str, Any]) -> bool:
         """Salva ou atualiza um registro"""
         try:
-            # Normaliza campos: frontend usa clientId/bikeId, banco usa clienteId/bicicletaId
-            if 'clientId' in registro and 'clienteId' not in registro:
-                registro['clienteId'] = registro['clientId']
-            if 'bikeId' in registro and 'bicicletaId' not in registro:
-                registro['bicicletaId'] = registro['bikeId']
-            
+            row = self._registro_row(registro, datetime.now().isoformat())
             with self._get_connection() as conn:
-                cursor = conn.cursor()
-                now = datetime.now().isoformat()
-                
-                cursor.execute("SELECT id FROM registros WHERE id = ?", (registro['id'],))
-                exists = cursor.fetchone()
-                
-                if exists:
-                    cursor.execute("""
-                        UPDATE registros SET
-                            cliente_id = ?, bicicleta_id = ?, data_hora_entrada = ?,
-                            data_hora_saida = ?, pernoite = ?, acesso_removido = ?,
-                            registro_original_id = ?, criado_por = ?, atualizado_em = ?
-                        WHERE id = ?
-                    """, (
-                        registro['clienteId'], registro['bicicletaId'],
-                        registro['dataHoraEntrada'], registro.get('dataHoraSaida'),
-                        1 if registro.get('pernoite', False) else 0,
-                        1 if registro.get('acessoRemovido', False) else 0,
-                        registro.get('registroOriginalId'), registro.get('criadoPor'),
-                        now, registro['id']
-                    ))
-                else:
-                    cursor.execute("""
-                        INSERT INTO registros (
-                            id, cliente_id, bicicleta_id, data_hora_entrada,
-                            data_hora_saida, pernoite, acesso_removido,
-                            registro_original_id, criado_por, criado_em, atualizado_em
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        registro['id'], registro['clienteId'], registro['bicicletaId'],
-                        registro['dataHoraEntrada'], registro.get('dataHoraSaida'),
-                        1 if registro.get('pernoite', False) else 0,
-                        1 if registro.get('acessoRemovido', False) else 0,
-                        registro.get('registroOriginalId'), registro.get('criadoPor'),
-                        now, now
-                    ))
-                
-                conn.commit()
+                conn.execute(self._UPSERT_REGISTRO_SQL, row)
+                self._commit(conn)
                 return True
         except Exception as e:
             logger.error(f"Erro ao salvar registro: {e}", exc_info=True)
             return False
     
+    def save_all_registros(self, registros: List[Dict[str, Any]]) -> bool:
+        """Salva uma lista de registros em uma única transação (executemany)"""
+        try:
+            now = datetime.now().isoformat()
+            rows = [self._registro_row(registro, now) for registro in registros]
+            with self._get_connection() as conn:
+                conn.executemany(self._UPSERT_REGISTRO_SQL, rows)
+                self._commit(conn)
+                logger.info(f"Salvos {len(rows)} registros em lote")
+                return True
+        except Exception as e:
+            logger.error(f"Erro ao salvar registros em lote: {e}", exc_info=True)
+            return False
+    
+    @staticmethod
+    def _row_to_registro(row: sqlite3.Row) -> Dict[str, Any]:
+        """Converte uma linha de registros (com JOIN de clientes) para o formato do frontend"""
+        registro = dict(row)
+        cid = registro.pop('cliente_id')
+        bid = registro.pop('bicicleta_id')
+        registro['clienteId'] = cid
+        registro['clientId'] = cid
+        registro['bicicletaId'] = bid
+        registro['bikeId'] = bid
+        registro['dataHoraEntrada'] = registro.pop('data_hora_entrada')
+        registro['dataHoraSaida'] = registro.pop('data_hora_saida')
+        registro['pernoite'] = bool(registro['pernoite'])
+        registro['acessoRemovido'] = bool(registro.pop('acesso_removido'))
+        registro['registroOriginalId'] = registro.pop('registro_original_id')
+        registro['criadoPor'] = registro.pop('criado_por')
+        return registro
+    
     def get_all_registros(self) -> List[Dict[str, Any]]:
         """Retorna todos os registros"""
         try:
@@ -589,30 +2019,101 @@ class DatabaseManager:
                     LEFT JOIN clientes c ON r.cliente_id = c.id
                     ORDER BY r.data_hora_entrada DESC
                 """)
-                rows = cursor.fetchall()
-                
-                registros = []
-                for row in rows:
-                    registro = dict(row)
-                    cid = registro.pop('cliente_id')
-                    bid = registro.pop('bicicleta_id')
-                    registro['clienteId'] = cid
-                    registro['clientId'] = cid
-                    registro['bicicletaId'] = bid
-                    registro['bikeId'] = bid
-                    registro['dataHoraEntrada'] = registro.pop('data_hora_entrada')
-                    registro['dataHoraSaida'] = registro.pop('data_hora_saida')
-                    registro['pernoite'] = bool(registro['pernoite'])
-                    registro['acessoRemovido'] = bool(registro.pop('acesso_removido'))
-                    registro['registroOriginalId'] = registro.pop('registro_original_id')
-                    registro['criadoPor'] = registro.pop('criado_por')
-                    registros.append(registro)
-                
-                return registros
+                return [self._row_to_registro(row) for row in cursor.fetchall()]
         except Exception as e:
             logger.error(f"Erro ao buscar registros: {e}", exc_info=True)
             return []
     
+    def iter_all_registros(self, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        Gera todos os registros em lotes, sem montar a lista inteira.
+        Mesma ordem de get_all_registros; cada lote é lido por chave
+        (data_hora_entrada, id) e a conexão volta ao pool antes dos yields.
+        """
+        sql = """
+            SELECT r.*, c.nome as cliente_nome, c.cpf as cliente_cpf
+            FROM registros r
+            LEFT JOIN clientes c ON r.cliente_id = c.id
+            {where}
+            ORDER BY r.data_hora_entrada DESC, r.id DESC
+            LIMIT ?
+        """
+        position = None
+        while True:
+            with self._get_connection() as conn:
+                if position is None:
+                    rows = conn.execute(sql.format(where=''), (batch_size,)).fetchall()
+                else:
+                    rows = conn.execute(
+                        sql.format(where="WHERE (r.data_hora_entrada, r.id) < (?, ?)"),
+                        (*position, batch_size)
+                    ).fetchall()
+            if not rows:
+                break
+            position = (rows[-1]['data_hora_entrada'], rows[-1]['id'])
+            for row in rows:
+                yield self._row_to_registro(row)
+            if len(rows) < batch_size:
+                break
+    
+    def get_registros_page(self, limit: int = REGISTROS_PAGE_DEFAULT, cursor: Optional[str] = None,
+                           desde: Optional[str] = None, ate: Optional[str] = None,
+                           cliente_id: Optional[str] = None, em_aberto: bool = False) -> Dict[str, Any]:
+        """
+        Retorna uma página de registros (mais recentes primeiro) usando paginação
+        por cursor sobre (data_hora_entrada, id).
+        Filtros: intervalo de entrada [desde, ate), cliente e registros sem saída.
+        """
+        limit = max(1, min(int(limit), REGISTROS_PAGE_MAX))
+        where = []
+        params: List[Any] = []
+        
+        if em_aberto:
+            where.append("r.data_hora_saida IS NULL")
+        if cliente_id:
+            where.append("r.cliente_id = ?")
+            params.append(cliente_id)
+        if desde:
+            where.append("r.data_hora_entrada >= ?")
+            params.append(desde)
+        if ate:
+            where.append("r.data_hora_entrada < ?")
+            params.append(registros_range_end(ate))
+        if cursor:
+            position = decode_registros_cursor(cursor)
+            if position is None:
+                raise ValueError("Cursor inválido")
+            where.append("(r.data_hora_entrada, r.id) < (?, ?)")
+            params.extend(position)
+        
+        sql = """
+            SELECT r.*, c.nome as cliente_nome, c.cpf as cliente_cpf
+            FROM registros r
+            LEFT JOIN clientes c ON r.cliente_id = c.id
+        """
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY r.data_hora_entrada DESC, r.id DESC LIMIT ?"
+        params.append(limit + 1)
+        
+        # Erros de banco sobem para o chamador (500), em vez de parecer uma página vazia
+        with self._get_connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        
+        has_more = len(rows) > limit
+        registros = [self._row_to_registro(row) for row in rows[:limit]]
+        next_cursor = None
+        if has_more:
+            last = registros[-1]
+            next_cursor = encode_registros_cursor(last['dataHoraEntrada'], last['id'])
+        
+        return {
+            'registros': registros,
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+            'limit': limit
+        }
+    
     # ==================== AUDITORIA ====================
     
     def log_audit(self, usuario: str, acao: str, detalhes: Optional[str] = None) -> bool:
@@ -624,7 +2125,7 @@ class DatabaseManager:
                     INSERT INTO auditoria (usuario, acao, detalhes, timestamp)
                     VALUES (?, ?, ?, ?)
                 """, (usuario, acao, detalhes, datetime.now().isoformat()))
-                conn.commit()
+                self._commit(conn)
                 return True
         except Exception as e:
             logger.error(f"Erro ao registrar auditoria: {e}", exc_info=True)
@@ -665,14 +2166,18 @@ class DatabaseManager:
                         VALUES (?, ?, ?, ?)
                     """, (nome, emoji, now, now))
                 
-                conn.commit()
+                self._commit(conn)
                 return True
         except Exception as e:
             logger.error(f"Erro ao salvar categorias: {e}", exc_info=True)
             return False
     
-    def get_all_categorias(self) -> Dict[str, str]:
-        """Retorna todas as categorias como dicionário {nome: emoji}"""
+    def get_all_categorias(self, raise_errors: bool = False) -> Dict[str, str]:
+        """
+        Retorna todas as categorias como dicionário {nome: emoji}. Em caso de
+        erro retorna {}, ou propaga a exceção com `raise_errors` (para quem
+        guardaria o vazio como resultado válido).
+        """
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
@@ -680,6 +2185,8 @@ class DatabaseManager:
                 rows = cursor.fetchall()
                 return {row['nome']: row['emoji'] for row in rows}
         except Exception as e:
+            if raise_errors:
+                raise
             logger.error(f"Erro ao buscar categorias: {e}", exc_info=True)
             return {}
     
@@ -689,7 +2196,7 @@ class DatabaseManager:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute("DELETE FROM registros WHERE id = ?", (registro_id,))
-                conn.commit()
+                self._commit(conn)
                 return cursor.rowcount > 0
         except Exception as e:
             logger.error(f"Erro ao deletar registro: {e}", exc_info=True)
@@ -704,9 +2211,15 @@ class DatabaseManager:
                 cursor = conn.cursor()
                 cursor.execute("SELECT COUNT(*) as count FROM clientes")
                 count = cursor.fetchone()['count']
+                if self._search_fts:
+                    self._suspend_client_search(conn)
                 cursor.execute("DELETE FROM bicicletas")
                 cursor.execute("DELETE FROM clientes")
-                conn.commit()
+                if self._search_fts:
+                    self._resume_client_search(conn)
+                self._mark_sync_reset(conn, ('clientes', 'bicicletas'))
+                self._commit(conn)
+                self._cliente_cache.clear()
                 logger.info(f"Todos os {count} clientes foram removidos")
                 return {'success': True, 'deleted': count}
         except Exception as e:
@@ -721,7 +2234,8 @@ class DatabaseManager:
                 cursor.execute("SELECT COUNT(*) as count FROM registros")
                 count = cursor.fetchone()['count']
                 cursor.execute("DELETE FROM registros")
-                conn.commit()
+                self._mark_sync_reset(conn, ('registros',))
+                self._commit(conn)
                 logger.info(f"Todos os {count} registros foram removidos")
                 return {'success': True, 'deleted': count}
         except Exception as e:
@@ -735,8 +2249,14 @@ class DatabaseManager:
                 cursor = conn.cursor()
                 cursor.execute("SELECT COUNT(*) as count FROM bicicletas")
                 count = cursor.fetchone()['count']
+                if self._search_fts:
+                    self._suspend_client_search(conn)
                 cursor.execute("DELETE FROM bicicletas")
-                conn.commit()
+                if self._search_fts:
+                    self._resume_client_search(conn)
+                self._mark_sync_reset(conn, ('bicicletas',))
+                self._commit(conn)
+                self._cliente_cache.clear()
                 logger.info(f"Todas as {count} bicicletas foram removidas")
                 return {'success': True, 'deleted': count}
         except Exception as e:
@@ -751,7 +2271,7 @@ class DatabaseManager:
                 cursor.execute("SELECT COUNT(*) as count FROM categorias")
                 count = cursor.fetchone()['count']
                 cursor.execute("DELETE FROM categorias")
-                conn.commit()
+                self._commit(conn)
                 logger.info(f"Todas as {count} categorias foram removidas")
                 return {'success': True, 'deleted': count}
         except Exception as e:
@@ -767,8 +2287,12 @@ class DatabaseManager:
             
             if format == 'zip':
                 backup_file = os.path.join(BACKUP_DIR, f"backup_{timestamp}.zip")
-                with zipfile.ZipFile(backup_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                    zipf.write(self.db_path, os.path.basename(self.db_path))
+                with zipfile.ZipFile(backup_file, 'w', zipfile.ZIP_DEFLATED) as zipf, \
+                        tempfile.TemporaryDirectory() as tmp:
+                    # Cópia consistente: o arquivo principal sozinho não tem o que está no WAL
+                    copia = os.path.join(tmp, os.path.basename(self.db_path))
+                    self._copy_database(self.db_path, copia)
+                    zipf.write(copia, os.path.basename(self.db_path))
                     
                     # Adiciona um arquivo JSON com metadados
                     metadata = {
@@ -806,6 +2330,20 @@ class DatabaseManager:
             logger.error(f"Erro ao criar backup: {e}", exc_info=True)
             return None
     
+    @staticmethod
+    def _copy_database(origem: str, destino: str):
+        """Copia o conteúdo de `origem` para `destino` (sqlite3 backup API)"""
+        src = sqlite3.connect(origem)
+        try:
+            dest = sqlite3.connect(destino)
+            try:
+                src.backup(dest)
+                dest.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+            finally:
+                dest.close()
+        finally:
+            src.close()
+
     def restore_backup(self, backup_file: str) -> bool:
         """Restaura um backup"""
         try:
@@ -817,8 +2355,18 @@ class DatabaseManager:
                 logger.warning(f"Não foi possível criar backup de segurança: {e}")
 
             if backup_file.endswith('.zip'):
-                with zipfile.ZipFile(backup_file, 'r') as zipf:
-                    zipf.extractall(DB_DIR)
+                with zipfile.ZipFile(backup_file, 'r') as zipf, tempfile.TemporaryDirectory() as tmp:
+                    nome = os.path.basename(self.db_path)
+                    if 'metadata.json' in zipf.namelist():
+                        nome = json.loads(zipf.read('metadata.json')).get('database', nome)
+                    origem = zipf.extract(nome, tmp)
+                    # Sem conexões emprestadas; a cópia pela API de backup do SQLite
+                    # passa pelo WAL, então -wal/-shm antigos não sobrevivem ao restore
+                    with self._pool.exclusive():
+                        self._copy_database(origem, self.db_path)
+                        self._cliente_cache.clear()
+                # Backups anteriores ao índice de busca ganham tabelas/triggers novos
+                self._init_database()
                 logger.info(f"Backup restaurado: {backup_file}")
                 return True
             
@@ -856,7 +2404,7 @@ class DatabaseManager:
                     INSERT INTO sincronizacao_pendente (tipo, operacao, dados, timestamp)
                     VALUES (?, ?, ?, ?)
                 """, (tipo, operacao, json.dumps(dados), datetime.now().isoformat()))
-                conn.commit()
+                self._commit(conn)
                 return True
         except Exception as e:
             logger.error(f"Erro ao adicionar operação pendente: {e}", exc_info=True)
@@ -895,12 +2443,191 @@ class DatabaseManager:
                     SET sincronizado = 1
                     WHERE id = ?
                 """, (sync_id,))
-                conn.commit()
+                self._commit(conn)
                 return True
         except Exception as e:
             logger.error(f"Erro ao marcar sincronização como completa: {e}", exc_info=True)
             return False
     
+    # ==================== SOLICITAÇÕES ====================
+    
+    def _init_solicitacoes(self, cursor: sqlite3.Cursor):
+        """
+        Fila de solicitações de entrada/saída do app móvel. `reserva` marca
+        as linhas pegas por um `claim_solicitacoes`; o índice (status,
+        criada_em) serve a listagem e a reserva da mais antiga.
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS solicitacoes (
+                id TEXT PRIMARY KEY,
+                cliente_id TEXT NOT NULL,
+                bicicleta_id TEXT NOT NULL,
+                tipo TEXT NOT NULL DEFAULT 'entrada',
+                status TEXT NOT NULL DEFAULT 'pendente',
+                timestamp TEXT,
+                operador TEXT,
+                reserva TEXT,
+                criada_em TEXT NOT NULL,
+                atualizada_em TEXT NOT NULL,
+                concluida_em TEXT
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_solicitacoes_status_criada ON solicitacoes(status, criada_em)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_solicitacoes_reserva ON solicitacoes(reserva)")
+    
+    @staticmethod
+    def _solicitacao_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            'id': row['id'],
+            'clientId': row['cliente_id'],
+            'bikeId': row['bicicleta_id'],
+            'tipo': row['tipo'],
+            'timestamp': row['timestamp'] or row['criada_em'],
+            'status': row['status'],
+            'operador': row['operador'],
+            'criadaEm': row['criada_em'],
+            'atualizadaEm': row['atualizada_em'],
+            'concluidaEm': row['concluida_em'],
+        }
+    
+    def add_solicitacao(self, solicitacao: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Enfileira uma solicitação (uma única inserção) e a retorna como gravada"""
+        try:
+            now = datetime.now().isoformat()
+            with self._get_connection() as conn:
+                conn.execute("""
+                    INSERT INTO solicitacoes (id, cliente_id, bicicleta_id, tipo, status, timestamp,
+                                              criada_em, atualizada_em)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    solicitacao['id'], solicitacao['clientId'], solicitacao['bikeId'],
+                    solicitacao.get('tipo') or 'entrada',
+                    solicitacao.get('status') or SOLICITACAO_PENDENTE,
+                    solicitacao.get('timestamp') or now,
+                    solicitacao.get('criadaEm') or now, now
+                ))
+                row = conn.execute("SELECT * FROM solicitacoes WHERE id = ?", (solicitacao['id'],)).fetchone()
+                return self._solicitacao_from_row(row)
+        except Exception as e:
+            logger.error(f"Erro ao adicionar solicitação: {e}", exc_info=True)
+            return None
+    
+    def import_solicitacoes(self, solicitacoes: List[Dict[str, Any]]) -> int:
+        """Importa solicitações de solicitacoes.json (ids já existentes são ignorados)"""
+        now = datetime.now().isoformat()
+        rows = [
+            (s['id'], s['clientId'], s['bikeId'], s.get('tipo') or 'entrada',
+             s.get('status') if s.get('status') in SOLICITACOES_ABERTAS else SOLICITACAO_PENDENTE,
+             s.get('timestamp') or now, s.get('timestamp') or now, now)
+            for s in solicitacoes
+            if s.get('id') and s.get('clientId') and s.get('bikeId')
+        ]
+        with self._get_connection() as conn:
+            before = conn.total_changes
+            conn.executemany("""
+                INSERT OR IGNORE INTO solicitacoes (id, cliente_id, bicicleta_id, tipo, status, timestamp,
+                                                    criada_em, atualizada_em)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            return conn.total_changes - before
+    
+    def get_solicitacoes(self, statuses=SOLICITACOES_ABERTAS, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Solicitações com os status pedidos (padrão: em aberto), da mais antiga para a mais nova"""
+        try:
+            statuses = tuple(statuses)
+            sql = f"""
+                SELECT * FROM solicitacoes
+                WHERE status IN ({','.join('?' * len(statuses))})
+                ORDER BY criada_em, id
+            """
+            params: List[Any] = list(statuses)
+            if limit is not None:
+                sql += " LIMIT ?"
+                params.append(limit)
+            with self._get_connection() as conn:
+                return [self._solicitacao_from_row(row) for row in conn.execute(sql, params)]
+        except Exception as e:
+            logger.error(f"Erro ao buscar solicitações: {e}", exc_info=True)
+            return []
+    
+    def get_solicitacao(self, solicitacao_id: str) -> Optional[Dict[str, Any]]:
+        """Solicitação pelo id em qualquer status (None se não existe ou já foi expurgada)"""
+        try:
+            with self._get_connection() as conn:
+                row = conn.execute("SELECT * FROM solicitacoes WHERE id = ?", (solicitacao_id,)).fetchone()
+                return self._solicitacao_from_row(row) if row else None
+        except Exception as e:
+            logger.error(f"Erro ao buscar solicitação: {e}", exc_info=True)
+            return None
+    
+    def claim_solicitacoes(self, operador: Optional[str] = None, limit: int = 1,
+                           timeout: int = SOLICITACAO_CLAIM_TIMEOUT) -> List[Dict[str, Any]]:
+        """
+        Reserva as `limit` solicitações pendentes mais antigas para `operador`.
+        É um único UPDATE: duas estações nunca recebem a mesma solicitação.
+        Reservas não concluídas em `timeout` segundos podem ser pegas de novo.
+        """
+        try:
+            now = datetime.now()
+            expiradas = (now - timedelta(seconds=timeout)).isoformat()
+            reserva = uuid.uuid4().hex
+            with self._get_connection() as conn:
+                conn.execute("""
+                    UPDATE solicitacoes
+                    SET status = ?, reserva = ?, operador = ?, atualizada_em = ?
+                    WHERE id IN (
+                        SELECT id FROM solicitacoes
+                        WHERE status = ?
+                           OR (status = ? AND atualizada_em < ?)
+                        ORDER BY criada_em, id
+                        LIMIT ?
+                    )
+                """, (SOLICITACAO_EM_ATENDIMENTO, reserva, operador, now.isoformat(),
+                      SOLICITACAO_PENDENTE, SOLICITACAO_EM_ATENDIMENTO, expiradas, max(1, limit)))
+                rows = conn.execute(
+                    "SELECT * FROM solicitacoes WHERE reserva = ? ORDER BY criada_em, id", (reserva,)
+                ).fetchall()
+                return [self._solicitacao_from_row(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Erro ao reservar solicitações: {e}", exc_info=True)
+            return []
+    
+    def complete_solicitacao(self, solicitacao_id: str, status: str = SOLICITACAO_APROVADA,
+                             operador: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Conclui uma solicitação em aberto (aprovada/rejeitada). Retorna a
+        solicitação concluída, ou None se ela não existe ou já foi concluída.
+        """
+        try:
+            now = datetime.now().isoformat()
+            with self._get_connection() as conn:
+                cursor = conn.execute("""
+                    UPDATE solicitacoes
+                    SET status = ?, operador = COALESCE(?, operador), atualizada_em = ?, concluida_em = ?
+                    WHERE id = ? AND status IN (?, ?)
+                """, (status, operador, now, now, solicitacao_id, *SOLICITACOES_ABERTAS))
+                if cursor.rowcount != 1:
+                    return None
+                row = conn.execute("SELECT * FROM solicitacoes WHERE id = ?", (solicitacao_id,)).fetchone()
+                return self._solicitacao_from_row(row)
+        except Exception as e:
+            logger.error(f"Erro ao concluir solicitação: {e}", exc_info=True)
+            return None
+    
+    def purge_solicitacoes(self, days: int = SOLICITACOES_RETENCAO_DIAS) -> int:
+        """Apaga solicitações concluídas há mais de `days` dias"""
+        try:
+            limite = (datetime.now() - timedelta(days=days)).isoformat()
+            with self._get_connection() as conn:
+                cursor = conn.execute("""
+                    DELETE FROM solicitacoes
+                    WHERE status IN (?, ?) AND concluida_em < ?
+                """, (SOLICITACAO_APROVADA, SOLICITACAO_REJEITADA, limite))
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Erro ao limpar solicitações: {e}", exc_info=True)
+            return 0
+    
     # ==================== CONFIGURAÇÕES ====================
     
     def get_config(self, chave: str, default: Optional[str] = None) -> Optional[str]:
@@ -925,7 +2652,7 @@ class DatabaseManager:
                     INSERT OR REPLACE INTO configuracoes (chave, valor, atualizado_em)
                     VALUES (?, ?, ?)
                 """, (chave, valor, now))
-                conn.commit()
+                self._commit(conn)
                 return True
         except Exception as e:
             logger.error(f"Erro ao definir configuração: {e}", exc_info=True)
@@ -968,38 +2695,16 @@ class DatabaseManager:
         
         # Estatísticas JSON
         try:
-            json_clients_dir = "dados/navegador/clientes"
+            store = get_json_store()
             bicicletas_count = 0
-            if os.path.exists(json_clients_dir):
-                client_files = [f for f in os.listdir(json_clients_dir) if f.endswith('.json')]
-                stats['json']['clientes'] = len(client_files)
-                
-                for filename in client_files:
-                    try:
-                        filepath = os.path.join(json_clients_dir, filename)
-                        with open(filepath, 'r', encoding='utf-8') as f:
-                            client_data = json.load(f)
-                            if 'bicicletas' in client_data and isinstance(client_data['bicicletas'], list):
-                                bicicletas_count += len(client_data['bicicletas'])
-                    except:
-                        pass
-            
+            clientes_count = 0
+            for client_data in store.clientes.iter_all():
+                clientes_count += 1
+                if isinstance(client_data.get('bicicletas'), list):
+                    bicicletas_count += len(client_data['bicicletas'])
+            stats['json']['clientes'] = clientes_count
             stats['json']['bicicletas'] = bicicletas_count
-            
-            json_registros_dir = "dados/navegador/registros"
-            if os.path.exists(json_registros_dir):
-                count = 0
-                for year in os.listdir(json_registros_dir):
-                    year_path = os.path.join(json_registros_dir, year)
-                    if os.path.isdir(year_path):
-                        for month in os.listdir(year_path):
-                            month_path = os.path.join(year_path, month)
-                            if os.path.isdir(month_path):
-                                for day in os.listdir(month_path):
-                                    day_path = os.path.join(month_path, day)
-                                    if os.path.isdir(day_path):
-                                        count += len([f for f in os.listdir(day_path) if f.endswith('.json')])
-                stats['json']['registros'] = count
+            stats['json']['registros'] = store.registros.count()
         except Exception as e:
             logger.error(f"Erro ao obter estatísticas JSON: {e}")
         
@@ -1017,47 +2722,26 @@ class DatabaseManager:
             # Cria backup antes da migração
             self.create_backup('json')
             
+            store = get_json_store()
+            
             # Migra clientes (inclui bicicletas embutidas)
-            json_clients_dir = "dados/navegador/clientes"
-            if os.path.exists(json_clients_dir):
-                for filename in os.listdir(json_clients_dir):
-                    if filename.endswith('.json'):
-                        try:
-                            filepath = os.path.join(json_clients_dir, filename)
-                            with open(filepath, 'r', encoding='utf-8') as f:
-                                client = json.load(f)
-                            if self.save_cliente(client):
-                                result['migrated']['clientes'] += 1
-                                # Conta bicicletas embutidas no cliente
-                                result['migrated']['bicicletas'] += len(client.get('bicicletas', []))
-                        except Exception as e:
-                            result['errors'].append(f"Cliente {filename}: {str(e)}")
+            for key, client in store.clientes.items():
+                try:
+                    # Conta bicicletas embutidas antes: save_cliente as retira do objeto
+                    bicicletas = len(client.get('bicicletas') or [])
+                    if self.save_cliente(client):
+                        result['migrated']['clientes'] += 1
+                        result['migrated']['bicicletas'] += bicicletas
+                except Exception as e:
+                    result['errors'].append(f"Cliente {key}: {str(e)}")
             
             # Migra registros
-            json_registros_dir = "dados/navegador/registros"
-            if os.path.exists(json_registros_dir):
-                for year in os.listdir(json_registros_dir):
-                    year_path = os.path.join(json_registros_dir, year)
-                    if not os.path.isdir(year_path):
-                        continue
-                    for month in os.listdir(year_path):
-                        month_path = os.path.join(year_path, month)
-                        if not os.path.isdir(month_path):
-                            continue
-                        for day in os.listdir(month_path):
-                            day_path = os.path.join(month_path, day)
-                            if not os.path.isdir(day_path):
-                                continue
-                            for filename in os.listdir(day_path):
-                                if filename.endswith('.json'):
-                                    try:
-                                        filepath = os.path.join(day_path, filename)
-                                        with open(filepath, 'r', encoding='utf-8') as f:
-                                            registro = json.load(f)
-                                        if self.save_registro(registro):
-                                            result['migrated']['registros'] += 1
-                                    except Exception as e:
-                                        result['errors'].append(f"Registro {filename}: {str(e)}")
+            for key, registro in store.registros.items():
+                try:
+                    if self.save_registro(registro):
+                        result['migrated']['registros'] += 1
+                except Exception as e:
+                    result['errors'].append(f"Registro {key}: {str(e)}")
             
             result['success'] = len(result['errors']) == 0
             self.set_config('migration_status', 'completed' if result['success'] else 'completed_with_errors')
@@ -1071,6 +2755,34 @@ class DatabaseManager:
         
         return result
     
+    @staticmethod
+    def _export_json_chunks(collection, items, key_of, label: str, label_field: str,
+                            errors: List[str], chunk_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        Grava `items` na coleção JSON em blocos com put_many (um sync por bloco)
+        e devolve os itens gravados. Um bloco com erro é regravado item a item
+        para apontar os itens inválidos em `errors`.
+        """
+        iterator = iter(items)
+        while True:
+            chunk = list(itertools.islice(iterator, chunk_size))
+            if not chunk:
+                return
+            try:
+                collection.put_many([(key_of(item), item) for item in chunk])
+            except Exception:
+                pass
+            else:
+                yield from chunk
+                continue
+            for item in chunk:
+                try:
+                    collection.put(key_of(item), item)
+                except Exception as e:
+                    errors.append(f"{label} {item.get(label_field, 'unknown')}: {str(e)}")
+                    continue
+                yield item
+
     def migrate_sqlite_to_json(self) -> Dict[str, Any]:
         """Migra dados de SQLite para arquivos JSON"""
         result = {'success': False, 'migrated': {'clientes': 0, 'bicicletas': 0, 'registros': 0}, 'errors': []}
@@ -1081,46 +2793,22 @@ class DatabaseManager:
             # Cria backup antes da migração
             self.create_backup('json')
             
-            json_clients_dir = "dados/navegador/clientes"
-            json_bicicletas_dir = "dados/navegador/bicicletas"
-            json_registros_dir = "dados/navegador/registros"
-            os.makedirs(json_clients_dir, exist_ok=True)
-            os.makedirs(json_bicicletas_dir, exist_ok=True)
-            os.makedirs(json_registros_dir, exist_ok=True)
+            store = get_json_store()
+            os.makedirs("dados/navegador/bicicletas", exist_ok=True)
             
             # Exporta clientes (já incluem bicicletas no objeto)
-            clientes = self.get_all_clientes()
-            for cliente in clientes:
-                try:
-                    filename = f"{cliente['cpf'].replace('.', '').replace('-', '')}.json"
-                    filepath = os.path.join(json_clients_dir, filename)
-                    with open(filepath, 'w', encoding='utf-8') as f:
-                        json.dump(cliente, f, ensure_ascii=False, indent=2)
-                    result['migrated']['clientes'] += 1
-                    # Conta bicicletas embutidas no cliente
-                    result['migrated']['bicicletas'] += len(cliente.get('bicicletas', []))
-                except Exception as e:
-                    result['errors'].append(f"Cliente {cliente.get('cpf', 'unknown')}: {str(e)}")
+            for cliente in self._export_json_chunks(store.clientes, self.get_all_clientes(),
+                                                    lambda c: normalize_cpf(c['cpf']), 'Cliente', 'cpf',
+                                                    result['errors']):
+                result['migrated']['clientes'] += 1
+                # Conta bicicletas embutidas no cliente
+                result['migrated']['bicicletas'] += len(cliente.get('bicicletas', []))
             
             # Exporta registros
-            registros = self.get_all_registros()
-            for registro in registros:
-                try:
-                    dt = datetime.fromisoformat(registro['dataHoraEntrada'].replace('Z', '+00:00'))
-                    year = str(dt.year)
-                    month = str(dt.month).zfill(2)
-                    day = str(dt.day).zfill(2)
-                    
-                    day_dir = os.path.join(json_registros_dir, year, month, day)
-                    os.makedirs(day_dir, exist_ok=True)
-                    
-                    filename = f"{registro['id']}.json"
-                    filepath = os.path.join(day_dir, filename)
-                    with open(filepath, 'w', encoding='utf-8') as f:
-                        json.dump(registro, f, ensure_ascii=False, indent=2)
-                    result['migrated']['registros'] += 1
-                except Exception as e:
-                    result['errors'].append(f"Registro {registro.get('id', 'unknown')}: {str(e)}")
+            for _ in self._export_json_chunks(store.registros, self.iter_all_registros(),
+                                              lambda r: r['id'], 'Registro', 'id', result['errors']):
+                result['migrated']['registros'] += 1
+            store.maintenance()
             
             result['success'] = len(result['errors']) == 0
             self.set_config('migration_status', 'completed' if result['success'] else 'completed_with_errors')
@@ -1243,6 +2931,13 @@ class DatabaseManager:
             return None
         return filepath
 
+    def get_backup_path(self, filename: str) -> Optional[str]:
+        """Retorna o caminho validado de um backup existente (None se inválido/ausente)"""
+        filepath = self._safe_backup_path(filename)
+        if not filepath or not os.path.isfile(filepath):
+            return None
+        return filepath
+    
     def get_backup_content(self, filename: str) -> Optional[Dict[str, Any]]:
         """Retorna o conteúdo de um arquivo de backup"""
         try:
@@ -1498,7 +3193,7 @@ class DatabaseManager:
                         permissoes, now, now
                     ))
                 
-                conn.commit()
+                self._commit(conn)
                 return True
         except Exception as e:
             logger.error(f"Erro ao salvar usuário: {e}", exc_info=True)
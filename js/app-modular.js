@@ -167,6 +167,33 @@ class App {
                 this.refreshCategorias();
             }
         });
+
+        this.jobMonitor.onRowChange((change) => this.applyRowChange(change));
+    }
+
+    applyRowChange(change) {
+        const lists = { cliente: 'clients', registro: 'registros' };
+        const key = lists[change.entity];
+        if (!key || !Array.isArray(this.data[key])) return false;
+
+        const list = this.data[key];
+        const index = list.findIndex(item => item.id === change.id);
+        if (change.op === 'delete') {
+            if (index > -1) list.splice(index, 1);
+        } else if (change.op === 'save' && change.data) {
+            if (index > -1) list[index] = { ...list[index], ...change.data };
+            else list.push(change.data);
+        } else {
+            return false;
+        }
+
+        if (key === 'clients' && this.clientesManager) {
+            this.clientesManager.renderClientList();
+        }
+        if (key === 'registros' && this.registrosManager) {
+            this.registrosManager.renderDailyRecords();
+        }
+        return true;
     }
 
     async refreshClients() {
@@ -18,6 +18,7 @@
  *  2. jobMonitor.pollChanges() → Verifica mudanças em /api/changes a cada 10s
  *  3. jobMonitor.showToast()   → Exibe notificação toast (canto inferior direito)
  *  4. jobMonitor.onChanges()   → Registra callback para quando dados mudarem
+ *  5. jobMonitor.onRowChange() → Registra callback para alterações de uma linha
  *
  *  CARDS DE JOB:
  *  - Cada job recebe um card fixo no canto inferior direito
@@ -29,6 +30,10 @@
  *  - Compara contadores do servidor com lastKnownChanges (localStorage)
  *  - Quando há mudança: dispara todos os callbacks registrados via onChanges()
  *  - Usado por app-modular.js para recarregar dados sem reload da página
+ *  - Eventos 'change' (id, operação e dados de uma linha) vão para os callbacks
+ *    de onRowChange(); se algum aplicar a alteração (retornar true), o contador
+ *    avança e a lista não é buscada de novo
+ *  - Reconexão com Last-Event-ID: o servidor reenvia os eventos perdidos
  *
  *  TOASTS:
  *  - showToast(message, type) → tipos: 'success', 'error', 'warning', 'info'
@@ -56,6 +61,8 @@ export class JobMonitor {
             categorias: 0
         };
         this.changeCallbacks = [];
+        this.rowChangeCallbacks = [];
+        this.lastEventId = null;
         this.pollingInterval = null;
         this.changePollingInterval = null;
         this.eventSource = null;
@@ -114,7 +121,11 @@ export class JobMonitor {
             this.eventSource.close();
         }
 
-        const es = new EventSource('/api/events');
+        // Conexão nova: o EventSource só envia Last-Event-ID nas reconexões automáticas
+        const url = this.lastEventId
+            ? `/api/events?lastEventId=${encodeURIComponent(this.lastEventId)}`
+            : '/api/events';
+        const es = new EventSource(url);
         this.eventSource = es;
 
         es.addEventListener('init', (e) => {
@@ -143,6 +154,14 @@ export class JobMonitor {
             }
         });
 
+        es.addEventListener('change', (e) => {
+            try {
+                this._handleRowChangeEvent(e.lastEventId, JSON.parse(e.data));
+            } catch (err) {
+                console.warn('Erro ao processar evento change SSE:', err);
+            }
+        });
+
         es.onerror = () => {
         };
     }
@@ -195,6 +214,35 @@ export class JobMonitor {
         }
     }
 
+    _handleRowChangeEvent(eventId, change) {
+        // Entrega pelo menos uma vez: descarta eventos já vistos do mesmo boot
+        const [boot, seq] = this._parseEventId(eventId);
+        const [lastBoot, lastSeq] = this._parseEventId(this.lastEventId);
+        if (boot && boot === lastBoot && seq <= lastSeq) return;
+        if (eventId) this.lastEventId = eventId;
+
+        let applied = false;
+        this.rowChangeCallbacks.forEach(callback => {
+            try {
+                if (callback(change)) applied = true;
+            } catch (e) {
+                console.warn('Erro no callback de alteração:', e);
+            }
+        });
+
+        const resource = change.resource;
+        if (applied && resource && change.version === (this.lastKnownChanges[resource] || 0) + 1) {
+            this.lastKnownChanges[resource] = change.version;
+            this.saveLastKnownChanges();
+        }
+    }
+
+    _parseEventId(eventId) {
+        if (!eventId) return [null, 0];
+        const index = eventId.lastIndexOf('-');
+        return [eventId.slice(0, index), parseInt(eventId.slice(index + 1), 10) || 0];
+    }
+
     async _fetchAndUpdateFinishedJob(jobId) {
         try {
             const response = await fetch(`/api/job/${jobId}`);
@@ -210,6 +258,10 @@ export class JobMonitor {
         this.changeCallbacks.push(callback);
     }
 
+    onRowChange(callback) {
+        this.rowChangeCallbacks.push(callback);
+    }
+
     removeChangeCallback(callback) {
         const index = this.changeCallbacks.indexOf(callback);
         if (index > -1) {
@@ -0,0 +1,1034 @@
+#!/usr/bin/env python3
+"""
+Armazenamento do modo JSON (dados/navegador)
+
+Cada coleção (clientes, registros) tem a mesma interface em dois motores:
+
+- files: um arquivo por item (clientes/<cpf>.json, registros/AAAA/MM/DD/<id>.json),
+  o layout histórico usado pelas ferramentas externas, com um índice em
+  memória que só relê os arquivos cujo mtime/tamanho mudou;
+- log: segmentos JSON Lines só de acréscimo (log/<coleção>/segment-NNNNNN.jsonl),
+  um índice compacto chave→(segmento, offset, tamanho) em disco e compactação
+  periódica. Ler a coleção inteira são poucas leituras sequenciais grandes em
+  vez de um open() por item.
+
+JSON_STORAGE_ENGINE escolhe o motor (padrão: files). Na primeira abertura do
+motor log, os arquivos existentes da árvore são importados para os segmentos.
+"""
+import atexit
+import copy
+import itertools
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+JSON_STORAGE_ENGINE = os.getenv('JSON_STORAGE_ENGINE', 'files').lower()
+JSONL_SEGMENT_MAX_BYTES = int(os.getenv('JSONL_SEGMENT_MAX_BYTES', 16 * 1024 * 1024))
+JSONL_COMPACT_RATIO = float(os.getenv('JSONL_COMPACT_RATIO', 0.5))
+JSONL_COMPACT_MIN_BYTES = 1024 * 1024
+JSONL_INDEX_SAVE_EVERY = 1000
+JSON_FILE_CACHE_ENABLED = os.getenv('JSON_FILE_CACHE', '1') != '0'
+JSON_FILE_CACHE_TTL = float(os.getenv('JSON_FILE_CACHE_TTL', 1.0))
+# fsync das gravações atômicas: 'always' (arquivo e pasta), 'data' (só o arquivo) ou 'never'
+JSON_FSYNC = os.getenv('JSON_FSYNC', 'data').lower()
+JSON_COALESCE_DELAY = float(os.getenv('JSON_COALESCE_DELAY_MS', 50)) / 1000
+
+# Sufixo único dos temporários: duas gravações do mesmo arquivo na mesma thread (put_many)
+_temp_counter = itertools.count()
+
+INDEX_VERSION = 1
+
+
+def registro_day_path(registro: Dict[str, Any]) -> Tuple[str, str, str]:
+    """Pasta AAAA/MM/DD de um registro pela data de entrada (hoje, se não houver)"""
+    if registro.get('dataHoraEntrada'):
+        entrada = datetime.fromisoformat(registro['dataHoraEntrada'].replace('Z', '+00:00'))
+    elif registro.get('data') and 'entrada' in registro:
+        entrada = datetime.fromisoformat(f"{registro['data']}T{registro['entrada'] or '00:00'}:00")
+    else:
+        entrada = datetime.now()
+    return str(entrada.year), str(entrada.month).zfill(2), str(entrada.day).zfill(2)
+
+
+def _copy_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Cópia independente para o chamador (inclui listas de objetos, como as bicicletas)"""
+    copia = dict(record)
+    for field, value in record.items():
+        if isinstance(value, list):
+            copia[field] = [dict(item) if isinstance(item, dict) else item for item in value]
+    return copia
+
+
+# ==================== GRAVAÇÃO ATÔMICA ====================
+
+def write_text_atomic(path: str, content: str, mode: Optional[int] = None, fsync: Optional[str] = None):
+    """
+    Grava `content` em um arquivo temporário na mesma pasta e o renomeia
+    sobre `path`: leitores veem o arquivo antigo ou o novo, nunca um pela
+    metade. `mode` define as permissões (ex.: 0o600) antes da troca.
+    """
+    policy = fsync or JSON_FSYNC
+    tmp = _write_temp(path, content, mode, sync=policy != 'never')
+    _replace_temp(tmp, path)
+    if policy == 'always':
+        # Persiste a renomeação (entrada da pasta)
+        _fsync_directory(os.path.dirname(path) or '.')
+
+
+def _write_temp(path: str, content: str, mode: Optional[int] = None, sync: bool = True) -> str:
+    """Grava `content` num temporário ao lado de `path` e retorna o caminho dele"""
+    directory = os.path.dirname(path) or '.'
+    tmp = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}"
+                                  f".{next(_temp_counter)}.tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666 if mode is None else mode)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        if mode is not None:
+            os.chmod(tmp, mode)
+    except BaseException:
+        _remove_temp(tmp)
+        raise
+    return tmp
+
+
+def _replace_temp(tmp: str, path: str):
+    try:
+        os.replace(tmp, path)
+    except BaseException:
+        _remove_temp(tmp)
+        raise
+
+
+def _remove_temp(tmp: str):
+    try:
+        os.remove(tmp)
+    except OSError:
+        pass
+
+
+def _sync_temps(paths: List[str]):
+    """Persiste vários temporários de uma vez (um sync() em vez de um fsync por arquivo)"""
+    if hasattr(os, 'sync'):
+        os.sync()
+        return
+    for path in paths:
+        fd = os.open(path, os.O_RDWR)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _fsync_directory(directory: str):
+    """fsync da pasta (novas entradas e renomeações); não se aplica no Windows"""
+    if os.name == 'nt':
+        return
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def _lock_directory(directory: str):
+    """
+    Trava exclusiva (arquivo LOCK) da pasta de uma coleção, mantida enquanto
+    o arquivo devolvido estiver aberto. RuntimeError se outro processo (ou
+    outra instância) já a abriu.
+    """
+    f = open(os.path.join(directory, 'LOCK'), 'a+b')
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        f.close()
+        raise RuntimeError(f"{directory} já está em uso por outro processo") from None
+    return f
+
+
+def write_json_atomic(path: str, data: Any, mode: Optional[int] = None, fsync: Optional[str] = None):
+    """Grava `data` como JSON compacto com write_text_atomic"""
+    write_text_atomic(path, json.dumps(data, ensure_ascii=False, separators=(',', ':')), mode, fsync)
+
+
+def read_json(path: str, default: Any = None) -> Any:
+    """Conteúdo JSON de `path` (`default` se o arquivo não existe)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+class CoalescingJSONWriter:
+    """
+    Agrupa rajadas de gravações do mesmo arquivo: `write` guarda o conteúdo
+    mais recente e uma única gravação atômica acontece `delay` segundos
+    depois da primeira. `read` devolve o conteúdo pendente, então quem lê e
+    regrava o arquivo não perde alterações. Pendências são gravadas ao sair
+    do processo; uma queda dentro do intervalo perde só essa janela.
+    """
+
+    def __init__(self, delay: float = JSON_COALESCE_DELAY):
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._pending: Dict[str, Any] = {}
+        self._timers: Dict[str, threading.Timer] = {}
+        self._stats = {'writes': 0, 'flushes': 0, 'errors': 0}
+        atexit.register(self.flush)
+
+    def write(self, path: str, data: Any):
+        if self.delay <= 0:
+            with self._io_lock:
+                write_json_atomic(path, data)
+            with self._lock:
+                self._stats['writes'] += 1
+                self._stats['flushes'] += 1
+            return
+        with self._lock:
+            self._stats['writes'] += 1
+            self._pending[path] = data
+            if path not in self._timers:
+                timer = threading.Timer(self.delay, self.flush, args=(path,))
+                timer.daemon = True
+                self._timers[path] = timer
+                timer.start()
+
+    def read(self, path: str, default: Any = None) -> Any:
+        with self._lock:
+            if path in self._pending:
+                return copy.deepcopy(self._pending[path])
+        return read_json(path, default)
+
+    def flush(self, path: Optional[str] = None):
+        """Grava já as pendências de `path` (ou de todos os arquivos)"""
+        with self._io_lock:
+            with self._lock:
+                paths = [path] if path is not None else list(self._pending)
+                batch = [(p, self._pending[p]) for p in paths if p in self._pending]
+                for p, _ in batch:
+                    timer = self._timers.pop(p, None)
+                    if timer is not None:
+                        timer.cancel()
+            for p, data in batch:
+                try:
+                    write_json_atomic(p, data)
+                except Exception as e:
+                    with self._lock:
+                        self._stats['errors'] += 1
+                    logger.error(f"Erro ao gravar {p}: {e}", exc_info=True)
+                    continue
+                with self._lock:
+                    self._stats['flushes'] += 1
+                    # Uma escrita nova durante a gravação continua pendente (com timer próprio)
+                    if self._pending.get(p) is data:
+                        del self._pending[p]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._pending)
+        return stats
+
+
+_json_writer: Optional[CoalescingJSONWriter] = None
+_json_writer_lock = threading.Lock()
+
+
+def get_json_writer() -> CoalescingJSONWriter:
+    """Retorna a instância única do CoalescingJSONWriter"""
+    global _json_writer
+    with _json_writer_lock:
+        if _json_writer is None:
+            _json_writer = CoalescingJSONWriter()
+        return _json_writer
+
+
+# ==================== MOTOR FILES ====================
+
+class FileTreeCollection:
+    """
+    Um arquivo JSON por item; `nested_by_date` usa a árvore AAAA/MM/DD dos registros.
+
+    Com o cache ligado, mantém um índice em memória de todos os arquivos:
+    caminho→(st_mtime_ns, tamanho, chave, objeto) mais os mapas chave→caminho
+    e id→chave. Cada atualização só faz stat dos arquivos e relê os que
+    mudaram; escritas feitas por esta coleção atualizam o índice na hora.
+    Arquivos alterados por outros processos aparecem na próxima atualização,
+    feita no máximo a cada `cache_ttl` segundos.
+    """
+
+    def __init__(self, directory: str, nested_by_date: bool = False,
+                 cache: bool = JSON_FILE_CACHE_ENABLED, cache_ttl: float = JSON_FILE_CACHE_TTL):
+        self.directory = directory
+        self.nested_by_date = nested_by_date
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        self._lock = threading.RLock()
+        self._entries: Dict[str, Tuple[int, int, str, Dict[str, Any]]] = {}
+        self._paths: Dict[str, str] = {}
+        self._ids: Dict[str, str] = {}
+        self._refreshed_at = None
+        self._version = 0
+        self._stats = {'hits': 0, 'misses': 0, 'refreshes': 0}
+        os.makedirs(directory, exist_ok=True)
+
+    def _path_for(self, key: str, record: Dict[str, Any]) -> str:
+        if self.nested_by_date:
+            return os.path.join(self.directory, *registro_day_path(record), f"{key}.json")
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _scan(self, path: str, depth: int) -> Iterator[os.DirEntry]:
+        """Arquivos .json da coleção (depth = níveis de pastas AAAA/MM/DD abaixo de `path`)"""
+        try:
+            with os.scandir(path) as it:
+                entries = list(it)
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if depth:
+                if entry.is_dir():
+                    yield from self._scan(entry.path, depth - 1)
+            elif entry.name.endswith('.json') and entry.is_file():
+                yield entry
+
+    def _iter_paths(self) -> Iterator[Tuple[str, str]]:
+        """(chave, caminho) de todos os arquivos da coleção"""
+        for entry in self._scan(self.directory, 3 if self.nested_by_date else 0):
+            yield entry.name[:-5], entry.path
+
+    @staticmethod
+    def _load(path: str) -> Dict[str, Any]:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    # ---------------------------------------------------------------
+    # Índice em memória
+
+    def _index(self, path: str, key: str, st: os.stat_result, record: Dict[str, Any]):
+        old = self._entries.get(path)
+        if old is not None and old[3].get('id') is not None and self._ids.get(old[3]['id']) == old[2]:
+            del self._ids[old[3]['id']]
+        self._entries[path] = (st.st_mtime_ns, st.st_size, key, record)
+        self._version += 1
+        self._paths[key] = path
+        if record.get('id') is not None:
+            self._ids[record['id']] = key
+
+    def _unindex(self, path: str):
+        old = self._entries.pop(path, None)
+        if old is None:
+            return
+        self._version += 1
+        _, _, key, record = old
+        if self._paths.get(key) == path:
+            del self._paths[key]
+        if record.get('id') is not None and self._ids.get(record['id']) == key:
+            del self._ids[record['id']]
+
+    def _cached(self, path: str, key: str) -> Optional[Dict[str, Any]]:
+        """Objeto do arquivo, relido só se mtime/tamanho mudaram (None se não existe)"""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self._unindex(path)
+            return None
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            self._stats['hits'] += 1
+            return entry[3]
+        self._stats['misses'] += 1
+        record = self._load(path)
+        self._index(path, key, st, record)
+        return record
+
+    def refresh(self, force: bool = False):
+        """Sincroniza o índice com o disco relendo só os arquivos novos ou alterados"""
+        if not self.cache:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._refreshed_at is not None and now - self._refreshed_at < self.cache_ttl:
+                return
+            seen = set()
+            for entry in self._scan(self.directory, 3 if self.nested_by_date else 0):
+                seen.add(entry.path)
+                try:
+                    self._cached(entry.path, entry.name[:-5])
+                except Exception as e:
+                    self._unindex(entry.path)
+                    logger.error(f"Erro ao ler {entry.path}: {e}")
+            for path in [p for p in self._entries if p not in seen]:
+                self._unindex(path)
+            self._refreshed_at = time.monotonic()
+            self._stats['refreshes'] += 1
+
+    # ---------------------------------------------------------------
+
+    def _find(self, key: str) -> Optional[str]:
+        if not self.nested_by_date:
+            path = os.path.join(self.directory, f"{key}.json")
+            return path if os.path.exists(path) else None
+        if not self.cache:
+            for item_key, path in self._iter_paths():
+                if item_key == key:
+                    return path
+            return None
+        with self._lock:
+            self.refresh()
+            path = self._paths.get(key)
+            if path is None or not os.path.exists(path):
+                # Pode ter sido criado/movido por outro processo dentro do TTL
+                self.refresh(force=True)
+                path = self._paths.get(key)
+            return path
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            if not self.cache:
+                path = self._find(key)
+                return self._load(path) if path is not None else None
+            with self._lock:
+                path = self._find(key) if self.nested_by_date else os.path.join(self.directory, f"{key}.json")
+                record = self._cached(path, key) if path is not None else None
+            return _copy_record(record) if record is not None else None
+        except FileNotFoundError:
+            return None
+
+    def get_by_id(self, record_id: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """(chave, objeto) do item com esse `id` (None se não existe)"""
+        if not self.cache:
+            for key, record in self.items():
+                if record.get('id') == record_id:
+                    return key, record
+            return None
+        with self._lock:
+            self.refresh()
+            key = self._ids.get(record_id)
+        if key is None:
+            return None
+        record = self.get(key)
+        if record is None or record.get('id') != record_id:
+            return None
+        return key, record
+
+    def _stage(self, key: str, record: Dict[str, Any], sync: bool) -> Tuple[str, str]:
+        """Serializa e grava o temporário fora da trava; retorna (caminho, temporário)"""
+        path = self._path_for(key, record)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        content = json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+        return path, _write_temp(path, content, sync=sync)
+
+    def _install(self, key: str, record: Dict[str, Any], path: str, tmp: str):
+        """Troca o temporário pelo arquivo e atualiza o índice (com a trava)"""
+        old_path = self._paths.get(key)
+        _replace_temp(tmp, path)
+        if self.cache:
+            if old_path is not None and old_path != path:
+                # A data de entrada mudou: o arquivo antigo fica em outra pasta
+                try:
+                    os.remove(old_path)
+                except FileNotFoundError:
+                    pass
+                self._unindex(old_path)
+            self._index(path, key, os.stat(path), _copy_record(record))
+
+    def put(self, key: str, record: Dict[str, Any]):
+        # O fsync do temporário acontece fora da trava: só a troca e o índice são serializados
+        path, tmp = self._stage(key, record, sync=JSON_FSYNC != 'never')
+        with self._lock:
+            self._install(key, record, path, tmp)
+        if JSON_FSYNC == 'always':
+            _fsync_directory(os.path.dirname(path))
+
+    def put_many(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """
+        Grava vários itens com um único sync no fim em vez de um fsync por
+        arquivo (importações e migrações). Os temporários são persistidos
+        antes das trocas, então cada arquivo continua velho ou novo.
+        """
+        staged = []
+        try:
+            for key, record in items:
+                staged.append((key, record) + self._stage(key, record, sync=False))
+            if JSON_FSYNC != 'never' and staged:
+                _sync_temps([tmp for _, _, _, tmp in staged])
+            with self._lock:
+                for key, record, path, tmp in staged:
+                    self._install(key, record, path, tmp)
+        except BaseException:
+            for _, _, _, tmp in staged:
+                _remove_temp(tmp)
+            raise
+        if JSON_FSYNC == 'always':
+            for directory in {os.path.dirname(path) for _, _, path, _ in staged}:
+                _fsync_directory(directory)
+        return len(staged)
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            path = self._find(key)
+            if path is None:
+                return False
+            os.remove(path)
+            self._unindex(path)
+            return True
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        if not self.cache:
+            for key, path in self._iter_paths():
+                try:
+                    yield key, self._load(path)
+                except Exception as e:
+                    logger.error(f"Erro ao ler {path}: {e}")
+            return
+        with self._lock:
+            self.refresh()
+            snapshot = [(entry[2], entry[3]) for entry in self._entries.values()]
+        for key, record in snapshot:
+            yield key, _copy_record(record)
+
+    def iter_all(self) -> Iterator[Dict[str, Any]]:
+        for _, record in self.items():
+            yield record
+
+    def clear(self) -> int:
+        count = 0
+        with self._lock:
+            for _, path in list(self._iter_paths()):
+                os.remove(path)
+                count += 1
+            if self.nested_by_date:
+                # Remove as pastas AAAA/MM/DD que ficaram vazias
+                for root, dirs, files in os.walk(self.directory, topdown=False):
+                    if root != self.directory and not os.listdir(root):
+                        os.rmdir(root)
+            self._entries.clear()
+            self._paths.clear()
+            self._ids.clear()
+            self._version += 1
+        return count
+
+    def version(self) -> Optional[int]:
+        """
+        Contador que muda sempre que o índice muda, inclusive por arquivos
+        alterados por outros processos (vistos na atualização pelo TTL).
+        None sem o cache: não há índice para comparar.
+        """
+        if not self.cache:
+            return None
+        with self._lock:
+            self.refresh()
+            return self._version
+
+    def count(self) -> int:
+        if self.cache:
+            with self._lock:
+                self.refresh()
+                return len(self._entries)
+        return sum(1 for _ in self._iter_paths())
+
+    def maintenance(self):
+        pass
+
+    def close(self):
+        pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        if not self.cache:
+            return {'engine': 'files', 'cache': False}
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({'engine': 'files', 'cache': True, 'records': len(self._entries)})
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+# ==================== MOTOR LOG (JSON LINES) ====================
+
+class SegmentLogCollection:
+    """
+    Coleção em segmentos JSON Lines. Cada linha é uma operação legível:
+
+        {"op":"put","id":"12345678900","data":{...}}
+        {"op":"del","id":"12345678900"}
+
+    A última linha de cada chave vale. O índice em memória guarda
+    chave→(segmento, offset, tamanho) e é salvo em index.jsonl com o tamanho
+    dos segmentos; ao abrir, só o trecho escrito depois do último salvamento
+    é relido. A compactação reescreve os itens vivos em segmentos novos
+    (numeração maior) antes de apagar os antigos, então uma queda no meio
+    dela não perde dados.
+
+    A pasta fica travada (LOCK) enquanto a coleção está aberta: só um
+    processo pode acrescentar nos segmentos e manter o índice. Cada
+    acréscimo segue a política JSON_FSYNC.
+    """
+
+    def __init__(self, directory: str, segment_max_bytes: int = JSONL_SEGMENT_MAX_BYTES,
+                 compact_ratio: float = JSONL_COMPACT_RATIO, fsync: Optional[str] = None):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.compact_ratio = compact_ratio
+        self.fsync = fsync or JSON_FSYNC
+        self._lock = threading.RLock()
+        self._index: Dict[str, Tuple[int, int, int]] = {}
+        self._ids: Optional[Dict[str, str]] = None
+        self._sizes: Dict[int, int] = {}
+        self._dead_bytes = 0
+        self._active = None
+        self._active_no = 0
+        self._readers = 0
+        self._unsaved = 0
+        self._version = 0
+        self._stats = {'compactions': 0, 'replayed_bytes': 0}
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = _lock_directory(directory)
+        try:
+            self._open()
+        except BaseException:
+            self._lock_file.close()
+            raise
+
+    # ---------------------------------------------------------------
+
+    def _segment_path(self, no: int) -> str:
+        return os.path.join(self.directory, f"segment-{no:06d}.jsonl")
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, 'index.jsonl')
+
+    def _segments_on_disk(self) -> List[int]:
+        numbers = []
+        for filename in os.listdir(self.directory):
+            if filename.startswith('segment-') and filename.endswith('.jsonl'):
+                try:
+                    numbers.append(int(filename[8:-6]))
+                except ValueError:
+                    continue
+        return sorted(numbers)
+
+    def _open(self):
+        on_disk = self._segments_on_disk()
+        saved = self._load_index()
+        if saved is not None and all(no in on_disk and os.path.getsize(self._segment_path(no)) >= size
+                                     for no, size in saved.items()):
+            first = min(saved) if saved else None
+            for no in on_disk:
+                if no in saved:
+                    self._sizes[no] = saved[no]
+                elif first is not None and no < first:
+                    # Sobra de uma compactação interrompida após salvar o índice
+                    os.remove(self._segment_path(no))
+            to_replay = [no for no in on_disk if no in self._sizes or first is None or no > first]
+        else:
+            if saved is not None:
+                logger.warning(f"Índice de {self.directory} desatualizado; relendo os segmentos")
+            self._index.clear()
+            self._ids = None
+            self._dead_bytes = 0
+            to_replay = on_disk
+
+        for no in to_replay:
+            self._replay(no, self._sizes.get(no, 0), last=(no == to_replay[-1]))
+        self._active_no = max(self._sizes) if self._sizes else 1
+        self._sizes.setdefault(self._active_no, 0)
+        self._active = open(self._segment_path(self._active_no), 'ab')
+
+    def _load_index(self) -> Optional[Dict[int, int]]:
+        """Carrega index.jsonl; retorna {segmento: tamanho indexado} ou None se ausente/inválido"""
+        try:
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                header = json.loads(f.readline())
+                if header.get('version') != INDEX_VERSION:
+                    return None
+                index = {}
+                for line in f:
+                    key, no, offset, length = json.loads(line)
+                    index[key] = (no, offset, length)
+        except FileNotFoundError:
+            return None
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Índice inválido em {self.directory}: {e}")
+            return None
+        self._index = index
+        self._dead_bytes = header.get('dead_bytes', 0)
+        return {int(no): size for no, size in header.get('segments', {}).items()}
+
+    def _replay(self, no: int, start: int, last: bool):
+        """Aplica ao índice as linhas do segmento a partir de `start`"""
+        path = self._segment_path(no)
+        offset = start
+        with open(path, 'rb') as f:
+            f.seek(start)
+            for line in f:
+                length = len(line)
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError("linha incompleta")
+                    entry = json.loads(line)
+                    key = entry['id']
+                except (ValueError, KeyError, TypeError) as e:
+                    if last:
+                        # Escrita interrompida no fim do log: descarta o resto
+                        logger.warning(f"{path}: descartando {os.path.getsize(path) - offset} bytes finais ({e})")
+                        break
+                    logger.error(f"{path}: linha inválida no offset {offset}: {e}")
+                    self._dead_bytes += length
+                    offset += length
+                    continue
+                self._apply(key, entry.get('op'), no, offset, length)
+                offset += length
+        if last and offset < os.path.getsize(path):
+            with open(path, 'r+b') as f:
+                f.truncate(offset)
+        self._sizes[no] = offset
+        self._stats['replayed_bytes'] += offset - start
+
+    def _apply(self, key: str, op: str, no: int, offset: int, length: int):
+        old = self._index.pop(key, None)
+        if old is not None:
+            self._dead_bytes += old[2]
+        if op == 'del':
+            self._dead_bytes += length
+        else:
+            self._index[key] = (no, offset, length)
+
+    # ---------------------------------------------------------------
+
+    def _append(self, entry: Dict[str, Any], sync: bool = True) -> Tuple[int, int, int]:
+        line = (json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+        if self._sizes[self._active_no] and self._sizes[self._active_no] + len(line) > self.segment_max_bytes:
+            if not sync and self.fsync != 'never':
+                # Lote em andamento: o segmento cheio não passa pelo sync final
+                self._active.flush()
+                os.fsync(self._active.fileno())
+            self._active.close()
+            self._active_no += 1
+            self._sizes[self._active_no] = 0
+            self._active = open(self._segment_path(self._active_no), 'ab')
+            if self.fsync == 'always':
+                _fsync_directory(self.directory)
+        offset = self._sizes[self._active_no]
+        self._active.write(line)
+        self._active.flush()
+        if sync and self.fsync != 'never':
+            os.fsync(self._active.fileno())
+        self._sizes[self._active_no] = offset + len(line)
+        self._unsaved += 1
+        if self._unsaved >= JSONL_INDEX_SAVE_EVERY:
+            self._save_index()
+        return self._active_no, offset, len(line)
+
+    def _save_index(self):
+        header = {
+            'version': INDEX_VERSION,
+            'segments': {str(no): size for no, size in self._sizes.items()},
+            'dead_bytes': self._dead_bytes,
+        }
+        tmp = self._index_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(header) + '\n')
+            for key, (no, offset, length) in self._index.items():
+                f.write(json.dumps([key, no, offset, length], ensure_ascii=False) + '\n')
+        os.replace(tmp, self._index_path)
+        self._unsaved = 0
+
+    def _read(self, location: Tuple[int, int, int]) -> Dict[str, Any]:
+        no, offset, length = location
+        with open(self._segment_path(no), 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.read(length))['data']
+
+    # ---------------------------------------------------------------
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            location = self._index.get(key)
+            if location is None:
+                return None
+            return self._read(location)
+
+    def get_by_id(self, record_id: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """(chave, objeto) do item com esse `id`; o mapa id→chave é montado na primeira chamada"""
+        with self._lock:
+            if self._ids is None:
+                self._ids = {}
+                for key, record in self.items():
+                    if record.get('id') is not None:
+                        self._ids[record['id']] = key
+            key = self._ids.get(record_id)
+            record = self.get(key) if key is not None else None
+            if record is None or record.get('id') != record_id:
+                return None
+            return key, record
+
+    def put(self, key: str, record: Dict[str, Any]):
+        with self._lock:
+            self._put(key, record, sync=True)
+
+    def put_many(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """Acrescenta vários itens com um único fsync no fim"""
+        count = 0
+        with self._lock:
+            try:
+                for key, record in items:
+                    self._put(key, record, sync=False)
+                    count += 1
+            finally:
+                if count and self.fsync != 'never':
+                    os.fsync(self._active.fileno())
+        return count
+
+    def _put(self, key: str, record: Dict[str, Any], sync: bool):
+        location = self._append({'op': 'put', 'id': key, 'data': record}, sync)
+        self._apply(key, 'put', *location)
+        self._version += 1
+        if self._ids is not None and record.get('id') is not None:
+            self._ids[record['id']] = key
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            if key not in self._index:
+                return False
+            location = self._append({'op': 'del', 'id': key})
+            self._apply(key, 'del', *location)
+            self._version += 1
+            return True
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Percorre os segmentos em sequência e devolve só as linhas vivas do
+        momento da chamada. Escritas concorrentes não afetam a iteração e a
+        compactação espera os leitores terminarem.
+        """
+        with self._lock:
+            self._active.flush()
+            live: Dict[int, Dict[int, int]] = {}
+            for key, (no, offset, length) in self._index.items():
+                live.setdefault(no, {})[offset] = length
+            self._readers += 1
+        try:
+            for no in sorted(live):
+                offsets = live[no]
+                offset = 0
+                try:
+                    f = open(self._segment_path(no), 'rb', buffering=1024 * 1024)
+                except FileNotFoundError:
+                    continue  # Coleção limpa durante a iteração
+                with f:
+                    for line in f:
+                        if offset in offsets:
+                            entry = json.loads(line)
+                            yield entry['id'], entry['data']
+                        offset += len(line)
+        finally:
+            with self._lock:
+                self._readers -= 1
+
+    def iter_all(self) -> Iterator[Dict[str, Any]]:
+        for _, record in self.items():
+            yield record
+
+    def clear(self) -> int:
+        with self._lock:
+            count = len(self._index)
+            self._active.close()
+            for no in list(self._sizes):
+                try:
+                    os.remove(self._segment_path(no))
+                except OSError as e:
+                    logger.warning(f"Não foi possível remover o segmento {no}: {e}")
+            self._index.clear()
+            self._ids = None
+            self._dead_bytes = 0
+            self._active_no += 1
+            self._sizes = {self._active_no: 0}
+            self._active = open(self._segment_path(self._active_no), 'ab')
+            self._save_index()
+            self._version += 1
+            return count
+
+    def version(self) -> int:
+        """Contador de alterações (put, delete, clear) desta coleção"""
+        with self._lock:
+            return self._version
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._index)
+
+    # ---------------------------------------------------------------
+
+    def compact(self) -> bool:
+        """Reescreve os itens vivos em segmentos novos e apaga os antigos"""
+        with self._lock:
+            if self._readers:
+                return False
+            self._active.flush()
+            old_segments = sorted(self._sizes)
+            locations = sorted(self._index.items(), key=lambda item: item[1])
+            before = sum(self._sizes.values())
+
+            self._active.close()
+            self._active_no = old_segments[-1] + 1
+            self._sizes[self._active_no] = 0
+            self._active = open(self._segment_path(self._active_no), 'ab')
+            new_index = {}
+            source_no, source = None, None
+            for key, (no, offset, length) in locations:
+                if no != source_no:
+                    if source is not None:
+                        source.close()
+                    source_no, source = no, open(self._segment_path(no), 'rb', buffering=1024 * 1024)
+                source.seek(offset)
+                line = source.read(length)
+                if self._sizes[self._active_no] and self._sizes[self._active_no] + len(line) > self.segment_max_bytes:
+                    self._active.close()
+                    self._active_no += 1
+                    self._sizes[self._active_no] = 0
+                    self._active = open(self._segment_path(self._active_no), 'ab')
+                new_index[key] = (self._active_no, self._sizes[self._active_no], len(line))
+                self._active.write(line)
+                self._sizes[self._active_no] += len(line)
+            if source is not None:
+                source.close()
+            self._active.flush()
+            os.fsync(self._active.fileno())
+
+            self._index = new_index
+            self._dead_bytes = 0
+            for no in old_segments:
+                del self._sizes[no]
+            self._save_index()
+            for no in old_segments:
+                try:
+                    os.remove(self._segment_path(no))
+                except OSError as e:
+                    logger.warning(f"Não foi possível remover o segmento {no}: {e}")
+            self._stats['compactions'] += 1
+            logger.info(f"Compactação de {self.directory}: {before} → {sum(self._sizes.values())} bytes")
+            return True
+
+    def maintenance(self):
+        """Salva o índice pendente e compacta se os bytes mortos passaram do limite"""
+        with self._lock:
+            total = sum(self._sizes.values())
+            if total >= JSONL_COMPACT_MIN_BYTES and self._dead_bytes >= total * self.compact_ratio:
+                if self.compact():
+                    return
+            if self._unsaved:
+                self._save_index()
+
+    def close(self):
+        with self._lock:
+            if self._active is not None and not self._active.closed:
+                self._active.close()
+                self._save_index()
+            if not self._lock_file.closed:
+                self._lock_file.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'engine': 'log',
+                'records': len(self._index),
+                'segments': len(self._sizes),
+                'bytes': sum(self._sizes.values()),
+                'dead_bytes': self._dead_bytes,
+            })
+            return stats
+
+
+# ==================== FACHADA ====================
+
+class JSONStore:
+    """Coleções `clientes` (chave: CPF só com dígitos) e `registros` (chave: id)"""
+
+    def __init__(self, base_dir: str = 'dados/navegador', engine: str = JSON_STORAGE_ENGINE):
+        self.base_dir = base_dir
+        self.engine = engine
+        clients_tree = FileTreeCollection(os.path.join(base_dir, 'clientes'))
+        registros_tree = FileTreeCollection(os.path.join(base_dir, 'registros'), nested_by_date=True)
+        if engine == 'log':
+            log_dir = os.path.join(base_dir, 'log')
+            self.clientes = self._open_log(os.path.join(log_dir, 'clientes'), clients_tree)
+            self.registros = self._open_log(os.path.join(log_dir, 'registros'), registros_tree)
+        else:
+            if engine != 'files':
+                logger.warning(f"JSON_STORAGE_ENGINE desconhecido '{engine}', usando 'files'")
+                self.engine = 'files'
+            self.clientes = clients_tree
+            self.registros = registros_tree
+
+    @staticmethod
+    def _open_log(directory: str, tree: FileTreeCollection) -> SegmentLogCollection:
+        if not os.path.exists(directory):
+            # Importa em um diretório temporário e renomeia: uma queda no meio
+            # da importação não deixa uma coleção pela metade
+            staging = directory + '.importando'
+            if os.path.exists(staging):
+                shutil.rmtree(staging)
+            collection = SegmentLogCollection(staging)
+            imported = collection.put_many(tree.items())
+            collection.close()
+            os.rename(staging, directory)
+            if imported:
+                logger.info(f"{imported} itens de {tree.directory} importados para {directory}")
+        return SegmentLogCollection(directory)
+
+    def maintenance(self):
+        for collection in (self.clientes, self.registros):
+            try:
+                collection.maintenance()
+            except Exception as e:
+                logger.error(f"Erro na manutenção do armazenamento JSON: {e}", exc_info=True)
+
+    def close(self):
+        self.clientes.close()
+        self.registros.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'engine': self.engine,
+            'clientes': self.clientes.get_stats(),
+            'registros': self.registros.get_stats(),
+        }
+
+
+_json_stores: Dict[str, JSONStore] = {}
+_json_stores_lock = threading.Lock()
+
+
+def get_json_store(base_dir: str = 'dados/navegador') -> JSONStore:
+    """Retorna a instância única do JSONStore para o diretório"""
+    key = os.path.abspath(base_dir)
+    with _json_stores_lock:
+        store = _json_stores.get(key)
+        if store is None:
+            store = _json_stores[key] = JSONStore(base_dir)
+        return store
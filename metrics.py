@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Métricas de desempenho do servidor no formato texto do Prometheus
+
+Guarda histogramas de latência por rota da API e por método instrumentado
+(DatabaseManager, AuthManager), contadores de requisições e tamanhos de
+resposta. Valores instantâneos (caches, assinantes SSE, pool) entram por
+coletores chamados no momento da exportação.
+"""
+import bisect
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') != '0'
+METRICS_PREFIX = 'bicicletario'
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Histograma de buckets fixos (contagens não acumuladas; acumula na exportação)"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        # Bucket `le` do Prometheus é inclusivo: value <= le
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float):
+        if value == float('inf'):
+            return '+Inf'
+        return repr(value)
+    return str(value)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels)
+    if extra is not None:
+        items.append(extra)
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items) + '}'
+
+
+def stats_family(name: str, stats: Dict[str, Any], help_text: str = '') -> tuple:
+    """Converte um dicionário de estatísticas numéricas em uma família gauge{stat=...}"""
+    samples = [
+        ((('stat', key),), value) for key, value in sorted(stats.items())
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    ]
+    return (name, 'gauge', help_text, samples)
+
+
+class MetricsRegistry:
+    """Registro de métricas thread-safe exportado em formato Prometheus"""
+
+    def __init__(self, prefix: str = METRICS_PREFIX):
+        self.prefix = prefix
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._meta: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._collectors: List[Callable[[], Iterable[tuple]]] = []
+
+    def describe(self, name: str, metric_type: str, help_text: str):
+        self._meta[self.prefix + '_' + name] = (metric_type, help_text)
+
+    def inc(self, name: str, labels: Labels = (), value: float = 1):
+        full = self.prefix + '_' + name
+        with self._lock:
+            series = self._counters.setdefault(full, {})
+            series[labels] = series.get(labels, 0) + value
+
+    def observe(self, name: str, labels: Labels, value: float,
+                buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        full = self.prefix + '_' + name
+        with self._lock:
+            series = self._histograms.setdefault(full, {})
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = Histogram(buckets)
+            histogram.observe(value)
+
+    def add_collector(self, collector: Callable[[], Iterable[tuple]]):
+        """
+        Registra uma função que retorna tuplas
+        (nome, tipo, ajuda, [(labels, valor), ...]) lidas a cada exportação.
+        """
+        self._collectors.append(collector)
+
+    # ------------------------------------------------------------------
+
+    def observe_request(self, method: str, route: str, status: int, elapsed: float, size: int = 0):
+        """Hook de tempo do APIRouter"""
+        labels = (('method', method), ('route', route))
+        self.inc('http_requests_total', labels + (('status', str(status)),))
+        self.observe('http_request_duration_seconds', labels, elapsed)
+        self.observe('http_response_size_bytes', labels, size, SIZE_BUCKETS)
+
+    def observe_call(self, component: str, method: str, elapsed: float, failed: bool = False):
+        labels = (('component', component), ('method', method))
+        self.observe('method_duration_seconds', labels, elapsed)
+        if failed:
+            self.inc('method_errors_total', labels)
+
+    def _timed(self, component: str, name: str, func: Callable) -> Callable:
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                # Geradores são medidos até o fim da iteração
+                started = time.perf_counter()
+                failed = False
+                try:
+                    yield from func(*args, **kwargs)
+                except GeneratorExit:
+                    raise
+                except Exception:
+                    failed = True
+                    raise
+                finally:
+                    self.observe_call(component, name, time.perf_counter() - started, failed)
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            failed = False
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                self.observe_call(component, name, time.perf_counter() - started, failed)
+        return wrapper
+
+    def instrument(self, obj: Any, component: str, exclude: Iterable[str] = ()):
+        """
+        Substitui, na própria instância, os métodos públicos de `obj` por
+        versões que registram a latência em method_duration_seconds.
+        """
+        if obj is None:
+            return 0
+        skip = set(exclude)
+        count = 0
+        for name, func in inspect.getmembers(type(obj), inspect.isfunction):
+            if name.startswith('_') or name in skip:
+                continue
+            bound = getattr(obj, name)
+            setattr(obj, name, self._timed(component, name, bound))
+            count += 1
+        return count
+
+    # ------------------------------------------------------------------
+
+    def render(self, extra: Iterable[tuple] = ()) -> str:
+        """
+        Exporta todas as métricas no formato texto do Prometheus. `extra`
+        recebe famílias adicionais no mesmo formato dos coletores.
+        """
+        lines: List[str] = []
+
+        def header(name, metric_type, default_help=''):
+            help_text = self._meta.get(name, (metric_type, default_help))[1]
+            if help_text:
+                lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+
+        with self._lock:
+            counters = {n: dict(s) for n, s in self._counters.items()}
+            histograms = {
+                n: {labels: (h.buckets, list(h.counts), h.sum, h.count) for labels, h in s.items()}
+                for n, s in self._histograms.items()
+            }
+
+        name = self.prefix + '_uptime_seconds'
+        header(name, 'gauge', 'Tempo desde o início do processo')
+        lines.append(f'{name} {round(time.time() - self.started_at, 3)}')
+
+        for name in sorted(counters):
+            header(name, 'counter')
+            for labels, value in sorted(counters[name].items()):
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+        for name in sorted(histograms):
+            header(name, 'histogram')
+            for labels, (buckets, counts, total, count) in sorted(histograms[name].items()):
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{_format_labels(labels, ("le", _format_value(float(bound))))} {cumulative}')
+                lines.append(f'{name}_bucket{_format_labels(labels, ("le", "+Inf"))} {count}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(total)}')
+                lines.append(f'{name}_count{_format_labels(labels)} {count}')
+
+        families = []
+        for collector in self._collectors:
+            try:
+                families.extend(collector())
+            except Exception as e:
+                logger.error(f"Erro no coletor de métricas: {e}", exc_info=True)
+        families.extend(extra)
+        for name, metric_type, help_text, samples in families:
+            name = self.prefix + '_' + name
+            header(name, metric_type, help_text)
+            for labels, value in samples:
+                lines.append(f'{name}{_format_labels(tuple(labels))} {_format_value(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+_metrics_registry: Optional[MetricsRegistry] = None
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Retorna a instância singleton do MetricsRegistry"""
+    global _metrics_registry
+    if _metrics_registry is None:
+        _metrics_registry = MetricsRegistry()
+        _metrics_registry.describe('http_requests_total', 'counter', 'Requisições da API por rota e status')
+        _metrics_registry.describe('http_request_duration_seconds', 'histogram', 'Latência das rotas da API')
+        _metrics_registry.describe('http_response_size_bytes', 'histogram', 'Tamanho do corpo enviado pelas rotas da API')
+        _metrics_registry.describe('method_duration_seconds', 'histogram', 'Latência dos métodos instrumentados')
+        _metrics_registry.describe('method_errors_total', 'counter', 'Exceções dos métodos instrumentados')
+    return _metrics_registry
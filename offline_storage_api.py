@@ -106,9 +106,8 @@ class OfflineStorageAPIHandler(BaseHTTPRequestHandler):
         if parsed_path.path.startswith('/api/client/'):
             cpf = parsed_path.path.split('/')[-1]
             if DB_AVAILABLE and self.db is not None:
-                # Busca por CPF no SQLite
-                clients = self.db.get_all_clientes()
-                client = next((c for c in clients if c['cpf'] == cpf), None)
+                # Busca direta por ID/CPF (cache em memória ou índice)
+                client = self.db.get_cliente_by_id_or_cpf(cpf)
                 if client:
                     self._set_headers()
                     self.wfile.write(json.dumps(client, ensure_ascii=False).encode('utf-8'))
@@ -247,9 +246,8 @@ class OfflineStorageAPIHandler(BaseHTTPRequestHandler):
         if self.path.startswith('/api/client/'):
             cpf = self.path.split('/')[-1]
             if DB_AVAILABLE and self.db is not None:
-                # Busca cliente por CPF
-                clients = self.db.get_all_clientes()
-                client = next((c for c in clients if c['cpf'] == cpf), None)
+                # Busca cliente por ID/CPF
+                client = self.db.get_cliente_by_id_or_cpf(cpf)
                 if client:
                     success = self.db.delete_cliente(client['id'])
                     if success:
@@ -12,10 +12,25 @@ import time
 import logging
 import base64
 import queue
+import selectors
+import socket
 import gzip
 import io
-from datetime import datetime
-from urllib.parse import urlparse
+import zlib
+import uuid
+from datetime import datetime, timedelta
+from collections import deque
+from urllib.parse import urlparse, parse_qs
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 logging.basicConfig(
     level=logging.INFO,
@@ -43,8 +58,20 @@ class SSEBroadcaster:
             if q in self._clients:
                 self._clients.remove(q)
 
-    def broadcast(self, event_type, data):
+    def attach_hub(self, hub):
+        """Encaminha os eventos também para as conexões mantidas pelo SSEConnectionHub"""
+        self._hub = hub
+
+    def subscriber_count(self):
+        with self._lock:
+            count = len(self._clients)
+        hub = getattr(self, '_hub', None)
+        return count + (hub.client_count() if hub is not None else 0)
+
+    def broadcast(self, event_type, data, event_id=None):
         msg = f"event: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        if event_id is not None:
+            msg = f"id: {event_id}\n" + msg
         with self._lock:
             dead = []
             for q in self._clients:
@@ -54,6 +81,9 @@ class SSEBroadcaster:
                     dead.append(q)
             for q in dead:
                 self._clients.remove(q)
+        hub = getattr(self, '_hub', None)
+        if hub is not None:
+            hub.broadcast(msg.encode('utf-8'))
 
     def broadcast_jobs(self):
         now = time.time()
@@ -72,10 +102,99 @@ class SSEBroadcaster:
 
 SSE_BROADCASTER = SSEBroadcaster()
 
+# Eventos de linha guardados para quem reconecta com Last-Event-ID
+CHANGE_FEED_BUFFER = int(os.getenv('CHANGE_FEED_BUFFER', 1000))
+
+
+class ChangeFeed:
+    """
+    Feed de alterações por linha (evento SSE 'change', com id '<boot>-<seq>').
+    Os últimos eventos ficam num buffer circular para reenviar a quem reconecta;
+    a entrega é pelo menos uma vez: o cliente descarta seq já vistos.
+    """
+
+    def __init__(self, broadcaster, size=CHANGE_FEED_BUFFER):
+        self._broadcaster = broadcaster
+        self._buffer = deque(maxlen=max(1, size))
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def publish(self, change, resource=None, version=None):
+        """Numera e transmite a alteração {entity, op, id, data}"""
+        with self._lock:
+            self._seq += 1
+            event = dict(change, seq=self._seq)
+            if resource is not None:
+                event['resource'] = resource
+                event['version'] = version
+            event_id = f"{SERVER_BOOT_ID}-{self._seq}"
+            msg = (f"id: {event_id}\nevent: change\n"
+                   f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+            self._buffer.append((self._seq, msg))
+            # Sob o lock: os assinantes recebem os eventos na ordem do seq
+            self._broadcaster.broadcast('change', event, event_id=event_id)
+
+    def last_event_id(self):
+        with self._lock:
+            return f"{SERVER_BOOT_ID}-{self._seq}"
+
+    def since(self, last_event_id):
+        """Eventos posteriores a `last_event_id`; None se não for possível retomar"""
+        boot, _, seq = (last_event_id or '').rpartition('-')
+        if boot != SERVER_BOOT_ID or not seq.isdigit():
+            return None
+        seq = int(seq)
+        with self._lock:
+            if seq > self._seq:
+                return None
+            if seq < self._seq and (not self._buffer or self._buffer[0][0] > seq + 1):
+                # Parte do intervalo já saiu do buffer
+                return None
+            return [msg for s, msg in self._buffer if s > seq]
+
+
+CHANGE_FEED = ChangeFeed(SSE_BROADCASTER)
+
+
+def publish_change(entity, op, key, data=None, resource=None):
+    """
+    Publica a alteração de uma linha no feed. Com `resource` também avança o
+    contador de mudanças correspondente; o evento leva a versão resultante para
+    que o cliente atualize a lista sem buscá-la de novo.
+    """
+    change = {'entity': entity, 'op': op, 'id': key, 'data': data}
+    if resource is not None and JOB_MANAGER is not None:
+        JOB_MANAGER.notify_change(resource, change)
+    else:
+        CHANGE_FEED.publish(change)
+
+
+def sse_init_event(last_event_id=None):
+    """
+    Evento 'init' enviado a cada novo assinante de /api/events. Com
+    `last_event_id` (reconexão) os eventos 'change' perdidos vão antes do init,
+    para que os contadores do init já os incluam.
+    """
+    missed = CHANGE_FEED.since(last_event_id) if last_event_id else None
+    init_data = {
+        'jobs': {
+            'active': JOB_MANAGER.get_active_jobs() if JOB_MANAGER else [],
+            'recent': JOB_MANAGER.get_recent_jobs(5) if JOB_MANAGER else []
+        },
+        'changes': JOB_MANAGER.get_changes() if JOB_MANAGER else {},
+        'feed': {'lastEventId': CHANGE_FEED.last_event_id(), 'resumed': missed is not None}
+    }
+    init = f"event: init\ndata: {json.dumps(init_data, ensure_ascii=False)}\n\n"
+    return (''.join(missed or ()) + init).encode('utf-8')
+
 
 PORT = 5000
 DIRECTORY = "."
 
+# Timeouts de socket: durante uma requisição e entre requisições (keep-alive)
+SERVER_SOCKET_TIMEOUT = float(os.getenv('SERVER_SOCKET_TIMEOUT', 30))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', 5))
+
 STORAGE_DIR = "dados/navegador"
 CLIENTS_DIR = os.path.join(STORAGE_DIR, "clientes")
 REGISTROS_DIR = os.path.join(STORAGE_DIR, "registros")
@@ -84,9 +203,24 @@ IMAGES_DIR = "dados/imagens"
 
 DB_MANAGER = None
 DB_AVAILABLE = False
+paginate_registros = None
+parse_registros_query = None
+normalize_cpf = None
+CLIENT_SEARCH_LIMIT_DEFAULT = 20
+SOLICITACAO_PENDENTE = 'pendente'
+SOLICITACAO_EM_ATENDIMENTO = 'em_atendimento'
+SOLICITACAO_APROVADA = 'aprovada'
+SOLICITACAO_REJEITADA = 'rejeitada'
+SOLICITACOES_ABERTAS = (SOLICITACAO_PENDENTE, SOLICITACAO_EM_ATENDIMENTO)
+SOLICITACAO_CLAIM_TIMEOUT = 300
 
 try:
-    from db_manager import get_db_manager
+    from db_manager import (
+        get_db_manager, paginate_registros, parse_registros_query, normalize_cpf,
+        client_search_terms, client_matches_search, CLIENT_SEARCH_LIMIT_DEFAULT, CLIENT_SEARCH_LIMIT_MAX,
+        SOLICITACAO_PENDENTE, SOLICITACAO_EM_ATENDIMENTO, SOLICITACAO_APROVADA, SOLICITACAO_REJEITADA,
+        SOLICITACOES_ABERTAS, SOLICITACAO_CLAIM_TIMEOUT
+    )
     DB_MANAGER = get_db_manager()
     DB_AVAILABLE = True
     logger.info("✅ DatabaseManager SQLite carregado com sucesso")
@@ -118,6 +252,15 @@ except ImportError as e:
 except Exception as e:
     logger.warning(f"Erro ao inicializar Gerenciador de Autenticação: {e}")
 
+from metrics import get_metrics_registry, stats_family, METRICS_ENABLED, PROMETHEUS_CONTENT_TYPE
+from json_store import get_json_store, get_json_writer, read_json, write_json_atomic
+
+METRICS = get_metrics_registry()
+if METRICS_ENABLED:
+    # Latência por método do DatabaseManager e do login (bcrypt)
+    METRICS.instrument(DB_MANAGER, 'database', exclude=('close', 'get_pool_stats', 'get_cache_stats'))
+    METRICS.instrument(AUTH_MANAGER, 'auth')
+
 def _patch_job_manager_for_sse(jm):
     """Intercepta métodos do JOB_MANAGER para emitir eventos SSE em tempo real."""
     _orig_notify = jm.notify_change
@@ -126,9 +269,15 @@ def _patch_job_manager_for_sse(jm):
     _orig_complete = jm.complete_job
     _orig_fail = jm.fail_job
 
-    def notify_change(change_type):
-        _orig_notify(change_type)
+    def notify_change(change_type, change=None):
+        version = _orig_notify(change_type)
+        if change is not None:
+            # O evento de linha sai antes dos contadores, já com a versão nova
+            # (a do próprio incremento, não a de uma escrita concorrente)
+            CHANGE_FEED.publish(change, resource=change_type, version=version)
         SSE_BROADCASTER.broadcast_changes()
+        SNAPSHOT_CACHE.schedule_refresh(change_type)
+        return version
 
     def start_job(job_id, message='Processando...'):
         _orig_start(job_id, message)
@@ -164,6 +313,50 @@ def use_sqlite_storage() -> bool:
     current_mode = DB_MANAGER.get_storage_mode()
     return current_mode == 'sqlite'
 
+# ETags das leituras derivadas dos contadores do JOB_MANAGER mais a versão dos
+# dados (resource_data_version), que muda também quando outro processo grava.
+# O BOOT_ID evita que um ETag antigo coincida com o contador reiniciado.
+SERVER_BOOT_ID = uuid.uuid4().hex[:12]
+ETAG_RESOURCES = {
+    '/api/clients': 'clients',
+    '/api/categorias': 'categorias',
+    '/api/system-config': 'config',
+    '/api/solicitacoes': 'solicitacoes',
+}
+
+
+def resource_data_version(change_type):
+    """
+    Versão dos dados de um recurso vista por todos os processos que gravam
+    (app.py, storage_api, ferramentas): versões das linhas no SQLite, índice
+    de mtimes no modo JSON, stat do config.json. 0 para recursos que só este
+    processo grava; None se não há como saber (sem ETag nem snapshot).
+    """
+    if change_type == 'clients':
+        if use_sqlite_storage():
+            return DB_MANAGER.get_clientes_version()
+        return JSON_STORE.clientes.version()
+    if change_type == 'categorias':
+        return DB_MANAGER.get_categorias_version() if use_sqlite_storage() else 0
+    if change_type == 'config':
+        try:
+            st = os.stat(CONFIG_FILE)
+        except FileNotFoundError:
+            return 0
+        return f"{st.st_mtime_ns:x}.{st.st_ino:x}.{st.st_size:x}"
+    return 0
+
+
+def etag_matches(if_none_match, etag):
+    """Compara um If-None-Match (lista ou '*') com o ETag atual"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return etag in candidates or f'W/{etag}' in candidates
+
+
 def ensure_directories():
     """Cria as pastas necessárias se não existirem"""
     try:
@@ -178,6 +371,59 @@ ensure_directories()
 
 CONFIG_FILE = os.path.join(STORAGE_DIR, "config.json")
 
+# Clientes e registros do modo JSON (motor escolhido por JSON_STORAGE_ENGINE)
+JSON_STORE = get_json_store(STORAGE_DIR)
+JSON_WRITER = get_json_writer()
+
+# Solicitações do app móvel: tabela `solicitacoes` do SQLite; solicitacoes.json
+# só quando o banco não está disponível (leitura-alteração-gravação sob o lock)
+SOLICITACOES_FILE_LOCK = threading.Lock()
+
+def solicitacoes_in_db() -> bool:
+    return DB_AVAILABLE and DB_MANAGER is not None
+
+def import_solicitacoes_file():
+    """Leva as solicitações de solicitacoes.json para o banco (uma vez) e renomeia o arquivo"""
+    if not solicitacoes_in_db() or not os.path.exists(SOLICITACOES_FILE):
+        return
+    try:
+        count = DB_MANAGER.import_solicitacoes(read_json(SOLICITACOES_FILE, []))
+        os.replace(SOLICITACOES_FILE, SOLICITACOES_FILE + '.importado')
+        logger.info(f"{count} solicitações importadas de {SOLICITACOES_FILE}")
+    except Exception as e:
+        logger.error(f"Erro ao importar solicitações: {e}", exc_info=True)
+
+import_solicitacoes_file()
+
+def publish_solicitacao(op, solicitacao):
+    """Avisa os painéis (SSE) sobre uma solicitação nova, reservada ou concluída"""
+    publish_change('solicitacao', op, solicitacao['id'], solicitacao, resource='solicitacoes')
+
+def iter_clients_files():
+    """Gera os clientes do armazenamento JSON um a um"""
+    return JSON_STORE.clientes.iter_all()
+
+def load_client_file(cpf: str):
+    """Cliente do armazenamento JSON pelo CPF em qualquer formatação (None se não existir)"""
+    key = normalize_cpf(cpf)
+    if not key:
+        return None
+    return JSON_STORE.clientes.get(key)
+
+def search_clients_files(query: str, limit: int):
+    """Busca de clientes nos arquivos JSON (mesma regra de prefixos do índice FTS5)"""
+    terms = client_search_terms(query)
+    if not terms:
+        return []
+    limit = max(1, min(limit, CLIENT_SEARCH_LIMIT_MAX))
+    results = []
+    for client in iter_clients_files():
+        if client_matches_search(client, terms):
+            results.append(client)
+            if len(results) >= limit:
+                break
+    return results
+
 def load_config():
     """Carrega as configurações do sistema"""
     default_config = {
@@ -198,8 +444,7 @@ def save_system_config(new_config):
     try:
         current_config = load_config()
         current_config.update(new_config)
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(current_config, f, indent=2)
+        write_json_atomic(CONFIG_FILE, current_config)
         return True
     except Exception as e:
         logger.error(f"Erro ao salvar config: {e}")
@@ -239,6 +484,406 @@ def _get_gzip_cached(path):
     return compressed
 
 
+# Compressão das respostas /api/*: níveis baixos priorizam latência sobre taxa
+API_COMPRESSION_MIN_SIZE = int(os.getenv('API_COMPRESSION_MIN_SIZE', 1024))
+API_GZIP_LEVEL = int(os.getenv('API_GZIP_LEVEL', 5))
+API_BROTLI_QUALITY = int(os.getenv('API_BROTLI_QUALITY', 4))
+API_ZSTD_LEVEL = int(os.getenv('API_ZSTD_LEVEL', 3))
+COMPRESSIBLE_CONTENT_TYPES = ('application/json', 'text/')
+
+
+def parse_accept_encoding(header):
+    """Converte um Accept-Encoding em {codificação: q}"""
+    accepted = {}
+    for part in (header or '').split(','):
+        token, _, params = part.strip().partition(';')
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+    return accepted
+
+
+def negotiate_encoding(header):
+    """Escolhe a melhor codificação disponível aceita pelo cliente (ou None)"""
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get('*', 0.0)
+    candidates = []
+    if zstandard is not None:
+        candidates.append('zstd')
+    if brotli is not None:
+        candidates.append('br')
+    candidates.append('gzip')
+
+    best, best_q = None, 0.0
+    for encoding in candidates:
+        q = accepted.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress_body(data, encoding):
+    """Comprime o corpo com a codificação negociada"""
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=API_ZSTD_LEVEL).compress(data)
+    if encoding == 'br':
+        return brotli.compress(data, quality=API_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=API_GZIP_LEVEL)
+
+
+# Snapshots das listagens quentes (0 desativa o armazenamento)
+API_SNAPSHOT_MAX_BYTES = int(os.getenv('API_SNAPSHOT_MAX_BYTES', 64 * 1024 * 1024))
+API_SNAPSHOT_REFRESH_DELAY = float(os.getenv('API_SNAPSHOT_REFRESH_DELAY', 0.5))
+
+
+class JSONSnapshotCache:
+    """
+    Corpo JSON já serializado (e já comprimido em gzip) das listagens mais
+    consultadas, associado ao contador de mudanças e à versão dos dados do
+    recurso (resource_data_version), que também muda com gravações de
+    outros processos. Leitores simultâneos compartilham o mesmo snapshot em
+    vez de cada um serializar os mesmos dados; depois de um notify_change o
+    snapshot é refeito em segundo plano.
+    """
+
+    def __init__(self, max_bytes=API_SNAPSHOT_MAX_BYTES, refresh_delay=API_SNAPSHOT_REFRESH_DELAY):
+        self.max_bytes = max_bytes
+        self.refresh_delay = refresh_delay
+        self._lock = threading.Lock()
+        self._builders = {}
+        self._build_locks = {}
+        self._snapshots = {}
+        self._pending = set()
+        # Payloads acima de max_bytes voltam a ser transmitidos em streaming
+        self._oversized = set()
+        self._stats = {'hits': 0, 'builds': 0, 'background_builds': 0}
+
+    def register(self, path, change_type, builder):
+        """Registra como montar o payload de `path` (versão = contador e dados de `change_type`)"""
+        self._builders[path] = (change_type, builder)
+        self._build_locks[path] = threading.Lock()
+
+    def _version(self, change_type):
+        return JOB_MANAGER.get_changes().get(change_type, 0), resource_data_version(change_type)
+
+    def get(self, path):
+        """
+        Retorna (versão, corpo, corpo_gzip ou None) atualizado, montando-o
+        uma única vez mesmo com vários leitores simultâneos.
+        """
+        if (JOB_MANAGER is None or self.max_bytes <= 0
+                or path not in self._builders or path in self._oversized):
+            return None
+        change_type, builder = self._builders[path]
+
+        version = self._version(change_type)
+        if version[1] is None:
+            # Sem versão dos dados não há como saber se o snapshot ainda vale
+            return None
+        snapshot = self._snapshots.get(path)
+        if snapshot is not None and snapshot[0] == version:
+            with self._lock:
+                self._stats['hits'] += 1
+            return snapshot
+
+        with self._build_locks[path]:
+            # A versão é lida antes dos dados: uma escrita concorrente só
+            # pode tornar o snapshot mais novo que a versão, nunca o contrário
+            version = self._version(change_type)
+            snapshot = self._snapshots.get(path)
+            if snapshot is not None and snapshot[0] == version:
+                with self._lock:
+                    self._stats['hits'] += 1
+                return snapshot
+
+            try:
+                body = builder()
+            except Exception as e:
+                # Nada é guardado: a requisição segue pelo caminho sem snapshot
+                logger.error(f"Erro ao montar snapshot de {path}: {e}", exc_info=True)
+                return None
+            gzip_body = None
+            if len(body) >= API_COMPRESSION_MIN_SIZE:
+                gzip_body = gzip.compress(body, compresslevel=API_GZIP_LEVEL)
+            snapshot = (version, body, gzip_body)
+            with self._lock:
+                self._stats['builds'] += 1
+                if len(body) <= self.max_bytes:
+                    self._snapshots[path] = snapshot
+                else:
+                    self._snapshots.pop(path, None)
+                    self._oversized.add(path)
+            return snapshot
+
+    def schedule_refresh(self, change_type):
+        """Refaz em segundo plano os snapshots afetados (rajadas viram uma única montagem)"""
+        if self.max_bytes <= 0:
+            return
+        for path, (path_change_type, _) in self._builders.items():
+            if path_change_type != change_type:
+                continue
+            with self._lock:
+                self._oversized.discard(path)
+                if path in self._pending:
+                    continue
+                self._pending.add(path)
+            timer = threading.Timer(self.refresh_delay, self._background_refresh, args=(path,))
+            timer.daemon = True
+            timer.start()
+
+    def _background_refresh(self, path):
+        with self._lock:
+            self._pending.discard(path)
+            self._stats['background_builds'] += 1
+        try:
+            self.get(path)
+        except Exception as e:
+            logger.error(f"Erro ao refazer snapshot de {path}: {e}", exc_info=True)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['bytes'] = sum(len(s[1]) + len(s[2] or b'') for s in self._snapshots.values())
+        return stats
+
+
+# Os builders propagam erros do banco: get_all_clientes() devolveria [] e o
+# vazio ficaria guardado como snapshot válido da versão atual
+def _build_clients_snapshot():
+    if use_sqlite_storage():
+        clients = list(DB_MANAGER.iter_all_clientes())
+    else:
+        clients = list(iter_clients_files())
+    return json.dumps(clients, ensure_ascii=False).encode('utf-8')
+
+
+def _build_categorias_snapshot():
+    categorias = DB_MANAGER.get_all_categorias(raise_errors=True) if use_sqlite_storage() else {}
+    return json.dumps(categorias, ensure_ascii=False).encode('utf-8')
+
+
+SNAPSHOT_CACHE = JSONSnapshotCache()
+SNAPSHOT_CACHE.register('/api/clients', 'clients', _build_clients_snapshot)
+SNAPSHOT_CACHE.register('/api/categorias', 'categorias', _build_categorias_snapshot)
+
+
+class APIRoute:
+    """Rota registrada: método, padrão (ex.: /api/client/<param>) e handler"""
+
+    __slots__ = ('method', 'pattern', 'handler', 'buffered')
+
+    def __init__(self, method, pattern, handler, buffered=True):
+        self.method = method
+        self.pattern = pattern
+        self.handler = handler
+        # False para respostas longas (SSE) que não passam pelo buffer
+        self.buffered = buffered
+
+
+class _RouteNode:
+    __slots__ = ('children', 'param_name', 'param_child', 'routes')
+
+    def __init__(self):
+        self.children = {}
+        self.param_name = None
+        self.param_child = None
+        self.routes = {}
+
+
+class APIRouter:
+    """
+    Tabela de rotas da API. Caminhos fixos ficam em um dicionário
+    (caminho -> {método: rota}); rotas com parâmetros ficam em uma trie de
+    segmentos, onde `<nome>` casa exatamente um segmento e é passado ao
+    handler como argumento nomeado. Hooks de tempo recebem
+    (método, padrão, status, segundos, bytes do corpo) após cada requisição.
+    """
+
+    def __init__(self):
+        self._exact = {}
+        self._root = _RouteNode()
+        self._timing_hooks = []
+
+    def add(self, method, pattern, handler, buffered=True):
+        route = APIRoute(method, pattern, handler, buffered)
+        if '<' not in pattern:
+            routes = self._exact.setdefault(pattern, {})
+        else:
+            node = self._root
+            for segment in pattern.strip('/').split('/'):
+                if segment.startswith('<') and segment.endswith('>'):
+                    name = segment[1:-1]
+                    if node.param_child is None:
+                        node.param_name = name
+                        node.param_child = _RouteNode()
+                    elif node.param_name != name:
+                        raise ValueError(f"Parâmetro conflitante em {pattern}: <{node.param_name}>")
+                    node = node.param_child
+                else:
+                    node = node.children.setdefault(segment, _RouteNode())
+            routes = node.routes
+        if method in routes:
+            raise ValueError(f"Rota duplicada: {method} {pattern}")
+        routes[method] = route
+        return route
+
+    def route(self, method, pattern, buffered=True):
+        """Decorador para registrar um método do handler HTTP"""
+        def decorator(func):
+            self.add(method, pattern, func, buffered)
+            return func
+        return decorator
+
+    def _match_params(self, path):
+        node = self._root
+        params = {}
+        for segment in path.strip('/').split('/'):
+            child = node.children.get(segment)
+            if child is not None:
+                node = child
+            elif node.param_child is not None and segment:
+                params[node.param_name] = segment
+                node = node.param_child
+            else:
+                return None, None
+        return node.routes, params
+
+    def resolve(self, method, path):
+        """
+        Retorna (rota, parâmetros, métodos permitidos). Sem rota para o
+        método, a lista de métodos permitidos distingue 405 de 404.
+        """
+        exact = self._exact.get(path)
+        if exact and method in exact:
+            return exact[method], {}, None
+        routes, params = self._match_params(path)
+        if routes and method in routes:
+            return routes[method], params, None
+        allowed = set(exact or ()) | set(routes or ())
+        return None, None, sorted(allowed)
+
+    def add_timing_hook(self, hook):
+        self._timing_hooks.append(hook)
+
+    def record_timing(self, method, pattern, status, elapsed, size=0):
+        for hook in self._timing_hooks:
+            try:
+                hook(method, pattern, status, elapsed, size)
+            except Exception as e:
+                logger.error(f"Erro no hook de tempo da rota {method} {pattern}: {e}", exc_info=True)
+
+    def get_routes(self):
+        """Lista (método, padrão) de todas as rotas registradas"""
+        routes = [(m, p) for p, by_method in self._exact.items() for m in by_method]
+
+        def walk(node):
+            for method, route in node.routes.items():
+                routes.append((method, route.pattern))
+            for child in node.children.values():
+                walk(child)
+            if node.param_child is not None:
+                walk(node.param_child)
+
+        walk(self._root)
+        return sorted(routes, key=lambda r: (r[1], r[0]))
+
+
+API_ROUTER = APIRouter()
+if METRICS_ENABLED:
+    API_ROUTER.add_timing_hook(METRICS.observe_request)
+
+
+def _collect_runtime_metrics():
+    """Valores instantâneos exportados em /api/metrics"""
+    yield ('sse_subscribers', 'gauge', 'Assinantes SSE conectados', [((), SSE_BROADCASTER.subscriber_count())])
+
+    caches = {}
+    if DB_AVAILABLE and DB_MANAGER is not None:
+        caches['clientes'] = DB_MANAGER.get_cache_stats()
+        yield stats_family('db_pool', DB_MANAGER.get_pool_stats(), 'Pool de conexões SQLite')
+    snapshots = SNAPSHOT_CACHE.get_stats()
+    # Cada montagem de snapshot corresponde a uma consulta que não encontrou o corpo pronto
+    caches['snapshots'] = {'hits': snapshots['hits'], 'misses': snapshots['builds']}
+    for name in ('clientes', 'registros'):
+        stats = getattr(JSON_STORE, name).get_stats()
+        if 'hits' in stats:
+            caches[f'json_{name}'] = stats
+
+    hits, misses, ratios = [], [], []
+    for name, stats in caches.items():
+        labels = (('cache', name),)
+        lookups = stats['hits'] + stats['misses']
+        hits.append((labels, stats['hits']))
+        misses.append((labels, stats['misses']))
+        ratios.append((labels, round(stats['hits'] / lookups, 4) if lookups else 0.0))
+    yield ('cache_hits_total', 'counter', 'Consultas atendidas pelo cache', hits)
+    yield ('cache_misses_total', 'counter', 'Consultas que não estavam no cache', misses)
+    yield ('cache_hit_ratio', 'gauge', 'Proporção de acertos do cache', ratios)
+
+
+METRICS.add_collector(_collect_runtime_metrics)
+
+
+class StreamingResponseWriter:
+    """
+    Escreve o corpo de uma resposta em partes, com gzip incremental e
+    Transfer-Encoding: chunked opcionais. Mantém no máximo `buffer_size`
+    bytes em memória, independentemente do tamanho total da resposta.
+    """
+
+    def __init__(self, wfile, chunked=False, compress=False, buffer_size=64 * 1024):
+        self.wfile = wfile
+        self.chunked = chunked
+        self.buffer_size = buffer_size
+        self.bytes_sent = 0
+        self._buffer = []
+        self._buffered = 0
+        # wbits=31 gera o formato gzip (cabeçalho + trailer)
+        self._compressor = zlib.compressobj(API_GZIP_LEVEL, zlib.DEFLATED, 31) if compress else None
+
+    def write(self, data: bytes):
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        data = b''.join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+        self._send(data)
+
+    def _send(self, data: bytes):
+        if not data:
+            return
+        if self.chunked:
+            self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        else:
+            self.wfile.write(data)
+        self.bytes_sent += len(data)
+
+    def close(self):
+        self.flush()
+        if self._compressor is not None:
+            self._send(self._compressor.flush())
+            self._compressor = None
+        if self.chunked:
+            self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
 class CombinedHTTPHandler(http.server.SimpleHTTPRequestHandler):
     """
     Handler HTTP que serve arquivos estáticos e também endpoints de API
@@ -247,9 +892,54 @@ class CombinedHTTPHandler(http.server.SimpleHTTPRequestHandler):
     SILENT_PATHS = {'/api/jobs', '/api/changes', '/api/events'}
     COMPRESSIBLE_EXTS = {'.js', '.css', '.html', '.json', '.svg', '.txt', '.xml'}
 
+    # Conexões persistentes: toda resposta leva Content-Length, usa chunked
+    # ou fecha a conexão ao final
+    protocol_version = 'HTTP/1.1'
+    timeout = SERVER_SOCKET_TIMEOUT
+    # Headers e corpo saem em escritas separadas: com Nagle ligado, a
+    # segunda espera o ACK atrasado do cliente (~40 ms) na conexão persistente
+    disable_nagle_algorithm = True
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=DIRECTORY, **kwargs)
 
+    def handle(self):
+        """Atende requisições na mesma conexão até o cliente fechar ou ficar ocioso"""
+        self.close_connection = True
+        self.handle_one_request()
+        park = getattr(self.server, 'park_keepalive', None)
+        while not self.close_connection:
+            if self.connection is None:
+                break
+            if park is not None and not self._has_buffered_request():
+                # Modo pool: a espera pela próxima requisição não ocupa o worker
+                park(self.connection, self.client_address)
+                return
+            self.connection.settimeout(HTTP_KEEPALIVE_TIMEOUT)
+            self.handle_one_request()
+
+    def _has_buffered_request(self):
+        """True se a próxima requisição (pipelining) já chegou ou está no buffer"""
+        self.connection.settimeout(0)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+
+    def parse_request(self):
+        # A linha de requisição já chegou: volta ao timeout normal
+        if self.connection is not None:
+            self.connection.settimeout(self.timeout)
+        return super().parse_request()
+
+    def log_error(self, format, *args):
+        # Conexões keep-alive ociosas expiram normalmente; não é erro
+        if format.startswith('Request timed out'):
+            return
+        super().log_error(format, *args)
+
     def send_head(self):
         """Serve arquivos estáticos com compressão gzip quando o cliente suporta."""
         accept_enc = self.headers.get('Accept-Encoding', '')
@@ -279,32 +969,285 @@ class CombinedHTTPHandler(http.server.SimpleHTTPRequestHandler):
             return super().send_head()
 
     def _load_solicitacoes(self):
-        if os.path.exists(SOLICITACOES_FILE):
-            try:
-                with open(SOLICITACOES_FILE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                logger.error(f"Erro ao carregar solicitações: {e}")
-                return []
-        return []
+        # Inclui uma gravação ainda pendente no JSON_WRITER
+        try:
+            return JSON_WRITER.read(SOLICITACOES_FILE, [])
+        except Exception as e:
+            logger.error(f"Erro ao carregar solicitações: {e}")
+            return []
 
     def _save_solicitacoes(self, solicitacoes):
+        # Rajadas de solicitações viram uma gravação atômica por intervalo
         try:
-            with open(SOLICITACOES_FILE, 'w', encoding='utf-8') as f:
-                json.dump(solicitacoes, f, indent=2)
+            JSON_WRITER.write(SOLICITACOES_FILE, solicitacoes)
             return True
         except Exception as e:
             logger.error(f"Erro ao salvar solicitações: {e}")
             return False
 
-    def _set_api_headers(self, status=200, content_type='application/json'):
+    def _claim_solicitacoes_file(self, operador, limit):
+        """claim_solicitacoes sobre solicitacoes.json (sem banco)"""
+        now = datetime.now()
+        expiradas = (now - timedelta(seconds=SOLICITACAO_CLAIM_TIMEOUT)).isoformat()
+        claimed = []
+        with SOLICITACOES_FILE_LOCK:
+            solicitacoes = self._load_solicitacoes()
+            for s in solicitacoes:
+                status = s.get('status', SOLICITACAO_PENDENTE)
+                if status == SOLICITACAO_PENDENTE or (
+                        status == SOLICITACAO_EM_ATENDIMENTO and s.get('atualizadaEm', '') < expiradas):
+                    s.update(status=SOLICITACAO_EM_ATENDIMENTO, operador=operador, atualizadaEm=now.isoformat())
+                    claimed.append(dict(s))
+                    if len(claimed) >= limit:
+                        break
+            if claimed:
+                self._save_solicitacoes(solicitacoes)
+        return claimed
+
+    def _complete_solicitacao(self, post_data, solicitacao_id=None):
+        """
+        Conclui (aprova/rejeita) uma solicitação em aberto. Repetir o pedido
+        para uma já concluída é idempotente: 200 com o estado atual. 404 só
+        se ela não existe no banco.
+        """
+        try:
+            data = json.loads(post_data.decode('utf-8') or '{}')
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            self._set_api_headers(400)
+            self.wfile.write(json.dumps({"error": "Dados JSON inválidos"}).encode())
+            return
+        solicitacao_id = solicitacao_id or data.get('id')
+        action = data.get('action') or data.get('status')
+        status = SOLICITACAO_REJEITADA if action in ('reject', 'rejeitar', SOLICITACAO_REJEITADA) else SOLICITACAO_APROVADA
+        operador = data.get('operador')
+
+        if solicitacoes_in_db():
+            done = DB_MANAGER.complete_solicitacao(solicitacao_id, status, operador)
+        else:
+            done = None
+            with SOLICITACOES_FILE_LOCK:
+                solicitacoes = self._load_solicitacoes()
+                for s in solicitacoes:
+                    if s['id'] == solicitacao_id:
+                        done = dict(s, status=status, operador=operador or s.get('operador'),
+                                    concluidaEm=datetime.now().isoformat())
+                        break
+                if done is not None:
+                    # O arquivo guarda só as solicitações em aberto
+                    self._save_solicitacoes([s for s in solicitacoes if s['id'] != solicitacao_id])
+
+        if done is None:
+            current = DB_MANAGER.get_solicitacao(solicitacao_id) if solicitacoes_in_db() else None
+            if solicitacoes_in_db() and current is None:
+                self._set_api_headers(404)
+                self.wfile.write(json.dumps({"error": "Solicitação não encontrada"}).encode())
+            elif current is not None and current['status'] in SOLICITACOES_ABERTAS:
+                # Continua em aberto: o UPDATE falhou (erro já registrado)
+                self._set_api_headers(500)
+                self.wfile.write(json.dumps({"error": "Erro ao concluir solicitação"}).encode())
+            else:
+                # Repetição (ex.: resposta perdida). Sem banco o arquivo só guarda
+                # as abertas, então, como antes, concluir uma ausente não é erro
+                self._set_api_headers()
+                self.wfile.write(json.dumps({
+                    "success": True, "solicitacao": current, "alreadyCompleted": True
+                }).encode())
+            return
+        publish_solicitacao('concluida', done)
+        self._set_api_headers()
+        self.wfile.write(json.dumps({"success": True, "solicitacao": done}).encode())
+
+    _api_body = None
+    _api_response = None
+    _response_etag = None
+    _response_bytes = 0
+    _response_stream = None
+
+    def _set_api_headers(self, status=200, content_type='application/json', extra_headers=None):
+        if self._api_body is not None and self.wfile is self._api_body:
+            # Resposta bufferizada: headers saem em _finish_api_response
+            self._api_response = (status, content_type, extra_headers)
+            return
+        self._write_api_headers(status, content_type, extra_headers)
+
+    def _write_api_headers(self, status=200, content_type='application/json', extra_headers=None):
+        headers = dict(extra_headers or {})
+        cache_control = 'no-cache, no-store, must-revalidate'
+        if self._response_etag and status in (200, 304):
+            # Permite ao navegador guardar a resposta e revalidar via If-None-Match
+            headers.setdefault('ETag', self._response_etag)
+            cache_control = 'no-cache'
         self.send_response(status)
         self.send_header('Content-type', content_type)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, If-None-Match')
+        self.send_header('Access-Control-Expose-Headers', 'ETag')
+        self.send_header('Cache-Control', cache_control)
+        for name, value in headers.items():
+            self.send_header(name, value)
         self.end_headers()
+
+    def _resource_etag(self, path):
+        """ETag forte do recurso: contador de mudanças + versão dos dados (ou None)"""
+        change_type = ETAG_RESOURCES.get(path)
+        if change_type is None or JOB_MANAGER is None:
+            return None
+        version = resource_data_version(change_type)
+        if version is None:
+            return None
+        counter = JOB_MANAGER.get_changes().get(change_type, 0)
+        return f'"{SERVER_BOOT_ID}-{change_type}-{counter}-{version}"'
+
+    def _check_not_modified(self, path):
+        """
+        Define o ETag da resposta e, se o cliente já tem essa versão,
+        responde 304 sem consultar o armazenamento. O ETag é lido antes dos
+        dados, então uma escrita concorrente só pode causar um 200 extra.
+        """
+        self._response_etag = self._resource_etag(path)
+        if self._response_etag and etag_matches(self.headers.get('If-None-Match'), self._response_etag):
+            self._set_api_headers(304)
+            return True
+        return False
+
+    def _accepts_gzip(self):
+        accepted = parse_accept_encoding(self.headers.get('Accept-Encoding', ''))
+        return accepted.get('gzip', accepted.get('*', 0.0)) > 0
+
+    def _run_api_handler(self, handler, *args):
+        """
+        Executa um handler de API com o corpo bufferizado, para poder
+        comprimir e informar Content-Length antes de enviar os headers.
+        """
+        raw_wfile = self.wfile
+        self._raw_wfile = raw_wfile
+        self._api_body = io.BytesIO()
+        self._api_response = None
+        self.wfile = self._api_body
+        try:
+            handler(*args)
+        finally:
+            self.wfile = raw_wfile
+            self._finish_api_response()
+            self._response_etag = None
+
+    def _finish_api_response(self):
+        body_buffer, pending = self._api_body, self._api_response
+        self._api_body = None
+        self._api_response = None
+        if body_buffer is None:
+            return
+        body = body_buffer.getvalue()
+
+        if pending is None:
+            # Handler escreveu headers próprios (send_response/send_error)
+            self._response_bytes = len(body)
+            if body:
+                head = body.split(b'\r\n\r\n', 1)[0].lower()
+                if b'\r\ncontent-length:' not in head and b'transfer-encoding: chunked' not in head:
+                    self.close_connection = True
+                self.wfile.write(body)
+            return
+
+        status, content_type, extra_headers = pending
+        headers = dict(extra_headers or {})
+        if status == 304:
+            self._write_api_headers(status, content_type, headers)
+            return
+        if (len(body) >= API_COMPRESSION_MIN_SIZE
+                and content_type.startswith(COMPRESSIBLE_CONTENT_TYPES)
+                and 'Content-Encoding' not in headers):
+            encoding = negotiate_encoding(self.headers.get('Accept-Encoding', ''))
+            if encoding:
+                body = compress_body(body, encoding)
+                headers['Content-Encoding'] = encoding
+                headers['Vary'] = 'Accept-Encoding'
+        headers['Content-Length'] = str(len(body))
+        self._write_api_headers(status, content_type, headers)
+        self.wfile.write(body)
+        self._response_bytes = len(body)
+
+    def _send_snapshot(self, path):
+        """Envia o snapshot pré-serializado de `path`; False se não houver"""
+        snapshot = SNAPSHOT_CACHE.get(path)
+        if snapshot is None:
+            return False
+        _, body, gzip_body = snapshot
+        if gzip_body is not None and self._accepts_gzip():
+            self._set_api_headers(extra_headers={'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'})
+            self.wfile.write(gzip_body)
+        else:
+            self._set_api_headers()
+            self.wfile.write(body)
+        return True
+
+    def _open_stream(self, content_type='application/json', extra_headers=None):
+        """
+        Envia os headers de uma resposta de tamanho desconhecido e retorna um
+        StreamingResponseWriter. Usa chunked no HTTP/1.1; no HTTP/1.0 o fim
+        do corpo é indicado pelo fechamento da conexão.
+        """
+        if self._api_body is not None:
+            # Streaming não passa pelo buffer da resposta
+            self.wfile = self._raw_wfile
+            self._api_body = None
+            self._api_response = None
+        chunked = self.request_version == 'HTTP/1.1' and self.protocol_version == 'HTTP/1.1'
+        compress = self._accepts_gzip()
+        headers = dict(extra_headers or {})
+        if chunked:
+            headers['Transfer-Encoding'] = 'chunked'
+        else:
+            self.close_connection = True
+        if compress:
+            headers['Content-Encoding'] = 'gzip'
+            headers['Vary'] = 'Accept-Encoding'
+        self._write_api_headers(content_type=content_type, extra_headers=headers)
+        self._response_stream = StreamingResponseWriter(self.wfile, chunked=chunked, compress=compress)
+        return self._response_stream
+
+    def _stream_json_array(self, items):
+        """Serializa um iterável como array JSON, item a item, direto no socket"""
+        writer = self._open_stream()
+        iterator = iter(items)
+        try:
+            writer.write(b'[')
+            first = True
+            for item in iterator:
+                if not first:
+                    writer.write(b',')
+                writer.write(json.dumps(item, ensure_ascii=False).encode('utf-8'))
+                first = False
+            writer.write(b']')
+            writer.close()
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+        except Exception as e:
+            # Headers já enviados: só resta abortar a conexão
+            logger.error(f"Erro ao transmitir resposta: {e}", exc_info=True)
+            self.close_connection = True
+        finally:
+            # Libera a conexão SQLite se a iteração foi interrompida
+            if hasattr(iterator, 'close'):
+                iterator.close()
+
+    def _stream_file(self, filepath, content_type='application/octet-stream', extra_headers=None):
+        """Transmite um arquivo em blocos (com gzip incremental quando aceito)"""
+        writer = self._open_stream(content_type=content_type, extra_headers=extra_headers)
+        try:
+            with open(filepath, 'rb') as f:
+                while True:
+                    block = f.read(64 * 1024)
+                    if not block:
+                        break
+                    writer.write(block)
+            writer.close()
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+        except Exception as e:
+            logger.error(f"Erro ao transmitir arquivo {filepath}: {e}", exc_info=True)
+            self.close_connection = True
     
     def end_headers(self):
         """Adiciona headers de segurança e controle de cache adequados por tipo de recurso"""
@@ -342,1250 +1285,1264 @@ class CombinedHTTPHandler(http.server.SimpleHTTPRequestHandler):
     
     def do_OPTIONS(self):
         """Trata requisições preflight CORS"""
-        self._set_api_headers()
+        self._run_api_handler(self._set_api_headers)
     
     def do_GET(self):
         parsed_path = urlparse(self.path)
         
         if parsed_path.path.startswith('/api/'):
-            self._handle_api_get(parsed_path)
+            self._dispatch_api('GET', parsed_path)
         else:
             super().do_GET()
     
     def do_POST(self):
         if self.path.startswith('/api/'):
-            self._handle_api_post()
+            self._dispatch_api('POST', urlparse(self.path))
         else:
+            # Corpo não lido: não dá para reaproveitar a conexão
+            self.close_connection = True
             self.send_error(404, "Not Found")
     
     def do_DELETE(self):
+        if int(self.headers.get('Content-Length', 0) or 0):
+            self.close_connection = True
         if self.path.startswith('/api/'):
-            self._handle_api_delete()
+            self._dispatch_api('DELETE', urlparse(self.path))
         else:
             self.send_error(404, "Not Found")
     
-    def _handle_api_get(self, parsed_path):
-        path = parsed_path.path
+    _response_status = None
+
+    def send_response(self, code, message=None):
+        # Guarda o status para os hooks de tempo das rotas
+        self._response_status = code
+        super().send_response(code, message)
+
+    def _dispatch_api(self, method, parsed_path):
+        """Resolve a rota em API_ROUTER e executa o handler com resposta bufferizada"""
+        if method == 'POST':
+            content_length = int(self.headers.get('Content-Length', 0))
+            args = (self.rfile.read(content_length),)
+        elif method == 'GET':
+            args = (parsed_path,)
+        else:
+            args = ()
 
-        if path == '/api/events':
-            self.send_response(200)
-            self.send_header('Content-Type', 'text/event-stream')
-            self.send_header('Cache-Control', 'no-cache')
-            self.send_header('Connection', 'keep-alive')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('X-Accel-Buffering', 'no')
-            self.end_headers()
-            client_q = SSE_BROADCASTER.subscribe()
-            try:
-                init_data = {
-                    'jobs': {
-                        'active': JOB_MANAGER.get_active_jobs() if JOB_MANAGER else [],
-                        'recent': JOB_MANAGER.get_recent_jobs(5) if JOB_MANAGER else []
-                    },
-                    'changes': JOB_MANAGER.get_changes() if JOB_MANAGER else {}
-                }
-                self.wfile.write(
-                    f"event: init\ndata: {json.dumps(init_data, ensure_ascii=False)}\n\n".encode('utf-8')
-                )
-                self.wfile.flush()
-                while True:
-                    try:
-                        msg = client_q.get(timeout=25)
-                        self.wfile.write(msg.encode('utf-8'))
-                        self.wfile.flush()
-                    except queue.Empty:
-                        self.wfile.write(b": keepalive\n\n")
-                        self.wfile.flush()
-            except (BrokenPipeError, ConnectionResetError, OSError):
-                pass
-            finally:
-                SSE_BROADCASTER.unsubscribe(client_q)
+        route, params, allowed = API_ROUTER.resolve(method, parsed_path.path)
+        if route is None:
+            self._run_api_handler(self._send_route_not_found, allowed)
             return
-
-        if path == '/api/health':
-            self._set_api_headers()
-            health_status = {
-                "status": "ok",
-                "offline_mode": True,
-                "database_type": "sqlite" if DB_AVAILABLE else "filesystem",
-                "storage_available": True
-            }
-            self.wfile.write(json.dumps(health_status).encode())
+        if not route.buffered:
+            route.handler(self, *args, **params)
             return
 
-        if path == '/api/solicitacoes':
-            solicitacoes = self._load_solicitacoes()
-            self._set_api_headers()
-            self.wfile.write(json.dumps(solicitacoes).encode())
+        self._response_status = None
+        self._response_bytes = 0
+        self._response_stream = None
+        started = time.perf_counter()
+        try:
+            self._run_api_handler(self._call_route, route, parsed_path, args, params)
+        finally:
+            elapsed = time.perf_counter() - started
+            if self._response_stream is not None:
+                self._response_bytes = self._response_stream.bytes_sent
+                self._response_stream = None
+            API_ROUTER.record_timing(method, route.pattern, self._response_status or 500,
+                                     elapsed, self._response_bytes)
+
+    def _call_route(self, route, parsed_path, args, params):
+        if route.method == 'GET' and self._check_not_modified(parsed_path.path):
             return
-        
-        if path == '/api/clients':
-            if use_sqlite_storage():
-                clients = DB_MANAGER.get_all_clientes()
-                self._set_api_headers()
-                self.wfile.write(json.dumps(clients, ensure_ascii=False).encode('utf-8'))
-            else:
-                self._get_all_clients_files()
+        route.handler(self, *args, **params)
+
+    def _send_route_not_found(self, allowed):
+        if allowed:
+            self._set_api_headers(405, extra_headers={'Allow': ', '.join(allowed)})
+            self.wfile.write(json.dumps({"error": "Method not allowed"}).encode())
+        else:
+            self._set_api_headers(404)
+            self.wfile.write(json.dumps({"error": "Not found"}).encode())
+
+    # ========== ROTAS GET ==========
+    @API_ROUTER.route('GET', '/api/events', buffered=False)
+    def _api_get_events(self, parsed_path):
+        # Fluxo sem tamanho definido: termina com o fechamento da conexão
+        self.close_connection = True
+        hub = getattr(self.server, 'sse_hub', None)
+        if hub is not None and not hub.has_capacity():
+            self._set_api_headers(503, extra_headers={'Retry-After': '30'})
+            self.wfile.write(json.dumps({"error": "Limite de conexões SSE atingido"}).encode())
             return
-        
-        if path.startswith('/api/client/'):
-            param = path.split('/')[-1]
-            if use_sqlite_storage():
-                client = DB_MANAGER.get_cliente_by_id_or_cpf(param)
-                if client:
-                    self._set_api_headers()
-                    self.wfile.write(json.dumps(client, ensure_ascii=False).encode('utf-8'))
-                else:
-                    self._set_api_headers(404)
-                    self.wfile.write(json.dumps({"error": "Client not found"}).encode())
-            else:
-                self._get_client_file(cpf)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'keep-alive')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('X-Accel-Buffering', 'no')
+        self.end_headers()
+        # Reconexão: o EventSource envia Last-Event-ID; ?lastEventId= numa conexão nova
+        last_event_id = (self.headers.get('Last-Event-ID')
+                         or parse_qs(parsed_path.query).get('lastEventId', [None])[0])
+        if hub is not None and self.server.detach_to_sse_hub(
+                self.connection, lambda: sse_init_event(last_event_id)):
+            # O hub envia o init já como assinante e depois os eventos; o worker fica livre
             return
+        client_q = SSE_BROADCASTER.subscribe()
+        try:
+            self.wfile.write(sse_init_event(last_event_id))
+            self.wfile.flush()
+            while True:
+                try:
+                    msg = client_q.get(timeout=25)
+                    self.wfile.write(msg.encode('utf-8'))
+                    self.wfile.flush()
+                except queue.Empty:
+                    self.wfile.write(b": keepalive\n\n")
+                    self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            pass
+        finally:
+            SSE_BROADCASTER.unsubscribe(client_q)
+
+    @API_ROUTER.route('GET', '/api/health')
+    def _api_get_health(self, parsed_path):
+        self._set_api_headers()
+        health_status = {
+            "status": "ok",
+            "offline_mode": True,
+            "database_type": "sqlite" if DB_AVAILABLE else "filesystem",
+            "storage_available": True
+        }
+        if DB_AVAILABLE and DB_MANAGER is not None:
+            health_status["pool"] = DB_MANAGER.get_pool_stats()
+            health_status["client_cache"] = DB_MANAGER.get_cache_stats()
+        health_status["snapshots"] = SNAPSHOT_CACHE.get_stats()
+        health_status["json_store"] = JSON_STORE.get_stats()
+        health_status["json_writer"] = JSON_WRITER.get_stats()
+        health_status["sse_subscribers"] = SSE_BROADCASTER.subscriber_count()
+        if hasattr(self.server, 'get_stats'):
+            health_status["server"] = self.server.get_stats()
+        self.wfile.write(json.dumps(health_status).encode())
+
+    @API_ROUTER.route('GET', '/api/metrics')
+    def _api_get_metrics(self, parsed_path):
+        extra = []
+        if hasattr(self.server, 'get_stats'):
+            extra.append(stats_family('server', self.server.get_stats(), 'Estado do servidor HTTP'))
+        self._set_api_headers(content_type=PROMETHEUS_CONTENT_TYPE)
+        self.wfile.write(METRICS.render(extra).encode('utf-8'))
+
+    @API_ROUTER.route('GET', '/api/solicitacoes')
+    def _api_get_solicitacoes(self, parsed_path):
+        if solicitacoes_in_db():
+            solicitacoes = DB_MANAGER.get_solicitacoes()
+        else:
+            solicitacoes = [
+                s for s in self._load_solicitacoes()
+                if s.get('status', SOLICITACAO_PENDENTE) in SOLICITACOES_ABERTAS
+            ]
+        self._set_api_headers()
+        self.wfile.write(json.dumps(solicitacoes).encode())
 
-        # Servir imagens enviadas
-        if path.startswith('/imagens/'):
-            image_filename = path.split('/')[-1]
-            image_path = os.path.join(IMAGES_DIR, image_filename)
-            if os.path.exists(image_path):
-                self.send_response(200)
-                self.send_header('Content-Type', 'image/jpeg') # Assumindo JPEG por simplicidade
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.end_headers()
-                with open(image_path, 'rb') as f:
-                    self.wfile.write(f.read())
-            else:
-                self.send_error(404, "Image Not Found")
+    @API_ROUTER.route('GET', '/api/clients')
+    def _api_get_clients(self, parsed_path):
+        if self._send_snapshot('/api/clients'):
             return
-        
-        if path == '/api/registros':
-            if use_sqlite_storage():
-                registros = DB_MANAGER.get_all_registros()
-                self._set_api_headers()
-                self.wfile.write(json.dumps(registros, ensure_ascii=False).encode('utf-8'))
-            else:
-                self._get_all_registros_files()
-            return
-        
-        if path == '/api/audit':
-            if use_sqlite_storage():
-                logs = DB_MANAGER.get_audit_logs(100)
-                self._set_api_headers()
-                self.wfile.write(json.dumps(logs, ensure_ascii=False).encode('utf-8'))
-            else:
-                self._set_api_headers()
-                self.wfile.write(json.dumps([], ensure_ascii=False).encode('utf-8'))
+        if use_sqlite_storage():
+            self._stream_json_array(DB_MANAGER.iter_all_clientes())
+        else:
+            self._get_all_clients_files()
+
+    @API_ROUTER.route('GET', '/api/clients/search')
+    def _api_get_clients_search(self, parsed_path):
+        params = parse_qs(parsed_path.query)
+        query = params.get('q', [''])[0]
+        try:
+            limit = int(params.get('limit', [CLIENT_SEARCH_LIMIT_DEFAULT])[0])
+        except ValueError:
+            self._set_api_headers(400)
+            self.wfile.write(json.dumps({"error": "Parâmetro 'limit' deve ser inteiro"}).encode())
             return
-        
-        if path == '/api/sync/status':
-            if use_sqlite_storage():
-                pending = DB_MANAGER.get_pending_syncs()
+        if use_sqlite_storage():
+            results = DB_MANAGER.search_clientes(query, limit)
+        else:
+            results = search_clients_files(query, limit)
+        self._set_api_headers()
+        self.wfile.write(json.dumps(results, ensure_ascii=False).encode('utf-8'))
+
+    @API_ROUTER.route('GET', '/api/client/<param>')
+    def _api_get_client(self, parsed_path, param):
+        if use_sqlite_storage():
+            client = DB_MANAGER.get_cliente_by_id_or_cpf(param)
+            if client:
                 self._set_api_headers()
-                self.wfile.write(json.dumps({
-                    "pending_count": len(pending),
-                    "pending_operations": pending
-                }).encode())
+                self.wfile.write(json.dumps(client, ensure_ascii=False).encode('utf-8'))
             else:
-                self._set_api_headers()
-                self.wfile.write(json.dumps({
-                    "pending_count": 0,
-                    "pending_operations": []
-                }).encode())
-            return
-        
-        if path == '/api/categorias':
+                self._set_api_headers(404)
+                self.wfile.write(json.dumps({"error": "Client not found"}).encode())
+        else:
+            self._get_client_file(param)
+
+    @API_ROUTER.route('GET', '/api/registros')
+    def _api_get_registros(self, parsed_path):
+        try:
+            filters = parse_registros_query(parsed_path.query) if parse_registros_query else None
             if use_sqlite_storage():
-                categorias = DB_MANAGER.get_all_categorias()
-                self._set_api_headers()
-                self.wfile.write(json.dumps(categorias, ensure_ascii=False).encode('utf-8'))
+                if filters is None:
+                    self._stream_json_array(DB_MANAGER.iter_all_registros())
+                else:
+                    page = DB_MANAGER.get_registros_page(**filters)
+                    self._set_api_headers()
+                    self.wfile.write(json.dumps(page, ensure_ascii=False).encode('utf-8'))
             else:
-                self._set_api_headers()
-                self.wfile.write(json.dumps({}).encode())
+                self._get_all_registros_files(filters)
+        except ValueError as e:
+            self._set_api_headers(400)
+            self.wfile.write(json.dumps({"error": f"Parâmetros inválidos: {e}"}).encode())
+        except Exception as e:
+            logger.error(f"Erro ao listar registros: {e}", exc_info=True)
+            self._set_api_headers(500)
+            self.wfile.write(json.dumps({"error": "Erro ao buscar registros"}).encode())
+
+    @API_ROUTER.route('GET', '/api/audit')
+    def _api_get_audit(self, parsed_path):
+        if use_sqlite_storage():
+            logs = DB_MANAGER.get_audit_logs(100)
+            self._set_api_headers()
+            self.wfile.write(json.dumps(logs, ensure_ascii=False).encode('utf-8'))
+        else:
+            self._set_api_headers()
+            self.wfile.write(json.dumps([], ensure_ascii=False).encode('utf-8'))
+
+    @API_ROUTER.route('GET', '/api/sync/status')
+    def _api_get_sync_status(self, parsed_path):
+        if use_sqlite_storage():
+            pending = DB_MANAGER.get_pending_syncs()
+            self._set_api_headers()
+            self.wfile.write(json.dumps({
+                "pending_count": len(pending),
+                "pending_operations": pending
+            }).encode())
+        else:
+            self._set_api_headers()
+            self.wfile.write(json.dumps({
+                "pending_count": 0,
+                "pending_operations": []
+            }).encode())
+
+    @API_ROUTER.route('GET', '/api/categorias')
+    def _api_get_categorias(self, parsed_path):
+        if self._send_snapshot('/api/categorias'):
             return
-        
-        if path == '/api/storage-mode':
-            if DB_AVAILABLE and DB_MANAGER is not None:
-                stats = DB_MANAGER.get_storage_stats()
+        if use_sqlite_storage():
+            categorias = DB_MANAGER.get_all_categorias()
+            self._set_api_headers()
+            self.wfile.write(json.dumps(categorias, ensure_ascii=False).encode('utf-8'))
+        else:
+            self._set_api_headers()
+            self.wfile.write(json.dumps({}).encode())
+
+    @API_ROUTER.route('GET', '/api/storage-mode')
+    def _api_get_storage_mode(self, parsed_path):
+        if DB_AVAILABLE and DB_MANAGER is not None:
+            stats = DB_MANAGER.get_storage_stats()
+            self._set_api_headers()
+            self.wfile.write(json.dumps(stats, ensure_ascii=False).encode('utf-8'))
+        else:
+            self._set_api_headers()
+            self.wfile.write(json.dumps({
+                'current_mode': 'json',
+                'sqlite': {'clientes': 0, 'bicicletas': 0, 'registros': 0, 'categorias': 0},
+                'json': {'clientes': 0, 'bicicletas': 0, 'registros': 0},
+                'last_migration': None,
+                'migration_status': 'idle',
+                'db_available': False
+            }).encode())
+
+    @API_ROUTER.route('GET', '/api/jobs')
+    def _api_get_jobs(self, parsed_path):
+        if JOB_MANAGER is not None:
+            active_jobs = JOB_MANAGER.get_active_jobs()
+            recent_jobs = JOB_MANAGER.get_recent_jobs(5)
+            self._set_api_headers()
+            self.wfile.write(json.dumps({
+                'active': active_jobs,
+                'recent': recent_jobs
+            }, ensure_ascii=False).encode('utf-8'))
+        else:
+            self._set_api_headers()
+            self.wfile.write(json.dumps({'active': [], 'recent': []}).encode())
+
+    @API_ROUTER.route('GET', '/api/job/<job_id>')
+    def _api_get_job(self, parsed_path, job_id):
+        if JOB_MANAGER is not None:
+            job = JOB_MANAGER.get_job(job_id)
+            if job:
                 self._set_api_headers()
-                self.wfile.write(json.dumps(stats, ensure_ascii=False).encode('utf-8'))
+                self.wfile.write(json.dumps(job, ensure_ascii=False).encode('utf-8'))
             else:
-                self._set_api_headers()
-                self.wfile.write(json.dumps({
-                    'current_mode': 'json',
-                    'sqlite': {'clientes': 0, 'bicicletas': 0, 'registros': 0, 'categorias': 0},
-                    'json': {'clientes': 0, 'bicicletas': 0, 'registros': 0},
-                    'last_migration': None,
-                    'migration_status': 'idle',
-                    'db_available': False
-                }).encode())
-            return
-        
-        if path == '/api/jobs':
-            if JOB_MANAGER is not None:
-                active_jobs = JOB_MANAGER.get_active_jobs()
-                recent_jobs = JOB_MANAGER.get_recent_jobs(5)
-                self._set_api_headers()
-                self.wfile.write(json.dumps({
-                    'active': active_jobs,
-                    'recent': recent_jobs
-                }, ensure_ascii=False).encode('utf-8'))
-            else:
-                self._set_api_headers()
-                self.wfile.write(json.dumps({'active': [], 'recent': []}).encode())
-            return
-        
-        if path.startswith('/api/job/'):
-            job_id = path.split('/')[-1]
-            if JOB_MANAGER is not None:
-                job = JOB_MANAGER.get_job(job_id)
-                if job:
-                    self._set_api_headers()
-                    self.wfile.write(json.dumps(job, ensure_ascii=False).encode('utf-8'))
-                else:
-                    self._set_api_headers(404)
-                    self.wfile.write(json.dumps({"error": "Job not found"}).encode())
-            else:
-                self._set_api_headers(503)
-                self.wfile.write(json.dumps({"error": "Job system not available"}).encode())
-            return
-        
-        if path == '/api/changes':
-            if JOB_MANAGER is not None:
-                changes = JOB_MANAGER.get_changes()
-                self._set_api_headers()
-                self.wfile.write(json.dumps(changes).encode())
-            else:
-                self._set_api_headers()
-                self.wfile.write(json.dumps({
-                    'clients': 0, 'registros': 0, 'usuarios': 0, 'categorias': 0
-                }).encode())
-            return
-        
-        if path == '/api/system-config':
-            config = load_config()
+                self._set_api_headers(404)
+                self.wfile.write(json.dumps({"error": "Job not found"}).encode())
+        else:
+            self._set_api_headers(503)
+            self.wfile.write(json.dumps({"error": "Job system not available"}).encode())
+
+    @API_ROUTER.route('GET', '/api/changes')
+    def _api_get_changes(self, parsed_path):
+        if JOB_MANAGER is not None:
+            changes = JOB_MANAGER.get_changes()
             self._set_api_headers()
-            self.wfile.write(json.dumps(config).encode())
-            return
-        
-        if path == '/api/solicitacoes':
-            if os.path.exists(SOLICITACOES_FILE):
-                try:
-                    with open(SOLICITACOES_FILE, 'r', encoding='utf-8') as f:
-                        solicitacoes = json.load(f)
-                    self._set_api_headers()
-                    self.wfile.write(json.dumps(solicitacoes, ensure_ascii=False).encode('utf-8'))
-                except Exception as e:
-                    logger.error(f"Erro ao ler solicitacoes: {e}")
-                    self._set_api_headers(500)
-                    self.wfile.write(json.dumps({"error": "Failed to read solicitacoes"}).encode())
-            else:
-                self._set_api_headers()
-                self.wfile.write(json.dumps([]).encode())
-            return
+            self.wfile.write(json.dumps(changes).encode())
+        else:
+            self._set_api_headers()
+            self.wfile.write(json.dumps({
+                'clients': 0, 'registros': 0, 'usuarios': 0, 'categorias': 0, 'config': 0
+            }).encode())
+
+    @API_ROUTER.route('GET', '/api/sync/changes')
+    def _api_get_sync_changes(self, parsed_path):
+        if use_sqlite_storage():
+            params = parse_qs(parsed_path.query)
+            try:
+                since = int(params.get('since', ['0'])[0] or 0)
+                limit = int(params.get('limit', ['1000'])[0] or 1000)
+            except ValueError:
+                self._set_api_headers(400)
+                self.wfile.write(json.dumps({"error": "Parâmetros 'since' e 'limit' devem ser inteiros"}).encode())
+                return
+            delta = DB_MANAGER.get_changes_since(since, limit)
+            self._set_api_headers()
+            self.wfile.write(json.dumps(delta, ensure_ascii=False).encode('utf-8'))
+        else:
+            self._set_api_headers(503)
+            self.wfile.write(json.dumps({"error": "Sincronização incremental disponível apenas no modo SQLite"}).encode())
 
-        # ========== BACKUP ENDPOINTS ==========
-        if path == '/api/backups':
-            if DB_AVAILABLE and DB_MANAGER is not None:
-                backups = DB_MANAGER.list_backups()
-                self._set_api_headers()
-                self.wfile.write(json.dumps(backups, ensure_ascii=False).encode('utf-8'))
-            else:
-                self._set_api_headers(503)
-                self.wfile.write(json.dumps({"error": "Database not available"}).encode())
-            return
-        
-        if path == '/api/users':
-            if AUTH_MANAGER:
-                users = AUTH_MANAGER.get_all_users()
-                self._set_api_headers()
-                self.wfile.write(json.dumps(users, ensure_ascii=False).encode('utf-8'))
-            else:
-                self._set_api_headers(503)
-                self.wfile.write(json.dumps({"error": "Auth not available"}).encode())
-            return
+    @API_ROUTER.route('GET', '/api/system-config')
+    def _api_get_system_config(self, parsed_path):
+        config = load_config()
+        self._set_api_headers()
+        self.wfile.write(json.dumps(config).encode())
 
-        if path == '/api/backup/settings':
-            if DB_AVAILABLE and DB_MANAGER is not None:
-                settings = DB_MANAGER.get_backup_settings()
-                self._set_api_headers()
-                self.wfile.write(json.dumps(settings, ensure_ascii=False).encode('utf-8'))
-            else:
-                self._set_api_headers(503)
-                self.wfile.write(json.dumps({"error": "Database not available"}).encode())
-            return
-        
-        if path.startswith('/api/backup/download/'):
-            filename = path.split('/')[-1]
-            if DB_AVAILABLE and DB_MANAGER is not None:
-                backup_content = DB_MANAGER.get_backup_content(filename)
-                if backup_content:
-                    content = json.dumps(backup_content, ensure_ascii=False, indent=2).encode('utf-8')
-                    self.send_response(200)
-                    self.send_header('Content-type', 'application/octet-stream')
-                    self.send_header('Content-Disposition', f'attachment; filename="{filename}"')
-                    self.send_header('Content-Length', str(len(content)))
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.send_header('Cache-Control', 'no-cache')
-                    self.end_headers()
-                    self.wfile.write(content)
-                else:
-                    self._set_api_headers(404)
-                    self.wfile.write(json.dumps({"error": "Backup not found"}).encode())
-            else:
-                self._set_api_headers(503)
-                self.wfile.write(json.dumps({"error": "Database not available"}).encode())
-            return
-        
-        self._set_api_headers(404)
-        self.wfile.write(json.dumps({"error": "Not found"}).encode())
-    
-    def _handle_api_post(self):
-        content_length = int(self.headers.get('Content-Length', 0))
-        post_data = self.rfile.read(content_length)
-        
-        if self.path == '/api/auth/login':
-            try:
-                data = json.loads(post_data.decode('utf-8'))
-                username = data.get('username')
-                password = data.get('password')
-                
-                if not username or not password:
-                    self._set_api_headers(status=400)
-                    self.wfile.write(json.dumps({"error": "Usuário e senha são obrigatórios"}).encode())
-                    return
-                
-                if AUTH_MANAGER:
-                    user_data = AUTH_MANAGER.authenticate(username, password)
-                    if user_data:
-                        self._set_api_headers(status=200)
-                        self.wfile.write(json.dumps({
-                            "success": True,
-                            "user": user_data
-                        }).encode())
-                    else:
-                        # Registrar erro internamente e simular atraso de 1.5s para prevenir ataques de temporização
-                        logger.warning(f"Falha de autenticação para usuário: {username}")
-                        import time; time.sleep(1.5)
-                        self._set_api_headers(status=401)
-                        self.wfile.write(json.dumps({"error": "Credenciais inválidas. Verifique usuário e senha."}).encode())
-                else:
-                    self._set_api_headers(status=503)
-                    self.wfile.write(json.dumps({"error": "Serviço de autenticação indisponível"}).encode())
-            except json.JSONDecodeError:
-                self._set_api_headers(status=400)
-                self.wfile.write(json.dumps({"error": "Dados inválidos"}).encode())
-            return
+    # ========== BACKUP ENDPOINTS ==========
+    @API_ROUTER.route('GET', '/api/backups')
+    def _api_get_backups(self, parsed_path):
+        if DB_AVAILABLE and DB_MANAGER is not None:
+            backups = DB_MANAGER.list_backups()
+            self._set_api_headers()
+            self.wfile.write(json.dumps(backups, ensure_ascii=False).encode('utf-8'))
+        else:
+            self._set_api_headers(503)
+            self.wfile.write(json.dumps({"error": "Database not available"}).encode())
 
-        if self.path == '/api/client':
-            try:
-                client = json.loads(post_data.decode('utf-8'))
-            except (json.JSONDecodeError, UnicodeDecodeError):
-                self._set_api_headers(status=400)
-                self.wfile.write(json.dumps({"error": "Dados JSON inválidos"}).encode())
-                return
-            if not client.get('cpf') or not client.get('nome'):
-                self._set_api_headers(status=400)
-                self.wfile.write(json.dumps({"error": "Campos obrigatórios: nome e cpf"}).encode())
-                return
-            if use_sqlite_storage():
-                success = DB_MANAGER.save_cliente(client)
-                if success:
-                    DB_MANAGER.add_pending_sync('cliente', 'save', client)
-                    self._set_api_headers()
-                    self.wfile.write(json.dumps({
-                        "success": True,
-                        "cpf": client['cpf']
-                    }).encode())
-                else:
-                    self._set_api_headers(500)
-                    self.wfile.write(json.dumps({"error": "Failed to save client"}).encode())
+    @API_ROUTER.route('GET', '/api/users')
+    def _api_get_users(self, parsed_path):
+        if AUTH_MANAGER:
+            users = AUTH_MANAGER.get_all_users()
+            self._set_api_headers()
+            self.wfile.write(json.dumps(users, ensure_ascii=False).encode('utf-8'))
+        else:
+            self._set_api_headers(503)
+            self.wfile.write(json.dumps({"error": "Auth not available"}).encode())
+
+    @API_ROUTER.route('GET', '/api/backup/settings')
+    def _api_get_backup_settings(self, parsed_path):
+        if DB_AVAILABLE and DB_MANAGER is not None:
+            settings = DB_MANAGER.get_backup_settings()
+            self._set_api_headers()
+            self.wfile.write(json.dumps(settings, ensure_ascii=False).encode('utf-8'))
+        else:
+            self._set_api_headers(503)
+            self.wfile.write(json.dumps({"error": "Database not available"}).encode())
+
+    @API_ROUTER.route('GET', '/api/backup/download/<filename>')
+    def _api_get_backup_download(self, parsed_path, filename):
+        if DB_AVAILABLE and DB_MANAGER is not None:
+            backup_path = DB_MANAGER.get_backup_path(filename)
+            if backup_path:
+                self._stream_file(backup_path, extra_headers={
+                    'Content-Disposition': f'attachment; filename="{os.path.basename(backup_path)}"'
+                })
             else:
-                self._save_client_file(client)
-            return
+                self._set_api_headers(404)
+                self.wfile.write(json.dumps({"error": "Backup not found"}).encode())
+        else:
+            self._set_api_headers(503)
+            self.wfile.write(json.dumps({"error": "Database not available"}).encode())
 
-        if self.path == '/api/clients':
+    @API_ROUTER.route('GET', '/api/admin/sql-profile')
+    def _api_get_admin_sql_profile(self, parsed_path):
+        if DB_AVAILABLE and DB_MANAGER is not None:
+            params = parse_qs(parsed_path.query)
             try:
-                clients = json.loads(post_data.decode('utf-8'))
-            except (json.JSONDecodeError, UnicodeDecodeError):
-                self._set_api_headers(status=400)
-                self.wfile.write(json.dumps({"error": "Dados JSON inválidos"}).encode())
+                limit = int(params.get('limit', ['50'])[0] or 50)
+            except ValueError:
+                self._set_api_headers(400)
+                self.wfile.write(json.dumps({"error": "Parâmetro 'limit' deve ser inteiro"}).encode())
                 return
-            if use_sqlite_storage():
-                success = DB_MANAGER.save_all_clientes(clients)
-                if success:
-                    # Notificar mudança para todos os clientes? Ou apenas genérico 'clients'
-                    # Idealmente rastrearíamos mudanças, mas para salvamento em lote é uma atualização completa
-                    if JOB_MANAGER is not None:
-                         JOB_MANAGER.notify_change('clients')
-                    
-                    self._set_api_headers()
-                    self.wfile.write(json.dumps({
-                        "success": True,
-                        "count": len(clients)
-                    }).encode())
-                else:
-                    self._set_api_headers(500)
-                    self.wfile.write(json.dumps({"error": "Failed to save clients batch"}).encode())
-            else:
-                # Fallback para armazenamento em arquivo (salva um por um, ou sobrescreve todos)
-                # Como ainda não temos um método otimizado "salvar todos os arquivos",
-                # podemos implementar um loop básico aqui ou em um auxiliar.
-                # Dado que a instrução era principalmente para otimização SQLite,
-                # implementaremos um loop de segurança aqui.
-                success_count = 0
-                for client in clients:
-                    if self._save_client_file(client): # Assumindo que este método existe na lógica do self
-                         success_count += 1
-                
-                self._set_api_headers()
-                self.wfile.write(json.dumps({
-                    "success": True,
-                    "count": success_count
-                }).encode())
-            return
+            report = DB_MANAGER.get_query_profile(limit)
+            self._set_api_headers()
+            self.wfile.write(json.dumps(report, ensure_ascii=False).encode('utf-8'))
+        else:
+            self._set_api_headers(503)
+            self.wfile.write(json.dumps({"error": "Database not available"}).encode())
 
-        
-        if self.path == '/api/registro':
-            try:
-                registro = json.loads(post_data.decode('utf-8'))
-            except (json.JSONDecodeError, UnicodeDecodeError):
+    # ========== ROTAS POST ==========
+    @API_ROUTER.route('POST', '/api/auth/login')
+    def _api_post_auth_login(self, post_data):
+        try:
+            data = json.loads(post_data.decode('utf-8'))
+            username = data.get('username')
+            password = data.get('password')
+            
+            if not username or not password:
                 self._set_api_headers(status=400)
-                self.wfile.write(json.dumps({"error": "Dados JSON inválidos"}).encode())
+                self.wfile.write(json.dumps({"error": "Usuário e senha são obrigatórios"}).encode())
                 return
-            if 'data' in registro and 'entrada' in registro and 'dataHoraEntrada' not in registro:
-                registro['dataHoraEntrada'] = f"{registro['data']}T{registro['entrada'] or '00:00'}:00"
-                if registro.get('saida'):
-                    registro['dataHoraSaida'] = f"{registro['data']}T{registro['saida']}:00"
-                if 'cpf' in registro and 'clienteId' not in registro:
-                    registro['clienteId'] = registro['cpf']
-                if 'bicicletaId' not in registro:
-                    registro['bicicletaId'] = registro.get('bikeId', '')
-                if 'observacoes' not in registro and 'observacao' in registro:
-                    registro['observacoes'] = registro['observacao']
-            if use_sqlite_storage():
-                success = DB_MANAGER.save_registro(registro)
-                if success:
-                    DB_MANAGER.add_pending_sync('registro', 'save', registro)
-                    self._set_api_headers()
+            
+            if AUTH_MANAGER:
+                user_data = AUTH_MANAGER.authenticate(username, password)
+                if user_data:
+                    self._set_api_headers(status=200)
                     self.wfile.write(json.dumps({
                         "success": True,
-                        "id": registro['id']
+                        "user": user_data
                     }).encode())
                 else:
-                    self._set_api_headers(500)
-                    self.wfile.write(json.dumps({"error": "Failed to save registro"}).encode())
-            else:
-                self._save_registro_file(registro)
-            return
-        
-        if self.path == '/api/audit':
-            audit_data = json.loads(post_data.decode('utf-8'))
-            if use_sqlite_storage():
-                success = DB_MANAGER.log_audit(
-                    audit_data['usuario'],
-                    audit_data['acao'],
-                    audit_data.get('detalhes')
-                )
-                self._set_api_headers()
-                self.wfile.write(json.dumps({"success": success}).encode())
-            else:
-                self._set_api_headers()
-                self.wfile.write(json.dumps({"success": True}).encode())
-            return
-        
-        if self.path == '/api/categorias':
-            categorias = json.loads(post_data.decode('utf-8'))
-            if use_sqlite_storage():
-                success = DB_MANAGER.save_categorias(categorias)
-                if success:
-                    self._set_api_headers()
-                    self.wfile.write(json.dumps({"success": True}).encode())
-                else:
-                    self._set_api_headers(500)
-                    self.wfile.write(json.dumps({"error": "Failed to save categorias"}).encode())
+                    # Registrar erro internamente e simular atraso de 1.5s para prevenir ataques de temporização
+                    logger.warning(f"Falha de autenticação para usuário: {username}")
+                    import time; time.sleep(1.5)
+                    self._set_api_headers(status=401)
+                    self.wfile.write(json.dumps({"error": "Credenciais inválidas. Verifique usuário e senha."}).encode())
             else:
-                self._set_api_headers()
-                self.wfile.write(json.dumps({"success": True}).encode())
+                self._set_api_headers(status=503)
+                self.wfile.write(json.dumps({"error": "Serviço de autenticação indisponível"}).encode())
+        except json.JSONDecodeError:
+            self._set_api_headers(status=400)
+            self.wfile.write(json.dumps({"error": "Dados inválidos"}).encode())
+
+    @API_ROUTER.route('POST', '/api/client')
+    def _api_post_client(self, post_data):
+        try:
+            client = json.loads(post_data.decode('utf-8'))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            self._set_api_headers(status=400)
+            self.wfile.write(json.dumps({"error": "Dados JSON inválidos"}).encode())
             return
-        
-        if self.path == '/api/storage-mode':
-            data = json.loads(post_data.decode('utf-8'))
-            if DB_AVAILABLE and DB_MANAGER is not None:
-                new_mode = data.get('mode')
-                if new_mode in ('sqlite', 'json'):
-                    success = DB_MANAGER.set_storage_mode(new_mode)
-                    if success:
-                        self._set_api_headers()
-                        self.wfile.write(json.dumps({
-                            "success": True,
-                            "mode": new_mode
-                        }).encode())
-                    else:
-                        self._set_api_headers(500)
-                        self.wfile.write(json.dumps({"error": "Failed to change storage mode"}).encode())
-                else:
-                    self._set_api_headers(400)
-                    self.wfile.write(json.dumps({"error": "Invalid mode. Use 'sqlite' or 'json'"}).encode())
-            else:
-                self._set_api_headers(503)
-                self.wfile.write(json.dumps({"error": "Database not available"}).encode())
+        if not client.get('cpf') or not client.get('nome'):
+            self._set_api_headers(status=400)
+            self.wfile.write(json.dumps({"error": "Campos obrigatórios: nome e cpf"}).encode())
             return
-        
-        if self.path == '/api/migrate':
-            data = json.loads(post_data.decode('utf-8'))
-            if DB_AVAILABLE and DB_MANAGER is not None:
-                direction = data.get('direction')
-                if direction == 'json_to_sqlite':
-                    result = DB_MANAGER.migrate_json_to_sqlite()
-                    self._set_api_headers()
-                    self.wfile.write(json.dumps(result, ensure_ascii=False).encode('utf-8'))
-                elif direction == 'sqlite_to_json':
-                    result = DB_MANAGER.migrate_sqlite_to_json()
-                    self._set_api_headers()
-                    self.wfile.write(json.dumps(result, ensure_ascii=False).encode('utf-8'))
-                else:
-                    self._set_api_headers(400)
-                    self.wfile.write(json.dumps({"error": "Invalid direction. Use 'json_to_sqlite' or 'sqlite_to_json'"}).encode())
-            else:
-                self._set_api_headers(503)
-                self.wfile.write(json.dumps({"error": "Database not available for migration"}).encode())
-            return
-        
-        if self.path == '/api/import/clients':
-            data = json.loads(post_data.decode('utf-8'))
-            if IMPORT_WORKER is not None:
-                clients = data.get('clients', [])
-                storage_mode = 'sqlite' if use_sqlite_storage() else 'json'
-                job_id = IMPORT_WORKER.import_clients_async(clients, storage_mode)
+        if use_sqlite_storage():
+            # save_cliente retira as bicicletas do dicionário; o evento leva o cliente inteiro
+            payload = dict(client)
+            success = DB_MANAGER.save_cliente(client)
+            if success:
+                DB_MANAGER.add_pending_sync('cliente', 'save', client)
+                publish_change('cliente', 'save', client['id'], dict(payload, id=client['id']),
+                               resource='clients')
                 self._set_api_headers()
                 self.wfile.write(json.dumps({
                     "success": True,
-                    "job_id": job_id,
-                    "message": "Importação iniciada em segundo plano"
+                    "cpf": client['cpf']
                 }).encode())
             else:
-                self._set_api_headers(503)
-                self.wfile.write(json.dumps({"error": "Import system not available"}).encode())
+                self._set_api_headers(500)
+                self.wfile.write(json.dumps({"error": "Failed to save client"}).encode())
+        else:
+            self._save_client_file(client)
+
+    @API_ROUTER.route('POST', '/api/clients')
+    def _api_post_clients(self, post_data):
+        try:
+            clients = json.loads(post_data.decode('utf-8'))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            self._set_api_headers(status=400)
+            self.wfile.write(json.dumps({"error": "Dados JSON inválidos"}).encode())
             return
-        
-        if self.path == '/api/import/registros':
-            data = json.loads(post_data.decode('utf-8'))
-            if IMPORT_WORKER is not None:
-                registros = data.get('registros', [])
-                storage_mode = 'sqlite' if use_sqlite_storage() else 'json'
-                job_id = IMPORT_WORKER.import_registros_async(registros, storage_mode)
+        if use_sqlite_storage():
+            success = DB_MANAGER.save_all_clientes(clients)
+            if success:
+                # Notificar mudança para todos os clientes? Ou apenas genérico 'clients'
+                # Idealmente rastrearíamos mudanças, mas para salvamento em lote é uma atualização completa
+                if JOB_MANAGER is not None:
+                     JOB_MANAGER.notify_change('clients')
+                
                 self._set_api_headers()
                 self.wfile.write(json.dumps({
                     "success": True,
-                    "job_id": job_id,
-                    "message": "Importação iniciada em segundo plano"
+                    "count": len(clients)
                 }).encode())
             else:
-                self._set_api_headers(503)
-                self.wfile.write(json.dumps({"error": "Import system not available"}).encode())
+                self._set_api_headers(500)
+                self.wfile.write(json.dumps({"error": "Failed to save clients batch"}).encode())
+        else:
+            # Lote no armazenamento JSON: grava tudo com um único sync e notifica
+            # uma única vez (como os demais caminhos em lote, só o contador)
+            items = [(normalize_cpf(client.get('cpf')), client) for client in clients]
+            try:
+                success_count = JSON_STORE.clientes.put_many((cpf, client) for cpf, client in items if cpf)
+            except Exception as e:
+                logger.error(f"Erro ao salvar lote de clientes: {e}", exc_info=True)
+                if JOB_MANAGER is not None:
+                    JOB_MANAGER.notify_change('clients')
+                self._set_api_headers(500)
+                self.wfile.write(json.dumps({"error": "Failed to save clients batch"}).encode())
+                return
+            if success_count and JOB_MANAGER is not None:
+                JOB_MANAGER.notify_change('clients')
+            
+            self._set_api_headers()
+            self.wfile.write(json.dumps({
+                "success": True,
+                "count": success_count
+            }).encode())
+
+    @API_ROUTER.route('POST', '/api/registro')
+    def _api_post_registro(self, post_data):
+        try:
+            registro = json.loads(post_data.decode('utf-8'))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            self._set_api_headers(status=400)
+            self.wfile.write(json.dumps({"error": "Dados JSON inválidos"}).encode())
             return
-        
-        if self.path == '/api/import/backup':
-            data = json.loads(post_data.decode('utf-8'))
-            if IMPORT_WORKER is not None:
-                storage_mode = 'sqlite' if use_sqlite_storage() else 'json'
-                job_id = IMPORT_WORKER.import_system_backup_async(data, storage_mode)
+        if 'data' in registro and 'entrada' in registro and 'dataHoraEntrada' not in registro:
+            registro['dataHoraEntrada'] = f"{registro['data']}T{registro['entrada'] or '00:00'}:00"
+            if registro.get('saida'):
+                registro['dataHoraSaida'] = f"{registro['data']}T{registro['saida']}:00"
+            if 'cpf' in registro and 'clienteId' not in registro:
+                registro['clienteId'] = registro['cpf']
+            if 'bicicletaId' not in registro:
+                registro['bicicletaId'] = registro.get('bikeId', '')
+            if 'observacoes' not in registro and 'observacao' in registro:
+                registro['observacoes'] = registro['observacao']
+        if use_sqlite_storage():
+            success = DB_MANAGER.save_registro(registro)
+            if success:
+                DB_MANAGER.add_pending_sync('registro', 'save', registro)
+                publish_change('registro', 'save', registro['id'], registro, resource='registros')
                 self._set_api_headers()
                 self.wfile.write(json.dumps({
                     "success": True,
-                    "job_id": job_id,
-                    "message": "Importação de backup iniciada em segundo plano"
+                    "id": registro['id']
                 }).encode())
             else:
-                self._set_api_headers(503)
-                self.wfile.write(json.dumps({"error": "Import system not available"}).encode())
-            return
-        
-        if self.path == '/api/notify-change':
-            data = json.loads(post_data.decode('utf-8'))
-            if JOB_MANAGER is not None:
-                change_type = data.get('type', 'clients')
-                JOB_MANAGER.notify_change(change_type)
-                self._set_api_headers()
-                self.wfile.write(json.dumps({"success": True}).encode())
-            else:
-                self._set_api_headers()
-                self.wfile.write(json.dumps({"success": True}).encode())
-            return
+                self._set_api_headers(500)
+                self.wfile.write(json.dumps({"error": "Failed to save registro"}).encode())
+        else:
+            self._save_registro_file(registro)
+
+    @API_ROUTER.route('POST', '/api/audit')
+    def _api_post_audit(self, post_data):
+        audit_data = json.loads(post_data.decode('utf-8'))
+        if use_sqlite_storage():
+            success = DB_MANAGER.log_audit(
+                audit_data['usuario'],
+                audit_data['acao'],
+                audit_data.get('detalhes')
+            )
+            self._set_api_headers()
+            self.wfile.write(json.dumps({"success": success}).encode())
+        else:
+            self._set_api_headers()
+            self.wfile.write(json.dumps({"success": True}).encode())
 
-        if self.path == '/api/system-config':
-            data = json.loads(post_data.decode('utf-8'))
-            success = save_system_config(data)
+    @API_ROUTER.route('POST', '/api/categorias')
+    def _api_post_categorias(self, post_data):
+        categorias = json.loads(post_data.decode('utf-8'))
+        if use_sqlite_storage():
+            success = DB_MANAGER.save_categorias(categorias)
             if success:
+                if JOB_MANAGER is not None:
+                    JOB_MANAGER.notify_change('categorias')
                 self._set_api_headers()
                 self.wfile.write(json.dumps({"success": True}).encode())
             else:
                 self._set_api_headers(500)
-                self.wfile.write(json.dumps({"error": "Failed to save config"}).encode())
-            return
-        
-        if self.path == '/api/clear/clients':
-            if use_sqlite_storage():
-                result = DB_MANAGER.clear_all_clientes()
-                if result['success']:
-                    if JOB_MANAGER is not None:
-                        JOB_MANAGER.notify_change('clients')
-                    self._set_api_headers()
-                    self.wfile.write(json.dumps(result).encode())
-                else:
-                    self._set_api_headers(500)
-                    self.wfile.write(json.dumps(result).encode())
-            else:
-                count = 0
-                try:
-                    if os.path.exists(CLIENTS_DIR):
-                        for filename in os.listdir(CLIENTS_DIR):
-                            if filename.endswith('.json'):
-                                filepath = os.path.join(CLIENTS_DIR, filename)
-                                os.remove(filepath)
-                                count += 1
+                self.wfile.write(json.dumps({"error": "Failed to save categorias"}).encode())
+        else:
+            self._set_api_headers()
+            self.wfile.write(json.dumps({"success": True}).encode())
+
+    @API_ROUTER.route('POST', '/api/storage-mode')
+    def _api_post_storage_mode(self, post_data):
+        data = json.loads(post_data.decode('utf-8'))
+        if DB_AVAILABLE and DB_MANAGER is not None:
+            new_mode = data.get('mode')
+            if new_mode in ('sqlite', 'json'):
+                success = DB_MANAGER.set_storage_mode(new_mode)
+                if success:
                     if JOB_MANAGER is not None:
                         JOB_MANAGER.notify_change('clients')
-                    self._set_api_headers()
-                    self.wfile.write(json.dumps({"success": True, "count": count}).encode())
-                except Exception as e:
-                    self._set_api_headers(500)
-                    self.wfile.write(json.dumps({"success": False, "error": str(e)}).encode())
-            return
-        
-        if self.path == '/api/clear/registros':
-            if use_sqlite_storage():
-                result = DB_MANAGER.clear_all_registros()
-                if result['success']:
-                    if JOB_MANAGER is not None:
-                        JOB_MANAGER.notify_change('registros')
-                    self._set_api_headers()
-                    self.wfile.write(json.dumps(result).encode())
-                else:
-                    self._set_api_headers(500)
-                    self.wfile.write(json.dumps(result).encode())
-            else:
-                count = 0
-                try:
-                    import shutil
-                    if os.path.exists(REGISTROS_DIR):
-                        for item in os.listdir(REGISTROS_DIR):
-                            item_path = os.path.join(REGISTROS_DIR, item)
-                            if os.path.isdir(item_path):
-                                for root, dirs, files in os.walk(item_path):
-                                    for f in files:
-                                        if f.endswith('.json'):
-                                            os.remove(os.path.join(root, f))
-                                            count += 1
-                                shutil.rmtree(item_path, ignore_errors=True)
-                    if JOB_MANAGER is not None:
                         JOB_MANAGER.notify_change('registros')
-                    self._set_api_headers()
-                    self.wfile.write(json.dumps({"success": True, "count": count}).encode())
-                except Exception as e:
-                    self._set_api_headers(500)
-                    self.wfile.write(json.dumps({"success": False, "error": str(e)}).encode())
-            return
-        
-        if self.path == '/api/clear/categorias':
-            if use_sqlite_storage():
-                result = DB_MANAGER.clear_all_categorias()
-                if result['success']:
-                    if JOB_MANAGER is not None:
                         JOB_MANAGER.notify_change('categorias')
                     self._set_api_headers()
-                    self.wfile.write(json.dumps(result).encode())
+                    self.wfile.write(json.dumps({
+                        "success": True,
+                        "mode": new_mode
+                    }).encode())
                 else:
                     self._set_api_headers(500)
-                    self.wfile.write(json.dumps(result).encode())
+                    self.wfile.write(json.dumps({"error": "Failed to change storage mode"}).encode())
             else:
-                try:
-                    categorias_file = os.path.join(STORAGE_DIR, "categorias.json")
-                    if os.path.exists(categorias_file):
-                        os.remove(categorias_file)
+                self._set_api_headers(400)
+                self.wfile.write(json.dumps({"error": "Invalid mode. Use 'sqlite' or 'json'"}).encode())
+        else:
+            self._set_api_headers(503)
+            self.wfile.write(json.dumps({"error": "Database not available"}).encode())
+
+    @API_ROUTER.route('POST', '/api/migrate')
+    def _api_post_migrate(self, post_data):
+        data = json.loads(post_data.decode('utf-8'))
+        if DB_AVAILABLE and DB_MANAGER is not None:
+            direction = data.get('direction')
+            if direction == 'json_to_sqlite':
+                result = DB_MANAGER.migrate_json_to_sqlite()
+                if JOB_MANAGER is not None:
+                    JOB_MANAGER.notify_change('clients')
+                    JOB_MANAGER.notify_change('registros')
+                self._set_api_headers()
+                self.wfile.write(json.dumps(result, ensure_ascii=False).encode('utf-8'))
+            elif direction == 'sqlite_to_json':
+                result = DB_MANAGER.migrate_sqlite_to_json()
+                if JOB_MANAGER is not None:
+                    JOB_MANAGER.notify_change('clients')
+                    JOB_MANAGER.notify_change('registros')
+                self._set_api_headers()
+                self.wfile.write(json.dumps(result, ensure_ascii=False).encode('utf-8'))
+            else:
+                self._set_api_headers(400)
+                self.wfile.write(json.dumps({"error": "Invalid direction. Use 'json_to_sqlite' or 'sqlite_to_json'"}).encode())
+        else:
+            self._set_api_headers(503)
+            self.wfile.write(json.dumps({"error": "Database not available for migration"}).encode())
+
+    @API_ROUTER.route('POST', '/api/import/clients')
+    def _api_post_import_clients(self, post_data):
+        data = json.loads(post_data.decode('utf-8'))
+        if IMPORT_WORKER is not None:
+            clients = data.get('clients', [])
+            storage_mode = 'sqlite' if use_sqlite_storage() else 'json'
+            job_id = IMPORT_WORKER.import_clients_async(clients, storage_mode)
+            self._set_api_headers()
+            self.wfile.write(json.dumps({
+                "success": True,
+                "job_id": job_id,
+                "message": "Importação iniciada em segundo plano"
+            }).encode())
+        else:
+            self._set_api_headers(503)
+            self.wfile.write(json.dumps({"error": "Import system not available"}).encode())
+
+    @API_ROUTER.route('POST', '/api/import/registros')
+    def _api_post_import_registros(self, post_data):
+        data = json.loads(post_data.decode('utf-8'))
+        if IMPORT_WORKER is not None:
+            registros = data.get('registros', [])
+            storage_mode = 'sqlite' if use_sqlite_storage() else 'json'
+            job_id = IMPORT_WORKER.import_registros_async(registros, storage_mode)
+            self._set_api_headers()
+            self.wfile.write(json.dumps({
+                "success": True,
+                "job_id": job_id,
+                "message": "Importação iniciada em segundo plano"
+            }).encode())
+        else:
+            self._set_api_headers(503)
+            self.wfile.write(json.dumps({"error": "Import system not available"}).encode())
+
+    @API_ROUTER.route('POST', '/api/import/backup')
+    def _api_post_import_backup(self, post_data):
+        data = json.loads(post_data.decode('utf-8'))
+        if IMPORT_WORKER is not None:
+            storage_mode = 'sqlite' if use_sqlite_storage() else 'json'
+            job_id = IMPORT_WORKER.import_system_backup_async(data, storage_mode)
+            self._set_api_headers()
+            self.wfile.write(json.dumps({
+                "success": True,
+                "job_id": job_id,
+                "message": "Importação de backup iniciada em segundo plano"
+            }).encode())
+        else:
+            self._set_api_headers(503)
+            self.wfile.write(json.dumps({"error": "Import system not available"}).encode())
+
+    @API_ROUTER.route('POST', '/api/notify-change')
+    def _api_post_notify_change(self, post_data):
+        data = json.loads(post_data.decode('utf-8'))
+        if JOB_MANAGER is not None:
+            change_type = data.get('type', 'clients')
+            JOB_MANAGER.notify_change(change_type)
+            self._set_api_headers()
+            self.wfile.write(json.dumps({"success": True}).encode())
+        else:
+            self._set_api_headers()
+            self.wfile.write(json.dumps({"success": True}).encode())
+
+    @API_ROUTER.route('POST', '/api/system-config')
+    def _api_post_system_config(self, post_data):
+        data = json.loads(post_data.decode('utf-8'))
+        success = save_system_config(data)
+        if success:
+            if JOB_MANAGER is not None:
+                JOB_MANAGER.notify_change('config')
+            self._set_api_headers()
+            self.wfile.write(json.dumps({"success": True}).encode())
+        else:
+            self._set_api_headers(500)
+            self.wfile.write(json.dumps({"error": "Failed to save config"}).encode())
+
+    @API_ROUTER.route('POST', '/api/clear/clients')
+    def _api_post_clear_clients(self, post_data):
+        if use_sqlite_storage():
+            result = DB_MANAGER.clear_all_clientes()
+            if result['success']:
+                if JOB_MANAGER is not None:
+                    JOB_MANAGER.notify_change('clients')
+                self._set_api_headers()
+                self.wfile.write(json.dumps(result).encode())
+            else:
+                self._set_api_headers(500)
+                self.wfile.write(json.dumps(result).encode())
+        else:
+            try:
+                count = JSON_STORE.clientes.clear()
+                if JOB_MANAGER is not None:
+                    JOB_MANAGER.notify_change('clients')
+                self._set_api_headers()
+                self.wfile.write(json.dumps({"success": True, "count": count}).encode())
+            except Exception as e:
+                self._set_api_headers(500)
+                self.wfile.write(json.dumps({"success": False, "error": str(e)}).encode())
+
+    @API_ROUTER.route('POST', '/api/clear/registros')
+    def _api_post_clear_registros(self, post_data):
+        if use_sqlite_storage():
+            result = DB_MANAGER.clear_all_registros()
+            if result['success']:
+                if JOB_MANAGER is not None:
+                    JOB_MANAGER.notify_change('registros')
+                self._set_api_headers()
+                self.wfile.write(json.dumps(result).encode())
+            else:
+                self._set_api_headers(500)
+                self.wfile.write(json.dumps(result).encode())
+        else:
+            try:
+                count = JSON_STORE.registros.clear()
+                if JOB_MANAGER is not None:
+                    JOB_MANAGER.notify_change('registros')
+                self._set_api_headers()
+                self.wfile.write(json.dumps({"success": True, "count": count}).encode())
+            except Exception as e:
+                self._set_api_headers(500)
+                self.wfile.write(json.dumps({"success": False, "error": str(e)}).encode())
+
+    @API_ROUTER.route('POST', '/api/clear/categorias')
+    def _api_post_clear_categorias(self, post_data):
+        if use_sqlite_storage():
+            result = DB_MANAGER.clear_all_categorias()
+            if result['success']:
+                if JOB_MANAGER is not None:
+                    JOB_MANAGER.notify_change('categorias')
+                self._set_api_headers()
+                self.wfile.write(json.dumps(result).encode())
+            else:
+                self._set_api_headers(500)
+                self.wfile.write(json.dumps(result).encode())
+        else:
+            try:
+                categorias_file = os.path.join(STORAGE_DIR, "categorias.json")
+                if os.path.exists(categorias_file):
+                    os.remove(categorias_file)
+                if JOB_MANAGER is not None:
+                    JOB_MANAGER.notify_change('categorias')
+                self._set_api_headers()
+                self.wfile.write(json.dumps({"success": True, "count": 1}).encode())
+            except Exception as e:
+                self._set_api_headers(500)
+                self.wfile.write(json.dumps({"success": False, "error": str(e)}).encode())
+
+    # ========== BACKUP POST ENDPOINTS ==========
+    @API_ROUTER.route('POST', '/api/backup')
+    def _api_post_backup(self, post_data):
+        if DB_AVAILABLE and DB_MANAGER is not None:
+            auth_users = AUTH_MANAGER.get_all_users_for_backup() if AUTH_MANAGER else None
+            result = DB_MANAGER.create_full_backup(auth_users=auth_users)
+            if result and result.get('success'):
+                self._set_api_headers()
+                self.wfile.write(json.dumps(result, ensure_ascii=False).encode('utf-8'))
+            else:
+                self._set_api_headers(500)
+                self.wfile.write(json.dumps({"error": "Failed to create backup"}).encode())
+        else:
+            self._set_api_headers(503)
+            self.wfile.write(json.dumps({"error": "Database not available"}).encode())
+
+    @API_ROUTER.route('POST', '/api/backup/restore')
+    def _api_post_backup_restore(self, post_data):
+        data = json.loads(post_data.decode('utf-8'))
+        if DB_AVAILABLE and DB_MANAGER is not None:
+            filename = data.get('filename')
+            backup_data = data.get('backup_data')
+            
+            # Se foi enviado um filename, carregar do arquivo
+            if filename and not backup_data:
+                backup_data = DB_MANAGER.get_backup_content(filename)
+                if not backup_data:
+                    self._set_api_headers(404)
+                    self.wfile.write(json.dumps({"error": "Arquivo de backup não encontrado. Pode ter sido removido pela limpeza automática."}).encode())
+                    return
+            
+            if backup_data:
+                result = DB_MANAGER.restore_from_backup(backup_data)
+                if AUTH_MANAGER and 'data' in backup_data and 'usuarios' in backup_data['data']:
+                    try:
+                        restored_users = AUTH_MANAGER.restore_users_from_backup(backup_data['data']['usuarios'])
+                        result['restored']['usuarios'] = restored_users
+                    except Exception as e:
+                        result['errors'].append(f"Erro ao restaurar usuários: {str(e)}")
+                if result.get('success') or (result['restored']['clientes'] > 0 or result['restored']['registros'] > 0):
+                    result['success'] = len(result.get('errors', [])) == 0
                     if JOB_MANAGER is not None:
+                        JOB_MANAGER.notify_change('clients')
+                        JOB_MANAGER.notify_change('registros')
                         JOB_MANAGER.notify_change('categorias')
                     self._set_api_headers()
-                    self.wfile.write(json.dumps({"success": True, "count": 1}).encode())
-                except Exception as e:
-                    self._set_api_headers(500)
-                    self.wfile.write(json.dumps({"success": False, "error": str(e)}).encode())
-            return
-        
-        # ========== BACKUP POST ENDPOINTS ==========
-        if self.path == '/api/backup':
-            if DB_AVAILABLE and DB_MANAGER is not None:
-                auth_users = AUTH_MANAGER.get_all_users_for_backup() if AUTH_MANAGER else None
-                result = DB_MANAGER.create_full_backup(auth_users=auth_users)
-                if result and result.get('success'):
-                    self._set_api_headers()
                     self.wfile.write(json.dumps(result, ensure_ascii=False).encode('utf-8'))
                 else:
                     self._set_api_headers(500)
-                    self.wfile.write(json.dumps({"error": "Failed to create backup"}).encode())
+                    self.wfile.write(json.dumps(result, ensure_ascii=False).encode('utf-8'))
             else:
-                self._set_api_headers(503)
-                self.wfile.write(json.dumps({"error": "Database not available"}).encode())
-            return
-        
-        if self.path == '/api/backup/restore':
-            data = json.loads(post_data.decode('utf-8'))
-            if DB_AVAILABLE and DB_MANAGER is not None:
-                filename = data.get('filename')
-                backup_data = data.get('backup_data')
-                
-                # Se foi enviado um filename, carregar do arquivo
-                if filename and not backup_data:
-                    backup_data = DB_MANAGER.get_backup_content(filename)
-                    if not backup_data:
-                        self._set_api_headers(404)
-                        self.wfile.write(json.dumps({"error": "Arquivo de backup não encontrado. Pode ter sido removido pela limpeza automática."}).encode())
-                        return
-                
-                if backup_data:
-                    result = DB_MANAGER.restore_from_backup(backup_data)
-                    if AUTH_MANAGER and 'data' in backup_data and 'usuarios' in backup_data['data']:
-                        try:
-                            restored_users = AUTH_MANAGER.restore_users_from_backup(backup_data['data']['usuarios'])
-                            result['restored']['usuarios'] = restored_users
-                        except Exception as e:
-                            result['errors'].append(f"Erro ao restaurar usuários: {str(e)}")
-                    if result.get('success') or (result['restored']['clientes'] > 0 or result['restored']['registros'] > 0):
-                        result['success'] = len(result.get('errors', [])) == 0
-                        if JOB_MANAGER is not None:
-                            JOB_MANAGER.notify_change('clients')
-                            JOB_MANAGER.notify_change('registros')
-                            JOB_MANAGER.notify_change('categorias')
-                        self._set_api_headers()
-                        self.wfile.write(json.dumps(result, ensure_ascii=False).encode('utf-8'))
-                    else:
-                        self._set_api_headers(500)
-                        self.wfile.write(json.dumps(result, ensure_ascii=False).encode('utf-8'))
-                else:
+                self._set_api_headers(400)
+                self.wfile.write(json.dumps({"error": "No backup data provided"}).encode())
+        else:
+            self._set_api_headers(503)
+            self.wfile.write(json.dumps({"error": "Database not available"}).encode())
+
+    @API_ROUTER.route('POST', '/api/backup/upload')
+    def _api_post_backup_upload(self, post_data):
+        data = json.loads(post_data.decode('utf-8'))
+        if DB_AVAILABLE and DB_MANAGER is not None:
+            backup_data = data.get('backup_data')
+            filename = data.get('filename')
+            
+            if backup_data:
+                # Validar estrutura básica do backup
+                if 'data' not in backup_data:
                     self._set_api_headers(400)
-                    self.wfile.write(json.dumps({"error": "No backup data provided"}).encode())
-            else:
-                self._set_api_headers(503)
-                self.wfile.write(json.dumps({"error": "Database not available"}).encode())
-            return
-        
-        if self.path == '/api/backup/upload':
-            data = json.loads(post_data.decode('utf-8'))
-            if DB_AVAILABLE and DB_MANAGER is not None:
-                backup_data = data.get('backup_data')
-                filename = data.get('filename')
+                    self.wfile.write(json.dumps({"error": "Invalid backup structure"}).encode())
+                    return
                 
-                if backup_data:
-                    # Validar estrutura básica do backup
-                    if 'data' not in backup_data:
-                        self._set_api_headers(400)
-                        self.wfile.write(json.dumps({"error": "Invalid backup structure"}).encode())
-                        return
-                    
-                    saved_filename = DB_MANAGER.save_backup_file(backup_data, filename)
-                    if saved_filename:
-                        self._set_api_headers()
-                        self.wfile.write(json.dumps({
-                            "success": True,
-                            "filename": saved_filename
-                        }).encode())
-                    else:
-                        self._set_api_headers(500)
-                        self.wfile.write(json.dumps({"error": "Failed to save backup"}).encode())
+                saved_filename = DB_MANAGER.save_backup_file(backup_data, filename)
+                if saved_filename:
+                    self._set_api_headers()
+                    self.wfile.write(json.dumps({
+                        "success": True,
+                        "filename": saved_filename
+                    }).encode())
                 else:
-                    self._set_api_headers(400)
-                    self.wfile.write(json.dumps({"error": "No backup data provided"}).encode())
+                    self._set_api_headers(500)
+                    self.wfile.write(json.dumps({"error": "Failed to save backup"}).encode())
             else:
-                self._set_api_headers(503)
-                self.wfile.write(json.dumps({"error": "Database not available"}).encode())
-            return
-        
-        if self.path == '/api/upload-image':
-            try:
-                data = json.loads(post_data.decode('utf-8'))
-                image_data = data.get('image') # String Base64
-                
-                if not image_data:
-                    self._set_api_headers(400)
-                    self.wfile.write(json.dumps({"error": "No image data provided"}).encode())
-                    return
+                self._set_api_headers(400)
+                self.wfile.write(json.dumps({"error": "No backup data provided"}).encode())
+        else:
+            self._set_api_headers(503)
+            self.wfile.write(json.dumps({"error": "Database not available"}).encode())
 
-                # Remove cabeçalho se presente (data:image/jpeg;base64,...)
-                if ',' in image_data:
-                    header, encoded = image_data.split(',', 1)
-                else:
-                    encoded = image_data
+    @API_ROUTER.route('POST', '/api/upload-image')
+    def _api_post_upload_image(self, post_data):
+        try:
+            data = json.loads(post_data.decode('utf-8'))
+            image_data = data.get('image') # String Base64
+            
+            if not image_data:
+                self._set_api_headers(400)
+                self.wfile.write(json.dumps({"error": "No image data provided"}).encode())
+                return
 
-                import uuid
-                filename = f"img_{uuid.uuid4().hex}.jpg"
-                filepath = os.path.join(IMAGES_DIR, filename)
+            # Remove cabeçalho se presente (data:image/jpeg;base64,...)
+            if ',' in image_data:
+                header, encoded = image_data.split(',', 1)
+            else:
+                encoded = image_data
 
-                with open(filepath, "wb") as f:
-                    f.write(base64.b64decode(encoded))
+            import uuid
+            filename = f"img_{uuid.uuid4().hex}.jpg"
+            filepath = os.path.join(IMAGES_DIR, filename)
 
-                self._set_api_headers()
-                self.wfile.write(json.dumps({
-                    "success": True, 
-                    "url": f"/imagens/{filename}",
-                    "path": filename
-                }).encode())
-            except Exception as e:
-                logger.error(f"Erro ao fazer upload da imagem: {e}")
-                self._set_api_headers(500)
-                self.wfile.write(json.dumps({"error": str(e)}).encode())
-            return
+            with open(filepath, "wb") as f:
+                f.write(base64.b64decode(encoded))
 
-        if self.path == '/api/users':
-            try:
-                data = json.loads(post_data.decode('utf-8'))
-                username = data.get('username', '').strip()
-                password = data.get('password', '')
-                nome = data.get('nome', '').strip()
-                tipo = data.get('tipo', 'funcionario')
-                if not username or not password or not nome:
-                    self._set_api_headers(400)
-                    self.wfile.write(json.dumps({"error": "Campos obrigatórios faltando"}).encode())
-                    return
-                if AUTH_MANAGER:
-                    success = AUTH_MANAGER.create_user(username, password, nome, tipo)
-                    if success:
-                        self._set_api_headers()
-                        self.wfile.write(json.dumps({"success": True}).encode())
-                    else:
-                        self._set_api_headers(400)
-                        self.wfile.write(json.dumps({"error": "Usuário já existe"}).encode())
-                else:
-                    self._set_api_headers(503)
-                    self.wfile.write(json.dumps({"error": "Auth not available"}).encode())
-            except Exception as e:
-                self._set_api_headers(500)
-                self.wfile.write(json.dumps({"error": str(e)}).encode())
-            return
-
-        if self.path == '/api/users/change-password':
-            try:
-                data = json.loads(post_data.decode('utf-8'))
-                username = data.get('username', '')
-                old_password = data.get('old_password', '')
-                new_password = data.get('new_password', '')
-                if not username or not new_password:
-                    self._set_api_headers(400)
-                    self.wfile.write(json.dumps({"error": "Campos obrigatórios faltando"}).encode())
-                    return
-                if AUTH_MANAGER:
-                    success = AUTH_MANAGER.change_password(username, old_password, new_password)
-                    if success:
-                        self._set_api_headers()
-                        self.wfile.write(json.dumps({"success": True}).encode())
-                    else:
-                        self._set_api_headers(400)
-                        self.wfile.write(json.dumps({"error": "Senha atual incorreta ou usuário não encontrado"}).encode())
-                else:
-                    self._set_api_headers(503)
-                    self.wfile.write(json.dumps({"error": "Auth not available"}).encode())
-            except Exception as e:
-                self._set_api_headers(500)
-                self.wfile.write(json.dumps({"error": str(e)}).encode())
-            return
+            self._set_api_headers()
+            self.wfile.write(json.dumps({
+                "success": True, 
+                "url": f"/imagens/{filename}",
+                "path": filename
+            }).encode())
+        except Exception as e:
+            logger.error(f"Erro ao fazer upload da imagem: {e}")
+            self._set_api_headers(500)
+            self.wfile.write(json.dumps({"error": str(e)}).encode())
 
-        if self.path == '/api/backup/settings':
+    @API_ROUTER.route('POST', '/api/users')
+    def _api_post_users(self, post_data):
+        try:
             data = json.loads(post_data.decode('utf-8'))
-            if DB_AVAILABLE and DB_MANAGER is not None:
-                success = DB_MANAGER.save_backup_settings(data)
+            username = data.get('username', '').strip()
+            password = data.get('password', '')
+            nome = data.get('nome', '').strip()
+            tipo = data.get('tipo', 'funcionario')
+            if not username or not password or not nome:
+                self._set_api_headers(400)
+                self.wfile.write(json.dumps({"error": "Campos obrigatórios faltando"}).encode())
+                return
+            if AUTH_MANAGER:
+                success = AUTH_MANAGER.create_user(username, password, nome, tipo)
                 if success:
                     self._set_api_headers()
                     self.wfile.write(json.dumps({"success": True}).encode())
                 else:
-                    self._set_api_headers(500)
-                    self.wfile.write(json.dumps({"error": "Failed to save settings"}).encode())
+                    self._set_api_headers(400)
+                    self.wfile.write(json.dumps({"error": "Usuário já existe"}).encode())
             else:
                 self._set_api_headers(503)
-                self.wfile.write(json.dumps({"error": "Database not available"}).encode())
-            return
+                self.wfile.write(json.dumps({"error": "Auth not available"}).encode())
+        except Exception as e:
+            self._set_api_headers(500)
+            self.wfile.write(json.dumps({"error": str(e)}).encode())
 
-        if self.path == '/api/solicitacoes':
-            try:
-                data = json.loads(post_data.decode('utf-8'))
-                
-                # Validação básica
-                if not data.get('clientId') or not data.get('bikeId'):
+    @API_ROUTER.route('POST', '/api/users/change-password')
+    def _api_post_users_change_password(self, post_data):
+        try:
+            data = json.loads(post_data.decode('utf-8'))
+            username = data.get('username', '')
+            old_password = data.get('old_password', '')
+            new_password = data.get('new_password', '')
+            if not username or not new_password:
+                self._set_api_headers(400)
+                self.wfile.write(json.dumps({"error": "Campos obrigatórios faltando"}).encode())
+                return
+            if AUTH_MANAGER:
+                success = AUTH_MANAGER.change_password(username, old_password, new_password)
+                if success:
+                    self._set_api_headers()
+                    self.wfile.write(json.dumps({"success": True}).encode())
+                else:
                     self._set_api_headers(400)
-                    self.wfile.write(json.dumps({"error": "Missing required fields"}).encode())
-                    return
-
-                solicitacoes = self._load_solicitacoes()
-                
-                # Adicionar ID e timestamp se ausentes
-                import uuid
-                new_solicitacao = {
-                    "id": str(uuid.uuid4()),
-                    "clientId": data.get('clientId'),
-                    "bikeId": data.get('bikeId'),
-                    "tipo": data.get('tipo', 'entrada'),
-                    "timestamp": data.get('timestamp') or datetime.now().isoformat()
-                }
-                
-                solicitacoes.append(new_solicitacao)
-                self._save_solicitacoes(solicitacoes)
+                    self.wfile.write(json.dumps({"error": "Senha atual incorreta ou usuário não encontrado"}).encode())
+            else:
+                self._set_api_headers(503)
+                self.wfile.write(json.dumps({"error": "Auth not available"}).encode())
+        except Exception as e:
+            self._set_api_headers(500)
+            self.wfile.write(json.dumps({"error": str(e)}).encode())
 
-                self._set_api_headers(201)
-                self.wfile.write(json.dumps({"success": True, "id": new_solicitacao["id"]}).encode())
-                
-            except Exception as e:
-                logger.error(f"Erro ao criar solicitação: {e}")
+    @API_ROUTER.route('POST', '/api/backup/settings')
+    def _api_post_backup_settings(self, post_data):
+        data = json.loads(post_data.decode('utf-8'))
+        if DB_AVAILABLE and DB_MANAGER is not None:
+            success = DB_MANAGER.save_backup_settings(data)
+            if success:
+                self._set_api_headers()
+                self.wfile.write(json.dumps({"success": True}).encode())
+            else:
                 self._set_api_headers(500)
-                self.wfile.write(json.dumps({"error": str(e)}).encode())
-            return
-
-            return
+                self.wfile.write(json.dumps({"error": "Failed to save settings"}).encode())
+        else:
+            self._set_api_headers(503)
+            self.wfile.write(json.dumps({"error": "Database not available"}).encode())
 
-        if self.path == '/api/mobile/register-client':
-            try:
-                data = json.loads(post_data.decode('utf-8'))
-                
-                # Verificar se cliente já existe
-                cpf = data.get('cpf')
-                
-                # Verificação manual de arquivo por segurança
-                cpf_clean = cpf.replace('.', '').replace('-', '')
-                filepath = os.path.join(CLIENTS_DIR, f"{cpf_clean}.json")
-                if os.path.exists(filepath):
-                    self._set_api_headers(400)
-                    self.wfile.write(json.dumps({"error": "CPF já cadastrado"}).encode())
-                    return
+    @API_ROUTER.route('POST', '/api/admin/sql-profile/reset')
+    def _api_post_admin_sql_profile_reset(self, post_data):
+        if DB_AVAILABLE and DB_MANAGER is not None:
+            DB_MANAGER.reset_query_profile()
+            self._set_api_headers()
+            self.wfile.write(json.dumps({"success": True}).encode())
+        else:
+            self._set_api_headers(503)
+            self.wfile.write(json.dumps({"error": "Database not available"}).encode())
 
-                # Criar objeto do cliente
-                import uuid
-                new_client = {
-                    "id": str(uuid.uuid4()),
-                    "nome": data.get('nome').upper(), # Garantir maiúsculas também no backend
-                    "cpf": cpf,
-                    "telefone": data.get('telefone', ''),
-                    "bicicletas": [],
-                    "ativo": True,
-                    "dataCadastro": datetime.now().isoformat()
-                }
-
-                # Salvar em arquivo manualmente
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    json.dump(new_client, f, ensure_ascii=False, indent=2)
-                
-                if JOB_MANAGER:
-                    JOB_MANAGER.notify_change('clients')
+    @API_ROUTER.route('POST', '/api/solicitacoes')
+    def _api_post_solicitacoes(self, post_data):
+        try:
+            data = json.loads(post_data.decode('utf-8'))
+            
+            # Validação básica
+            if not data.get('clientId') or not data.get('bikeId'):
+                self._set_api_headers(400)
+                self.wfile.write(json.dumps({"error": "Missing required fields"}).encode())
+                return
 
-                self._set_api_headers(201)
-                self.wfile.write(json.dumps({"success": True, "client": new_client}).encode())
+            new_solicitacao = {
+                "id": str(uuid.uuid4()),
+                "clientId": data.get('clientId'),
+                "bikeId": data.get('bikeId'),
+                "tipo": data.get('tipo', 'entrada'),
+                "timestamp": data.get('timestamp') or datetime.now().isoformat(),
+                "status": SOLICITACAO_PENDENTE
+            }
+            
+            if solicitacoes_in_db():
+                # Uma única inserção na fila, sem reler as demais
+                saved = DB_MANAGER.add_solicitacao(new_solicitacao)
+                if saved is None:
+                    self._set_api_headers(500)
+                    self.wfile.write(json.dumps({"error": "Failed to save solicitação"}).encode())
+                    return
+                new_solicitacao = saved
+            else:
+                with SOLICITACOES_FILE_LOCK:
+                    solicitacoes = self._load_solicitacoes()
+                    solicitacoes.append(new_solicitacao)
+                    self._save_solicitacoes(solicitacoes)
+            publish_solicitacao('nova', new_solicitacao)
+
+            self._set_api_headers(201)
+            self.wfile.write(json.dumps({"success": True, "id": new_solicitacao["id"]}).encode())
+            
+        except Exception as e:
+            logger.error(f"Erro ao criar solicitação: {e}")
+            self._set_api_headers(500)
+            self.wfile.write(json.dumps({"error": str(e)}).encode())
 
-            except Exception as e:
-                logger.error(f"Erro ao registrar cliente: {e}")
-                self._set_api_headers(500)
-                self.wfile.write(json.dumps({"error": str(e)}).encode())
+    @API_ROUTER.route('POST', '/api/solicitacoes/claim')
+    def _api_post_solicitacoes_claim(self, post_data):
+        try:
+            data = json.loads(post_data.decode('utf-8') or '{}')
+            limit = max(1, min(int(data.get('limit', 1)), 100))
+        except (json.JSONDecodeError, UnicodeDecodeError, TypeError, ValueError):
+            self._set_api_headers(400)
+            self.wfile.write(json.dumps({"error": "Dados inválidos"}).encode())
             return
+        operador = data.get('operador')
+        if solicitacoes_in_db():
+            claimed = DB_MANAGER.claim_solicitacoes(operador, limit)
+        else:
+            claimed = self._claim_solicitacoes_file(operador, limit)
+        for solicitacao in claimed:
+            publish_solicitacao('reservada', solicitacao)
+        self._set_api_headers()
+        self.wfile.write(json.dumps({"success": True, "solicitacoes": claimed}).encode())
 
-        if self.path == '/api/mobile/bike/add':
-            try:
-                data = json.loads(post_data.decode('utf-8'))
-                client_id = data.get('clientId')
-                bike_data = data.get('bike')
-
-                if not client_id or not bike_data:
-                    self._set_api_headers(400)
-                    self.wfile.write(json.dumps({"error": "Dados incompletos"}).encode())
-                    return
+    @API_ROUTER.route('POST', '/api/solicitacoes/<solicitacao_id>/complete')
+    def _api_post_solicitacao_complete(self, post_data, solicitacao_id):
+        self._complete_solicitacao(post_data, solicitacao_id)
 
-                # Encontrar cliente (precisa buscar em todos os arquivos se não temos o nome/cpf)
-                # Mas tipicamente podemos otimizar. Por enquanto, varrer diretório já que não temos DB_MANAGER ativo com certeza.
-                # Na verdade, iterar e encontrar por ID.
-                
-                target_file = None
-                client = None
-
-                if os.path.exists(CLIENTS_DIR):
-                    for filename in os.listdir(CLIENTS_DIR):
-                        if filename.endswith('.json'):
-                            try:
-                                fp = os.path.join(CLIENTS_DIR, filename)
-                                with open(fp, 'r', encoding='utf-8') as f:
-                                    c = json.load(f)
-                                    if c.get('id') == client_id:
-                                        client = c
-                                        target_file = fp
-                                        break
-                            except:
-                                continue
-                
-                if not client:
-                    self._set_api_headers(404)
-                    self.wfile.write(json.dumps({"error": "Cliente não encontrado"}).encode())
-                    return
+    @API_ROUTER.route('POST', '/api/mobile/register-client')
+    def _api_post_mobile_register_client(self, post_data):
+        try:
+            data = json.loads(post_data.decode('utf-8'))
+            
+            # Verificar se cliente já existe
+            cpf = data.get('cpf')
+            if not normalize_cpf(cpf):
+                self._set_api_headers(400)
+                self.wfile.write(json.dumps({"error": "CPF inválido"}).encode())
+                return
+            
+            if self._find_client_by_cpf(cpf) is not None:
+                self._set_api_headers(400)
+                self.wfile.write(json.dumps({"error": "CPF já cadastrado"}).encode())
+                return
 
-                # Tratar foto
-                photo_data = bike_data.get('photo')
-                photo_url = ''
-                if photo_data:
-                    if ',' in photo_data:
-                        _, encoded = photo_data.split(',', 1)
-                    else:
-                        encoded = photo_data
-                    
-                    import uuid
-                    filename = f"bike_{uuid.uuid4().hex}.jpg"
-                    img_path = os.path.join(IMAGES_DIR, filename)
-                    with open(img_path, "wb") as f:
-                        f.write(base64.b64decode(encoded))
-                    photo_url = f"/imagens/{filename}"
-
-                # Adicionar bicicleta
-                import uuid
-                new_bike = {
-                    "id": str(uuid.uuid4()),
-                    "marca": bike_data.get('marca').upper(),
-                    "modelo": bike_data.get('modelo').upper(),
-                    "cor": bike_data.get('cor').upper(),
-                    "foto": photo_url
-                }
-                
-                if 'bicicletas' not in client:
-                    client['bicicletas'] = []
-                
-                client['bicicletas'].append(new_bike)
+            # Criar objeto do cliente
+            import uuid
+            new_client = {
+                "id": str(uuid.uuid4()),
+                "nome": data.get('nome').upper(), # Garantir maiúsculas também no backend
+                "cpf": cpf,
+                "telefone": data.get('telefone', ''),
+                "bicicletas": [],
+                "ativo": True,
+                "dataCadastro": datetime.now().isoformat()
+            }
 
-                # Salvar cliente atualizado
-                with open(target_file, 'w', encoding='utf-8') as f:
-                    json.dump(client, f, ensure_ascii=False, indent=2)
+            JSON_STORE.clientes.put(normalize_cpf(cpf), new_client)
+            publish_change('cliente', 'save', new_client['id'], new_client, resource='clients')
 
-                if JOB_MANAGER:
-                    JOB_MANAGER.notify_change('clients')
+            self._set_api_headers(201)
+            self.wfile.write(json.dumps({"success": True, "client": new_client}).encode())
 
-                self._set_api_headers(200)
-                self.wfile.write(json.dumps({"success": True, "client": client}).encode())
+        except Exception as e:
+            logger.error(f"Erro ao registrar cliente: {e}")
+            self._set_api_headers(500)
+            self.wfile.write(json.dumps({"error": str(e)}).encode())
 
-            except Exception as e:
-                logger.error(f"Erro ao adicionar bicicleta: {e}")
-                self._set_api_headers(500)
-                self.wfile.write(json.dumps({"error": str(e)}).encode())
-            return
+    @API_ROUTER.route('POST', '/api/mobile/bike/add')
+    def _api_post_mobile_bike_add(self, post_data):
+        try:
+            data = json.loads(post_data.decode('utf-8'))
+            client_id = data.get('clientId')
+            bike_data = data.get('bike')
 
-        if self.path == '/api/solicitacoes/process':
-            try:
-                data = json.loads(post_data.decode('utf-8'))
-                solicitacao_id = data.get('id')
-                action = data.get('action') # 'approve' ou 'reject'
+            if not client_id or not bike_data:
+                self._set_api_headers(400)
+                self.wfile.write(json.dumps({"error": "Dados incompletos"}).encode())
+                return
 
-                solicitacoes = self._load_solicitacoes()
-                
-                # Remove da lista independente da ação (aprovar trata a lógica no frontend/backend, rejeitar apenas remove)
-                # Em um app real, o backend também faria a lógica de criar registro se aprovado por segurança.
-                # Por enquanto, o frontend chama create_registro, o backend apenas remove a solicitação.
-                # O JS 'approve' chama criação interna e depois chama este endpoint para remover.
-                # Então aqui apenas removemos.
-                
-                new_solicitacoes = [s for s in solicitacoes if s['id'] != solicitacao_id]
-                self._save_solicitacoes(new_solicitacoes)
+            # Encontrar cliente pelo id (mapa id→CPF do armazenamento JSON)
+            found = JSON_STORE.clientes.get_by_id(client_id)
+            client_key, client = found if found else (None, None)
+            
+            if not client:
+                self._set_api_headers(404)
+                self.wfile.write(json.dumps({"error": "Cliente não encontrado"}).encode())
+                return
 
-                self._set_api_headers()
-                self.wfile.write(json.dumps({"success": True}).encode())
-                
-            except Exception as e:
-                logger.error(f"Erro ao processar solicitação: {e}")
-                self._set_api_headers(500)
-                self.wfile.write(json.dumps({"error": str(e)}).encode())
-            return
-        
-        if self.path == '/api/mobile/identify':
-            try:
-                data = json.loads(post_data.decode('utf-8'))
-                cpf = data.get('cpf')
-                
-                # Sempre recarregar do disco neste contexto de debug para garantir que vemos a nova bicicleta
-                files_found = []
-                if os.path.exists(CLIENTS_DIR):
-                    for filename in os.listdir(CLIENTS_DIR):
-                        if filename.endswith('.json'):
-                            try:
-                                with open(os.path.join(CLIENTS_DIR, filename), 'r', encoding='utf-8') as f:
-                                    client = json.load(f)
-                                    if client.get('cpf') == cpf:
-                                        found_client = client
-                                        break
-                            except:
-                                continue
-                
-                # Fallback para DB_MANAGER se não encontrado via arquivo direto (ex: se usando SQLite)
-                if not found_client and use_sqlite_storage():
-                     found_client = DB_MANAGER.get_cliente_by_id_or_cpf(cpf)
-                
-                if found_client:
-                    self._set_api_headers()
-                    self.wfile.write(json.dumps({"success": True, "client": found_client}, ensure_ascii=False).encode('utf-8'))
+            # Tratar foto
+            photo_data = bike_data.get('photo')
+            photo_url = ''
+            if photo_data:
+                if ',' in photo_data:
+                    _, encoded = photo_data.split(',', 1)
                 else:
-                    self._set_api_headers() # Retornar 200 OK para que o frontend analise a mensagem de erro
-                    self.wfile.write(json.dumps({"success": False, "error": "Client not found"}).encode())
-            except Exception as e:
-                logger.error(f"Erro na identificação: {e}")
-                self._set_api_headers(500)
-                self.wfile.write(json.dumps({"error": str(e)}).encode())
-            return
-
-        if self.path == '/api/solicitacoes':
-            solicitacao = json.loads(post_data.decode('utf-8'))
-            if not solicitacao.get('id'):
+                    encoded = photo_data
+                
                 import uuid
-                solicitacao['id'] = str(uuid.uuid4())
+                filename = f"bike_{uuid.uuid4().hex}.jpg"
+                img_path = os.path.join(IMAGES_DIR, filename)
+                with open(img_path, "wb") as f:
+                    f.write(base64.b64decode(encoded))
+                photo_url = f"/imagens/{filename}"
+
+            # Adicionar bicicleta
+            import uuid
+            new_bike = {
+                "id": str(uuid.uuid4()),
+                "marca": bike_data.get('marca').upper(),
+                "modelo": bike_data.get('modelo').upper(),
+                "cor": bike_data.get('cor').upper(),
+                "foto": photo_url
+            }
             
-            try:
-                solicitacoes = []
-                if os.path.exists(SOLICITACOES_FILE):
-                    with open(SOLICITACOES_FILE, 'r', encoding='utf-8') as f:
-                        solicitacoes = json.load(f)
-                
-                solicitacoes.append(solicitacao)
-                
-                with open(SOLICITACOES_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(solicitacoes, f, ensure_ascii=False, indent=2)
-                
-                self._set_api_headers()
-                self.wfile.write(json.dumps({"success": True}).encode())
-            except Exception as e:
-                logger.error(f"Erro ao salvar solicitacao: {e}")
-                self._set_api_headers(500)
-                self.wfile.write(json.dumps({"error": str(e)}).encode())
-            return
+            if 'bicicletas' not in client:
+                client['bicicletas'] = []
             
-        if self.path == '/api/solicitacoes/process':
+            client['bicicletas'].append(new_bike)
+
+            JSON_STORE.clientes.put(client_key, client)
+            publish_change('cliente', 'save', client['id'], client, resource='clients')
+
+            self._set_api_headers(200)
+            self.wfile.write(json.dumps({"success": True, "client": client}).encode())
+
+        except Exception as e:
+            logger.error(f"Erro ao adicionar bicicleta: {e}")
+            self._set_api_headers(500)
+            self.wfile.write(json.dumps({"error": str(e)}).encode())
+
+    @API_ROUTER.route('POST', '/api/solicitacoes/process')
+    def _api_post_solicitacoes_process(self, post_data):
+        # O JS 'approve' cria o registro e depois chama este endpoint para concluir a solicitação
+        self._complete_solicitacao(post_data)
+
+    @API_ROUTER.route('POST', '/api/mobile/identify')
+    def _api_post_mobile_identify(self, post_data):
+        try:
             data = json.loads(post_data.decode('utf-8'))
-            solicitacao_id = data.get('id')
-            action = data.get('action') # 'approve' ou 'reject'
+            found_client = self._find_client_by_cpf(data.get('cpf'))
             
-            try:
-                solicitacoes = []
-                if os.path.exists(SOLICITACOES_FILE):
-                    with open(SOLICITACOES_FILE, 'r', encoding='utf-8') as f:
-                        solicitacoes = json.load(f)
-                
-                # Filtrar a solicitação processada
-                new_solicitacoes = [s for s in solicitacoes if s['id'] != solicitacao_id]
-                
-                with open(SOLICITACOES_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(new_solicitacoes, f, ensure_ascii=False, indent=2)
-                
+            if found_client:
                 self._set_api_headers()
-                self.wfile.write(json.dumps({"success": True}).encode())
-            except Exception as e:
-                logger.error(f"Erro ao processar solicitacao: {e}")
-                self._set_api_headers(500)
-                self.wfile.write(json.dumps({"error": str(e)}).encode())
-            return
-
-        self._set_api_headers(404)
-        self.wfile.write(json.dumps({"error": "Not found"}).encode())
-    
-    def _handle_api_delete(self):
-        if self.path.startswith('/api/users/'):
-            username = self.path.split('/')[-1]
-            if AUTH_MANAGER:
-                success = AUTH_MANAGER.delete_user(username)
-                if success:
-                    self._set_api_headers()
-                    self.wfile.write(json.dumps({"success": True}).encode())
-                else:
-                    self._set_api_headers(400)
-                    self.wfile.write(json.dumps({"error": "Não é possível remover este usuário"}).encode())
+                self.wfile.write(json.dumps({"success": True, "client": found_client}, ensure_ascii=False).encode('utf-8'))
             else:
-                self._set_api_headers(503)
-                self.wfile.write(json.dumps({"error": "Auth not available"}).encode())
-            return
+                self._set_api_headers() # Retornar 200 OK para que o frontend analise a mensagem de erro
+                self.wfile.write(json.dumps({"success": False, "error": "Client not found"}).encode())
+        except Exception as e:
+            logger.error(f"Erro na identificação: {e}")
+            self._set_api_headers(500)
+            self.wfile.write(json.dumps({"error": str(e)}).encode())
 
-        if self.path.startswith('/api/client/'):
-            param = self.path.split('/')[-1]
-            if use_sqlite_storage():
-                client = DB_MANAGER.get_cliente_by_id_or_cpf(param)
-                if client:
-                    success = DB_MANAGER.delete_cliente(client['id'])
-                    if success:
-                        DB_MANAGER.add_pending_sync('cliente', 'delete', {'id': client['id']})
-                        self._set_api_headers()
-                        self.wfile.write(json.dumps({"success": True}).encode())
-                    else:
-                        self._set_api_headers(500)
-                        self.wfile.write(json.dumps({"error": "Failed to delete client"}).encode())
-                else:
-                    self._set_api_headers(404)
-                    self.wfile.write(json.dumps({"error": "Client not found"}).encode())
+    # ========== ROTAS DELETE ==========
+    @API_ROUTER.route('DELETE', '/api/users/<username>')
+    def _api_delete_users(self, username):
+        if AUTH_MANAGER:
+            success = AUTH_MANAGER.delete_user(username)
+            if success:
+                self._set_api_headers()
+                self.wfile.write(json.dumps({"success": True}).encode())
             else:
-                self._delete_client_file(cpf)
-            return
-        
-        if self.path.startswith('/api/registro/'):
-            registro_id = self.path.split('/')[-1]
-            if use_sqlite_storage():
-                success = DB_MANAGER.delete_registro(registro_id)
+                self._set_api_headers(400)
+                self.wfile.write(json.dumps({"error": "Não é possível remover este usuário"}).encode())
+        else:
+            self._set_api_headers(503)
+            self.wfile.write(json.dumps({"error": "Auth not available"}).encode())
+
+    @API_ROUTER.route('DELETE', '/api/client/<param>')
+    def _api_delete_client(self, param):
+        if use_sqlite_storage():
+            client = DB_MANAGER.get_cliente_by_id_or_cpf(param)
+            if client:
+                success = DB_MANAGER.delete_cliente(client['id'])
                 if success:
+                    DB_MANAGER.add_pending_sync('cliente', 'delete', {'id': client['id']})
+                    publish_change('cliente', 'delete', client['id'], {'cpf': client.get('cpf')},
+                                   resource='clients')
                     self._set_api_headers()
                     self.wfile.write(json.dumps({"success": True}).encode())
                 else:
-                    self._set_api_headers(404)
-                    self.wfile.write(json.dumps({"error": "Registro not found"}).encode())
+                    self._set_api_headers(500)
+                    self.wfile.write(json.dumps({"error": "Failed to delete client"}).encode())
             else:
-                deleted = False
-                if os.path.exists(REGISTROS_DIR):
-                    for root, dirs, files in os.walk(REGISTROS_DIR):
-                        fname = f"{registro_id}.json"
-                        if fname in files:
-                            os.remove(os.path.join(root, fname))
-                            deleted = True
-                            break
+                self._set_api_headers(404)
+                self.wfile.write(json.dumps({"error": "Client not found"}).encode())
+        else:
+            self._delete_client_file(param)
+
+    @API_ROUTER.route('DELETE', '/api/registro/<registro_id>')
+    def _api_delete_registro(self, registro_id):
+        if use_sqlite_storage():
+            success = DB_MANAGER.delete_registro(registro_id)
+            if success:
+                publish_change('registro', 'delete', registro_id, resource='registros')
                 self._set_api_headers()
-                self.wfile.write(json.dumps({"success": True, "deleted": deleted}).encode())
-            return
-        
-        # ========== BACKUP DELETE ENDPOINT ==========
-        if self.path.startswith('/api/backup/'):
-            filename = self.path.split('/')[-1]
-            if DB_AVAILABLE and DB_MANAGER is not None:
-                success = DB_MANAGER.delete_backup(filename)
-                if success:
-                    self._set_api_headers()
-                    self.wfile.write(json.dumps({"success": True}).encode())
-                else:
-                    self._set_api_headers(404)
-                    self.wfile.write(json.dumps({"error": "Backup not found"}).encode())
+                self.wfile.write(json.dumps({"success": True}).encode())
             else:
-                self._set_api_headers(503)
-                self.wfile.write(json.dumps({"error": "Database not available"}).encode())
-            return
-        
-        self._set_api_headers(404)
-        self.wfile.write(json.dumps({"error": "Not found"}).encode())
+                self._set_api_headers(404)
+                self.wfile.write(json.dumps({"error": "Registro not found"}).encode())
+        else:
+            deleted = JSON_STORE.registros.delete(registro_id)
+            if deleted:
+                publish_change('registro', 'delete', registro_id, resource='registros')
+            self._set_api_headers()
+            self.wfile.write(json.dumps({"success": True, "deleted": deleted}).encode())
+
+    # ========== BACKUP DELETE ENDPOINT ==========
+    @API_ROUTER.route('DELETE', '/api/backup/<filename>')
+    def _api_delete_backup(self, filename):
+        if DB_AVAILABLE and DB_MANAGER is not None:
+            success = DB_MANAGER.delete_backup(filename)
+            if success:
+                self._set_api_headers()
+                self.wfile.write(json.dumps({"success": True}).encode())
+            else:
+                self._set_api_headers(404)
+                self.wfile.write(json.dumps({"error": "Backup not found"}).encode())
+        else:
+            self._set_api_headers(503)
+            self.wfile.write(json.dumps({"error": "Database not available"}).encode())
+
     
     def _get_all_clients_files(self):
         """Retorna todos os clientes de arquivos JSON"""
-        try:
-            clients = []
-            if os.path.exists(CLIENTS_DIR):
-                for filename in os.listdir(CLIENTS_DIR):
-                    if filename.endswith('.json'):
-                        filepath = os.path.join(CLIENTS_DIR, filename)
-                        try:
-                            with open(filepath, 'r', encoding='utf-8') as f:
-                                clients.append(json.load(f))
-                        except Exception as e:
-                            logger.error(f"Erro ao ler {filename}: {e}")
-            
-            self._set_api_headers()
-            self.wfile.write(json.dumps(clients, ensure_ascii=False).encode('utf-8'))
-        except Exception as e:
-            logger.error(f"Erro em _get_all_clients_files: {e}")
-            self._set_api_headers(500)
-            self.wfile.write(json.dumps({"error": "Internal server error"}).encode())
+        self._stream_json_array(iter_clients_files())
+    
+    def _find_client_by_cpf(self, cpf):
+        """
+        Cliente pelo CPF em qualquer formatação: índice cpf_normalizado do SQLite
+        e, se não estiver lá, o arquivo <cpf>.json (cadastros feitos pelo app móvel).
+        """
+        if use_sqlite_storage():
+            client = DB_MANAGER.get_cliente_by_cpf(cpf)
+            if client:
+                return client
+        return load_client_file(cpf)
     
     def _get_client_file(self, cpf):
         """Retorna um cliente específico por CPF"""
-        cpf_clean = cpf.replace('.', '').replace('-', '')
-        filepath = os.path.join(CLIENTS_DIR, f"{cpf_clean}.json")
-        
-        if os.path.exists(filepath):
-            with open(filepath, 'r', encoding='utf-8') as f:
-                client = json.load(f)
+        client = load_client_file(cpf)
+        if client is not None:
             self._set_api_headers()
             self.wfile.write(json.dumps(client, ensure_ascii=False).encode('utf-8'))
         else:
@@ -1594,82 +2551,44 @@ class CombinedHTTPHandler(http.server.SimpleHTTPRequestHandler):
     
     def _save_client_file(self, client):
         """Salva cliente em arquivo JSON"""
-        cpf_clean = client['cpf'].replace('.', '').replace('-', '')
-        filepath = os.path.join(CLIENTS_DIR, f"{cpf_clean}.json")
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(client, f, ensure_ascii=False, indent=2)
-        
+        cpf_clean = normalize_cpf(client['cpf'])
+        JSON_STORE.clientes.put(cpf_clean, client)
+        publish_change('cliente', 'save', client.get('id') or cpf_clean, client, resource='clients')
         self._set_api_headers()
         self.wfile.write(json.dumps({"success": True, "cpf": cpf_clean}).encode())
     
     def _delete_client_file(self, cpf):
-        """Deleta um cliente por arquivo"""
-        cpf_clean = cpf.replace('.', '').replace('-', '')
-        filepath = os.path.join(CLIENTS_DIR, f"{cpf_clean}.json")
-        
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        """Deleta um cliente do armazenamento JSON"""
+        key = normalize_cpf(cpf)
+        client = JSON_STORE.clientes.get(key) if key else None
+        if client is not None and JSON_STORE.clientes.delete(key):
+            publish_change('cliente', 'delete', client.get('id') or key, {'cpf': client.get('cpf')},
+                           resource='clients')
             self._set_api_headers()
             self.wfile.write(json.dumps({"success": True}).encode())
         else:
             self._set_api_headers(404)
             self.wfile.write(json.dumps({"error": "Client not found"}).encode())
     
-    def _get_all_registros_files(self):
-        """Retorna todos os registros de arquivos"""
-        registros = []
-        
-        if os.path.exists(REGISTROS_DIR):
-            for year in os.listdir(REGISTROS_DIR):
-                year_path = os.path.join(REGISTROS_DIR, year)
-                if not os.path.isdir(year_path):
-                    continue
-                    
-                for month in os.listdir(year_path):
-                    month_path = os.path.join(year_path, month)
-                    if not os.path.isdir(month_path):
-                        continue
-                        
-                    for day in os.listdir(month_path):
-                        day_path = os.path.join(month_path, day)
-                        if not os.path.isdir(day_path):
-                            continue
-                            
-                        for filename in os.listdir(day_path):
-                            if filename.endswith('.json'):
-                                filepath = os.path.join(day_path, filename)
-                                try:
-                                    with open(filepath, 'r', encoding='utf-8') as f:
-                                        registros.append(json.load(f))
-                                except Exception as e:
-                                    logger.error(f"Erro ao ler registro {filepath}: {e}")
+    def _iter_registros_files(self):
+        """Gera os registros do armazenamento JSON um a um"""
+        return JSON_STORE.registros.iter_all()
+
+    def _get_all_registros_files(self, filters=None):
+        """Retorna todos os registros de arquivos (ou uma página, se houver filtros)"""
+        if filters is None or paginate_registros is None:
+            self._stream_json_array(self._iter_registros_files())
+            return
         
+        page = paginate_registros(list(self._iter_registros_files()), **filters)
         self._set_api_headers()
-        self.wfile.write(json.dumps(registros, ensure_ascii=False).encode('utf-8'))
+        self.wfile.write(json.dumps(page, ensure_ascii=False).encode('utf-8'))
     
     def _save_registro_file(self, registro):
-        """Salva um registro em arquivo"""
-        from datetime import datetime
+        """Salva um registro no armazenamento JSON"""
         try:
-            if 'dataHoraEntrada' in registro:
-                entrada = datetime.fromisoformat(registro['dataHoraEntrada'].replace('Z', '+00:00'))
-            elif 'data' in registro and 'entrada' in registro:
-                dt_str = f"{registro['data']}T{registro['entrada'] or '00:00'}:00"
-                entrada = datetime.fromisoformat(dt_str)
-            else:
-                entrada = datetime.now()
-            year = str(entrada.year)
-            month = str(entrada.month).zfill(2)
-            day = str(entrada.day).zfill(2)
-
-            dir_path = os.path.join(REGISTROS_DIR, year, month, day)
-            os.makedirs(dir_path, exist_ok=True)
-
-            filepath = os.path.join(dir_path, f"{registro['id']}.json")
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(registro, f, ensure_ascii=False, indent=2)
-
+            JSON_STORE.registros.put(registro['id'], registro)
+            publish_change('registro', 'save', registro['id'], registro, resource='registros')
             self._set_api_headers()
             self.wfile.write(json.dumps({"success": True, "id": registro['id']}).encode())
         except Exception as e:
@@ -1703,6 +2622,10 @@ def run_scheduler():
         time.sleep(600)  # 10 minutos
         try:
             check_automatic_backup()
+            JSON_STORE.maintenance()
+            if solicitacoes_in_db():
+                DB_MANAGER.purge_solicitacoes()
+                DB_MANAGER.purge_exclusoes()
         except Exception as e:
             logger.error(f"Erro no agendador: {e}")
 
@@ -1712,26 +2635,429 @@ class ThreadingHTTPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
     daemon_threads = True
 
 
+# Modo do servidor: 'threading' (uma thread por conexão), 'pool' ou 'asyncio'
+SERVER_MODE = os.getenv('SERVER_MODE', 'threading').lower()
+SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', 16))
+SERVER_QUEUE_SIZE = int(os.getenv('SERVER_QUEUE_SIZE', 64))
+SSE_MAX_CLIENTS = int(os.getenv('SSE_MAX_CLIENTS', 200))
+SSE_KEEPALIVE_INTERVAL = 25
+SSE_MAX_PENDING_BYTES = 256 * 1024
+
+
+class SSEConnectionHub:
+    """
+    Mantém todas as conexões SSE abertas em uma única thread com selectors,
+    em vez de prender uma thread (ou um worker do pool) por assinante.
+    Clientes lentos acumulam no máximo SSE_MAX_PENDING_BYTES antes de serem
+    desconectados.
+    """
+
+    def __init__(self, max_clients=SSE_MAX_CLIENTS, keepalive=SSE_KEEPALIVE_INTERVAL,
+                 max_pending=SSE_MAX_PENDING_BYTES):
+        self.max_clients = max_clients
+        self.keepalive = keepalive
+        self.max_pending = max_pending
+        self._selector = selectors.DefaultSelector()
+        self._pending = {}
+        self._inbox = queue.Queue()
+        self._lock = threading.Lock()
+        self._count = 0
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='sse-hub', daemon=True)
+        self._thread.start()
+
+    def client_count(self):
+        with self._lock:
+            return self._count
+
+    def has_capacity(self):
+        return self.client_count() < self.max_clients
+
+    def adopt(self, sock, initial=None):
+        """
+        Assume a conexão (headers já enviados). `initial()` monta o evento
+        inicial na thread do hub, depois de a conexão virar assinante: nenhum
+        evento publicado entre o init e a adoção se perde. False se lotado.
+        """
+        with self._lock:
+            if self._count >= self.max_clients:
+                return False
+            self._count += 1
+        self._inbox.put(('add', (sock, initial)))
+        self._wake()
+        return True
+
+    def broadcast(self, data: bytes):
+        self._inbox.put(('send', data))
+        self._wake()
+
+    def close(self):
+        self._running = False
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._wakeup_w.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass
+
+    def _drop(self, sock):
+        if sock in self._pending:
+            del self._pending[sock]
+            with self._lock:
+                self._count -= 1
+            try:
+                self._selector.unregister(sock)
+            except (KeyError, ValueError):
+                pass
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def _queue_data(self, sock, data):
+        buffer = self._pending.get(sock)
+        if buffer is None:
+            return
+        buffer.extend(data)
+        if len(buffer) > self.max_pending:
+            self._drop(sock)
+            return
+        self._flush(sock)
+
+    def _flush(self, sock):
+        buffer = self._pending.get(sock)
+        if buffer is None:
+            return
+        try:
+            while buffer:
+                sent = sock.send(buffer)
+                del buffer[:sent]
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError:
+            self._drop(sock)
+            return
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if buffer else 0)
+        try:
+            self._selector.modify(sock, events)
+        except (KeyError, ValueError):
+            pass
+
+    def _process_inbox(self):
+        while True:
+            try:
+                action, payload = self._inbox.get_nowait()
+            except queue.Empty:
+                return
+            if action == 'add':
+                sock, initial = payload
+                sock.setblocking(False)
+                self._pending[sock] = bytearray()
+                self._selector.register(sock, selectors.EVENT_READ)
+                if initial is not None:
+                    try:
+                        self._queue_data(sock, initial())
+                    except Exception as e:
+                        logger.error(f"Erro ao montar o evento inicial SSE: {e}", exc_info=True)
+                        self._drop(sock)
+            else:
+                for sock in list(self._pending):
+                    self._queue_data(sock, payload)
+
+    def _run(self):
+        next_keepalive = time.monotonic() + self.keepalive
+        while self._running:
+            timeout = max(0.0, next_keepalive - time.monotonic())
+            for key, mask in self._selector.select(timeout):
+                sock = key.fileobj
+                if sock is self._wakeup_r:
+                    try:
+                        while sock.recv(4096):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+                    continue
+                if mask & selectors.EVENT_READ:
+                    # Assinantes SSE não enviam dados: leitura vazia = desconectou
+                    try:
+                        if not sock.recv(4096):
+                            self._drop(sock)
+                            continue
+                    except (BlockingIOError, InterruptedError):
+                        pass
+                    except OSError:
+                        self._drop(sock)
+                        continue
+                if mask & selectors.EVENT_WRITE:
+                    self._flush(sock)
+            self._process_inbox()
+            if time.monotonic() >= next_keepalive:
+                for sock in list(self._pending):
+                    self._queue_data(sock, b": keepalive\n\n")
+                next_keepalive = time.monotonic() + self.keepalive
+        for sock in list(self._pending):
+            self._drop(sock)
+
+
+class KeepAliveParker:
+    """
+    Conexões keep-alive ociosas esperam a próxima requisição num selector,
+    em uma única thread, em vez de prender um worker do pool. Quando chega
+    algo a conexão volta à fila (`dispatch`); sem atividade por
+    `idle_timeout` segundos é fechada (`close`).
+    """
+
+    def __init__(self, dispatch, close, idle_timeout=HTTP_KEEPALIVE_TIMEOUT):
+        self.dispatch = dispatch
+        self.close_request = close
+        self.idle_timeout = idle_timeout
+        self._selector = selectors.DefaultSelector()
+        self._inbox = queue.Queue()
+        # sock -> (prazo, client_address), em ordem de prazo (timeout fixo)
+        self._parked = {}
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='http-keepalive', daemon=True)
+        self._thread.start()
+
+    def park(self, sock, client_address):
+        self._inbox.put((sock, client_address))
+        self._wake()
+
+    def parked_count(self):
+        return len(self._parked)
+
+    def close(self):
+        self._running = False
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._wakeup_w.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass
+
+    def _release(self, sock):
+        _, client_address = self._parked.pop(sock)
+        try:
+            self._selector.unregister(sock)
+        except (KeyError, ValueError):
+            pass
+        return client_address
+
+    def _run(self):
+        while self._running:
+            timeout = None
+            if self._parked:
+                first_deadline = next(iter(self._parked.values()))[0]
+                timeout = max(0.0, first_deadline - time.monotonic())
+            for key, _ in self._selector.select(timeout):
+                sock = key.fileobj
+                if sock is self._wakeup_r:
+                    try:
+                        while sock.recv(4096):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+                    continue
+                # Nova requisição (ou fechamento): o worker lê e decide
+                self.dispatch(sock, self._release(sock))
+            while True:
+                try:
+                    sock, client_address = self._inbox.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    self._selector.register(sock, selectors.EVENT_READ)
+                except (KeyError, ValueError, OSError):
+                    self.close_request(sock)
+                    continue
+                self._parked[sock] = (time.monotonic() + self.idle_timeout, client_address)
+            now = time.monotonic()
+            for sock, (deadline, _) in list(self._parked.items()):
+                if deadline > now:
+                    break
+                self._release(sock)
+                self.close_request(sock)
+        for sock in list(self._parked):
+            self._release(sock)
+            self.close_request(sock)
+
+
+class WorkerPoolHTTPServer(socketserver.TCPServer):
+    """
+    Servidor com número fixo de workers e fila limitada de conexões.
+    Com a fila cheia a conexão recebe 503 imediatamente; conexões SSE são
+    repassadas ao SSEConnectionHub e conexões keep-alive ociosas ao
+    KeepAliveParker, liberando o worker.
+    """
+    allow_reuse_address = True
+
+    def __init__(self, server_address, handler_class, workers=SERVER_WORKERS,
+                 queue_size=SERVER_QUEUE_SIZE, sse_hub=None):
+        super().__init__(server_address, handler_class)
+        self.sse_hub = sse_hub
+        self._requests = queue.Queue(maxsize=max(1, queue_size))
+        self._detached = set()
+        self._parking = {}
+        self._detached_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'accepted': 0, 'rejected': 0, 'busy': 0}
+        self._keepalive = KeepAliveParker(self._dispatch_parked, self.shutdown_request)
+        self._workers = []
+        for i in range(max(1, workers)):
+            worker = threading.Thread(target=self._worker_loop, name=f'http-worker-{i}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def process_request(self, request, client_address):
+        try:
+            self._requests.put_nowait((request, client_address))
+            with self._stats_lock:
+                self._stats['accepted'] += 1
+        except queue.Full:
+            with self._stats_lock:
+                self._stats['rejected'] += 1
+            self._reject(request)
+
+    def _dispatch_parked(self, request, client_address):
+        """Conexão keep-alive com nova requisição volta à fila dos workers"""
+        try:
+            self._requests.put_nowait((request, client_address))
+        except queue.Full:
+            with self._stats_lock:
+                self._stats['rejected'] += 1
+            self._reject(request)
+
+    def _reject(self, request):
+        try:
+            request.settimeout(1)
+            request.sendall(
+                b"HTTP/1.1 503 Service Unavailable\r\n"
+                b"Retry-After: 1\r\n"
+                b"Content-Type: application/json\r\n"
+                b"Content-Length: 30\r\n"
+                b"Connection: close\r\n\r\n"
+                b'{"error": "Servidor ocupado"}\n'
+            )
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def _worker_loop(self):
+        while True:
+            item = self._requests.get()
+            if item is None:
+                return
+            request, client_address = item
+            with self._stats_lock:
+                self._stats['busy'] += 1
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                with self._stats_lock:
+                    self._stats['busy'] -= 1
+                with self._detached_lock:
+                    detached = request in self._detached
+                    self._detached.discard(request)
+                    parked_address = self._parking.pop(request, None)
+                if parked_address is not None:
+                    # Só depois de o handler terminar: a conexão não fica em dois lugares
+                    self._keepalive.park(request, parked_address)
+                elif not detached:
+                    self.shutdown_request(request)
+
+    def detach_to_sse_hub(self, request, initial=None):
+        """Entrega a conexão ao hub SSE; o worker volta ao pool sem fechá-la"""
+        if self.sse_hub is None or not self.sse_hub.adopt(request, initial):
+            return False
+        with self._detached_lock:
+            self._detached.add(request)
+        return True
+
+    def park_keepalive(self, request, client_address):
+        """Ao fim do handler a conexão ociosa vai para o KeepAliveParker"""
+        with self._detached_lock:
+            self._parking[request] = client_address
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queued'] = self._requests.qsize()
+        stats['idle_keepalive'] = self._keepalive.parked_count()
+        stats['workers'] = len(self._workers)
+        stats['queue_size'] = self._requests.maxsize
+        return stats
+
+    def server_close(self):
+        for _ in self._workers:
+            try:
+                self._requests.put_nowait(None)
+            except queue.Full:
+                break
+        self._keepalive.close()
+        if self.sse_hub is not None:
+            self.sse_hub.close()
+        super().server_close()
+
+
+def create_http_server(address=None):
+    """Cria o servidor HTTP conforme SERVER_MODE"""
+    address = address or ("0.0.0.0", PORT)
+    if SERVER_MODE == 'pool':
+        hub = SSEConnectionHub()
+        SSE_BROADCASTER.attach_hub(hub)
+        return WorkerPoolHTTPServer(address, CombinedHTTPHandler, sse_hub=hub)
+    return ThreadingHTTPServer(address, CombinedHTTPHandler)
+
+
+def _log_startup_and_start_scheduler():
+    logger.info(f"🚀 Servidor BICICLETÁRIO (v2.0 Config) rodando em http://0.0.0.0:{PORT}/")
+    if SERVER_MODE == 'pool':
+        logger.info(f"Modo pool: {SERVER_WORKERS} workers, fila de {SERVER_QUEUE_SIZE}, até {SSE_MAX_CLIENTS} conexões SSE")
+    elif SERVER_MODE == 'asyncio':
+        logger.info(f"Modo asyncio: até {SSE_MAX_CLIENTS} conexões SSE no laço de eventos")
+    logger.info(f"API integrada em http://0.0.0.0:{PORT}/api/")
+    logger.info(f"Diretório servido: {os.path.abspath(DIRECTORY)}")
+    logger.info(f"Dados serão salvos em: {os.path.abspath('dados')}/")
+    if DB_AVAILABLE:
+        logger.info("✅ Usando banco de dados SQLite para armazenamento")
+        # Verificar backup automático ao iniciar
+        check_automatic_backup()
+    else:
+        logger.info(f"📁 Usando sistema de arquivos para armazenamento (motor JSON: {JSON_STORE.engine})")
+    
+    # Iniciar agendador de tarefas em segundo plano (backup e manutenção do armazenamento JSON)
+    scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
+    scheduler_thread.start()
+    logger.info("Pressione Ctrl+C para parar o servidor")
+
+
 if __name__ == "__main__":
     try:
-        with ThreadingHTTPServer(("0.0.0.0", PORT), CombinedHTTPHandler) as httpd:
-            logger.info(f"🚀 Servidor BICICLETÁRIO (v2.0 Config) rodando em http://0.0.0.0:{PORT}/")
-            logger.info(f"API integrada em http://0.0.0.0:{PORT}/api/")
-            logger.info(f"Diretório servido: {os.path.abspath(DIRECTORY)}")
-            logger.info(f"Dados serão salvos em: {os.path.abspath('dados')}/")
-            if DB_AVAILABLE:
-                logger.info("✅ Usando banco de dados SQLite para armazenamento")
-                # Verificar backup automático ao iniciar
-                check_automatic_backup()
-                
-                # Iniciar agendador de tarefas em segundo plano
-                scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
-                scheduler_thread.start()
-            else:
-                logger.info("📁 Usando sistema de arquivos para armazenamento")
-            logger.info("Pressione Ctrl+C para parar o servidor")
-            httpd.serve_forever()
+        if SERVER_MODE == 'asyncio':
+            from async_server import run_async_server
+            _log_startup_and_start_scheduler()
+            run_async_server(CombinedHTTPHandler, ("0.0.0.0", PORT), broadcaster=SSE_BROADCASTER,
+                             sse_init=sse_init_event, max_sse_clients=SSE_MAX_CLIENTS)
+        else:
+            with create_http_server() as httpd:
+                _log_startup_and_start_scheduler()
+                httpd.serve_forever()
     except KeyboardInterrupt:
         logger.info("\nServidor interrompido pelo usuário")
     except Exception as e:
         logger.error(f"Erro ao iniciar servidor: {e}", exc_info=True)
+    finally:
+        JSON_WRITER.flush()
+        JSON_STORE.close()
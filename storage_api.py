@@ -10,6 +10,8 @@ from http.server import BaseHTTPRequestHandler, HTTPServer
 from urllib.parse import parse_qs, urlparse
 import threading
 
+from json_store import get_json_store
+
 # Configuração de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -79,18 +81,7 @@ class StorageAPIHandler(BaseHTTPRequestHandler):
     def get_all_clients(self):
         """Retorna todos os clientes"""
         try:
-            clients = []
-            if os.path.exists(CLIENTS_DIR):
-                for filename in os.listdir(CLIENTS_DIR):
-                    if filename.endswith('.json'):
-                        filepath = os.path.join(CLIENTS_DIR, filename)
-                        try:
-                            with open(filepath, 'r', encoding='utf-8') as f:
-                                clients.append(json.load(f))
-                        except json.JSONDecodeError as e:
-                            logger.error(f"Erro ao ler arquivo {filename}: {e}")
-                        except Exception as e:
-                            logger.error(f"Erro inesperado ao processar {filename}: {e}")
+            clients = list(get_json_store(STORAGE_DIR).clientes.iter_all())
             
             self._set_headers()
             self.wfile.write(json.dumps(clients, ensure_ascii=False).encode('utf-8'))
@@ -103,11 +94,9 @@ class StorageAPIHandler(BaseHTTPRequestHandler):
     def get_client(self, cpf):
         """Retorna um cliente específico por CPF"""
         cpf_clean = cpf.replace('.', '').replace('-', '')
-        filepath = os.path.join(CLIENTS_DIR, f"{cpf_clean}.json")
+        client = get_json_store(STORAGE_DIR).clientes.get(cpf_clean)
         
-        if os.path.exists(filepath):
-            with open(filepath, 'r', encoding='utf-8') as f:
-                client = json.load(f)
+        if client is not None:
             self._set_headers()
             self.wfile.write(json.dumps(client, ensure_ascii=False).encode('utf-8'))
         else:
@@ -121,10 +110,7 @@ class StorageAPIHandler(BaseHTTPRequestHandler):
         client = json.loads(post_data.decode('utf-8'))
         
         cpf_clean = client['cpf'].replace('.', '').replace('-', '')
-        filepath = os.path.join(CLIENTS_DIR, f"{cpf_clean}.json")
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(client, f, ensure_ascii=False, indent=2)
+        get_json_store(STORAGE_DIR).clientes.put(cpf_clean, client)
         
         self._set_headers()
         self.wfile.write(json.dumps({"success": True, "cpf": cpf_clean}).encode())
@@ -132,10 +118,8 @@ class StorageAPIHandler(BaseHTTPRequestHandler):
     def delete_client(self, cpf):
         """Deleta um cliente"""
         cpf_clean = cpf.replace('.', '').replace('-', '')
-        filepath = os.path.join(CLIENTS_DIR, f"{cpf_clean}.json")
         
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        if get_json_store(STORAGE_DIR).clientes.delete(cpf_clean):
             self._set_headers()
             self.wfile.write(json.dumps({"success": True}).encode())
         else:
@@ -144,29 +128,7 @@ class StorageAPIHandler(BaseHTTPRequestHandler):
 
     def get_all_registros(self):
         """Retorna todos os registros organizados"""
-        registros = []
-        
-        if os.path.exists(REGISTROS_DIR):
-            for year in os.listdir(REGISTROS_DIR):
-                year_path = os.path.join(REGISTROS_DIR, year)
-                if not os.path.isdir(year_path):
-                    continue
-                    
-                for month in os.listdir(year_path):
-                    month_path = os.path.join(year_path, month)
-                    if not os.path.isdir(month_path):
-                        continue
-                        
-                    for day in os.listdir(month_path):
-                        day_path = os.path.join(month_path, day)
-                        if not os.path.isdir(day_path):
-                            continue
-                            
-                        for filename in os.listdir(day_path):
-                            if filename.endswith('.json'):
-                                filepath = os.path.join(day_path, filename)
-                                with open(filepath, 'r', encoding='utf-8') as f:
-                                    registros.append(json.load(f))
+        registros = list(get_json_store(STORAGE_DIR).registros.iter_all())
         
         self._set_headers()
         self.wfile.write(json.dumps(registros, ensure_ascii=False).encode('utf-8'))
@@ -177,21 +139,8 @@ class StorageAPIHandler(BaseHTTPRequestHandler):
         post_data = self.rfile.read(content_length)
         registro = json.loads(post_data.decode('utf-8'))
         
-        # Organizar por data: ano/mes/dia
-        from datetime import datetime
-        entrada = datetime.fromisoformat(registro['dataHoraEntrada'].replace('Z', '+00:00'))
-        year = str(entrada.year)
-        month = str(entrada.month).zfill(2)
-        day = str(entrada.day).zfill(2)
-        
-        # Criar estrutura de pastas
-        dir_path = os.path.join(REGISTROS_DIR, year, month, day)
-        os.makedirs(dir_path, exist_ok=True)
-        
-        # Salvar com ID do registro
-        filepath = os.path.join(dir_path, f"{registro['id']}.json")
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(registro, f, ensure_ascii=False, indent=2)
+        # Motor files: organizado por data em ano/mes/dia
+        get_json_store(STORAGE_DIR).registros.put(registro['id'], registro)
         
         self._set_headers()
         self.wfile.write(json.dumps({"success": True, "id": registro['id']}).encode())
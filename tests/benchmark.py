@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+"""
+Benchmarks reproduzíveis dos caminhos críticos de armazenamento e da API
+
+Gera conjuntos de dados sintéticos (determinísticos pela semente) em um
+diretório temporário e mede o DatabaseManager, as importações em segundo
+plano, backup/restauração e a latência ponta a ponta de /api/* através de
+um servidor local. Os resultados saem em JSON para comparar commits:
+
+    python3 tests/benchmark.py --output antes.json
+    python3 tests/benchmark.py --output depois.json --compare antes.json
+"""
+import argparse
+import collections
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import re
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PRESETS = {
+    'smoke': {'clients': [200], 'registros': 2000, 'api_clients': 200, 'api_registros': 2000},
+    'quick': {'clients': [1000, 10000], 'registros': 100000, 'api_clients': 10000, 'api_registros': 100000},
+    'full': {'clients': [1000, 10000, 100000], 'registros': 1000000, 'api_clients': 100000, 'api_registros': 1000000},
+}
+
+REGISTROS_SEED_CLIENTS = 1000
+REGISTROS_BATCH = 50000
+IMPORT_MAX_ITEMS = 100000
+
+NOMES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Eduarda', 'Felipe', 'Gabriela', 'Henrique',
+         'Isabela', 'João', 'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Costa',
+              'Ferreira', 'Almeida', 'Ribeiro', 'Carvalho', 'Gomes']
+MARCAS = ['Caloi', 'Monark', 'Oggi', 'Sense', 'Specialized', 'Trek', 'Houston']
+CORES = ['Preta', 'Branca', 'Vermelha', 'Azul', 'Verde', 'Prata', 'Amarela']
+
+
+# ==================== DADOS SINTÉTICOS ====================
+
+def format_cpf(number: int) -> str:
+    digits = f"{number:011d}"
+    return f"{digits[:3]}.{digits[3:6]}.{digits[6:9]}-{digits[9:]}"
+
+
+def generate_clients(count: int, seed: int):
+    """Clientes com 1 a 2 bicicletas; mesma semente, mesmos dados"""
+    rng = random.Random(seed)
+    clients = []
+    for i in range(count):
+        client_id = f"cli{i:07d}"
+        bikes = []
+        for b in range(rng.choice((1, 1, 1, 2))):
+            bikes.append({
+                'id': f"{client_id}-b{b}",
+                'marca': rng.choice(MARCAS),
+                'modelo': f"Modelo {rng.randrange(1, 40)}",
+                'cor': rng.choice(CORES),
+                'aro': str(rng.choice((20, 24, 26, 29))),
+            })
+        clients.append({
+            'id': client_id,
+            'nome': f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {i}",
+            'cpf': format_cpf(10000000000 + i),
+            'telefone': f"(11) 9{rng.randrange(10000000, 99999999)}",
+            'categoria': rng.choice(('', '', 'mensalista', 'avulso')),
+            'comentarios': '',
+            'bicicletas': bikes,
+        })
+    return clients
+
+
+def generate_registros(clients, count: int, seed: int, start: int = 0):
+    """Gera registros de entrada/saída ao longo de um ano, em ordem de id"""
+    rng = random.Random(seed + start)
+    bikes = [(c['id'], b['id']) for c in clients for b in c['bicicletas']]
+    base = datetime(2025, 1, 1)
+    for i in range(start, start + count):
+        cliente_id, bicicleta_id = bikes[rng.randrange(len(bikes))]
+        entrada = base + timedelta(minutes=rng.randrange(365 * 24 * 60))
+        registro = {
+            'id': f"reg{i:08d}",
+            'clienteId': cliente_id,
+            'bicicletaId': bicicleta_id,
+            'dataHoraEntrada': entrada.isoformat(timespec='seconds'),
+            'criadoPor': 'benchmark',
+        }
+        if rng.random() < 0.9:
+            saida = entrada + timedelta(minutes=rng.randrange(15, 600))
+            registro['dataHoraSaida'] = saida.isoformat(timespec='seconds')
+        yield registro
+
+
+def registros_batches(clients, count: int, seed: int, batch: int = REGISTROS_BATCH):
+    """Lotes de registros, para não manter 1M de dicts em memória"""
+    for start in range(0, count, batch):
+        yield list(generate_registros(clients, min(batch, count - start), seed, start))
+
+
+# ==================== MEDIÇÃO ====================
+
+def percentile(sorted_samples, fraction: float) -> float:
+    """Percentil pelo método nearest-rank"""
+    if not sorted_samples:
+        return 0.0
+    index = max(0, min(len(sorted_samples) - 1, int(round(fraction * len(sorted_samples) + 0.5)) - 1))
+    return sorted_samples[index]
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'min': ordered[0],
+        'median': statistics.median(ordered),
+        'mean': statistics.fmean(ordered),
+        'p95': percentile(ordered, 0.95),
+        'p99': percentile(ordered, 0.99),
+        'max': ordered[-1],
+    }
+
+
+def measure(func, repeat: int = 1, setup=None):
+    """Executa `func` `repeat` vezes; `setup` roda fora do tempo medido"""
+    samples = []
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        started = time.perf_counter()
+        if setup is not None:
+            func(arg)
+        else:
+            func()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def measure_each(func, items):
+    """Uma amostra por item (latência de operações individuais)"""
+    samples = []
+    for item in items:
+        started = time.perf_counter()
+        func(item)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def consume(iterable):
+    collections.deque(iterable, maxlen=0)
+
+
+class BenchmarkResults:
+    def __init__(self):
+        self.results = []
+
+    def add(self, group, name, dataset, samples, items=None, variant=None, **extra):
+        summary = summarize(samples)
+        result = {
+            'group': group,
+            'name': name,
+            'variant': variant,
+            'dataset': dataset,
+            'seconds': summary,
+        }
+        if items:
+            result['items'] = items
+            result['items_per_second'] = round(items / summary['median'], 1) if summary['median'] else None
+        result.update(extra)
+        self.results.append(result)
+
+        label = f"{name}[{variant}]" if variant else name
+        data = ' '.join(f"{k}={v}" for k, v in dataset.items())
+        line = f"{group:8} {label:40} {data:32} mediana {summary['median'] * 1000:10.2f} ms"
+        if summary['count'] > 1:
+            line += f"  p95 {summary['p95'] * 1000:9.2f} ms"
+        if items:
+            line += f"  ({result['items_per_second']:,.0f} itens/s)"
+        if extra.get('errors'):
+            line += f"  erros={extra['errors']}"
+        print(line, flush=True)
+        return result
+
+
+@contextmanager
+def workspace(keep: bool = False):
+    """Diretório temporário como cwd (o armazenamento usa caminhos relativos a dados/)"""
+    previous = os.getcwd()
+    path = tempfile.mkdtemp(prefix='biciclet-bench-')
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(previous)
+        if keep:
+            print(f"Dados mantidos em {path}")
+        else:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def wait_job(job_manager, job_id: str, timeout: float = 3600):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = job_manager.get_job(job_id)
+        if job and job['status'] in ('completed', 'failed'):
+            return job
+        time.sleep(0.005)
+    raise TimeoutError(f"Job {job_id} não terminou em {timeout}s")
+
+
+# ==================== ARMAZENAMENTO ====================
+
+def bench_clients(results, count: int, args):
+    from db_manager import DatabaseManager
+    from background_jobs import get_import_worker, get_job_manager
+
+    clients = generate_clients(count, args.seed)
+    dataset = {'clientes': count}
+    rng = random.Random(args.seed)
+
+    with workspace(args.keep):
+        db = DatabaseManager()
+        try:
+            single = [dict(c) for c in clients[:min(count, args.single_ops)]]
+            results.add('storage', 'save_cliente', dataset, measure_each(db.save_cliente, single))
+
+            results.add('storage', 'save_all_clientes', dataset,
+                        measure(db.save_all_clientes, args.repeat, setup=lambda: [dict(c) for c in clients]),
+                        items=count)
+
+            # O cache em memória é esvaziado para medir a leitura do SQLite
+            results.add('storage', 'get_all_clientes', dataset,
+                        measure(lambda _: db.get_all_clientes(), args.repeat, setup=db._cliente_cache.clear),
+                        items=count, variant='cold')
+            db.get_all_clientes()
+            results.add('storage', 'get_all_clientes', dataset,
+                        measure(db.get_all_clientes, args.repeat), items=count, variant='warm')
+            results.add('storage', 'iter_all_clientes', dataset,
+                        measure(lambda _: consume(db.iter_all_clientes()), args.repeat, setup=db._cliente_cache.clear),
+                        items=count, variant='cold')
+
+            db._cliente_cache.clear()
+            cpfs = [clients[rng.randrange(count)]['cpf'] for _ in range(min(count, args.single_ops))]
+            results.add('storage', 'get_cliente_by_id_or_cpf', dataset,
+                        measure_each(db.get_cliente_by_id_or_cpf, cpfs), variant='cpf')
+
+            # Digitação na busca: prefixos do nome e dos dígitos do CPF
+            prefixes = [clients[rng.randrange(count)]['nome'][:rng.randint(2, 5)] for _ in range(min(count, args.single_ops))]
+            results.add('storage', 'search_clientes', dataset,
+                        measure_each(db.search_clientes, prefixes), variant='nome')
+            prefixes = [re.sub(r'\D', '', c)[:6] for c in cpfs]
+            results.add('storage', 'search_clientes', dataset,
+                        measure_each(db.search_clientes, prefixes), variant='cpf')
+
+            worker = get_import_worker(db, 'dados/navegador')
+            job_manager = get_job_manager()
+            imported = clients[:min(count, IMPORT_MAX_ITEMS)]
+            results.add('storage', 'import_clients_async', {'clientes': len(imported)},
+                        measure(lambda items: wait_job(job_manager, worker.import_clients_async(items)),
+                                args.repeat, setup=lambda: [dict(c) for c in imported]),
+                        items=len(imported))
+
+            backups = []
+            results.add('storage', 'create_backup', dataset,
+                        measure(lambda: backups.append(db.create_backup('zip')), args.repeat), variant='zip')
+            results.add('storage', 'restore_backup', dataset,
+                        measure(lambda: db.restore_backup(backups[-1]), args.repeat),
+                        variant='zip')
+        finally:
+            db.close()
+
+
+def bench_registros(results, count: int, args):
+    from db_manager import DatabaseManager
+    from background_jobs import get_import_worker, get_job_manager
+
+    clients = generate_clients(REGISTROS_SEED_CLIENTS, args.seed)
+    dataset = {'registros': count}
+    rng = random.Random(args.seed)
+
+    with workspace(args.keep):
+        db = DatabaseManager()
+        try:
+            db.save_all_clientes([dict(c) for c in clients])
+
+            elapsed = 0.0
+            for batch in registros_batches(clients, count, args.seed):
+                started = time.perf_counter()
+                db.save_all_registros(batch)
+                elapsed += time.perf_counter() - started
+            results.add('storage', 'save_all_registros', dataset, [elapsed], items=count)
+
+            results.add('storage', 'get_all_registros', dataset,
+                        measure(db.get_all_registros, args.repeat), items=count)
+            results.add('storage', 'iter_all_registros', dataset,
+                        measure(lambda: consume(db.iter_all_registros()), args.repeat), items=count)
+
+            pages = min(args.single_ops, 200)
+            results.add('storage', 'get_registros_page', dataset,
+                        measure_each(lambda _: db.get_registros_page(limit=100), range(pages)), variant='primeira')
+            client_ids = [clients[rng.randrange(len(clients))]['id'] for _ in range(pages)]
+            results.add('storage', 'get_registros_page', dataset,
+                        measure_each(lambda cid: db.get_registros_page(limit=100, cliente_id=cid), client_ids),
+                        variant='cliente')
+            results.add('storage', 'get_registros_page', dataset,
+                        measure_each(lambda _: db.get_registros_page(limit=100, em_aberto=True), range(pages)),
+                        variant='em_aberto')
+
+            worker = get_import_worker(db, 'dados/navegador')
+            job_manager = get_job_manager()
+            imported_count = min(count, IMPORT_MAX_ITEMS)
+            results.add('storage', 'import_registros_async', {'registros': imported_count},
+                        measure(lambda items: wait_job(job_manager, worker.import_registros_async(items)),
+                                args.repeat,
+                                setup=lambda: list(generate_registros(clients, imported_count, args.seed))),
+                        items=imported_count)
+
+            results.add('storage', 'create_backup', {'clientes': len(clients), 'registros': count},
+                        measure(lambda: db.create_backup('zip'), args.repeat), variant='zip')
+        finally:
+            db.close()
+
+
+# ==================== API ====================
+
+def http_request(conn, method, path, body=None, headers=None):
+    payload = json.dumps(body).encode('utf-8') if body is not None else None
+    request_headers = {'Accept-Encoding': 'gzip'}
+    if payload is not None:
+        request_headers['Content-Type'] = 'application/json'
+    request_headers.update(headers or {})
+    conn.request(method, path, body=payload, headers=request_headers)
+    response = conn.getresponse()
+    data = response.read()
+    return response.status, data, response
+
+
+def bench_api(results, client_count: int, registro_count: int, args):
+    """Latência ponta a ponta por HTTP (conexão persistente, um cliente por vez)"""
+    clients = generate_clients(client_count, args.seed)
+    dataset = {'clientes': client_count, 'registros': registro_count}
+    rng = random.Random(args.seed)
+
+    with workspace(args.keep):
+        import server
+
+        server.DB_MANAGER.save_all_clientes([dict(c) for c in clients])
+        for batch in registros_batches(clients, registro_count, args.seed):
+            server.DB_MANAGER.save_all_registros(batch)
+        server.JOB_MANAGER.notify_change('clients')
+        server.JOB_MANAGER.notify_change('registros')
+
+        httpd = server.create_http_server(('127.0.0.1', 0))
+        port = httpd.server_address[1]
+        thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        thread.start()
+
+        def pick_client():
+            return clients[rng.randrange(client_count)]
+
+        def new_registro():
+            client = pick_client()
+            new_registro.counter += 1
+            return {
+                'id': f"bench{new_registro.counter:08d}",
+                'clienteId': client['id'],
+                'bicicletaId': client['bicicletas'][0]['id'],
+                'dataHoraEntrada': datetime.now().isoformat(timespec='seconds'),
+            }
+        new_registro.counter = 0
+
+        etag = {}
+
+        def clients_if_none_match():
+            return {'If-None-Match': etag.get('clients', '')}
+
+        light, heavy = args.api_requests, args.api_heavy_requests
+        scenarios = [
+            ('GET /api/health', light, lambda: ('GET', '/api/health', None, None)),
+            ('GET /api/changes', light, lambda: ('GET', '/api/changes', None, None)),
+            ('GET /api/client/<cpf>', light, lambda: ('GET', f"/api/client/{pick_client()['cpf']}", None, None)),
+            ('GET /api/clients/search?q=', light,
+             lambda: ('GET', f"/api/clients/search?q={quote(pick_client()['nome'][:4])}", None, None)),
+            ('GET /api/categorias', light, lambda: ('GET', '/api/categorias', None, None)),
+            ('GET /api/registros?limit=100', light, lambda: ('GET', '/api/registros?limit=100', None, None)),
+            ('GET /api/registros?clientId=', light,
+             lambda: ('GET', f"/api/registros?clientId={pick_client()['id']}", None, None)),
+            ('POST /api/registro', light, lambda: ('POST', '/api/registro', new_registro(), None)),
+            ('POST /api/client', light, lambda: ('POST', '/api/client', dict(pick_client()), None)),
+            ('GET /api/clients', heavy, lambda: ('GET', '/api/clients', None, None)),
+            ('GET /api/clients (If-None-Match)', light,
+             lambda: ('GET', '/api/clients', None, clients_if_none_match())),
+            ('GET /api/registros', heavy, lambda: ('GET', '/api/registros', None, None)),
+        ]
+
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+        try:
+            # Aquece snapshots e cache, e obtém o ETag atual de /api/clients
+            _, _, response = http_request(conn, 'GET', '/api/clients')
+            etag['clients'] = response.getheader('ETag', '')
+
+            for name, count, make_request in scenarios:
+                samples, errors, sizes = [], 0, 0
+                for _ in range(count):
+                    method, path, body, headers = make_request()
+                    started = time.perf_counter()
+                    status, data, _ = http_request(conn, method, path, body, headers)
+                    samples.append(time.perf_counter() - started)
+                    sizes += len(data)
+                    if status >= 400:
+                        errors += 1
+                results.add('api', name, dataset, samples, errors=errors,
+                            avg_response_bytes=sizes // max(1, count))
+        finally:
+            conn.close()
+            httpd.shutdown()
+            httpd.server_close()
+            server.DB_MANAGER.close()
+
+
+# ==================== COMPARAÇÃO ====================
+
+def result_key(result):
+    return (result['group'], result['name'], result.get('variant') or '',
+            json.dumps(result['dataset'], sort_keys=True))
+
+
+def compare(baseline_path: str, results, threshold: float) -> int:
+    """Compara medianas com um arquivo anterior; retorna a quantidade de regressões"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {result_key(r): r for r in json.load(f)['results']}
+
+    regressions = 0
+    print(f"\nComparação com {baseline_path} (mediana; regressão acima de +{threshold:.0f}%)")
+    for result in results:
+        before = baseline.get(result_key(result))
+        if before is None:
+            continue
+        old, new = before['seconds']['median'], result['seconds']['median']
+        change = (new - old) / old * 100 if old else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  << REGRESSÃO'
+            regressions += 1
+        label = f"{result['name']}[{result['variant']}]" if result.get('variant') else result['name']
+        data = ' '.join(f"{k}={v}" for k, v in result['dataset'].items())
+        print(f"{label:40} {data:32} {old * 1000:10.2f} -> {new * 1000:10.2f} ms  {change:+7.1f}%{flag}")
+    return regressions
+
+
+# ==================== EXECUÇÃO ====================
+
+def git_revision():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT,
+                                         stderr=subprocess.DEVNULL, text=True).strip()
+        dirty = bool(subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                             cwd=ROOT, stderr=subprocess.DEVNULL, text=True).strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmarks de armazenamento e API do BICICLET')
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='quick',
+                        help='Tamanho dos conjuntos de dados (full: até 100k clientes e 1M registros)')
+    parser.add_argument('--suite', choices=('all', 'storage', 'api'), default='all')
+    parser.add_argument('--clients', help='Tamanhos de clientes separados por vírgula (substitui o preset)')
+    parser.add_argument('--registros', type=int, help='Quantidade de registros (substitui o preset)')
+    parser.add_argument('--repeat', type=int, default=3, help='Repetições das operações em lote')
+    parser.add_argument('--single-ops', type=int, default=1000, help='Amostras das operações individuais')
+    parser.add_argument('--api-requests', type=int, default=200, help='Requisições por cenário leve da API')
+    parser.add_argument('--api-heavy-requests', type=int, default=10,
+                        help='Requisições por cenário de listagem completa')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Arquivo JSON de saída')
+    parser.add_argument('--compare', help='JSON de uma execução anterior para comparação')
+    parser.add_argument('--fail-threshold', type=float, default=None,
+                        help='Sai com código 1 se alguma mediana piorar mais que este percentual')
+    parser.add_argument('--keep', action='store_true', help='Não apaga os diretórios temporários')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    preset = dict(PRESETS[args.preset])
+    if args.clients:
+        preset['clients'] = [int(n) for n in args.clients.split(',') if n.strip()]
+        preset['api_clients'] = max(preset['clients'])
+    if args.registros is not None:
+        preset['registros'] = preset['api_registros'] = args.registros
+
+    # Logs de cada requisição/lote distorcem as medições
+    logging.disable(logging.INFO)
+
+    commit, dirty = git_revision()
+    meta = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'dirty': dirty,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'preset': args.preset,
+        'datasets': preset,
+        'repeat': args.repeat,
+        'seed': args.seed,
+    }
+    print(f"BICICLET benchmark — commit {commit or '?'}{' (modificado)' if dirty else ''}, "
+          f"Python {meta['python']}, SQLite {meta['sqlite']}")
+
+    results = BenchmarkResults()
+    if args.suite in ('all', 'storage'):
+        for count in preset['clients']:
+            bench_clients(results, count, args)
+        bench_registros(results, preset['registros'], args)
+    if args.suite in ('all', 'api'):
+        bench_api(results, preset['api_clients'], preset['api_registros'], args)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'meta': meta, 'results': results.results}, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados gravados em {args.output}")
+
+    if args.compare:
+        regressions = compare(args.compare, results.results, args.fail_threshold or 10.0)
+        if args.fail_threshold is not None and regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+"""
+Configuração comum dos testes pytest
+
+Os módulos ficam na raiz do projeto; cada teste roda num diretório temporário
+para que os caminhos relativos (dados/...) nunca toquem nos dados reais.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(autouse=True)
+def _diretorio_temporario(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture
+def db(tmp_path):
+    from db_manager import DatabaseManager
+    manager = DatabaseManager(db_path=str(tmp_path / 'teste.db'))
+    yield manager
+    manager.close()
@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+"""
+Gerador de carga que simula estações do bicicletário contra o server.py
+
+Cada estação abre uma assinatura SSE em /api/events, consulta /api/changes
+periodicamente (recarregando /api/clients e /api/registros quando os
+contadores mudam, como o frontend) e executa, com tempo de espera aleatório,
+check-ins/check-outs (POST /api/registro), identificações do app móvel
+(POST /api/mobile/identify) e buscas de cliente. Ao final mostra vazão,
+latências p50/p95/p99 e taxa de erro por operação.
+
+    # Servidor local temporário com 5 mil clientes, 50 estações por 60 s
+    python3 tests/load_generator.py --spawn --clients 5000 --stations 50 --duration 60
+
+    # Servidor já em execução
+    python3 tests/load_generator.py --url http://127.0.0.1:5000 --stations 20
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import shutil
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(TESTS_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, TESTS_DIR)
+
+from benchmark import percentile  # noqa: E402
+
+DEFAULT_MIX = 'registro=60,search=25,identify=15'
+
+SPAWN_SCRIPT = """
+import logging, sys
+sys.path.insert(0, {root!r})
+sys.path.insert(0, {tests!r})
+import server
+from benchmark import generate_clients
+logging.disable(logging.INFO)
+server.DB_MANAGER.save_all_clientes(generate_clients({clients}, {seed}))
+server.JOB_MANAGER.notify_change('clients')
+address = ('127.0.0.1', {port})
+if server.SERVER_MODE == 'asyncio':
+    from async_server import run_async_server
+    print('READY', flush=True)
+    run_async_server(server.CombinedHTTPHandler, address, broadcaster=server.SSE_BROADCASTER,
+                     sse_init=server.sse_init_event, max_sse_clients=server.SSE_MAX_CLIENTS)
+else:
+    httpd = server.create_http_server(address)
+    print('READY', flush=True)
+    httpd.serve_forever()
+"""
+
+
+class LoadStats:
+    """Latências e erros por operação (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.error_samples = {}
+        self.sse = {'connected': 0, 'failed': 0, 'events': 0, 'dropped': 0, 'connect_latencies': []}
+
+    def record(self, operation, elapsed, ok, detail=None):
+        with self._lock:
+            self.latencies.setdefault(operation, []).append(elapsed)
+            if not ok:
+                self.errors[operation] = self.errors.get(operation, 0) + 1
+                if detail and len(self.error_samples.setdefault(operation, [])) < 3:
+                    self.error_samples[operation].append(detail)
+
+    def sse_event(self, key, value=1):
+        with self._lock:
+            if key == 'connect_latencies':
+                self.sse[key].append(value)
+            else:
+                self.sse[key] += value
+
+    def report(self, duration):
+        with self._lock:
+            operations = {}
+            total = errors = 0
+            for operation, samples in sorted(self.latencies.items()):
+                ordered = sorted(samples)
+                failed = self.errors.get(operation, 0)
+                total += len(ordered)
+                errors += failed
+                operations[operation] = {
+                    'requests': len(ordered),
+                    'errors': failed,
+                    'error_rate': round(failed / len(ordered), 4),
+                    'throughput': round(len(ordered) / duration, 2),
+                    'p50_ms': round(percentile(ordered, 0.50) * 1000, 2),
+                    'p95_ms': round(percentile(ordered, 0.95) * 1000, 2),
+                    'p99_ms': round(percentile(ordered, 0.99) * 1000, 2),
+                    'max_ms': round(ordered[-1] * 1000, 2),
+                    'error_samples': self.error_samples.get(operation, []),
+                }
+            connects = sorted(self.sse['connect_latencies'])
+            sse = {k: v for k, v in self.sse.items() if k != 'connect_latencies'}
+            sse['connect_p95_ms'] = round(percentile(connects, 0.95) * 1000, 2) if connects else None
+        return {
+            'duration_s': round(duration, 2),
+            'requests': total,
+            'errors': errors,
+            'error_rate': round(errors / total, 4) if total else 0.0,
+            'throughput': round(total / duration, 2) if duration else 0.0,
+            'operations': operations,
+            'sse': sse,
+        }
+
+
+class Station(threading.Thread):
+    """Uma estação: conexão HTTP persistente própria e uma assinatura SSE"""
+
+    def __init__(self, index, args, target, clients, stats, stop, start_delay):
+        super().__init__(name=f"estacao-{index}", daemon=True)
+        self.index = index
+        self.args = args
+        self.host, self.port = target
+        self.clients = clients
+        self.stats = stats
+        self.stop = stop
+        self.start_delay = start_delay
+        self.rng = random.Random(args.seed + index)
+        self.conn = None
+        self.sse_conn = None
+        self.open_registros = []
+        self.changes = None
+        self.clients_etag = ''
+        self.counter = 0
+        self.actions, self.weights = zip(*args.mix.items())
+
+    # ---------------------------------------------------------------
+
+    def request(self, operation, method, path, body=None, headers=None):
+        payload = json.dumps(body).encode('utf-8') if body is not None else None
+        request_headers = {'Accept-Encoding': 'gzip'}
+        if payload is not None:
+            request_headers['Content-Type'] = 'application/json'
+        request_headers.update(headers or {})
+        started = time.perf_counter()
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.args.timeout)
+            self.conn.request(method, path, body=payload, headers=request_headers)
+            response = self.conn.getresponse()
+            data = response.read()
+            elapsed = time.perf_counter() - started
+            ok = response.status < 400
+            self.stats.record(operation, elapsed, ok, None if ok else f"HTTP {response.status}")
+            if response.will_close:
+                self.conn.close()
+                self.conn = None
+            return response, data
+        except (OSError, http.client.HTTPException) as e:
+            self.stats.record(operation, time.perf_counter() - started, False, f"{type(e).__name__}: {e}")
+            if self.conn is not None:
+                self.conn.close()
+            self.conn = None
+            return None, None
+
+    def json_body(self, response, data):
+        if response is None or response.status >= 400 or not data:
+            return None
+        if response.getheader('Content-Encoding') == 'gzip':
+            import gzip
+            data = gzip.decompress(data)
+        try:
+            return json.loads(data)
+        except ValueError:
+            return None
+
+    # ---------------------------------------------------------------
+
+    def subscribe_sse(self):
+        started = time.perf_counter()
+        try:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.args.timeout)
+            conn.request('GET', '/api/events')
+            response = conn.getresponse()
+            if response.status != 200:
+                self.stats.sse_event('failed')
+                conn.close()
+                return
+            self.sse_conn = conn
+            first = True
+            while not self.stop.is_set():
+                line = response.readline()
+                if not line:
+                    if not self.stop.is_set():
+                        self.stats.sse_event('dropped')
+                    break
+                if line.startswith(b'event:'):
+                    if first:
+                        self.stats.sse_event('connect_latencies', time.perf_counter() - started)
+                        self.stats.sse_event('connected')
+                        first = False
+                    else:
+                        self.stats.sse_event('events')
+        except (OSError, http.client.HTTPException):
+            if not self.stop.is_set():
+                self.stats.sse_event('failed')
+
+    def close_sse(self):
+        conn = self.sse_conn
+        if conn is not None and conn.sock is not None:
+            try:
+                conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+
+    # ---------------------------------------------------------------
+
+    def poll_changes(self):
+        response, data = self.request('changes', 'GET', '/api/changes')
+        changes = self.json_body(response, data)
+        if changes is None:
+            return
+        previous, self.changes = self.changes, changes
+        if previous is None:
+            return
+        if changes.get('clients') != previous.get('clients'):
+            response, _ = self.request('clients_reload', 'GET', '/api/clients',
+                                       headers={'If-None-Match': self.clients_etag})
+            if response is not None and response.getheader('ETag'):
+                self.clients_etag = response.getheader('ETag')
+        if changes.get('registros') != previous.get('registros'):
+            self.request('registros_reload', 'GET', '/api/registros?limit=100')
+
+    def check_in(self):
+        client = self.rng.choice(self.clients)
+        if not client['bicicletas']:
+            return
+        self.counter += 1
+        registro = {
+            'id': f"load-{self.index}-{self.counter}-{int(time.time() * 1000)}",
+            'clienteId': client['id'],
+            'bicicletaId': client['bicicletas'][0]['id'],
+            'dataHoraEntrada': datetime.now().isoformat(timespec='seconds'),
+            'criadoPor': 'load_generator',
+        }
+        response, _ = self.request('checkin', 'POST', '/api/registro', registro)
+        if response is not None and response.status < 400:
+            self.open_registros.append(registro)
+
+    def check_out(self):
+        registro = self.open_registros.pop(self.rng.randrange(len(self.open_registros)))
+        registro['dataHoraSaida'] = datetime.now().isoformat(timespec='seconds')
+        self.request('checkout', 'POST', '/api/registro', registro)
+
+    def search(self):
+        client = self.rng.choice(self.clients)
+        self.request('search', 'GET', f"/api/client/{client['cpf']}")
+
+    def identify(self):
+        client = self.rng.choice(self.clients)
+        self.request('identify', 'POST', '/api/mobile/identify', {'cpf': client['cpf']})
+
+    def run(self):
+        if self.stop.wait(self.start_delay):
+            return
+        if self.args.sse:
+            threading.Thread(target=self.subscribe_sse, name=f"{self.name}-sse", daemon=True).start()
+
+        response, _ = self.request('clients_bootstrap', 'GET', '/api/clients')
+        if response is not None and response.getheader('ETag'):
+            self.clients_etag = response.getheader('ETag')
+        next_poll = time.monotonic()
+
+        while not self.stop.is_set():
+            now = time.monotonic()
+            if now >= next_poll:
+                self.poll_changes()
+                next_poll = now + self.args.poll_interval
+
+            action = self.rng.choices(self.actions, self.weights)[0]
+            if action == 'registro':
+                if self.open_registros and self.rng.random() < 0.5:
+                    self.check_out()
+                else:
+                    self.check_in()
+            elif action == 'search':
+                self.search()
+            elif action == 'identify':
+                self.identify()
+
+            wait = self.rng.expovariate(1.0 / self.args.think_time) if self.args.think_time > 0 else 0
+            self.stop.wait(min(wait, next_poll - time.monotonic()) if wait > 0 else 0)
+
+        self.close_sse()
+        if self.conn is not None:
+            self.conn.close()
+
+
+# ==================== SERVIDOR LOCAL ====================
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def spawn_server(args):
+    """Inicia o server.py em um processo separado, com dados sintéticos em um diretório temporário"""
+    workdir = tempfile.mkdtemp(prefix='biciclet-load-')
+    port = free_port()
+    env = dict(os.environ)
+    if args.server_mode:
+        env['SERVER_MODE'] = args.server_mode
+    script = SPAWN_SCRIPT.format(root=ROOT, tests=TESTS_DIR, clients=args.clients, seed=args.seed, port=port)
+    process = subprocess.Popen([sys.executable, '-c', script], cwd=workdir, env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    for line in process.stdout:
+        if line.strip() == 'READY':
+            break
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise RuntimeError("O servidor local não iniciou")
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/api/health')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return process, workdir, ('127.0.0.1', port)
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    shutil.rmtree(workdir, ignore_errors=True)
+    raise RuntimeError("O servidor local não respondeu em /api/health")
+
+
+def fetch_clients(target, limit):
+    """Clientes existentes no servidor (usados nos check-ins, buscas e identificações)"""
+    conn = http.client.HTTPConnection(*target, timeout=120)
+    try:
+        conn.request('GET', '/api/clients')
+        response = conn.getresponse()
+        data = response.read()
+    finally:
+        conn.close()
+    if response.status != 200:
+        raise RuntimeError(f"GET /api/clients retornou HTTP {response.status}")
+    clients = [c for c in json.loads(data) if c.get('cpf')]
+    return clients[:limit] if limit else clients
+
+
+# ==================== EXECUÇÃO ====================
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ('registro', 'search', 'identify'):
+            raise argparse.ArgumentTypeError(f"Ação desconhecida no mix: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Simula estações do bicicletário contra o server.py')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--url', default='http://127.0.0.1:5000', help='Servidor já em execução')
+    target.add_argument('--spawn', action='store_true',
+                        help='Inicia um servidor local temporário com dados sintéticos')
+    parser.add_argument('--server-mode', choices=('threading', 'pool', 'asyncio'),
+                        help='SERVER_MODE do servidor iniciado com --spawn')
+    parser.add_argument('--clients', type=int, default=2000, help='Clientes gerados com --spawn')
+    parser.add_argument('--stations', type=int, default=20, help='Estações simultâneas')
+    parser.add_argument('--duration', type=float, default=60, help='Duração do teste (s)')
+    parser.add_argument('--ramp-up', type=float, default=None, help='Tempo para iniciar todas as estações (s)')
+    parser.add_argument('--think-time', type=float, default=2.0,
+                        help='Espera média entre ações de uma estação (s); 0 = sem espera')
+    parser.add_argument('--poll-interval', type=float, default=5.0, help='Intervalo de consulta a /api/changes (s)')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"Pesos das ações (padrão: {DEFAULT_MIX})")
+    parser.add_argument('--no-sse', dest='sse', action='store_false', help='Não assina /api/events')
+    parser.add_argument('--timeout', type=float, default=30, help='Timeout de cada requisição (s)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Grava o relatório em JSON')
+    return parser.parse_args()
+
+
+def print_report(report, args):
+    print(f"\n{args.stations} estações, {report['duration_s']} s — "
+          f"{report['requests']} requisições, {report['throughput']} req/s, "
+          f"erros {report['error_rate'] * 100:.2f}%")
+    print(f"{'operação':20} {'req':>7} {'req/s':>8} {'erros':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'máx ms':>9}")
+    for name, op in report['operations'].items():
+        print(f"{name:20} {op['requests']:7d} {op['throughput']:8.2f} {op['errors']:7d} "
+              f"{op['p50_ms']:9.2f} {op['p95_ms']:9.2f} {op['p99_ms']:9.2f} {op['max_ms']:9.2f}")
+    for name, op in report['operations'].items():
+        for sample in op['error_samples']:
+            print(f"  erro em {name}: {sample}")
+    sse = report['sse']
+    if args.sse:
+        print(f"SSE: {sse['connected']} conectadas, {sse['failed']} falhas, {sse['dropped']} quedas, "
+              f"{sse['events']} eventos recebidos, conexão p95 {sse['connect_p95_ms']} ms")
+
+
+def main():
+    args = parse_args()
+    process = workdir = None
+    if args.spawn:
+        process, workdir, target = spawn_server(args)
+        print(f"Servidor local em http://{target[0]}:{target[1]} "
+              f"(SERVER_MODE={args.server_mode or os.getenv('SERVER_MODE', 'threading')}, {args.clients} clientes)")
+    else:
+        parsed = urlparse(args.url)
+        target = (parsed.hostname, parsed.port or 80)
+
+    try:
+        clients = fetch_clients(target, args.clients if not args.spawn else 0)
+        if not clients:
+            print("Nenhum cliente com CPF no servidor; cadastre clientes ou use --spawn")
+            sys.exit(1)
+
+        stats = LoadStats()
+        stop = threading.Event()
+        ramp_up = args.ramp_up if args.ramp_up is not None else min(10.0, args.duration / 4)
+        stations = [
+            Station(i, args, target, clients, stats, stop, ramp_up * i / max(1, args.stations))
+            for i in range(args.stations)
+        ]
+        started = time.monotonic()
+        for station in stations:
+            station.start()
+        try:
+            stop.wait(args.duration)
+        except KeyboardInterrupt:
+            pass
+        stop.set()
+        for station in stations:
+            station.close_sse()
+        for station in stations:
+            station.join(timeout=args.timeout)
+        duration = time.monotonic() - started
+
+        report = stats.report(duration)
+        report['config'] = {
+            'stations': args.stations, 'duration': args.duration, 'think_time': args.think_time,
+            'poll_interval': args.poll_interval, 'mix': args.mix, 'sse': args.sse,
+            'server_mode': args.server_mode, 'clients': len(clients),
+        }
+        print_report(report, args)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"Relatório gravado em {args.output}")
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
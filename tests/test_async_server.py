@@ -0,0 +1,64 @@
+"""Backend asyncio: respostas do handler chegam ao socket em pedaços"""
+import asyncio
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler
+
+from async_server import ASYNC_WRITE_BUFFER, AsyncHTTPServer
+
+liberar = threading.Event()
+
+
+class _StreamHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(b'a' * ASYNC_WRITE_BUFFER)
+        # Só termina depois que o cliente recebeu o primeiro pedaço
+        assert liberar.wait(5)
+        self.wfile.write(b'b' * 10)
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_server():
+    server = AsyncHTTPServer(_StreamHandler, ('127.0.0.1', 0))
+    loop = asyncio.new_event_loop()
+    iniciado = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(server.start())
+        iniciado.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    assert iniciado.wait(5)
+    return server, loop
+
+
+def test_resposta_e_enviada_antes_do_handler_terminar():
+    server, loop = _start_server()
+    port = server._server.sockets[0].getsockname()[1]
+    try:
+        with socket.create_connection(('127.0.0.1', port), timeout=5) as sock:
+            sock.sendall(b"GET /stream HTTP/1.1\r\nHost: x\r\n\r\n")
+            recebido = b''
+            while b'a' * 100 not in recebido:
+                recebido += sock.recv(65536)
+            assert recebido.split(b'\r\n', 1)[0].endswith(b'200 OK')
+            liberar.set()
+            while True:
+                parte = sock.recv(65536)
+                if not parte:
+                    break
+                recebido += parte
+        assert recebido.endswith(b'a' * 100 + b'b' * 10)
+        assert recebido.count(b'a') >= ASYNC_WRITE_BUFFER
+    finally:
+        liberar.set()
+        loop.call_soon_threadsafe(loop.stop)
+        server.executor.shutdown(wait=False)
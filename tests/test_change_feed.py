@@ -0,0 +1,55 @@
+"""Feed de alterações por linha: retomada com Last-Event-ID e versões dos eventos"""
+
+import importlib
+import json
+
+import pytest
+
+
+class _Broadcaster:
+    def __init__(self):
+        self.eventos = []
+
+    def broadcast(self, event_type, data, event_id=None):
+        self.eventos.append((event_id, data))
+
+
+@pytest.fixture
+def server():
+    # Importado já no diretório temporário: os caminhos dados/... ficam lá
+    return importlib.import_module('server')
+
+
+def _seq(msg):
+    return json.loads(msg.split('data: ', 1)[1])['seq']
+
+
+def test_retoma_a_partir_do_ultimo_evento_visto(server):
+    feed = server.ChangeFeed(_Broadcaster(), size=10)
+    for n in range(3):
+        feed.publish({'entity': 'registro', 'op': 'save', 'id': f'r{n}'})
+    primeiro = f"{server.SERVER_BOOT_ID}-1"
+    assert [_seq(msg) for msg in feed.since(primeiro)] == [2, 3]
+    assert feed.since(feed.last_event_id()) == []
+    # Outro boot ou seq do futuro: o cliente precisa recarregar tudo
+    assert feed.since('outroboot-1') is None
+    assert feed.since(f"{server.SERVER_BOOT_ID}-9") is None
+
+
+def test_nao_retoma_se_o_intervalo_saiu_do_buffer(server):
+    feed = server.ChangeFeed(_Broadcaster(), size=2)
+    for n in range(5):
+        feed.publish({'entity': 'cliente', 'op': 'save', 'id': f'c{n}'})
+    assert feed.since(f"{server.SERVER_BOOT_ID}-1") is None
+    assert [_seq(msg) for msg in feed.since(f"{server.SERVER_BOOT_ID}-3")] == [4, 5]
+
+
+def test_evento_de_registro_leva_o_contador_do_proprio_incremento(server, monkeypatch):
+    broadcaster = _Broadcaster()
+    monkeypatch.setattr(server, 'CHANGE_FEED', server.ChangeFeed(broadcaster))
+    monkeypatch.setattr(server.SNAPSHOT_CACHE, 'schedule_refresh', lambda change_type: None)
+    server.publish_change('registro', 'delete', 'r1', resource='registros')
+    _, evento = broadcaster.eventos[-1]
+    assert evento['resource'] == 'registros'
+    assert evento['version'] == server.JOB_MANAGER.get_changes()['registros']
+    assert server.JOB_MANAGER.notify_change('registros') == evento['version'] + 1
@@ -0,0 +1,77 @@
+"""Cache de clientes: gerações, releitura após gravação e cache completo"""
+
+from db_manager import ClienteCache, DatabaseManager
+
+
+def _cliente(cliente_id, nome='FULANO', cpf='00000000001'):
+    return {'id': cliente_id, 'nome': nome, 'cpf': cpf, 'bicicletas': []}
+
+
+def test_releitura_atrasada_nao_sobrescreve_gravacao_mais_nova():
+    cache = ClienteCache(max_entries=10)
+    antiga = cache.invalidate('c1')
+    nova = cache.invalidate('c1')
+    cache.put(_cliente('c1', 'NOVO'), nova)
+    # A releitura da primeira gravação chega depois e é descartada
+    cache.put(_cliente('c1', 'ANTIGO'), antiga)
+    assert cache.lookup('c1')[1]['nome'] == 'NOVO'
+
+
+def test_invalidate_suspende_cache_completo_ate_a_releitura():
+    cache = ClienteCache(max_entries=10)
+    cache.fill([_cliente('c1'), _cliente('c2', cpf='00000000002')], cache.generation, 1)
+    generation = cache.invalidate('c1')
+    assert cache.get_all() is None
+    # Outro cliente lido nessa geração não devolve a completude
+    cache.put(_cliente('c2', cpf='00000000002'), generation)
+    assert cache.get_all() is None
+    cache.put(_cliente('c1', 'ATUALIZADO'), generation)
+    assert sorted(c['id'] for c in cache.get_all()) == ['c1', 'c2']
+
+
+def test_cache_completo_consulta_o_banco_quando_nao_encontra(tmp_path):
+    caminho = str(tmp_path / 'compartilhado.db')
+    servidor = DatabaseManager(db_path=caminho)
+    assert servidor.save_cliente(_cliente('c1'))
+    assert len(servidor.get_all_clientes()) == 1
+    # Outro processo (app.py) grava no mesmo banco
+    assert DatabaseManager(db_path=caminho).save_cliente(_cliente('c2', cpf='00000000002'))
+    assert servidor.get_cliente_by_id('c2')['id'] == 'c2'
+    assert servidor.get_cliente_by_cpf('000.000.000-02')['id'] == 'c2'
+    assert servidor.get_cliente_by_id('inexistente') is None
+
+
+def test_save_cliente_atualiza_o_cache(db):
+    assert db.save_cliente(_cliente('c1'))
+    assert db.get_cliente_by_id('c1')['nome'] == 'FULANO'
+    assert db.save_cliente(_cliente('c1', 'BELTRANO'))
+    cached, cliente = db._cliente_cache.lookup('c1')
+    assert cached and cliente['nome'] == 'BELTRANO'
+
+
+def test_cache_descartado_quando_outro_processo_grava(tmp_path):
+    caminho = str(tmp_path / 'compartilhado.db')
+    servidor = DatabaseManager(db_path=caminho)
+    assert servidor.save_cliente(_cliente('c1', 'ANA'))
+    assert [c['nome'] for c in servidor.get_all_clientes()] == ['ANA']
+    assert servidor.get_cliente_by_id('c1')['nome'] == 'ANA'
+
+    outro = DatabaseManager(db_path=caminho)
+    assert outro.save_cliente(_cliente('c1', 'ANA MARIA'))
+    assert outro.save_cliente(_cliente('c2', 'BRUNO', cpf='00000000002'))
+
+    assert [c['nome'] for c in servidor.get_all_clientes()] == ['ANA MARIA', 'BRUNO']
+    assert servidor.get_cliente_by_id('c1')['nome'] == 'ANA MARIA'
+    assert servidor._cliente_cache.get_stats()['stale_drops'] >= 1
+
+
+def test_escritas_locais_mantem_o_cache_completo(db):
+    assert db.save_cliente(_cliente('c1'))
+    db.get_all_clientes()
+    assert db.save_cliente(_cliente('c2', 'BELTRANO', cpf='00000000002'))
+    assert db.save_bicicleta({'id': 'b1', 'clienteId': 'c1', 'descricao': 'CALOI'})
+    assert db.delete_cliente('c2')
+    stats = db._cliente_cache.get_stats()
+    assert stats['complete'] and stats['stale_drops'] == 0
+    [cliente] = db.get_all_clientes()
+    assert [b['id'] for b in cliente['bicicletas']] == ['b1']
@@ -0,0 +1,106 @@
+"""Pool de conexões do DatabaseManager: aninhamento, commits, close_all e restore"""
+import threading
+import time
+
+import pytest
+
+from db_manager import SQLiteConnectionPool
+
+
+def _count(db, table):
+    with db._get_connection() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_chamada_aninhada_reutiliza_conexao(db):
+    with db._get_connection() as outer:
+        with db._get_connection() as inner:
+            assert inner is outer
+        assert db._local.depth == 1
+    assert db.get_pool_stats()['idle'] == 1
+
+
+def test_commit_aninhado_fica_para_o_nivel_externo(db):
+    cliente = {'id': 'c1', 'nome': 'ANA', 'cpf': '529.982.247-25', 'bicicletas': []}
+    with pytest.raises(RuntimeError):
+        with db._get_connection():
+            # save_cliente faz commit; aninhado, não pode encerrar a transação do chamador
+            assert db.save_cliente(dict(cliente))
+            raise RuntimeError('falha depois da gravação')
+    assert _count(db, 'clientes') == 0
+
+    with db._get_connection():
+        assert db.save_cliente(dict(cliente))
+    assert _count(db, 'clientes') == 1
+
+
+def test_commit_no_nivel_externo(db):
+    assert db.save_cliente({'id': 'c2', 'nome': 'BIA', 'cpf': '111.444.777-35', 'bicicletas': []})
+    assert _count(db, 'clientes') == 1
+
+
+def test_close_all_fecha_conexoes_emprestadas_na_devolucao(tmp_path):
+    pool = SQLiteConnectionPool(str(tmp_path / 'pool.db'), size=2)
+    idle = pool.acquire()
+    busy = pool.acquire()
+    pool.release(idle)
+    pool.close_all()
+    assert pool.get_stats()['open'] == 1
+
+    pool.release(busy)
+    stats = pool.get_stats()
+    assert stats['open'] == 0 and stats['idle'] == 0
+
+    fresh = pool.acquire()
+    fresh.execute("SELECT 1")
+    pool.release(fresh)
+    assert pool.get_stats()['idle'] == 1
+
+
+def test_pool_esgotado_respeita_timeout(tmp_path):
+    pool = SQLiteConnectionPool(str(tmp_path / 'pool.db'), size=1, timeout=0.05)
+    conn = pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+    pool.release(conn)
+    pool.release(pool.acquire())
+
+
+def test_exclusive_espera_conexoes_emprestadas_e_bloqueia_acquire(tmp_path):
+    pool = SQLiteConnectionPool(str(tmp_path / 'pool.db'), size=2, timeout=0.05)
+    busy = pool.acquire()
+    with pytest.raises(TimeoutError):
+        with pool.exclusive():
+            pass
+    # Timeout devolve os slots ocupados e reabre o pool
+    pool.release(pool.acquire())
+
+    eventos = []
+    devolver = threading.Timer(0.1, lambda: (eventos.append('release'), pool.release(busy)))
+    devolver.start()
+    with pool.exclusive(timeout=2):
+        eventos.append('exclusive')
+        with pytest.raises(TimeoutError):
+            pool.acquire()
+    assert eventos == ['release', 'exclusive']
+    pool.release(pool.acquire())
+
+
+def test_restore_zip_com_conexao_emprestada(db, tmp_path):
+    cliente = {'id': 'c1', 'nome': 'ANA', 'cpf': '529.982.247-25', 'bicicletas': []}
+    assert db.save_cliente(dict(cliente))
+    backup = db.create_backup(format='zip')
+    assert db.delete_cliente('c1')
+    assert db.get_cliente_by_id('c1') is None
+
+    with db._get_connection() as conn:
+        # Outra thread restaura enquanto esta ainda segura uma conexão
+        resultado = []
+        restore = threading.Thread(target=lambda: resultado.append(db.restore_backup(backup)))
+        restore.start()
+        time.sleep(0.1)
+        assert restore.is_alive()
+        conn.execute("SELECT COUNT(*) FROM clientes").fetchone()
+    restore.join(5)
+    assert resultado == [True]
+    assert db.get_cliente_by_id('c1')['nome'] == 'ANA'
@@ -0,0 +1,36 @@
+"""Listas completas em lotes: iter_all_clientes / iter_all_registros"""
+
+
+def _popular(db, clientes=7, registros=9):
+    for n in range(clientes):
+        nome = 'MESMO NOME' if n < 3 else f'CLIENTE {n}'
+        assert db.save_cliente({'id': f'c{n}', 'nome': nome, 'cpf': f'{n:011d}',
+                                'bicicletas': [{'id': f'b{n}', 'marca': 'M', 'modelo': 'X', 'cor': 'Y'}]})
+    for n in range(registros):
+        assert db.save_registro({'id': f'r{n}', 'clienteId': 'c0', 'bicicletaId': 'b0',
+                                 'dataHoraEntrada': f'2026-01-0{1 + n % 3}T10:00:00'})
+
+
+def test_iter_all_clientes_percorre_lotes_sem_prender_conexao(db):
+    _popular(db)
+    db._cliente_cache.clear()
+    vistos = []
+    for cliente in db.iter_all_clientes(batch_size=2):
+        # Entre os lotes a conexão já voltou ao pool
+        assert not db._pool._in_use
+        vistos.append(cliente)
+    assert sorted(c['id'] for c in vistos) == [f'c{n}' for n in range(7)]
+    assert [c['nome'] for c in vistos] == sorted(c['nome'] for c in vistos)
+    assert all(len(c['bicicletas']) == 1 for c in vistos)
+
+
+def test_iter_all_registros_mesma_ordem_de_get_all(db):
+    _popular(db)
+    vistos = []
+    for registro in db.iter_all_registros(batch_size=4):
+        assert not db._pool._in_use
+        vistos.append(registro)
+    assert len({r['id'] for r in vistos}) == 9
+    entradas = [r['dataHoraEntrada'] for r in vistos]
+    assert entradas == sorted(entradas, reverse=True)
+    assert entradas == [r['dataHoraEntrada'] for r in db.get_all_registros()]
@@ -0,0 +1,72 @@
+"""Motor log do armazenamento JSON: releitura, compactação e trava da pasta"""
+
+import os
+
+import pytest
+
+from json_store import SegmentLogCollection
+
+
+def _abrir(pasta, **kwargs):
+    kwargs.setdefault('fsync', 'never')
+    return SegmentLogCollection(str(pasta), **kwargs)
+
+
+def test_reabre_relendo_os_segmentos_sem_indice(tmp_path):
+    colecao = _abrir(tmp_path, segment_max_bytes=200)
+    for n in range(10):
+        colecao.put(f'k{n}', {'id': f'r{n}', 'n': n})
+    colecao.put('k3', {'id': 'r3', 'n': 33})
+    assert colecao.delete('k5')
+    colecao.close()
+    os.remove(tmp_path / 'index.jsonl')
+
+    colecao = _abrir(tmp_path, segment_max_bytes=200)
+    assert colecao.count() == 9
+    assert colecao.get('k3')['n'] == 33
+    assert colecao.get('k5') is None
+    assert colecao.get_stats()['segments'] > 1
+    colecao.close()
+
+
+def test_descarta_linha_incompleta_no_fim_do_log(tmp_path):
+    colecao = _abrir(tmp_path)
+    colecao.put('a', {'id': 'a'})
+    colecao.put('b', {'id': 'b'})
+    segmento = colecao._segment_path(colecao._active_no)
+    colecao.close()
+    os.remove(tmp_path / 'index.jsonl')
+    with open(segmento, 'ab') as f:
+        f.write(b'{"op":"put","id":"c","da')
+
+    colecao = _abrir(tmp_path)
+    assert sorted(key for key, _ in colecao.items()) == ['a', 'b']
+    colecao.put('c', {'id': 'c'})
+    assert colecao.get('c') == {'id': 'c'}
+    colecao.close()
+
+
+def test_compactacao_mantem_so_os_itens_vivos(tmp_path):
+    colecao = _abrir(tmp_path, segment_max_bytes=300)
+    for rodada in range(5):
+        for n in range(6):
+            colecao.put(f'k{n}', {'id': f'k{n}', 'rodada': rodada})
+    colecao.delete('k0')
+    antigos = set(colecao._sizes)
+    assert colecao.compact()
+    assert not antigos & set(colecao._sizes)
+    assert all(not os.path.exists(colecao._segment_path(no)) for no in antigos)
+    assert colecao.get_stats()['dead_bytes'] == 0
+    colecao.close()
+
+    colecao = _abrir(tmp_path, segment_max_bytes=300)
+    assert {key: record['rodada'] for key, record in colecao.items()} == {f'k{n}': 4 for n in range(1, 6)}
+    colecao.close()
+
+
+def test_pasta_so_pode_ser_aberta_uma_vez(tmp_path):
+    colecao = _abrir(tmp_path)
+    with pytest.raises(RuntimeError):
+        _abrir(tmp_path)
+    colecao.close()
+    _abrir(tmp_path).close()
@@ -0,0 +1,53 @@
+"""Gravação em lote (put_many) nos dois motores do armazenamento JSON"""
+
+import os
+
+import pytest
+
+import json_store
+from json_store import FileTreeCollection, SegmentLogCollection
+
+
+@pytest.fixture(autouse=True)
+def fsync_data(monkeypatch):
+    monkeypatch.setattr(json_store, 'JSON_FSYNC', 'data')
+
+
+def _registro(n, dia):
+    return {'id': f'r{n}', 'dataHoraEntrada': f'2026-03-0{dia}T08:00:00'}
+
+
+def test_arvore_de_arquivos_grava_lote_sem_sobras(tmp_path):
+    registros = FileTreeCollection(str(tmp_path), nested_by_date=True)
+    versao = registros.version()
+    assert registros.put_many((f'r{n}', _registro(n, 1 + n % 3)) for n in range(6)) == 6
+    assert registros.count() == 6
+    assert registros.version() != versao
+    assert registros.get_by_id('r4')[1]['dataHoraEntrada'].startswith('2026-03-02')
+    # Mudou a data de entrada: o arquivo antigo sai da outra pasta
+    registros.put_many([('r4', _registro(4, 9))])
+    assert not os.path.exists(tmp_path / '2026' / '03' / '02' / 'r4.json')
+    assert os.path.exists(tmp_path / '2026' / '03' / '09' / 'r4.json')
+    temporarios = [nome for _, _, nomes in os.walk(tmp_path) for nome in nomes if nome.endswith('.tmp')]
+    assert temporarios == []
+
+
+def test_arvore_de_arquivos_remove_temporarios_se_o_lote_falha(tmp_path):
+    clientes = FileTreeCollection(str(tmp_path))
+
+    def itens():
+        yield '1', {'id': 'a'}
+        raise ValueError('item inválido')
+
+    with pytest.raises(ValueError):
+        clientes.put_many(itens())
+    assert os.listdir(tmp_path) == []
+
+
+def test_log_grava_lote_e_reabre(tmp_path):
+    colecao = SegmentLogCollection(str(tmp_path), segment_max_bytes=150)
+    assert colecao.put_many((f'k{n}', {'id': f'k{n}', 'n': n}) for n in range(8)) == 8
+    colecao.close()
+    colecao = SegmentLogCollection(str(tmp_path))
+    assert {key: record['n'] for key, record in colecao.items()} == {f'k{n}': n for n in range(8)}
+    colecao.close()
@@ -0,0 +1,41 @@
+"""Snapshots JSON das listagens: erro ao montar não vira resposta válida"""
+
+import importlib
+
+import pytest
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = importlib.import_module('server')
+    monkeypatch.setattr(server, 'resource_data_version', lambda change_type: 7)
+    return server
+
+
+def test_erro_no_builder_nao_fica_guardado(server):
+    cache = server.JSONSnapshotCache(max_bytes=1 << 20)
+    chamadas = []
+
+    def builder():
+        chamadas.append(1)
+        if len(chamadas) == 1:
+            raise TimeoutError("Nenhuma conexão SQLite livre")
+        return b'[{"id": "c1"}]'
+
+    cache.register('/api/teste', 'clients', builder)
+    assert cache.get('/api/teste') is None
+    _, body, _ = cache.get('/api/teste')
+    assert body == b'[{"id": "c1"}]'
+    # Mesma versão: servido do snapshot, sem montar de novo
+    assert cache.get('/api/teste')[1] == body
+    assert len(chamadas) == 2
+
+
+def test_snapshot_refeito_quando_a_versao_dos_dados_muda(server, monkeypatch):
+    cache = server.JSONSnapshotCache(max_bytes=1 << 20)
+    conteudo = {'valor': b'[1]'}
+    cache.register('/api/teste', 'clients', lambda: conteudo['valor'])
+    assert cache.get('/api/teste')[1] == b'[1]'
+    conteudo['valor'] = b'[2]'
+    monkeypatch.setattr(server, 'resource_data_version', lambda change_type: 8)
+    assert cache.get('/api/teste')[1] == b'[2]'
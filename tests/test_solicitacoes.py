@@ -0,0 +1,40 @@
+"""Fila de solicitações: reserva atômica, conclusão e repetição"""
+
+from db_manager import SOLICITACAO_APROVADA, SOLICITACAO_EM_ATENDIMENTO, SOLICITACAO_REJEITADA
+
+
+def _enfileirar(db, quantidade):
+    for n in range(quantidade):
+        assert db.add_solicitacao({'id': f's{n}', 'clientId': 'c1', 'bikeId': 'b1',
+                                   'criadaEm': f'2026-05-01T10:0{n}:00'})
+
+
+def test_estacoes_nunca_recebem_a_mesma_solicitacao(db):
+    _enfileirar(db, 3)
+    primeira = db.claim_solicitacoes('estacao-1', limit=2)
+    segunda = db.claim_solicitacoes('estacao-2', limit=2)
+    assert [s['id'] for s in primeira] == ['s0', 's1']
+    assert [s['id'] for s in segunda] == ['s2']
+    assert all(s['status'] == SOLICITACAO_EM_ATENDIMENTO for s in primeira + segunda)
+    assert db.claim_solicitacoes('estacao-3') == []
+
+
+def test_reserva_expirada_pode_ser_pega_de_novo(db):
+    _enfileirar(db, 1)
+    assert db.claim_solicitacoes('estacao-1')
+    assert db.claim_solicitacoes('estacao-2', timeout=3600) == []
+    [retomada] = db.claim_solicitacoes('estacao-2', timeout=-1)
+    assert retomada['id'] == 's0'
+    assert retomada['operador'] == 'estacao-2'
+
+
+def test_conclusao_repetida_nao_muda_o_estado(db):
+    _enfileirar(db, 1)
+    db.claim_solicitacoes('estacao-1')
+    concluida = db.complete_solicitacao('s0', SOLICITACAO_APROVADA)
+    assert concluida['status'] == SOLICITACAO_APROVADA
+    # A repetição não conclui de novo; o servidor responde com o estado atual
+    assert db.complete_solicitacao('s0', SOLICITACAO_REJEITADA) is None
+    assert db.get_solicitacao('s0')['status'] == SOLICITACAO_APROVADA
+    assert db.get_solicitacao('inexistente') is None
+    assert db.get_solicitacoes() == []
@@ -0,0 +1,68 @@
+"""Sincronização incremental: get_changes_since (paginação, tombstones e retenção)"""
+
+
+def _cliente(n):
+    return {'id': f'c{n}', 'nome': f'CLIENTE {n}', 'cpf': f'{n:011d}', 'bicicletas': []}
+
+
+def _sync_all(db, since, limit):
+    """Percorre as páginas como um cliente faria; devolve (ids vistos, versão final)"""
+    seen = set()
+    while True:
+        page = db.get_changes_since(since, limit)
+        seen.update(c['id'] for c in page['clientes'])
+        assert page['version'] <= db.get_data_version()
+        since = page['version']
+        if not page['has_more']:
+            return seen, since
+
+
+def test_paginacao_entrega_todas_as_linhas(db):
+    for n in range(1, 8):
+        assert db.save_cliente(_cliente(n))
+    seen, version = _sync_all(db, 1, limit=3)
+    assert seen == {f'c{n}' for n in range(1, 8)}
+    assert version == db.get_data_version()
+
+
+def test_pagina_cortada_nao_pula_linhas_de_outras_tabelas(db):
+    for n in range(1, 6):
+        assert db.save_cliente(_cliente(n))
+    first = db.get_changes_since(1, limit=2)
+    assert first['has_more']
+    assert [c['id'] for c in first['clientes']] == ['c1', 'c2']
+    assert all(c['versao'] <= first['version'] for c in first['clientes'])
+
+
+def test_exclusao_gera_tombstone(db):
+    assert db.save_cliente(_cliente(1))
+    since = db.get_data_version()
+    assert db.delete_cliente('c1')
+    page = db.get_changes_since(since)
+    assert page['deleted']['clientes'] == ['c1']
+    assert not page['reset']
+
+
+def test_expurgo_de_tombstones_forca_reset_para_quem_ficou_para_tras(db):
+    assert db.save_cliente(_cliente(1))
+    assert db.save_cliente(_cliente(2))
+    antigo = db.get_data_version()
+    assert db.delete_cliente('c1')
+    with db._get_connection() as conn:
+        conn.execute("UPDATE exclusoes SET excluido_em = datetime('now', '-200 days')")
+
+    assert db.purge_exclusoes(days=90) == 1
+    atual = db.get_data_version()
+
+    page = db.get_changes_since(antigo)
+    assert page['reset'] and page['since'] == 0
+    assert [c['id'] for c in page['clientes']] == ['c2']
+    assert not db.get_changes_since(atual)['reset']
+
+
+def test_expurgo_mantem_tombstones_recentes(db):
+    assert db.save_cliente(_cliente(1))
+    since = db.get_data_version()
+    assert db.delete_cliente('c1')
+    assert db.purge_exclusoes(days=90) == 0
+    assert db.get_changes_since(since)['deleted']['clientes'] == ['c1']